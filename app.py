@@ -10,11 +10,14 @@ import streamlit as st
 import requests
 import json
 import time
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import pandas as pd
-from streamlit_utils import run_wildlife_analysis_streamlit, fetch_species_data_streamlit
+from streamlit_utils import run_wildlife_analysis_streamlit
+from streamlit_utils import remember_analysis, analysis_history, current_analysis, select_analysis
+from streamlit_utils import species_suggestions, normalize_species_query
+from fused_pipeline import pipeline_mode
+from tools.records import ClimateSeries
+from tools.species_tool import fetch_species_records
+from tools.metrics import ensure_metrics_server
 
 # Page configuration
 st.set_page_config(
@@ -114,8 +117,191 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def render_analysis_results(analysis):
+    """
+    Render the report tabs for a completed analysis.
+    
+    Args:
+        analysis (dict): Stored analysis as kept in ``st.session_state``
+    """
+    # Charting libraries are only needed once there are results to show
+    import pandas as pd
+    from charts import (
+        kingdom_counts, species_count_figure, kingdom_pie_figure, temperature_figure, occurrence_map_figure
+    )
+    
+    species_query = analysis['species_query']
+    species_data = analysis['species_data']
+    climate_data = analysis['climate_data']
+    species_count = species_data.count
+    data_hash = analysis['data_hash']
+    
+    st.markdown("---")
+    st.markdown("## 📋 Wildlife Insight Report")
+    
+    # Create tabs for different views
+    tab1, tab2, tab3 = st.tabs(["📖 Full Report", "📊 Data Insights", "🔬 Technical Details"])
+    
+    with tab1:
+        st.markdown("### 🐾 Conservation Report")
+        st.markdown(analysis['result'])
+    
+    with tab2:
+        # Create two columns for species and climate data
+        col_species, col_climate = st.columns(2)
+        
+        with col_species:
+            st.markdown("#### 🐾 Species Data Insights")
+            # Create visualizations if we have data
+            if species_count > 0:
+                # Species count chart
+                fig = species_count_figure(data_hash, species_query, species_count)
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # Sample data visualization
+                if species_data.records:
+                    # Create a simple taxonomy breakdown
+                    kingdoms = kingdom_counts(species_data.records)
+                    
+                    if kingdoms:
+                        fig_pie = kingdom_pie_figure(data_hash, kingdoms)
+                        st.plotly_chart(fig_pie, use_container_width=True)
+            else:
+                st.info("No occurrence data available for visualization.")
+        
+        with col_climate:
+            st.markdown("#### 🌤️ Climate Data Insights")
+            # Climate data visualization
+            if climate_data.has_current:
+                current_temp = climate_data.current_temperature
+                wind_speed = climate_data.current_windspeed or 0
+                
+                # Current weather metrics
+                st.metric("Current Temperature", f"{current_temp}°C")
+                st.metric("Wind Speed", f"{wind_speed} km/h")
+                
+                # Temperature forecast chart
+                if climate_data.temperature_max:
+                    temps = climate_data.temperature_max.tolist()[:7]  # 7 days
+                    fig_temp = temperature_figure(data_hash, temps)
+                    st.plotly_chart(fig_temp, use_container_width=True)
+            else:
+                st.info("Climate data not available for visualization.")
+        
+        # Occurrence map spanning both columns
+        distribution = analysis.get('distribution') or {}
+        if distribution.get('top_cells'):
+            st.markdown("#### 🗺️ Where It Has Been Observed")
+            st.caption(
+                f"{distribution['records_binned']:,} GBIF occurrence records binned on a "
+                f"{distribution['cell_size_deg']}° grid ({distribution['occupied_cells']:,} occupied cells)"
+            )
+            fig_map = occurrence_map_figure(data_hash, distribution)
+            st.plotly_chart(fig_map, use_container_width=True)
+    
+    with tab3:
+        st.markdown("### 🔬 Technical Analysis Details")
+        
+        # API Response Summary
+        st.markdown("#### GBIF API Response")
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            st.metric("Total Records", species_data.count)
+        with col_b:
+            st.metric("Results Returned", len(species_data.records))
+        with col_c:
+            st.metric("End of Records", "Yes" if species_data.end_of_records else "No")
+        
+        # Sample data
+        if species_data.records:
+            st.markdown("#### Sample Species Data")
+            sample_data = []
+            for record in species_data.records[:5]:
+                sample_data.append({
+                    'Scientific Name': record.scientific_name or 'N/A',
+                    'Kingdom': record.kingdom or 'N/A',
+                    'Phylum': record.phylum or 'N/A',
+                    'Class': record.class_name or 'N/A',
+                    'Rank': record.rank or 'N/A',
+                    'Status': record.taxonomic_status or 'N/A'
+                })
+            
+            df = pd.DataFrame(sample_data)
+            st.dataframe(df, use_container_width=True)
+        
+        # Climate data summary
+        if climate_data.has_current:
+            st.markdown("#### Climate Data Summary")
+            climate_col_a, climate_col_b, climate_col_c = st.columns(3)
+            with climate_col_a:
+                st.metric("Location", "New York")
+            with climate_col_b:
+                st.metric("Current Temp", f"{climate_data.current_temperature}°C")
+            with climate_col_c:
+                st.metric("Wind Speed", f"{climate_data.current_windspeed if climate_data.current_windspeed is not None else 'N/A'} km/h")
+        
+        # Analysis metadata
+        st.markdown("#### Analysis Metadata")
+        metadata = {
+            'Species Query': species_query,
+            'Analysis Time': f"{analysis['elapsed_time']:.2f} seconds",
+            'Timestamp': analysis['timestamp'],
+            'Species API': f"https://api.gbif.org/v1/species/search?q={species_query}",
+            'Climate API': "https://api.open-meteo.com/v1/forecast",
+            'MCP Tools Used': "fetch_species, fetch_climate_data",
+            'AI Model': analysis.get('backend') or "N/A",
+            'Pipeline Mode': analysis.get('pipeline_mode') or "crew",
+            'Framework': "CrewAI"
+        }
+        
+        for key, value in metadata.items():
+            st.text(f"{key}: {value}")
+        
+        # Per-stage timings recorded when the analysis ran
+        if analysis.get('timings'):
+            st.markdown("#### Stage Timings")
+            for stage, seconds in analysis['timings'].items():
+                st.text(f"{stage}: {seconds:.2f} seconds")
+        
+        # Per-stage LLM token usage (see tools/prompt_budget.py)
+        if analysis.get('tokens'):
+            st.markdown("#### Token Usage")
+            for stage, counts in analysis['tokens'].items():
+                st.text(f"{stage}: {counts['prompt_tokens']} prompt + {counts['completion_tokens']} output tokens "
+                        f"in {counts['llm_calls']} calls, context {counts['context_tokens_in']} -> "
+                        f"{counts['context_tokens_out']}")
+
+def render_stored_analysis(analysis):
+    """
+    Re-render the last analysis on a rerun without fetching or recomputing.
+    
+    Args:
+        analysis (dict): Stored analysis as kept in ``st.session_state``
+    """
+    species_count = analysis['species_data'].count
+    
+    st.markdown(f"""
+    <div class="species-card">
+        <h2>🔍 Analysis: {analysis['species_query'].title()}</h2>
+        <p>Completed at {analysis['timestamp']}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Species Found", f"{species_count:,}")
+    with col2:
+        st.metric("Status", "✅ Retrieved" if species_count > 0 else "⚠️ Limited")
+    with col3:
+        st.metric("Progress", "100%")
+    with col4:
+        st.metric("Analysis Time", f"{analysis['elapsed_time']:.1f}s")
+    
+    render_analysis_results(analysis)
+
 def main():
     """Main Streamlit application"""
+    ensure_metrics_server()
     
     # Header
     st.markdown('<h1 class="main-header">🐾 Wildlife Insight Agent</h1>', unsafe_allow_html=True)
@@ -151,10 +337,34 @@ def main():
                 "Enter species name:",
                 placeholder="e.g., polar bear, dolphin, eagle"
             )
+            # Suggestions come from the local taxonomy index, when one is configured
+            suggestions = species_suggestions(custom_species)
+            if suggestions and custom_species.strip().lower() not in [name.lower() for name in suggestions]:
+                custom_species = st.selectbox("Did you mean:", [custom_species] + suggestions)
+        
+        # Crew runs four agent tasks; fused calls the tools directly and the LLM once
+        mode_options = {"Crew (4 agent tasks)": "crew", "Fused (1 LLM call)": "fused"}
+        selected_mode = st.radio("Pipeline mode:", list(mode_options),
+                                 index=list(mode_options.values()).index(pipeline_mode()))
         
         # Analysis button
         analyze_button = st.button("🚀 Start Analysis", type="primary")
         
+        # Previous analyses from this session; picking one re-renders it from
+        # session state without running the pipeline again
+        history = analysis_history(st.session_state)
+        if history:
+            st.markdown("## 🕘 Recent Analyses")
+            history_ids = [entry['id'] for entry in reversed(history)]
+            labels = {entry['id']: f"{entry['species_query'].title()} ({entry['timestamp']})" for entry in history}
+            chosen_id = st.selectbox(
+                "Show analysis:",
+                history_ids,
+                index=history_ids.index(current_analysis(st.session_state)['id']),
+                format_func=labels.get
+            )
+            select_analysis(st.session_state, chosen_id)
+        
         # Information section
         st.markdown("---")
         st.markdown("## 📊 About")
@@ -175,7 +385,13 @@ def main():
     if analyze_button:
         # Determine species to analyze
         if selected_option == "🔍 Custom species" and custom_species:
-            species_query = custom_species.lower().strip()
+            species_query, name_match = normalize_species_query(custom_species)
+            if species_query is None:
+                st.error(f"No species named '{custom_species}' was found. Please check the spelling.")
+                return
+            if name_match and name_match['matchType'] == 'FUZZY':
+                st.info(f"Using '{name_match['matchedName']}' ({name_match['canonicalName']}) "
+                        f"for '{custom_species}'.")
         elif selected_option in species_options:
             species_query = species_options[selected_option]
         else:
@@ -215,8 +431,16 @@ def main():
             progress_bar.progress(10)
             
             # Get basic species data for metrics
-            species_data = fetch_species_data_streamlit(species_query)
-            species_count = species_data.get('count', 0)
+            species_data = fetch_species_records(species_query)
+            species_count = species_data.count
+            timings = {'Species Fetch': time.time() - start_time}
+            
+            # Summarize where the species occurs from GBIF occurrence records
+            from tools.occurrence_tool import fetch_occurrence_distribution
+            status_text.text("🗺️ Mapping occurrence records...")
+            distribution_start = time.time()
+            distribution = fetch_occurrence_distribution(species_query)
+            timings['Occurrence Binning'] = time.time() - distribution_start
             
             # Update metrics
             with col1:
@@ -240,10 +464,13 @@ def main():
                 status_text.text(message)
             
             # Capture the analysis output
+            pipeline_start = time.time()
             with st.spinner("Running CrewAI analysis pipeline..."):
                 result, logs, final_species_data, climate_data = run_wildlife_analysis_streamlit(
                     species_query, 
-                    progress_callback=update_progress
+                    progress_callback=update_progress,
+                    distribution=distribution,
+                    mode=mode_options[selected_mode]
                 )
             
             progress_bar.progress(90)
@@ -251,6 +478,8 @@ def main():
             
             # Calculate elapsed time
             elapsed_time = time.time() - start_time
+            timings['AI Pipeline'] = time.time() - pipeline_start
+            timings['Total'] = elapsed_time
             with col4:
                 st.metric("Analysis Time", f"{elapsed_time:.1f}s")
             with col3:
@@ -261,147 +490,26 @@ def main():
             
             # Display results
             if result:
-                st.markdown("---")
-                st.markdown("## 📋 Wildlife Insight Report")
-                
-                # Create tabs for different views
-                tab1, tab2, tab3 = st.tabs(["📖 Full Report", "📊 Data Insights", "🔬 Technical Details"])
-                
-                with tab1:
-                    st.markdown("### 🐾 Conservation Report")
-                    st.markdown(result)
-                
-                with tab2:
-                    # Create two columns for species and climate data
-                    col_species, col_climate = st.columns(2)
-                    
-                    with col_species:
-                        st.markdown("#### 🐾 Species Data Insights")
-                        # Create visualizations if we have data
-                        if species_count > 0:
-                            # Species count chart
-                            fig = go.Figure(data=go.Bar(
-                                x=[species_query.title()],
-                                y=[species_count],
-                                marker_color='#2E8B57'
-                            ))
-                            fig.update_layout(
-                                title=f"Species Records Found",
-                                xaxis_title="Species Query",
-                                yaxis_title="Number of Records",
-                                showlegend=False,
-                                height=400
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                            
-                            # Sample data visualization
-                            if 'results' in species_data and species_data['results']:
-                                # Create a simple taxonomy breakdown
-                                kingdoms = {}
-                                for result in species_data['results'][:10]:  # First 10 results
-                                    kingdom = result.get('kingdom', 'Unknown')
-                                    kingdoms[kingdom] = kingdoms.get(kingdom, 0) + 1
-                                
-                                if kingdoms:
-                                    fig_pie = px.pie(
-                                        values=list(kingdoms.values()),
-                                        names=list(kingdoms.keys()),
-                                        title=f"Taxonomic Kingdoms (Sample)"
-                                    )
-                                    fig_pie.update_layout(height=400)
-                                    st.plotly_chart(fig_pie, use_container_width=True)
-                        else:
-                            st.info("No occurrence data available for visualization.")
-                    
-                    with col_climate:
-                        st.markdown("#### 🌤️ Climate Data Insights")
-                        # Climate data visualization
-                        if climate_data and 'current_weather' in climate_data:
-                            current_temp = climate_data['current_weather'].get('temperature', 0)
-                            wind_speed = climate_data['current_weather'].get('windspeed', 0)
-                            
-                            # Current weather metrics
-                            st.metric("Current Temperature", f"{current_temp}°C")
-                            st.metric("Wind Speed", f"{wind_speed} km/h")
-                            
-                            # Temperature forecast chart
-                            if 'daily' in climate_data and 'temperature_2m_max' in climate_data['daily']:
-                                temps = climate_data['daily']['temperature_2m_max'][:7]  # 7 days
-                                days = [f"Day {i+1}" for i in range(len(temps))]
-                                
-                                fig_temp = go.Figure(data=go.Scatter(
-                                    x=days,
-                                    y=temps,
-                                    mode='lines+markers',
-                                    line=dict(color='#FF6B6B', width=3),
-                                    marker=dict(size=8)
-                                ))
-                                fig_temp.update_layout(
-                                    title="7-Day Temperature Forecast (New York)",
-                                    xaxis_title="Days",
-                                    yaxis_title="Temperature (°C)",
-                                    height=300
-                                )
-                                st.plotly_chart(fig_temp, use_container_width=True)
-                        else:
-                            st.info("Climate data not available for visualization.")
+                from charts import dataset_hash
                 
-                with tab3:
-                    st.markdown("### 🔬 Technical Analysis Details")
-                    
-                    # API Response Summary
-                    st.markdown("#### GBIF API Response")
-                    col_a, col_b, col_c = st.columns(3)
-                    with col_a:
-                        st.metric("Total Records", species_data.get('count', 0))
-                    with col_b:
-                        st.metric("Results Returned", len(species_data.get('results', [])))
-                    with col_c:
-                        st.metric("End of Records", "Yes" if species_data.get('endOfRecords', False) else "No")
-                    
-                    # Sample data
-                    if 'results' in species_data and species_data['results']:
-                        st.markdown("#### Sample Species Data")
-                        sample_data = []
-                        for i, result in enumerate(species_data['results'][:5]):
-                            sample_data.append({
-                                'Scientific Name': result.get('scientificName', 'N/A'),
-                                'Kingdom': result.get('kingdom', 'N/A'),
-                                'Phylum': result.get('phylum', 'N/A'),
-                                'Class': result.get('class', 'N/A'),
-                                'Rank': result.get('rank', 'N/A'),
-                                'Status': result.get('taxonomicStatus', 'N/A')
-                            })
-                        
-                        df = pd.DataFrame(sample_data)
-                        st.dataframe(df, use_container_width=True)
-                    
-                    # Climate data summary
-                    if climate_data and 'current_weather' in climate_data:
-                        st.markdown("#### Climate Data Summary")
-                        climate_col_a, climate_col_b, climate_col_c = st.columns(3)
-                        with climate_col_a:
-                            st.metric("Location", "New York")
-                        with climate_col_b:
-                            st.metric("Current Temp", f"{climate_data['current_weather'].get('temperature', 'N/A')}°C")
-                        with climate_col_c:
-                            st.metric("Wind Speed", f"{climate_data['current_weather'].get('windspeed', 'N/A')} km/h")
-                    
-                    # Analysis metadata
-                    st.markdown("#### Analysis Metadata")
-                    metadata = {
-                        'Species Query': species_query,
-                        'Analysis Time': f"{elapsed_time:.2f} seconds",
-                        'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'Species API': f"https://api.gbif.org/v1/species/search?q={species_query}",
-                        'Climate API': "https://api.open-meteo.com/v1/forecast",
-                        'MCP Tools Used': "fetch_species, fetch_climate_data",
-                        'AI Model': "Gemini 1.5 Flash",
-                        'Framework': "CrewAI"
-                    }
-                    
-                    for key, value in metadata.items():
-                        st.text(f"{key}: {value}")
+                # Keep the analysis so reruns (tabs, sidebar, expanders) re-render it
+                # instead of discarding the results
+                analysis = {
+                    'species_query': species_query,
+                    'result': str(result),
+                    'species_data': species_data,
+                    'climate_data': ClimateSeries.from_response(climate_data or {}),
+                    'distribution': distribution,
+                    'elapsed_time': elapsed_time,
+                    'timings': timings,
+                    'tokens': logs.get('tokens'),
+                    'pipeline_mode': logs.get('mode'),
+                    'backend': logs.get('backend'),
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'data_hash': dataset_hash(species_query, species_data, climate_data, distribution)
+                }
+                analysis = remember_analysis(st.session_state, analysis)
+                render_analysis_results(analysis)
             
             else:
                 st.error("❌ Analysis failed. Please try again or contact support.")
@@ -411,6 +519,9 @@ def main():
             progress_bar.progress(0)
             status_text.text("❌ Analysis failed")
     
+    elif current_analysis(st.session_state) is not None:
+        render_stored_analysis(current_analysis(st.session_state))
+    
     else:
         # Welcome screen
         st.markdown("## 🌟 Welcome to Wildlife Insight Agent")
@@ -9,12 +9,14 @@ import streamlit as st
 import requests
 import json
 import time
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import pandas as pd
 import os
 from dotenv import load_dotenv
+from streamlit_utils import remember_analysis, analysis_history, current_analysis, select_analysis
+from streamlit_utils import species_suggestions, normalize_species_query
+from fused_pipeline import pipeline_mode
+from tools.records import SpeciesSearch, ClimateSeries
+from tools.metrics import ensure_metrics_server
 
 # Load environment variables
 load_dotenv()
@@ -127,6 +129,16 @@ def fetch_species_data_production(query: str) -> dict:
     except Exception as e:
         return {"error": str(e), "results": [], "count": 0}
 
+def fetch_species_records_production(query: str) -> SpeciesSearch:
+    """
+    Fetch species data as parsed records (Production version).
+    """
+    try:
+        from tools.species_tool import fetch_species_records
+        return fetch_species_records(query)
+    except Exception as e:
+        return SpeciesSearch(error=str(e))
+
 def create_demo_report(species_query: str, species_count: int) -> str:
     """
     Create a demo report when API key is not available.
@@ -171,8 +183,147 @@ This app uses Model Context Protocol (MCP) tools:
 *This is a demo report. Full AI analysis with climate correlation requires API configuration.*
 """
 
+def render_analysis_results(analysis):
+    """
+    Render the report tabs for a completed analysis.
+    
+    Args:
+        analysis (dict): Stored analysis as kept in ``st.session_state``
+    """
+    # Charting libraries are only needed once there are results to show
+    import pandas as pd
+    from charts import kingdom_counts, species_count_figure, kingdom_pie_figure
+    
+    species_query = analysis['species_query']
+    species_data = analysis['species_data']
+    species_count = species_data.count
+    data_hash = analysis['data_hash']
+    
+    st.markdown("---")
+    st.markdown("## 📋 Wildlife Insight Report")
+    
+    # Create tabs for different views
+    tab1, tab2, tab3 = st.tabs(["📖 Full Report", "📊 Data Insights", "🔬 Technical Details"])
+    
+    with tab1:
+        st.markdown("### 🐾 Conservation Report")
+        st.markdown(analysis['result'])
+    
+    with tab2:
+        # Create visualizations if we have data
+        if species_count > 0:
+            # Species count chart
+            fig = species_count_figure(
+                data_hash, species_query, species_count,
+                title=f"Species Records Found for '{species_query.title()}'"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Sample data visualization
+            if species_data.records:
+                # Create a simple taxonomy breakdown
+                kingdoms = kingdom_counts(species_data.records)
+                
+                if kingdoms:
+                    fig_pie = kingdom_pie_figure(
+                        data_hash, kingdoms,
+                        title=f"Taxonomic Kingdoms for '{species_query.title()}' (Sample)"
+                    )
+                    st.plotly_chart(fig_pie, use_container_width=True)
+        else:
+            st.info("No occurrence data available for visualization.")
+    
+    with tab3:
+        st.markdown("### 🔬 Technical Analysis Details")
+        
+        # API Response Summary
+        st.markdown("#### GBIF API Response")
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            st.metric("Total Records", species_data.count)
+        with col_b:
+            st.metric("Results Returned", len(species_data.records))
+        with col_c:
+            st.metric("End of Records", "Yes" if species_data.end_of_records else "No")
+        
+        # Sample data
+        if species_data.records:
+            st.markdown("#### Sample Species Data")
+            sample_data = []
+            for record in species_data.records[:5]:
+                sample_data.append({
+                    'Scientific Name': record.scientific_name or 'N/A',
+                    'Kingdom': record.kingdom or 'N/A',
+                    'Phylum': record.phylum or 'N/A',
+                    'Class': record.class_name or 'N/A',
+                    'Rank': record.rank or 'N/A',
+                    'Status': record.taxonomic_status or 'N/A'
+                })
+            
+            df = pd.DataFrame(sample_data)
+            st.dataframe(df, use_container_width=True)
+        
+        # Analysis metadata
+        st.markdown("#### Analysis Metadata")
+        metadata = {
+            'Query': species_query,
+            'Analysis Time': f"{analysis['elapsed_time']:.2f} seconds",
+            'Timestamp': analysis['timestamp'],
+            'API Endpoint': f"https://api.gbif.org/v1/species/search?q={species_query}",
+            'Mode': analysis['mode'],
+            'Pipeline Mode': analysis.get('pipeline_mode') or "crew",
+            'AI Model': analysis.get('backend') or "N/A",
+            'Framework': "CrewAI + Streamlit"
+        }
+        
+        for key, value in metadata.items():
+            st.text(f"{key}: {value}")
+        
+        # Per-stage timings recorded when the analysis ran
+        if analysis.get('timings'):
+            st.markdown("#### Stage Timings")
+            for stage, seconds in analysis['timings'].items():
+                st.text(f"{stage}: {seconds:.2f} seconds")
+        
+        # Per-stage LLM token usage (see tools/prompt_budget.py)
+        if analysis.get('tokens'):
+            st.markdown("#### Token Usage")
+            for stage, counts in analysis['tokens'].items():
+                st.text(f"{stage}: {counts['prompt_tokens']} prompt + {counts['completion_tokens']} output tokens "
+                        f"in {counts['llm_calls']} calls, context {counts['context_tokens_in']} -> "
+                        f"{counts['context_tokens_out']}")
+
+def render_stored_analysis(analysis):
+    """
+    Re-render the last analysis on a rerun without fetching or recomputing.
+    
+    Args:
+        analysis (dict): Stored analysis as kept in ``st.session_state``
+    """
+    species_count = analysis['species_data'].count
+    
+    st.markdown(f"""
+    <div class="species-card">
+        <h2>🔍 Analysis: {analysis['species_query'].title()}</h2>
+        <p>Completed at {analysis['timestamp']}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Species Found", f"{species_count:,}")
+    with col2:
+        st.metric("Status", "✅ Retrieved" if species_count > 0 else "⚠️ Limited")
+    with col3:
+        st.metric("Progress", "100%")
+    with col4:
+        st.metric("Analysis Time", f"{analysis['elapsed_time']:.1f}s")
+    
+    render_analysis_results(analysis)
+
 def main():
     """Main Streamlit application"""
+    ensure_metrics_server()
     
     # Check for API key
     api_key = os.getenv('GEMINI_API_KEY')
@@ -219,10 +370,34 @@ def main():
                 "Enter species name:",
                 placeholder="e.g., polar bear, dolphin, eagle"
             )
+            # Suggestions come from the local taxonomy index, when one is configured
+            suggestions = species_suggestions(custom_species)
+            if suggestions and custom_species.strip().lower() not in [name.lower() for name in suggestions]:
+                custom_species = st.selectbox("Did you mean:", [custom_species] + suggestions)
+        
+        # Crew runs four agent tasks; fused calls the tools directly and the LLM once
+        mode_options = {"Crew (4 agent tasks)": "crew", "Fused (1 LLM call)": "fused"}
+        selected_mode = st.radio("Pipeline mode:", list(mode_options),
+                                 index=list(mode_options.values()).index(pipeline_mode()))
         
         # Analysis button
         analyze_button = st.button("🚀 Start Analysis", type="primary")
         
+        # Previous analyses from this session; picking one re-renders it from
+        # session state without running the pipeline again
+        history = analysis_history(st.session_state)
+        if history:
+            st.markdown("## 🕘 Recent Analyses")
+            history_ids = [entry['id'] for entry in reversed(history)]
+            labels = {entry['id']: f"{entry['species_query'].title()} ({entry['timestamp']})" for entry in history}
+            chosen_id = st.selectbox(
+                "Show analysis:",
+                history_ids,
+                index=history_ids.index(current_analysis(st.session_state)['id']),
+                format_func=labels.get
+            )
+            select_analysis(st.session_state, chosen_id)
+        
         # Information section
         st.markdown("---")
         st.markdown("## 📊 About")
@@ -246,7 +421,13 @@ def main():
     if analyze_button:
         # Determine species to analyze
         if selected_option == "🔍 Custom species" and custom_species:
-            species_query = custom_species.lower().strip()
+            species_query, name_match = normalize_species_query(custom_species)
+            if species_query is None:
+                st.error(f"No species named '{custom_species}' was found. Please check the spelling.")
+                return
+            if name_match and name_match['matchType'] == 'FUZZY':
+                st.info(f"Using '{name_match['matchedName']}' ({name_match['canonicalName']}) "
+                        f"for '{custom_species}'.")
         elif selected_option in species_options:
             species_query = species_options[selected_option]
         else:
@@ -276,8 +457,9 @@ def main():
             progress_bar.progress(20)
             
             # Get basic species data for metrics
-            species_data = fetch_species_data_production(species_query)
-            species_count = species_data.get('count', 0)
+            species_data = fetch_species_records_production(species_query)
+            species_count = species_data.count
+            timings = {'Species Fetch': time.time() - start_time}
             
             # Update metrics
             with col1:
@@ -298,6 +480,9 @@ def main():
             status_text.text("📝 Generating report...")
             
             # Generate report (demo or full)
+            report_start = time.time()
+            climate_data = {}
+            logs = {}
             if demo_mode:
                 result = create_demo_report(species_query, species_count)
             else:
@@ -310,7 +495,8 @@ def main():
                     
                     result, logs, final_species_data, climate_data = run_wildlife_analysis_streamlit(
                         species_query, 
-                        progress_callback=update_progress
+                        progress_callback=update_progress,
+                        mode=mode_options[selected_mode]
                     )
                 except Exception as e:
                     st.error(f"Error in full analysis: {e}")
@@ -318,6 +504,8 @@ def main():
             
             # Calculate elapsed time
             elapsed_time = time.time() - start_time
+            timings['Report Generation'] = time.time() - report_start
+            timings['Total'] = elapsed_time
             with col4:
                 st.metric("Analysis Time", f"{elapsed_time:.1f}s")
             with col3:
@@ -328,94 +516,26 @@ def main():
             
             # Display results
             if result:
-                st.markdown("---")
-                st.markdown("## 📋 Wildlife Insight Report")
-                
-                # Create tabs for different views
-                tab1, tab2, tab3 = st.tabs(["📖 Full Report", "📊 Data Insights", "🔬 Technical Details"])
-                
-                with tab1:
-                    st.markdown("### 🐾 Conservation Report")
-                    st.markdown(str(result))
+                from charts import dataset_hash
                 
-                with tab2:
-                    # Create visualizations if we have data
-                    if species_count > 0:
-                        # Species count chart
-                        fig = go.Figure(data=go.Bar(
-                            x=[species_query.title()],
-                            y=[species_count],
-                            marker_color='#2E8B57'
-                        ))
-                        fig.update_layout(
-                            title=f"Species Records Found for '{species_query.title()}'",
-                            xaxis_title="Species Query",
-                            yaxis_title="Number of Records",
-                            showlegend=False
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Sample data visualization
-                        if 'results' in species_data and species_data['results']:
-                            # Create a simple taxonomy breakdown
-                            kingdoms = {}
-                            for result in species_data['results'][:10]:  # First 10 results
-                                kingdom = result.get('kingdom', 'Unknown')
-                                kingdoms[kingdom] = kingdoms.get(kingdom, 0) + 1
-                            
-                            if kingdoms:
-                                fig_pie = px.pie(
-                                    values=list(kingdoms.values()),
-                                    names=list(kingdoms.keys()),
-                                    title=f"Taxonomic Kingdoms for '{species_query.title()}' (Sample)"
-                                )
-                                st.plotly_chart(fig_pie, use_container_width=True)
-                    else:
-                        st.info("No occurrence data available for visualization.")
-                
-                with tab3:
-                    st.markdown("### 🔬 Technical Analysis Details")
-                    
-                    # API Response Summary
-                    st.markdown("#### GBIF API Response")
-                    col_a, col_b, col_c = st.columns(3)
-                    with col_a:
-                        st.metric("Total Records", species_data.get('count', 0))
-                    with col_b:
-                        st.metric("Results Returned", len(species_data.get('results', [])))
-                    with col_c:
-                        st.metric("End of Records", "Yes" if species_data.get('endOfRecords', False) else "No")
-                    
-                    # Sample data
-                    if 'results' in species_data and species_data['results']:
-                        st.markdown("#### Sample Species Data")
-                        sample_data = []
-                        for i, result in enumerate(species_data['results'][:5]):
-                            sample_data.append({
-                                'Scientific Name': result.get('scientificName', 'N/A'),
-                                'Kingdom': result.get('kingdom', 'N/A'),
-                                'Phylum': result.get('phylum', 'N/A'),
-                                'Class': result.get('class', 'N/A'),
-                                'Rank': result.get('rank', 'N/A'),
-                                'Status': result.get('taxonomicStatus', 'N/A')
-                            })
-                        
-                        df = pd.DataFrame(sample_data)
-                        st.dataframe(df, use_container_width=True)
-                    
-                    # Analysis metadata
-                    st.markdown("#### Analysis Metadata")
-                    metadata = {
-                        'Query': species_query,
-                        'Analysis Time': f"{elapsed_time:.2f} seconds",
-                        'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'API Endpoint': f"https://api.gbif.org/v1/species/search?q={species_query}",
-                        'Mode': 'Demo Mode' if demo_mode else 'Full AI Analysis',
-                        'Framework': "CrewAI + Streamlit"
-                    }
-                    
-                    for key, value in metadata.items():
-                        st.text(f"{key}: {value}")
+                # Keep the analysis so reruns (tabs, sidebar, expanders) re-render it
+                # instead of discarding the results
+                analysis = {
+                    'species_query': species_query,
+                    'result': str(result),
+                    'species_data': species_data,
+                    'climate_data': ClimateSeries.from_response(climate_data or {}),
+                    'elapsed_time': elapsed_time,
+                    'timings': timings,
+                    'tokens': logs.get('tokens'),
+                    'pipeline_mode': logs.get('mode'),
+                    'backend': logs.get('backend'),
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'mode': 'Demo Mode' if demo_mode else 'Full AI Analysis',
+                    'data_hash': dataset_hash(species_query, species_data, climate_data)
+                }
+                analysis = remember_analysis(st.session_state, analysis)
+                render_analysis_results(analysis)
             
             else:
                 st.error("❌ Analysis failed. Please try again or contact support.")
@@ -425,6 +545,9 @@ def main():
             progress_bar.progress(0)
             status_text.text("❌ Analysis failed")
     
+    elif current_analysis(st.session_state) is not None:
+        render_stored_analysis(current_analysis(st.session_state))
+    
     else:
         # Welcome screen
         st.markdown("## 🌟 Welcome to Wildlife Insight Agent")
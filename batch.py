@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Wildlife Insight Agent - Batch Runs
+
+Runs the analysis pipeline for every species in a manifest on a pool of
+workers and appends one JSON line per finished item to an output file.
+Per-item state is kept in a SQLite journal next to the output file (a new
+``--output`` starts afresh), so an interrupted run resumes where it
+stopped: items already done are skipped as long as their inputs
+(species, pipeline mode, LLM backend) are unchanged, failed items are
+retried up to ``--max-attempts`` times, and items that were running when
+the process died are started again.
+
+The manifest has one item per line, either a species name or a JSON object
+with ``species`` and optional ``id``, ``mode`` and ``backend`` (lines
+starting with ``#`` are comments). Output lines are flushed before the
+journal records the item as done, so a crash can repeat an item's line but
+never lose it; readers keep the last line per ``id``. ``--export`` also
+archives every report with its data aggregates (see ``tools.report_export``).
+
+Usage:
+    python batch.py species.txt --output reports.jsonl --workers 4
+    python batch.py species.jsonl --output reports.jsonl --mode fused --backend stub
+    python batch.py species.txt --export archive/reports.parquet
+    python batch.py species.txt --output reports.jsonl --status
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from fused_pipeline import pipeline_mode
+from llm_backend import backend_name
+from tools.json_backend import dumps, loads
+from tools.metrics import registry
+from tools.records import json_default
+from tools.report_export import REPORT_EXPORT_ENV, get_report_exporter
+
+DEFAULT_OUTPUT = "batch_results.jsonl"
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Items submitted ahead of the workers; bounds memory for very long manifests
+QUEUE_FACTOR = 2
+
+STATES = ("pending", "running", "done", "failed")
+
+BATCH_ITEMS = registry.counter(
+    "wildlife_batch_items_total", "Batch items by outcome (done, failed, skipped).", ("outcome",))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    species TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    seconds REAL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """One manifest entry, with its mode and backend already resolved."""
+
+    item_id: str
+    species: str
+    mode: str
+    backend: str
+
+    @property
+    def input_hash(self) -> str:
+        """Fingerprint of everything that determines the item's result."""
+        inputs = dumps({"species": self.species, "mode": self.mode, "backend": self.backend}, sort_keys=True)
+        return hashlib.sha256(inputs.encode("utf-8")).hexdigest()[:16]
+
+
+def read_manifest(path: str, mode: Optional[str] = None, backend: Optional[str] = None) -> Iterator[BatchItem]:
+    """
+    Stream the items of a manifest file.
+
+    Args:
+        path: Text file with one species name or JSON object per line
+        mode: Pipeline mode for items that name none (default ``WILDLIFE_PIPELINE_MODE``)
+        backend: LLM backend for items that name none (default ``WILDLIFE_LLM_BACKEND``)
+
+    Raises:
+        ValueError: On a malformed line, an unknown mode or an unknown backend
+    """
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    entry = loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+            else:
+                entry = {"species": line}
+            species = str(entry.get("species") or "").lower().strip()
+            if not species:
+                raise ValueError(f"{path}:{number}: item has no species")
+            yield BatchItem(
+                item_id=str(entry.get("id") or species),
+                species=species,
+                mode=pipeline_mode(entry.get("mode") or mode),
+                backend=backend_name(entry.get("backend") or backend)
+            )
+
+
+def journal_path(output: str) -> str:
+    """Default journal of an output file; each output keeps its own item states."""
+    return f"{output}.journal.sqlite3"
+
+
+class BatchJournal:
+    """SQLite record of each item's state, attempts and input fingerprint."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def recover(self) -> int:
+        """Return items left running by an interrupted run to pending; returns how many."""
+        cursor = self._conn.execute(
+            "UPDATE items SET state = 'pending', updated_at = ? WHERE state = 'running'", (time.time(),))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def entry(self, item_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT input_hash, state, attempts, error FROM items WHERE item_id = ?", (item_id,)).fetchone()
+        if row is None:
+            return None
+        return {"input_hash": row[0], "state": row[1], "attempts": row[2], "error": row[3]}
+
+    def start(self, item: BatchItem) -> int:
+        """Mark ``item`` running; returns its attempt number (reset when its inputs changed)."""
+        entry = self.entry(item.item_id)
+        attempts = entry["attempts"] if entry and entry["input_hash"] == item.input_hash else 0
+        self._conn.execute(
+            "INSERT OR REPLACE INTO items (item_id, species, input_hash, state, attempts, error, seconds, updated_at) "
+            "VALUES (?, ?, ?, 'running', ?, NULL, NULL, ?)",
+            (item.item_id, item.species, item.input_hash, attempts + 1, time.time()))
+        self._conn.commit()
+        return attempts + 1
+
+    def finish(self, item: BatchItem, error: Optional[str], seconds: float) -> None:
+        """Checkpoint an item as done, or failed with ``error``."""
+        self._conn.execute(
+            "UPDATE items SET state = ?, error = ?, seconds = ?, updated_at = ? WHERE item_id = ?",
+            ("failed" if error else "done", error, seconds, time.time(), item.item_id))
+        self._conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of items per state."""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self._conn.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+        return counts
+
+
+def analyze_item(item: BatchItem) -> Dict[str, Any]:
+    """Run the analysis pipeline for one item (the Streamlit entry point, output captured per thread)."""
+    from streamlit_utils import run_wildlife_analysis_streamlit
+    result, logs, _species_data, _climate_data = run_wildlife_analysis_streamlit(
+        item.species, mode=item.mode, backend=item.backend, row_id=f"{item.item_id}:{item.input_hash}")
+    error = logs.get("error")
+    if error is None and not result:
+        error = "Pipeline returned no report"
+    return {"report": str(result) if result else None, "error": error,
+            "tokens": logs.get("tokens"), "cached": bool(logs.get("cached"))}
+
+
+def _run_item(analyze: Callable[[BatchItem], Dict[str, Any]], item: BatchItem) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+    try:
+        outcome = analyze(item)
+    except Exception as e:
+        outcome = {"report": None, "error": str(e)}
+    outcome["seconds"] = round(time.perf_counter() - start_time, 3)
+    return outcome
+
+
+def _should_skip(journal: BatchJournal, item: BatchItem, force: bool, max_attempts: int) -> Optional[str]:
+    """Why ``item`` needs no run ('unchanged' or 'gave_up'), or None to run it."""
+    entry = journal.entry(item.item_id)
+    if force or entry is None or entry["input_hash"] != item.input_hash:
+        return None
+    if entry["state"] == "done":
+        return "unchanged"
+    if entry["state"] == "failed" and entry["attempts"] >= max_attempts:
+        return "gave_up"
+    return None
+
+
+def run_batch(items: Iterable[BatchItem], output: str, journal: BatchJournal, workers: int = DEFAULT_WORKERS,
+              force: bool = False, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+              analyze: Callable[[BatchItem], Dict[str, Any]] = analyze_item) -> Dict[str, Any]:
+    """
+    Run every item that needs it and append its result to ``output`` as one JSON line.
+
+    Args:
+        items: Manifest items (see ``read_manifest``); duplicate ids run once
+        output: JSONL file to append to
+        journal: Journal recording each item's state
+        workers: Concurrent pipelines
+        force: Run items even if done with unchanged inputs
+        max_attempts: Give up on a failing item after this many attempts
+        analyze: Function running one item (default ``analyze_item``)
+
+    Returns:
+        dict: done/failed/unchanged/gave_up/duplicate counts, recovered items and elapsed seconds
+    """
+    start_time = time.perf_counter()
+    counts = dict.fromkeys(("done", "failed", "unchanged", "gave_up", "duplicate"), 0)
+    recovered = journal.recover()
+    seen = set()
+    in_flight = {}
+
+    def drain(return_when):
+        finished, _ = wait(in_flight, return_when=return_when)
+        for future in finished:
+            item, attempt = in_flight.pop(future)
+            outcome = future.result()
+            record = {
+                "id": item.item_id, "species": item.species, "mode": item.mode, "backend": item.backend,
+                "status": "error" if outcome["error"] else "ok", "attempt": attempt,
+                "input_hash": item.input_hash, "finished_at": datetime.now(timezone.utc).isoformat(),
+                **outcome
+            }
+            handle.write(dumps(record, default=json_default) + "\n")
+            handle.flush()
+            journal.finish(item, outcome["error"], outcome["seconds"])
+            outcome_name = "failed" if outcome["error"] else "done"
+            counts[outcome_name] += 1
+            BATCH_ITEMS.inc(outcome=outcome_name)
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    workers = max(1, workers)
+    with open(output, "a", encoding="utf-8") as handle, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        try:
+            for item in items:
+                if item.item_id in seen:
+                    counts["duplicate"] += 1
+                    continue
+                seen.add(item.item_id)
+                reason = _should_skip(journal, item, force, max_attempts)
+                if reason is not None:
+                    counts[reason] += 1
+                    BATCH_ITEMS.inc(outcome="skipped")
+                    continue
+                attempt = journal.start(item)
+                in_flight[executor.submit(_run_item, analyze, item)] = (item, attempt)
+                if len(in_flight) >= workers * QUEUE_FACTOR:
+                    drain(FIRST_COMPLETED)
+        finally:
+            # Write and journal the items already submitted, even when the manifest turned out malformed
+            if in_flight:
+                drain(ALL_COMPLETED)
+
+    counts["recovered"] = recovered
+    counts["seconds"] = round(time.perf_counter() - start_time, 3)
+    return counts
+
+
+def print_summary(summary: Dict[str, Any], output: str) -> None:
+    """Print the outcome of a batch run."""
+    print(f"📦 Batch finished in {summary['seconds']:.1f}s: {summary['done']} done, {summary['failed']} failed, "
+          f"{summary['unchanged']} unchanged, {summary['gave_up']} given up, {summary['duplicate']} duplicates"
+          + (f", {summary['recovered']} resumed after an interruption" if summary["recovered"] else ""))
+    print(f"   Results appended to {output}")
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Analyze every species in a manifest, resumably.")
+    parser.add_argument("manifest", help="One species name or JSON object per line")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help="JSONL file results are appended to (default: %(default)s)")
+    parser.add_argument("--journal", default=None,
+                        help="SQLite journal path (default: the output path + .journal.sqlite3)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Concurrent pipelines (default: %(default)s)")
+    parser.add_argument("--mode", default=None,
+                        help="Pipeline mode for items without one: crew or fused (default: WILDLIFE_PIPELINE_MODE)")
+    parser.add_argument("--backend", default=None,
+                        help="LLM backend for items without one (default: WILDLIFE_LLM_BACKEND or gemini)")
+    parser.add_argument("--force", action="store_true", help="Rerun items already done with unchanged inputs")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="Attempts before a failing item is given up (default: %(default)s)")
+    parser.add_argument("--status", action="store_true", help="Print the journal's item counts and exit")
+    parser.add_argument("--export", default=os.getenv(REPORT_EXPORT_ENV),
+                        help="Archive reports to this .jsonl, .sqlite3 or .parquet path (default: WILDLIFE_REPORT_EXPORT)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run (or resume) a batch from the command line and print its summary."""
+    args = parse_args(argv)
+    args.journal = args.journal or journal_path(args.output)
+    if args.export:
+        os.environ[REPORT_EXPORT_ENV] = args.export
+    journal = BatchJournal(args.journal)
+    try:
+        if args.status:
+            counts = journal.counts()
+            print(", ".join(f"{count} {state}" for state, count in counts.items()))
+            return counts
+        print(f"📦 Running {args.manifest} with {args.workers} workers (journal {args.journal})...")
+        summary = run_batch(read_manifest(args.manifest, args.mode, args.backend), args.output, journal,
+                            args.workers, args.force, args.max_attempts)
+        print_summary(summary, args.output)
+        return summary
+    finally:
+        journal.close()
+        exporter = get_report_exporter()
+        if exporter is not None:
+            exporter.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tail latency of upstream GETs with and without hedging.
+
+Simulates an API whose response times are mostly fast with an occasional
+slow outlier (``--slow-fraction`` of requests take ``--slow`` seconds, the
+rest ``--fast``), sends ``--requests`` GETs through ``tools.http_client`` with
+hedging off and on, and reports caller-side p50/p95/p99 plus the extra load
+the hedges added. No network is used.
+
+Usage:
+    python benchmarks/bench_hedging.py
+    python benchmarks/bench_hedging.py --requests 500 --slow-fraction 0.05 --slow 1.0
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import http_client
+
+URL = "https://api.example.org/v1/species/search"
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--fast", type=float, default=0.02, help="Typical response time (s)")
+    parser.add_argument("--slow", type=float, default=0.5, help="Outlier response time (s)")
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--budget", type=float, default=http_client.DEFAULT_HEDGE_BUDGET)
+    args = parser.parse_args()
+
+    def upstream(url, timeout=None, **kwargs):
+        seconds = args.slow if random.random() < args.slow_fraction else args.fast * random.uniform(0.8, 1.2)
+        time.sleep(min(seconds, timeout))
+        return "ok"
+
+    print(f"{args.requests} GETs, {args.slow_fraction:.0%} take {args.slow}s, the rest ~{args.fast}s")
+    with patch("tools.http_client.requests.get", side_effect=upstream) as mock_get, \
+            patch.dict(os.environ, {http_client.HEDGE_BUDGET_ENV: str(args.budget)}):
+        for hedge in (False, True):
+            http_client.reset_latency()
+            random.seed(1)
+            mock_get.reset_mock()
+            latencies = []
+            for _ in range(args.requests):
+                start_time = time.perf_counter()
+                http_client.get(URL, hedge=hedge)
+                latencies.append(time.perf_counter() - start_time)
+            extra = mock_get.call_count / args.requests - 1
+            print(f"  hedging {'on ' if hedge else 'off'}  p50 {percentile(latencies, 0.5) * 1000:6.1f}ms  "
+                  f"p95 {percentile(latencies, 0.95) * 1000:6.1f}ms  p99 {percentile(latencies, 0.99) * 1000:6.1f}ms  "
+                  f"extra requests {extra:5.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start import cost of the app entry points.
+
+Runs ``python -X importtime`` in a fresh interpreter for each target module,
+reports its cumulative import time and the heaviest top-level packages it
+pulls in, and times ``python main.py --help`` end to end. Pass ``--budget-ms``
+to fail (exit code 1) when any target exceeds the budget, so the numbers can
+be tracked in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget-ms 1500
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported before the first screen renders
+DEFAULT_TARGETS = ["streamlit_utils", "main", "app", "app_production"]
+
+# Modules that should never load on the welcome screen or `main.py --help`
+# (Streamlit itself imports plotly's theme and lazy graph_objects stubs, so
+# plotly.express is the marker for the app's own charting imports)
+HEAVY_MODULES = ("crewai", "litellm", "plotly.express", "pandas")
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: (module, self_us, cumulative_us, depth) tuples in import order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile_import(module):
+    """Import ``module`` in a fresh interpreter and return its parsed timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def summarize(module, rows, top):
+    """Print the cumulative time and heaviest packages for one target."""
+    total_us = next((cumulative for name, _, cumulative, _ in rows if name == module), 0)
+    packages = {}
+    for name, self_us, _, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    loaded = {name for name, _, _, _ in rows}
+    heavy_loaded = [heavy for heavy in HEAVY_MODULES if heavy in loaded]
+
+    print(f"\n{module}: {total_us / 1000:.0f} ms cumulative")
+    print(f"  heavy packages loaded: {', '.join(heavy_loaded) if heavy_loaded else 'none'}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<30} {self_us / 1000:>8.1f} ms")
+    return total_us / 1000
+
+
+def time_cli_help():
+    """Return wall-clock seconds for ``python main.py --help``."""
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], cwd=ROOT, capture_output=True)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS)
+    parser.add_argument("--top", type=int, default=8, help="Packages listed per target")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any target exceeds this many ms")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.targets:
+        elapsed_ms = summarize(module, profile_import(module), args.top)
+        if args.budget_ms is not None and elapsed_ms > args.budget_ms:
+            over_budget.append(module)
+
+    print(f"\npython main.py --help: {time_cli_help() * 1000:.0f} ms wall clock")
+
+    if over_budget:
+        print(f"\n❌ Over {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
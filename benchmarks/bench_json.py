@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON decode/encode throughput per backend on GBIF payloads.
+
+Times ``loads`` and compact ``dumps`` of a species/search response with the
+standard library, orjson and msgspec (whichever are installed), then compares
+building ``SpeciesSearch`` records through a decoded dict against
+``SpeciesSearch.from_json``, which decodes typed structs directly under the
+msgspec backend. Pass a recorded GBIF response with ``--payload`` (e.g.
+``curl 'https://api.gbif.org/v1/species/search?q=tiger&limit=1000' > tiger.json``);
+otherwise synthetic results with the full GBIF key set are used.
+
+Usage:
+    python benchmarks/bench_json.py --records 1000
+    python benchmarks/bench_json.py --payload tiger.json --repeat 50
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import json_backend
+from tools.records import SpeciesSearch
+from bench_records import synthetic_result
+
+
+def best_ms(function, repeat):
+    """Fastest of ``repeat`` runs, in milliseconds (collector paused while timing)."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start_time = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start_time)
+        finally:
+            gc.enable()
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payload", help="Recorded species/search response (default: synthetic)")
+    parser.add_argument("--records", type=int, default=1000, help="Synthetic result count")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload, "rb") as handle:
+            body = handle.read()
+    else:
+        body = json.dumps({
+            "offset": 0, "limit": args.records, "endOfRecords": False, "count": args.records * 3,
+            "results": [synthetic_result(index) for index in range(args.records)]
+        }).encode("utf-8")
+    response = json.loads(body)
+    print(f"{len(response.get('results') or []):,} results, {len(body) / 1024 / 1024:.2f} MB of JSON\n")
+
+    previous = json_backend.backend_name()
+    timings = {}
+    print(f"{'backend':<10} {'loads ms':>9} {'dumps ms':>9} {'dict+records ms':>16} {'from_json ms':>13}")
+    try:
+        for name in json_backend.BACKENDS:
+            try:
+                json_backend.set_backend(name)
+            except ImportError:
+                print(f"{name:<10} (not installed)")
+                continue
+            timings[name] = (
+                best_ms(lambda: json_backend.loads(body), args.repeat),
+                best_ms(lambda: json_backend.dumpb(response), args.repeat),
+                best_ms(lambda: SpeciesSearch.from_response(json_backend.loads(body)), args.repeat),
+                best_ms(lambda: SpeciesSearch.from_json(body), args.repeat),
+            )
+            print(f"{name:<10} " + " ".join(f"{value:>{width}.2f}" for value, width in zip(timings[name], (9, 9, 16, 13))))
+            expected = SpeciesSearch.from_response(response).to_dict(raw=True)
+            assert SpeciesSearch.from_json(body).to_dict(raw=True) == expected
+    finally:
+        json_backend.set_backend(previous)
+
+    baseline = timings["stdlib"]
+    for name, values in timings.items():
+        if name != "stdlib":
+            print(f"\n{name}: loads {baseline[0] / values[0]:.1f}x, dumps {baseline[1] / values[1]:.1f}x, "
+                  f"records via from_json {baseline[2] / values[3]:.1f}x faster than stdlib dict+records")
+
+
+if __name__ == "__main__":
+    main()
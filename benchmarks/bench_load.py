@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Load test: many concurrent analyses against the stub LLM, fully offline.
+
+Submits ``--requests`` analyses for ``--species`` (cycled) to a pool of
+``--concurrency`` threads, as concurrent Streamlit sessions would, with the
+stub LLM backend and canned tool responses. Reports throughput, latency
+percentiles, how long requests waited for a worker, and LLM calls. With
+``--cache`` a throwaway shared SQLite report cache is used, with stub
+reports allowed into it, so repeated species measure the cache path instead
+of the crew.
+
+Usage:
+    python benchmarks/bench_load.py --requests 40 --concurrency 8 --stub-latency normal:0.5,0.1
+    python benchmarks/bench_load.py --mode fused --cache --species tiger whale
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from fused_pipeline import PIPELINE_MODES
+from llm_backend import LLM_BACKEND_ENV, STUB_LATENCY_ENV, STUB_TOKEN_RATE_ENV, parse_latency
+from tools.cache import CACHE_DB_ENV
+from bench_pipeline_modes import CANNED_TOOLS, count_llm_calls
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--species", nargs="+", default=["tiger", "whale", "elephant", "pug"])
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default="crew")
+    parser.add_argument("--stub-latency", default="fixed:0.2", help="Stub LLM latency distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Stub LLM generation speed")
+    parser.add_argument("--cache", action="store_true", help="Use a fresh shared report cache")
+    args = parser.parse_args()
+    parse_latency(args.stub_latency)
+
+    from streamlit_utils import run_wildlife_analysis_streamlit
+    from crewai.events import crewai_event_bus
+    calls = count_llm_calls()
+
+    with ExitStack() as stack:
+        cache_db = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), "load.sqlite3")
+        stack.enter_context(patch.dict(os.environ, {
+            LLM_BACKEND_ENV: "stub", STUB_LATENCY_ENV: args.stub_latency,
+            STUB_TOKEN_RATE_ENV: str(args.tokens_per_second), CACHE_DB_ENV: cache_db if args.cache else ""
+        }))
+        for target, value in CANNED_TOOLS.items():
+            stack.enter_context(patch(target, return_value=value))
+        if args.cache:
+            # Stub reports are kept out of real caches; this one is deleted afterwards
+            stack.enter_context(patch("streamlit_utils.UNCACHED_REPORT_BACKENDS", ()))
+
+        def run(index, submitted):
+            started = time.perf_counter()
+            species = args.species[index % len(args.species)]
+            result, logs, _species, _climate = run_wildlife_analysis_streamlit(species, mode=args.mode)
+            return started - submitted, time.perf_counter() - submitted, result is not None, bool(logs.get("cached"))
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [executor.submit(run, index, time.perf_counter()) for index in range(args.requests)]
+            outcomes = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start_time
+        crewai_event_bus.flush()
+
+    waits = [outcome[0] for outcome in outcomes]
+    latencies = [outcome[1] for outcome in outcomes]
+    print(f"{args.requests} {args.mode} analyses, {args.concurrency} concurrent, stub LLM {args.stub_latency}"
+          f"{', report cache' if args.cache else ''}")
+    print(f"  throughput  {args.requests / elapsed:6.2f} analyses/s ({elapsed:.2f}s total)")
+    print(f"  latency     p50 {statistics.median(latencies):6.2f}s  p95 {percentile(latencies, 0.95):6.2f}s  "
+          f"max {max(latencies):6.2f}s")
+    print(f"  queue wait  p50 {statistics.median(waits):6.2f}s  max {max(waits):6.2f}s")
+    print(f"  succeeded   {sum(outcome[2] for outcome in outcomes)}/{args.requests}, "
+          f"cached {sum(outcome[3] for outcome in outcomes)}, LLM calls {len(calls)}")
+
+
+if __name__ == "__main__":
+    main()
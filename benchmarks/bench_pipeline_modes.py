@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end latency of the crew and fused pipeline modes.
+
+Runs ``run_wildlife_analysis_streamlit`` in each mode with the report cache
+disabled and reports wall time and LLM round-trips per analysis. By default
+the configured Gemini model and the live APIs are used (network and
+``GEMINI_API_KEY`` required). ``--stub-latency`` switches to the local stub
+LLM (``llm_backend.py``) with that latency distribution and the tools to
+canned responses, which isolates the cost of sequential round-trips and
+orchestration.
+
+Usage:
+    python benchmarks/bench_pipeline_modes.py --species tiger --runs 3
+    python benchmarks/bench_pipeline_modes.py --stub-latency fixed:0.8 --runs 5
+    python benchmarks/bench_pipeline_modes.py --stub-latency lognormal:0.8,0.4 --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep CrewAI from phoning home during timed runs
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ["WILDLIFE_CACHE_DB"] = ""
+
+from fused_pipeline import PIPELINE_MODES
+from llm_backend import LLM_BACKEND_ENV, STUB_LATENCY_ENV, parse_latency
+
+CANNED_TOOLS = {
+    "streamlit_utils.fetch_species": {"count": 1, "results": [{"scientificName": "Panthera tigris"}]},
+    "tools.species_tool.fetch_species": {"count": 1, "results": [{"scientificName": "Panthera tigris"}]},
+    "tools.climate_tool.fetch_climate_data": {"current_weather": {"temperature": 18.5}},
+    "streamlit_utils.fetch_climate_data": {"current_weather": {"temperature": 18.5}},
+    "tools.climate_history_tool.fetch_climate_history": {"years": 10, "trend_per_decade": {}},
+    "tools.occurrence_tool.fetch_occurrence_distribution": {"records_binned": 0, "top_cells": []}
+}
+
+
+def count_llm_calls():
+    """A list that grows by one on every LLM call CrewAI reports."""
+    from crewai.events import crewai_event_bus, LLMCallStartedEvent
+    calls = []
+    crewai_event_bus.on(LLMCallStartedEvent)(lambda source, event: calls.append(event.model))
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--species", default="tiger")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--stub-latency", default=None,
+                        help="Use the stub LLM with this latency distribution (e.g. fixed:0.8); also stubs the tools")
+    args = parser.parse_args()
+
+    from streamlit_utils import run_wildlife_analysis_streamlit
+    from crewai.events import crewai_event_bus
+    calls = count_llm_calls()
+
+    with ExitStack() as stack:
+        if args.stub_latency is not None:
+            parse_latency(args.stub_latency)
+            stack.enter_context(patch.dict(os.environ, {LLM_BACKEND_ENV: "stub", STUB_LATENCY_ENV: args.stub_latency}))
+            for target, value in CANNED_TOOLS.items():
+                stack.enter_context(patch(target, return_value=value))
+        source = f"stub LLM ({args.stub_latency})" if args.stub_latency is not None else "live"
+        print(f"Pipeline modes for '{args.species}', {args.runs} runs each, {source}")
+
+        for mode in PIPELINE_MODES:
+            seconds, round_trips = [], []
+            for _ in range(args.runs):
+                before = len(calls)
+                start_time = time.perf_counter()
+                result, logs, _species, _climate = run_wildlife_analysis_streamlit(args.species, mode=mode)
+                seconds.append(time.perf_counter() - start_time)
+                crewai_event_bus.flush()
+                round_trips.append(len(calls) - before)
+                if result is None:
+                    print(f"  {mode}: failed ({logs.get('error')})")
+                    break
+            else:
+                print(f"  {mode:<6} median {statistics.median(seconds):6.2f}s  best {min(seconds):6.2f}s  "
+                      f"LLM calls/run {statistics.median(round_trips):.0f}")
+
+
+if __name__ == "__main__":
+    main()
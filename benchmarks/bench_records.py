@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory held by species results as raw dicts versus typed records.
+
+Decodes a GBIF species/search-shaped response of realistic results (the full
+key set GBIF returns, including descriptions, vernacular names and the higher
+classification map) and measures, with ``tracemalloc``, the memory retained
+per 1,000 results as decoded dicts and as ``SpeciesRecord`` objects. Parse
+time and the size of what is sent to the LLM are reported alongside.
+
+Usage:
+    python benchmarks/bench_records.py --records 5000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.records import SpeciesSearch
+
+KINGDOMS = ["Animalia", "Plantae", "Fungi"]
+
+
+def synthetic_result(index):
+    """One species/search result with the fields GBIF actually returns."""
+    kingdom = KINGDOMS[index % len(KINGDOMS)]
+    genus = f"Genus{index % 97}"
+    species = f"{genus} species{index}"
+    return {
+        "key": 5219000 + index, "datasetKey": "d7dddbf4-2cf0-4f39-9b2a-bb099caae36c",
+        "constituentKey": "7ddf754f-d193-4cc9-b351-99906754a03b", "nubKey": 5219000 + index,
+        "parentKey": 2435000 + index % 97, "parent": genus, "acceptedKey": 5219000 + index,
+        "kingdom": kingdom, "phylum": "Chordata", "order": "Carnivora", "family": "Felidae",
+        "genus": genus, "species": species, "kingdomKey": 1, "phylumKey": 44, "classKey": 359,
+        "orderKey": 732, "familyKey": 9703, "genusKey": 2435000 + index % 97,
+        "speciesKey": 5219000 + index, "scientificName": f"{species} (Linnaeus, 1758)",
+        "canonicalName": species, "authorship": "(Linnaeus, 1758)",
+        "publishedIn": "Linnaeus, C. (1758). Systema Naturae per regna tria naturae, 10th edition.",
+        "accordingTo": "The Catalogue of Life", "nameType": "SCIENTIFIC", "taxonomicStatus": "ACCEPTED",
+        "rank": "SPECIES", "origin": "SOURCE", "numDescendants": index % 9, "numOccurrences": 0,
+        "taxonID": f"urn:lsid:catalogueoflife.org:taxon:{index}", "extinct": False,
+        "habitats": ["TERRESTRIAL"], "nomenclaturalStatus": [], "threatStatuses": ["ENDANGERED"],
+        "descriptions": [
+            {"description": f"Large carnivore {index} inhabiting forests and grasslands. " * 4},
+            {"description": "Solitary and territorial; active mostly at dusk and night."}
+        ],
+        "vernacularNames": [
+            {"vernacularName": f"Common name {index}", "language": "eng"},
+            {"vernacularName": f"Nom commun {index}", "language": "fra"},
+            {"vernacularName": f"Nombre común {index}", "language": "spa"}
+        ],
+        "higherClassificationMap": {
+            "1": kingdom, "44": "Chordata", "359": "Mammalia", "732": "Carnivora",
+            "9703": "Felidae", str(2435000 + index % 97): genus
+        },
+        "synonym": False, "class": "Mammalia"
+    }
+
+
+def retained_bytes(build):
+    """Bytes still allocated after ``build()`` returns, with its result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=5000)
+    args = parser.parse_args()
+
+    body = json.dumps({
+        "offset": 0, "limit": args.records, "endOfRecords": False, "count": args.records * 3,
+        "results": [synthetic_result(index) for index in range(args.records)]
+    })
+
+    raw_bytes, response = retained_bytes(lambda: json.loads(body))
+    record_bytes, search = retained_bytes(lambda: SpeciesSearch.from_response(response))
+    # Timed separately: tracemalloc slows allocation-heavy code considerably
+    start_time = time.perf_counter()
+    SpeciesSearch.from_response(response)
+    parse_seconds = time.perf_counter() - start_time
+
+    per_thousand = 1000 / args.records
+    print(f"{args.records:,} results, {len(body) / 1024 / 1024:.1f} MB of JSON")
+    print(f"  raw dicts:      {raw_bytes * per_thousand / 1024:>9.1f} KiB per 1,000 results")
+    print(f"  SpeciesRecord:  {record_bytes * per_thousand / 1024:>9.1f} KiB per 1,000 results "
+          f"({raw_bytes / max(record_bytes, 1):.1f}x smaller)")
+    print(f"  parse time:     {parse_seconds * 1000 * per_thousand:>9.1f} ms per 1,000 results")
+    compact = json.dumps(search.to_dict())
+    print(f"  LLM payload:    {len(json.dumps(response)) / 1024:.0f} KiB raw -> {len(compact) / 1024:.0f} KiB compact")
+
+    sample = search.records[0]
+    assert sample.raw == response["results"][0]
+
+
+if __name__ == "__main__":
+    main()
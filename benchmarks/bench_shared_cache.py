@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: shared SQLite cache reads versus number of processes.
+
+Each simulated request does the cache work of a Streamlit rerun of a cached
+analysis: read the species, climate and report entries from the shared
+SQLite cache, then build the chart data from the species results. Workers are
+separate processes sharing one cache file, as under ``serve.py``. No HTTP
+serving, balancer or Streamlit rendering is involved, so the numbers bound
+the cache path only, not the throughput of a deployment.
+
+Usage:
+    python benchmarks/bench_shared_cache.py --workers 1 2 4 --duration 3
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.cache import SharedCache, cache_key
+
+SPECIES = ["tiger", "whale", "elephant", "pug"]
+
+
+def synthetic_species_payload(query, results=20):
+    """Build a GBIF species/search-shaped payload without hitting the network."""
+    kingdoms = ["Animalia", "Plantae", "Fungi", "Bacteria"]
+    return {
+        "offset": 0,
+        "limit": results,
+        "endOfRecords": False,
+        "count": 1000 + len(query),
+        "results": [
+            {
+                "key": index,
+                "scientificName": f"{query.title()} species {index}",
+                "canonicalName": f"{query.title()} {index}",
+                "kingdom": kingdoms[index % len(kingdoms)],
+                "phylum": "Chordata",
+                "class": "Mammalia",
+                "rank": "SPECIES",
+                "taxonomicStatus": "ACCEPTED",
+                "descriptions": [{"description": "x" * 200}],
+                "vernacularNames": [{"vernacularName": query, "language": "eng"}],
+            }
+            for index in range(results)
+        ],
+    }
+
+
+def synthetic_climate_payload():
+    """Build an Open-Meteo forecast-shaped payload."""
+    return {
+        "latitude": 40.71,
+        "longitude": -74.01,
+        "current_weather": {"temperature": 15.2, "windspeed": 10.5},
+        "daily": {
+            "time": [f"2024-01-{day:02d}" for day in range(1, 8)],
+            "temperature_2m_max": [18.5, 20.1, 16.8, 15.0, 14.2, 17.9, 19.3],
+            "temperature_2m_min": [8.2, 10.5, 7.9, 6.1, 5.5, 8.8, 9.0],
+            "precipitation_sum": [0.0, 2.5, 0.1, 0.0, 4.2, 1.1, 0.0],
+        },
+    }
+
+
+def seed_cache(path):
+    """Populate the benchmark cache with one entry per featured species."""
+    cache = SharedCache(path)
+    for species in SPECIES:
+        cache.set("species", cache_key(species), synthetic_species_payload(species))
+        cache.set("report", cache_key(species), f"# Report for {species}\n" + "Lorem ipsum. " * 300)
+    cache.set("climate", cache_key("New York"), synthetic_climate_payload())
+
+
+def handle_request(cache, species):
+    """Simulate one cached page render."""
+    species_data = cache.get("species", cache_key(species))
+    climate_data = cache.get("climate", cache_key("New York"))
+    report = cache.get("report", cache_key(species))
+
+    kingdoms = {}
+    for result in species_data["results"][:10]:
+        kingdom = result.get("kingdom", "Unknown")
+        kingdoms[kingdom] = kingdoms.get(kingdom, 0) + 1
+    chart = {
+        "kingdoms": kingdoms,
+        "temperatures": climate_data["daily"]["temperature_2m_max"][:7],
+        "report_length": len(report),
+    }
+    return len(json.dumps([chart, species_data]))
+
+
+def worker(path, duration, counter):
+    """Serve simulated requests until the time budget is used up."""
+    cache = SharedCache(path)
+    handled = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        handle_request(cache, SPECIES[handled % len(SPECIES)])
+        handled += 1
+    with counter.get_lock():
+        counter.value += handled
+
+
+def run(path, workers, duration):
+    """Return requests per second achieved with ``workers`` processes."""
+    counter = multiprocessing.Value("i", 0)
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, duration, counter))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return counter.value / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench_cache.sqlite3")
+        seed_cache(path)
+
+        print(f"CPU cores available: {os.cpu_count()}")
+        print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+        baseline = None
+        for count in args.workers:
+            throughput = run(path, count, args.duration)
+            baseline = baseline or throughput
+            print(f"{count:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark: buffered vs streamed decoding of a large GBIF occurrence page.
+
+The page (a recorded ``occurrence/search`` response given with ``--payload``,
+or a synthetic one with ``--records`` GBIF-shaped records) is gzip-compressed
+and "downloaded" at ``--mbps`` megabits per second, then decompressed and
+handed over in ``--chunk`` KB pieces as ``iter_content`` does. Two decoders
+extract the coordinates:
+
+* buffered: join the whole body, decode it with the active JSON backend, then
+  read ``results`` (what ``response_json`` did before)
+* streamed: ``ObjectStream`` over the chunks, keeping only the coordinates
+
+and the benchmark reports time to the first record, total time and peak
+Python memory (tracemalloc, measured in a separate untimed pass), plus the
+bytes gzip saved on the wire. No network is used.
+
+Usage:
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --payload occurrences.json --mbps 50
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import json_backend
+from tools.json_backend import ObjectStream
+
+
+def synthetic_page(records):
+    """An occurrence/search page whose records carry the usual ~60 GBIF fields."""
+    rng = random.Random(1)
+    words = ("adult", "female", "cub", "tracks", "scat", "road", "dawn", "dusk", "waterhole", "camera", "trap",
+             "near", "buffer", "zone", "seen", "crossing", "resting", "grassland", "ridge", "stream")
+    results = []
+    for index in range(records):
+        observation = rng.randrange(10 ** 8, 3 * 10 ** 8)
+        record = {
+            "key": 4000000000 + index, "datasetKey": "50c9509d-22c7-4a22-a47d-8c48425ef4a7",
+            "publishingOrgKey": str(uuid.UUID(int=rng.getrandbits(128))),
+            "installationKey": "997448a8-f762-11e1-a439-00145eb45e9a", "publishingCountry": "US",
+            "protocol": "DWC_ARCHIVE",
+            "lastCrawled": f"2026-10-{rng.randint(1, 19):02d}T{rng.randint(0, 23):02d}:18:41.{rng.randint(0, 999):03d}Z",
+            "lastParsed": "2026-10-12T05:02:11.456+00:00", "crawlId": 512,
+            "extensions": {}, "basisOfRecord": "HUMAN_OBSERVATION", "occurrenceStatus": "PRESENT",
+            "taxonKey": 5219416, "kingdomKey": 1, "phylumKey": 44, "classKey": 359, "orderKey": 732,
+            "familyKey": 9703, "genusKey": 2435194, "speciesKey": 5219416, "acceptedTaxonKey": 5219416,
+            "scientificName": "Panthera tigris (Linnaeus, 1758)", "acceptedScientificName": "Panthera tigris (Linnaeus, 1758)",
+            "kingdom": "Animalia", "phylum": "Chordata", "order": "Carnivora", "family": "Felidae",
+            "genus": "Panthera", "species": "Panthera tigris", "genericName": "Panthera", "specificEpithet": "tigris",
+            "taxonRank": "SPECIES", "taxonomicStatus": "ACCEPTED", "iucnRedListCategory": "EN",
+            "decimalLatitude": round(rng.uniform(5, 35), 6), "decimalLongitude": round(rng.uniform(70, 110), 6),
+            "coordinateUncertaintyInMeters": rng.choice([10.0, 31.0, 250.0, 4000.0]),
+            "continent": "ASIA", "stateProvince": "Madhya Pradesh", "year": 2020 + index % 6,
+            "month": 1 + index % 12, "day": 1 + index % 28,
+            "eventDate": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+            "issues": ["COORDINATE_ROUNDED", "CONTINENT_DERIVED_FROM_COORDINATES"],
+            "modified": "2025-01-03T10:22:14.000+00:00", "lastInterpreted": "2026-10-12T05:02:11.456+00:00",
+            "references": f"https://www.inaturalist.org/observations/{observation}",
+            "license": "http://creativecommons.org/licenses/by-nc/4.0/legalcode",
+            "identifiers": [{"identifier": str(observation)}],
+            "media": [{"type": "StillImage", "format": "image/jpeg",
+                       "identifier": f"https://inaturalist-open-data.s3.amazonaws.com/photos/{observation * 2 + 1}/original.jpg",
+                       "rightsHolder": "observer", "license": "http://creativecommons.org/licenses/by-nc/4.0/"}],
+            "facts": [], "relations": [], "gadm": {"level0": {"gid": "IND", "name": "India"}},
+            "isInCluster": False, "recordedBy": f"observer {rng.randint(1, 5000)}",
+            "identifiedBy": f"observer {rng.randint(1, 5000)}",
+            "geodeticDatum": "WGS84", "class": "Mammalia", "countryCode": "IN", "country": "India",
+            "gbifID": str(4000000000 + index), "occurrenceID": f"https://www.inaturalist.org/observations/{observation}",
+            "verbatimLocality": "Kanha National Park, Mandla, Madhya Pradesh, India",
+            "occurrenceRemarks": " ".join(rng.choice(words) for _ in range(rng.randint(5, 25))),
+        }
+        results.append(record)
+    return {"offset": 0, "limit": records, "endOfRecords": False, "count": records * 40,
+            "results": results, "facets": []}
+
+
+def download(compressed, chunk_size, mbps, read_size=16 * 1024):
+    """
+    Yield ``chunk_size`` pieces of the decompressed body as ``iter_content`` does,
+    reading the compressed bytes off a link of ``mbps`` ``read_size`` at a time.
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    seconds_per_byte = 8 / (mbps * 1e6) if mbps else 0
+    pending = b""
+    for start in range(0, len(compressed), read_size):
+        piece = compressed[start:start + read_size]
+        if seconds_per_byte:
+            time.sleep(len(piece) * seconds_per_byte)
+        pending += decompressor.decompress(piece)
+        while len(pending) >= chunk_size:
+            yield pending[:chunk_size]
+            pending = pending[chunk_size:]
+    pending += decompressor.flush()
+    if pending:
+        yield pending
+
+
+def buffered(chunks, first_record):
+    page = json_backend.loads(b"".join(chunks))
+    latitudes, longitudes = [], []
+    for record in page.get("results", []):
+        if not latitudes:
+            first_record()
+        latitudes.append(record.get("decimalLatitude"))
+        longitudes.append(record.get("decimalLongitude"))
+    return len(latitudes), page.get("endOfRecords")
+
+
+def streamed(chunks, first_record):
+    page = ObjectStream(chunks, "results")
+    latitudes, longitudes = [], []
+    for record in page:
+        if not latitudes:
+            first_record()
+        latitudes.append(record.get("decimalLatitude"))
+        longitudes.append(record.get("decimalLongitude"))
+    return len(latitudes), page.fields.get("endOfRecords")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payload", help="Recorded occurrence/search JSON response")
+    parser.add_argument("--records", type=int, default=300, help="Synthetic records per page (GBIF max is 300)")
+    parser.add_argument("--chunk", type=int, default=64, help="Decompressed bytes per iter_content chunk (KB)")
+    parser.add_argument("--mbps", type=float, default=20.0, help="Simulated bandwidth; 0 for none")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload, "rb") as handle:
+            body = handle.read()
+    else:
+        body = json_backend.dumpb(synthetic_page(args.records))
+    compressed = gzip.compress(body)
+    chunk_size = args.chunk * 1024
+    print(f"page {len(body) / 1e6:.2f} MB, gzip {len(compressed) / 1e6:.2f} MB on the wire "
+          f"({1 - len(compressed) / len(body):.0%} saved), {args.mbps} Mbit/s, backend {json_backend.backend_name()}")
+
+    for name, decode in (("buffered", buffered), ("streamed", streamed)):
+        first, total = [], []
+        for _ in range(args.runs):
+            start_time = time.perf_counter()
+            marks = []
+            count, _ = decode(download(compressed, chunk_size, args.mbps),
+                              lambda: marks.append(time.perf_counter() - start_time))
+            total.append(time.perf_counter() - start_time)
+            first.append(marks[0])
+        tracemalloc.start()
+        decode(download(compressed, chunk_size, 0), lambda: None)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {name}  first record {min(first) * 1000:7.1f}ms  total {min(total) * 1000:7.1f}ms  "
+              f"peak memory {peak / 1e6:6.2f} MB  ({count} records)")
+
+
+if __name__ == "__main__":
+    main()
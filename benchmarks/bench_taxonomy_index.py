@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: taxonomy index build time, lookup latency and memory footprint.
+
+Builds an index from a synthetic GBIF backbone snapshot (or a real
+``backbone.zip`` passed with ``--snapshot``), then times prefix autocomplete,
+exact normalization and fuzzy matching of misspelled names, reporting p50 and
+p95 latencies. Memory is reported as the resident-set growth from opening
+the index and running every query, next to the index size on disk.
+
+Usage:
+    python benchmarks/bench_taxonomy_index.py --taxa 200000
+    python benchmarks/bench_taxonomy_index.py --snapshot backbone.zip --queries 2000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.taxonomy_index import TaxonomyIndex, build_index, normalize_name
+
+SYLLABLES = ["pan", "the", "ra", "ti", "gris", "leo", "fe", "lis", "ur", "sus", "can", "is",
+             "lu", "pus", "ele", "phas", "max", "mus", "ba", "lae", "no", "ptera", "del", "phi"]
+COMMON_WORDS = ["tiger", "bear", "whale", "eagle", "owl", "fox", "shark", "frog", "snake", "moth",
+                "beetle", "orchid", "fern", "oak", "dolphin", "heron", "finch", "lizard"]
+ADJECTIVES = ["great", "lesser", "spotted", "striped", "golden", "northern", "southern", "giant",
+              "pygmy", "red", "black", "white", "common", "mountain", "river", "desert"]
+
+
+def latin_word(rng, parts):
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts))
+
+
+def synthetic_snapshot(path, taxa, seed=0):
+    """Write a backbone-shaped zip with ``taxa`` species and English vernacular names."""
+    rng = random.Random(seed)
+    genera = [latin_word(rng, 3).title() for _ in range(max(1, taxa // 20))]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("Taxon.tsv", "w") as handle:
+            handle.write(b"taxonID\tacceptedNameUsageID\tscientificName\tcanonicalName\ttaxonRank\ttaxonomicStatus\n")
+            for index, genus in enumerate(genera):
+                handle.write(f"{index + 1}\t\t{genus}\t{genus}\tgenus\taccepted\n".encode())
+            for key in range(len(genera) + 1, len(genera) + taxa + 1):
+                name = f"{rng.choice(genera)} {latin_word(rng, 2)}"
+                if key % 10 == 0:
+                    handle.write(f"{key}\t{key - 1}\t{name}\t{name}\tspecies\tsynonym\n".encode())
+                else:
+                    handle.write(f"{key}\t\t{name}\t{name}\tspecies\taccepted\n".encode())
+        with archive.open("VernacularName.tsv", "w") as handle:
+            handle.write(b"taxonID\tvernacularName\tlanguage\n")
+            for key in range(len(genera) + 1, len(genera) + taxa + 1, 3):
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(COMMON_WORDS)}"
+                handle.write(f"{key}\t{name.title()}\ten\n".encode())
+
+
+def resident_kb():
+    """Current resident set size of this process in KiB (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1024 / 1024
+
+
+def misspell(rng, name):
+    """Swap two adjacent letters, the most common typing mistake."""
+    if len(name) < 4:
+        return name
+    position = rng.randrange(1, len(name) - 2)
+    return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+
+def time_queries(function, queries):
+    """Return (p50_ms, p95_ms) of ``function`` over ``queries``."""
+    durations = []
+    for query in queries:
+        start_time = time.perf_counter()
+        function(query)
+        durations.append((time.perf_counter() - start_time) * 1000)
+    durations.sort()
+    return durations[len(durations) // 2], durations[int(len(durations) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", help="Real GBIF backbone zip (default: synthetic)")
+    parser.add_argument("--taxa", type=int, default=200000, help="Synthetic species count")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries per lookup type")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="taxonomy_bench_")
+    try:
+        snapshot = args.snapshot
+        if snapshot is None:
+            snapshot = os.path.join(work_dir, "backbone.zip")
+            synthetic_snapshot(snapshot, args.taxa)
+        index_dir = os.path.join(work_dir, "index")
+        meta = build_index(snapshot, index_dir)
+        print(f"Built {meta['entries']:,} names ({meta['distinct_names']:,} distinct) "
+              f"in {meta['build_seconds']:.1f}s; {directory_mb(index_dir):.1f} MB on disk")
+
+        rss_before = resident_kb()
+        index = TaxonomyIndex(index_dir)
+        rss_opened = resident_kb()
+
+        rng = random.Random(1)
+        sample = [index._text(index._display, index._display_offsets, rng.randrange(len(index)))
+                  for _ in range(args.queries)]
+        prefixes = [normalize_name(name)[:rng.randint(2, 6)] for name in sample]
+        typos = [misspell(rng, name) for name in sample]
+
+        print(f"\n{'lookup':<14} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, function, queries in (
+            ("autocomplete", index.autocomplete, prefixes),
+            ("exact", index.normalize, sample),
+            ("fuzzy", index.normalize, typos),
+        ):
+            p50, p95 = time_queries(function, queries)
+            print(f"{label:<14} {p50:>8.3f} {p95:>8.3f}")
+
+        resolved = sum(1 for name, typo in zip(sample, typos)
+                       if (index.normalize(typo) or {}).get("matchedName") == name)
+        print(f"\nMisspellings resolved to the original name: {resolved / len(typos):.0%}")
+        print(f"Resident memory: +{(rss_opened - rss_before) / 1024:.1f} MB to open, "
+              f"+{(resident_kb() - rss_before) / 1024:.1f} MB after all queries")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
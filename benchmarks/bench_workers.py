@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTTP throughput through serve.py versus number of workers.
+
+For each worker count, starts ``serve.py`` with that many Streamlit workers
+(no warm-up or habitat scheduler, a throwaway cache), waits until every
+worker passes its health check, then runs ``--clients`` client processes
+that send keep-alive requests for ``--path`` through the balancer for
+``--duration`` seconds. Each client sends its own ``X-Forwarded-For``
+address, so the balancer spreads clients over the workers as it would real
+users. Reports requests per second and the speedup over the first count.
+
+The default path is Streamlit's health endpoint, which measures the
+balancer and the workers' HTTP handling; pass ``--path /`` for the app
+page. Clients run on the same machine, so leave cores free for them.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --clients 16 --duration 5
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from serve import HEALTH_INTERVAL, HEALTH_PATH
+
+
+def free_ports(count):
+    """First of ``count`` consecutive local TCP ports that are currently unused."""
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            first = probe.getsockname()[1]
+        if first + count > 65535:
+            continue
+        try:
+            for port in range(first, first + count):
+                with socket.socket() as probe:
+                    probe.bind(("127.0.0.1", port))
+            return first
+        except OSError:
+            continue
+
+
+def healthy(port, path=HEALTH_PATH):
+    """True if a GET of ``path`` on ``port`` answers 200."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+    try:
+        connection.request("GET", path)
+        return connection.getresponse().status == 200
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+
+def start_server(app, workers, port, base_port, cache_db, timeout):
+    """Start serve.py and wait until all its workers are routed to."""
+    process = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "serve.py"), "--app", app, "--workers", str(workers),
+        "--host", "127.0.0.1", "--port", str(port), "--worker-base-port", str(base_port),
+        "--cache-db", cache_db, "--no-warmup", "--habitat-refresh", "0", "--metrics-port", "0"
+    ], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    pending = set(range(base_port, base_port + workers))
+    while pending:
+        if process.poll() is not None or time.monotonic() > deadline:
+            stop_server(process)
+            raise RuntimeError(f"serve.py with {workers} workers did not become healthy")
+        pending = {worker_port for worker_port in pending if not healthy(worker_port)}
+        time.sleep(0.2)
+    # The balancer marks workers ready on its next health round
+    time.sleep(HEALTH_INTERVAL + 0.5)
+    return process
+
+
+def stop_server(process):
+    """Stop serve.py and its workers."""
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def client(port, path, address, duration, counter):
+    """Send keep-alive requests as one user until the time budget is used up."""
+    headers = {"X-Forwarded-For": address}
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    handled = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                handled += 1
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.close()
+    with counter.get_lock():
+        counter.value += handled
+
+
+def run(port, path, clients, duration):
+    """Return requests per second through the balancer with ``clients`` client processes."""
+    counter = multiprocessing.Value("i", 0)
+    processes = [
+        multiprocessing.Process(target=client, args=(port, path, f"10.0.{index // 250}.{index % 250 + 1}",
+                                                     duration, counter))
+        for index in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return counter.value / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client processes")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement")
+    parser.add_argument("--path", default=HEALTH_PATH, help="Path requested through the balancer")
+    parser.add_argument("--app", default="app_production.py", help="Streamlit script the workers run")
+    parser.add_argument("--startup-timeout", type=float, default=60.0, help="Seconds to wait for workers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"CPU cores available: {os.cpu_count()}")
+        print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+        baseline = None
+        for count in args.workers:
+            # One port for the balancer, then the workers' consecutive ports
+            port = free_ports(count + 1)
+            server = start_server(args.app, count, port, port + 1, os.path.join(directory, "cache.sqlite3"),
+                                  args.startup_timeout)
+            try:
+                throughput = run(port, args.path, args.clients, args.duration)
+            finally:
+                stop_server(server)
+            baseline = baseline or throughput
+            print(f"{count:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Chart construction for the Data Insights tab.
+
+Streamlit reruns the whole script on every widget interaction, and building
+figures with plotly.express is comparatively slow. Figures are therefore built
+once per dataset and kept as serialized JSON in a small in-process LRU cache
+keyed on the dataset hash; reruns only deserialize the stored JSON.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from tools.json_backend import dumpb
+from tools.records import json_default
+
+FIGURE_CACHE_SIZE = 128
+
+_figure_cache: "OrderedDict[str, str]" = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def dataset_hash(*datasets: Any) -> str:
+    """
+    Hash the data behind a set of charts.
+
+    Args:
+        *datasets: JSON-serializable objects or typed records (API responses, queries, ...)
+
+    Returns:
+        str: Hex digest identifying the datasets
+    """
+    payload = dumpb(datasets, sort_keys=True, default=json_default)
+    return hashlib.sha1(payload).hexdigest()
+
+
+def _cached_figure(key: str, build: Callable[[], go.Figure]) -> go.Figure:
+    """Return the figure for ``key``, building and caching its JSON on a miss."""
+    with _figure_cache_lock:
+        figure_json = _figure_cache.get(key)
+        if figure_json is not None:
+            _figure_cache.move_to_end(key)
+
+    if figure_json is None:
+        figure_dict = build().to_plotly_json()
+        # The expanded plotly template dominates the payload and its validation
+        # cost; Streamlit applies its own chart theme, so it is not stored
+        figure_dict.get("layout", {}).pop("template", None)
+        figure_json = pio.to_json(figure_dict, validate=False)
+        with _figure_cache_lock:
+            _figure_cache[key] = figure_json
+            while len(_figure_cache) > FIGURE_CACHE_SIZE:
+                _figure_cache.popitem(last=False)
+
+    return pio.from_json(figure_json)
+
+
+def kingdom_counts(results: List[Dict[str, Any]], limit: int = 10) -> Dict[str, int]:
+    """Count taxonomic kingdoms among the first ``limit`` species results."""
+    kingdoms = {}
+    for result in results[:limit]:
+        kingdom = result.get('kingdom', 'Unknown')
+        kingdoms[kingdom] = kingdoms.get(kingdom, 0) + 1
+    return kingdoms
+
+
+def species_count_figure(data_hash: str, species_query: str, species_count: int,
+                         title: str = "Species Records Found", height: Optional[int] = 400) -> go.Figure:
+    """Bar chart of the number of GBIF records found for the query."""
+    def build():
+        fig = go.Figure(data=go.Bar(
+            x=[species_query.title()],
+            y=[species_count],
+            marker_color='#2E8B57'
+        ))
+        fig.update_layout(
+            title=title,
+            xaxis_title="Species Query",
+            yaxis_title="Number of Records",
+            showlegend=False
+        )
+        if height is not None:
+            fig.update_layout(height=height)
+        return fig
+
+    return _cached_figure(f"species_count:{data_hash}:{title}:{height}", build)
+
+
+def kingdom_pie_figure(data_hash: str, kingdoms: Dict[str, int],
+                       title: str = "Taxonomic Kingdoms (Sample)", height: Optional[int] = 400) -> go.Figure:
+    """Pie chart of the kingdom breakdown from ``kingdom_counts``."""
+    def build():
+        fig = px.pie(
+            values=list(kingdoms.values()),
+            names=list(kingdoms.keys()),
+            title=title
+        )
+        if height is not None:
+            fig.update_layout(height=height)
+        return fig
+
+    return _cached_figure(f"kingdom_pie:{data_hash}:{title}:{height}", build)
+
+
+def temperature_figure(data_hash: str, temperatures: List[float],
+                       title: str = "7-Day Temperature Forecast (New York)", height: int = 300) -> go.Figure:
+    """Line chart of daily maximum temperatures."""
+    def build():
+        days = [f"Day {i+1}" for i in range(len(temperatures))]
+        fig = go.Figure(data=go.Scatter(
+            x=days,
+            y=temperatures,
+            mode='lines+markers',
+            line=dict(color='#FF6B6B', width=3),
+            marker=dict(size=8)
+        ))
+        fig.update_layout(
+            title=title,
+            xaxis_title="Days",
+            yaxis_title="Temperature (°C)",
+            height=height
+        )
+        return fig
+
+    return _cached_figure(f"temperature:{data_hash}:{title}:{height}", build)
+
+
+def occurrence_map_figure(data_hash: str, distribution: Dict[str, Any],
+                          title: str = "Observed Distribution (GBIF Occurrences)", height: int = 400) -> go.Figure:
+    """Map of the densest occurrence grid cells, sized by record count."""
+    def build():
+        cells = distribution.get('top_cells', [])
+        counts = [cell['count'] for cell in cells]
+        largest = max(counts) if counts else 1
+        fig = go.Figure(data=go.Scattergeo(
+            lat=[cell['lat'] for cell in cells],
+            lon=[cell['lon'] for cell in cells],
+            text=[f"{count:,} records" for count in counts],
+            mode='markers',
+            marker=dict(
+                size=[6 + 24 * (count / largest) ** 0.5 for count in counts],
+                color='#2E8B57',
+                opacity=0.7
+            )
+        ))
+        fig.update_layout(
+            title=title,
+            geo=dict(showland=True, landcolor='#F0F0F0', projection_type='natural earth'),
+            height=height
+        )
+        return fig
+
+    return _cached_figure(f"occurrence_map:{data_hash}:{title}:{height}", build)
+
+
+def clear_figure_cache() -> None:
+    """Drop all cached figures."""
+    with _figure_cache_lock:
+        _figure_cache.clear()
@@ -0,0 +1,196 @@
+"""
+Wildlife Insight Agent - Fused Pipeline Mode
+
+The crew mode (``main.py``, ``streamlit_utils.py``) runs four sequential
+CrewAI tasks, so every analysis makes at least four LLM round-trips, two of
+which only call a tool and echo its JSON. The fused mode calls the tools
+directly in Python, concurrently, and asks for the analysis and the report
+in one structured LLM call over the prefetched data.
+
+Select it per request with ``run_wildlife_analysis_streamlit(..., mode="fused")``
+or ``python main.py tiger --mode fused``, or for every request with
+``WILDLIFE_PIPELINE_MODE=fused``. ``benchmarks/bench_pipeline_modes.py``
+compares the latency of both modes.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.json_backend import dumps
+from tools.prompt_budget import PromptBudget, compact_prompt, extract_json
+
+PIPELINE_MODE_ENV = "WILDLIFE_PIPELINE_MODE"
+PIPELINE_MODES = ("crew", "fused")
+DEFAULT_PIPELINE_MODE = "crew"
+
+CLIMATE_LOCATION = "New York"
+
+# Stage name used for the single call in token reports
+FUSED_STAGE = "fused"
+
+# Keys of the structured analysis requested alongside the report
+ANALYSIS_FIELDS = ("species_overview", "conservation_status", "distribution", "climate_context", "correlations")
+
+SYSTEM_PROMPT = compact_prompt("""
+    You are a wildlife researcher, biodiversity data analyst and science communicator in one.
+    You analyze GBIF species and occurrence data together with climate data, then explain the
+    findings to students and conservation enthusiasts in simple language while staying
+    scientifically accurate. Use only the data you are given.
+""")
+
+
+def pipeline_mode(mode: Optional[str] = None) -> str:
+    """
+    Resolve the pipeline mode for one request.
+
+    Args:
+        mode: "crew" or "fused"; None uses ``WILDLIFE_PIPELINE_MODE`` (default "crew")
+
+    Raises:
+        ValueError: If the mode is not one of ``PIPELINE_MODES``
+    """
+    mode = (mode or os.getenv(PIPELINE_MODE_ENV) or DEFAULT_PIPELINE_MODE).strip().lower()
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{mode}'; choose from {', '.join(PIPELINE_MODES)}")
+    return mode
+
+
+def gather_inputs(species_query: str, distribution: Optional[Dict[str, Any]] = None,
+                  location: str = CLIMATE_LOCATION) -> Dict[str, Any]:
+    """
+    Run the research tools concurrently, as the crew's research tasks would.
+
+    Args:
+        species_query: Species to search for
+        distribution: Prefetched occurrence distribution; fetched here if omitted
+        location: Climate location
+
+    Returns:
+        dict: ``species``, ``climate``, ``climate_history``, ``distribution`` and
+        ``habitat`` (None unless a precomputed summary exists)
+    """
+    from tools.species_tool import fetch_species
+    from tools.climate_tool import fetch_climate_data
+    from tools.climate_history_tool import fetch_climate_history
+    from tools.occurrence_tool import fetch_occurrence_distribution
+    from tools.habitat_climate import get_habitat_summary
+
+    calls: Dict[str, Callable[[], Any]] = {
+        "species": lambda: fetch_species(species_query),
+        "climate": lambda: fetch_climate_data(location),
+        "climate_history": lambda: fetch_climate_history(location),
+        "habitat": lambda: get_habitat_summary(species_query)
+    }
+    if distribution is None:
+        calls["distribution"] = lambda: fetch_occurrence_distribution(species_query)
+    with ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="fused-tools") as executor:
+        futures = {name: executor.submit(call) for name, call in calls.items()}
+        inputs = {name: future.result() for name, future in futures.items()}
+    if distribution is not None:
+        inputs["distribution"] = distribution
+    return inputs
+
+
+def build_messages(species_query: str, inputs: Dict[str, Any], budget: PromptBudget) -> List[Dict[str, str]]:
+    """
+    Build the single analysis-and-report request over the prefetched data.
+
+    Each tool response is shrunk to an equal share of the budget's context tokens.
+    """
+    from tools.occurrence_tool import distribution_context
+    from tools.habitat_climate import habitat_context
+
+    sections = [
+        ("Species search (GBIF)", dumps(inputs["species"])),
+        (f"Current weather ({CLIMATE_LOCATION})", dumps(inputs["climate"])),
+        (f"Multi-year climate ({CLIMATE_LOCATION})", dumps(inputs["climate_history"])),
+        ("Occurrence records binned on a latitude/longitude grid (densest cells first)",
+         distribution_context(inputs["distribution"]))
+    ]
+    if inputs.get("habitat") is not None:
+        sections.append(("Occurrence-weighted multi-year climate of the species' habitat regions",
+                         habitat_context(inputs["habitat"])))
+    share = budget.context_tokens // len(sections)
+    data = "\n\n".join(f"## {title}\n{budget.shrink(FUSED_STAGE, text, share)}" for title, text in sections)
+
+    instructions = compact_prompt(f"""
+        Analyze the data above about '{species_query}': species counts, scientific names and
+        conservation status, distribution patterns, the climate context and potential correlations
+        between environmental conditions and the species' habitat. Then write a beginner-friendly
+        report in Markdown that explains the findings, conservation concerns and interesting facts
+        about distribution and habitat in simple language.
+        Respond with one JSON object and nothing else:
+        {{"analysis": {{{", ".join(f'"{field}": "..."' for field in ANALYSIS_FIELDS)}}}, "report": "..."}}
+    """)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{data}\n\n{instructions}"}
+    ]
+
+
+def parse_response(text: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Split the model's answer into the structured analysis and the report.
+
+    Answers that are not the requested JSON are used as the report as-is.
+
+    Returns:
+        (analysis or None, report text)
+    """
+    document = extract_json(text or "")
+    if isinstance(document, dict) and isinstance(document.get("report"), str):
+        analysis = document.get("analysis")
+        return (analysis if isinstance(analysis, dict) else None), document["report"]
+    return None, (text or "").strip()
+
+
+def run_fused_analysis(species_query: str, llm: Any, distribution: Optional[Dict[str, Any]] = None,
+                       progress_callback: Optional[Callable[[int, str], None]] = None,
+                       context_tokens: Optional[int] = None,
+                       inputs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Produce the analysis and report with direct tool calls and one LLM request.
+
+    Args:
+        species_query: Species to analyze
+        llm: CrewAI ``LLM`` (anything with ``call(messages) -> str``)
+        distribution: Prefetched occurrence distribution; fetched here if omitted
+        progress_callback: Optional ``(percent, message)`` callback
+        context_tokens: Estimated tokens for all tool data (default: ``WILDLIFE_CONTEXT_TOKENS``)
+        inputs: Dict that receives the tool responses as soon as they are gathered,
+            so the caller keeps them when the LLM call fails
+
+    Returns:
+        dict: ``report``, ``analysis`` (None if the model ignored the JSON format),
+        ``inputs`` (the tool responses), ``tokens`` (per-stage report) and ``seconds``
+        spent in the tools and the LLM call
+    """
+    budget = PromptBudget(context_tokens)
+    if progress_callback:
+        progress_callback(20, "Fetching species and climate data...")
+    start_time = time.perf_counter()
+    gathered = gather_inputs(species_query, distribution)
+    tools_seconds = time.perf_counter() - start_time
+    if inputs is not None:
+        inputs.update(gathered)
+
+    if progress_callback:
+        progress_callback(60, "Generating analysis and report...")
+    messages = build_messages(species_query, gathered, budget)
+    start_time = time.perf_counter()
+    response = str(llm.call(messages))
+    llm_seconds = time.perf_counter() - start_time
+    budget.count_call(FUSED_STAGE, messages, response)
+    analysis, report = parse_response(response)
+
+    if progress_callback:
+        progress_callback(100, "Analysis complete!")
+    return {
+        "report": report,
+        "analysis": analysis,
+        "inputs": gathered,
+        "tokens": budget.finish(0),
+        "seconds": {"tools": round(tools_seconds, 3), "llm": round(llm_seconds, 3)}
+    }
@@ -0,0 +1,251 @@
+"""
+Wildlife Insight Agent - LLM Backends
+
+Chooses the LLM behind the agents and the fused pipeline. ``WILDLIFE_LLM_BACKEND``
+(or the ``backend`` argument) selects one of:
+
+- ``gemini``: Gemini 1.5 Flash through CrewAI (the Streamlit default; needs ``GEMINI_API_KEY``)
+- ``crewai``: CrewAI's own default model from ``MODEL`` / ``OPENAI_*`` (the CLI default)
+- ``stub``: ``StubLLM``, a deterministic local model that needs no network
+
+``WILDLIFE_LLM_MODEL`` overrides the model name of the gemini backend, and
+``register_backend`` adds more.
+
+The stub makes full pipeline runs, tests, benchmarks and load tests possible
+on an isolated machine. It sleeps for a latency drawn from a configurable
+distribution plus the time its answer would take at a configurable token
+rate, then answers from templates: a ReAct ``Final Answer`` for crew tasks and
+the JSON object the fused pipeline asks for. The draws are seeded by the
+prompt, so a given request always gets the same latency and answer, however
+many run concurrently. It reports LLM call events with token usage like the
+real providers, so metrics and token budgets work unchanged.
+
+Stub settings (environment):
+
+- ``WILDLIFE_STUB_LATENCY``: ``fixed:S``, ``uniform:LOW,HIGH``, ``normal:MEAN,STDDEV``
+  or ``lognormal:MEDIAN,SIGMA`` seconds (default ``fixed:0``)
+- ``WILDLIFE_STUB_TOKENS_PER_SECOND``: simulated generation speed (default 0, instant)
+- ``WILDLIFE_STUB_RESPONSES``: JSON file mapping ``crew`` / ``fused`` / an agent
+  role to a ``string.Template`` answer; ``$species``, ``$role``, ``$task`` and
+  ``$model`` are substituted
+- ``WILDLIFE_STUB_SEED``: changes every draw (default 0)
+"""
+
+import hashlib
+import math
+import os
+import random
+import re
+import time
+from string import Template
+from typing import Any, Callable, Dict, Optional, Tuple
+
+LLM_BACKEND_ENV = "WILDLIFE_LLM_BACKEND"
+LLM_MODEL_ENV = "WILDLIFE_LLM_MODEL"
+STUB_LATENCY_ENV = "WILDLIFE_STUB_LATENCY"
+STUB_TOKEN_RATE_ENV = "WILDLIFE_STUB_TOKENS_PER_SECOND"
+STUB_RESPONSES_ENV = "WILDLIFE_STUB_RESPONSES"
+STUB_SEED_ENV = "WILDLIFE_STUB_SEED"
+
+GEMINI_MODEL = "gemini/gemini-1.5-flash"
+GEMINI_API_KEY_ENV = "GEMINI_API_KEY"
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+STUB_TEMPLATES = {
+    "crew": (
+        "Thought: I now know the final answer\n"
+        "Final Answer: $role summary for $species. Stub output from $model for: $task"
+    ),
+    "fused": (
+        '{"analysis": {"species_overview": "$species (stub data)", "conservation_status": "Unknown", '
+        '"distribution": "See occurrence grid", "climate_context": "See climate summary", '
+        '"correlations": "None computed"}, '
+        '"report": "# $species\\n\\nStub report generated by $model."}'
+    )
+}
+
+# The fused pipeline asks for this JSON shape; crew tasks do not
+_FUSED_MARKER = '"report"'
+# Task and fused prompts name the species as "about 'tiger'" or "about tiger."
+_SPECIES_PATTERN = re.compile(r"about '([^']+)'|about ([^'.\n]+)\.")
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """
+    Parse a latency distribution such as ``uniform:0.2,1.5``.
+
+    Raises:
+        ValueError: For unknown distributions or missing parameters
+    """
+    name, _, params = (spec or "fixed:0").partition(":")
+    name = name.strip().lower()
+    values = tuple(float(value) for value in params.split(",") if value.strip())
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if name not in expected:
+        raise ValueError(f"Unknown latency distribution '{name}'; choose from {', '.join(LATENCY_DISTRIBUTIONS)}")
+    if len(values) != expected[name]:
+        raise ValueError(f"Latency '{name}' takes {expected[name]} value(s), got '{params}'")
+    return name, values
+
+
+def sample_latency(distribution: Tuple[str, Tuple[float, ...]], rng: random.Random) -> float:
+    """Draw one non-negative latency in seconds."""
+    name, values = distribution
+    if name == "fixed":
+        seconds = values[0]
+    elif name == "uniform":
+        seconds = rng.uniform(*values)
+    elif name == "normal":
+        seconds = rng.gauss(*values)
+    else:
+        median, sigma = values
+        seconds = rng.lognormvariate(math.log(max(median, 1e-9)), sigma)
+    return max(0.0, seconds)
+
+
+def _stub_class():
+    """Build StubLLM on first use so importing this module does not import CrewAI."""
+    from crewai.events.types.llm_events import LLMCallType
+    from crewai.llms.base_llm import BaseLLM, llm_call_context
+    from pydantic import PrivateAttr
+    from tools.prompt_budget import estimate_tokens, message_text
+
+    class StubLLM(BaseLLM):
+        """Deterministic local LLM with simulated latency (see module docstring)."""
+
+        latency: str = "fixed:0"
+        tokens_per_second: float = 0.0
+        templates: Dict[str, str] = {}
+        stub_seed: int = 0
+        _distribution: Tuple[str, Tuple[float, ...]] = PrivateAttr(default=("fixed", (0.0,)))
+        _templates: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+        def model_post_init(self, context: Any) -> None:
+            super().model_post_init(context)
+            self._distribution = parse_latency(self.latency)
+            self._templates = {**STUB_TEMPLATES, **self.templates}
+
+        def answer(self, messages: Any, from_task: Any = None, from_agent: Any = None) -> str:
+            """The templated answer for a request, without waiting."""
+            prompt = message_text(messages)
+            task = " ".join(str(getattr(from_task, "description", "") or "").split())
+            role = str(getattr(from_agent, "role", "") or "Assistant")
+            match = _SPECIES_PATTERN.search(task) or _SPECIES_PATTERN.search(prompt)
+            if _FUSED_MARKER in prompt and from_task is None:
+                template = self._templates["fused"]
+            else:
+                template = self._templates.get(role, self._templates["crew"])
+            return Template(template).safe_substitute(
+                species=(match.group(1) or match.group(2)) if match else "the species",
+                role=role, task=task[:120], model=self.model)
+
+        def delay(self, messages: Any, answer: str) -> float:
+            """Seconds this request takes: a latency draw plus generation time."""
+            digest = hashlib.sha256(f"{self.stub_seed}:{message_text(messages)}".encode("utf-8")).digest()
+            seconds = sample_latency(self._distribution, random.Random(digest))
+            if self.tokens_per_second > 0:
+                seconds += estimate_tokens(answer) / self.tokens_per_second
+            return seconds
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                 from_task=None, from_agent=None, response_model=None):
+            with llm_call_context():
+                self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+                answer = self.answer(messages, from_task, from_agent)
+                time.sleep(self.delay(messages, answer))
+                usage = {"prompt_tokens": estimate_tokens(message_text(messages)),
+                         "completion_tokens": estimate_tokens(answer)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                self._emit_call_completed_event(response=answer, call_type=LLMCallType.LLM_CALL,
+                                                from_task=from_task, from_agent=from_agent,
+                                                messages=messages, usage=usage)
+            return answer
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+    return StubLLM
+
+
+def _load_templates(path: str) -> Dict[str, str]:
+    """Read stub answer templates from a JSON file."""
+    from tools.json_backend import loads
+    with open(path, encoding="utf-8") as handle:
+        return loads(handle.read())
+
+
+_stub_llm_class = None
+
+
+def stub_llm(latency: Optional[str] = None, tokens_per_second: Optional[float] = None,
+             templates: Optional[Dict[str, str]] = None, seed: Optional[int] = None):
+    """
+    Create a StubLLM; unset arguments come from the ``WILDLIFE_STUB_*`` variables.
+
+    Args:
+        latency: Distribution spec, e.g. ``normal:0.8,0.2``
+        tokens_per_second: Simulated generation speed (0 for instant)
+        templates: Answers by ``crew``, ``fused`` or agent role
+        seed: Changes every latency draw
+    """
+    global _stub_llm_class
+    if _stub_llm_class is None:
+        _stub_llm_class = _stub_class()
+    if templates is None and os.getenv(STUB_RESPONSES_ENV):
+        templates = _load_templates(os.getenv(STUB_RESPONSES_ENV))
+    return _stub_llm_class(
+        model="stub",
+        latency=latency if latency is not None else os.getenv(STUB_LATENCY_ENV, "fixed:0"),
+        tokens_per_second=(tokens_per_second if tokens_per_second is not None
+                           else float(os.getenv(STUB_TOKEN_RATE_ENV) or 0)),
+        templates=templates or {},
+        stub_seed=seed if seed is not None else int(os.getenv(STUB_SEED_ENV) or 0)
+    )
+
+
+def _gemini_llm():
+    api_key = os.getenv(GEMINI_API_KEY_ENV)
+    if not api_key:
+        raise RuntimeError(f"{GEMINI_API_KEY_ENV} is not set; set it or select another backend "
+                           f"with {LLM_BACKEND_ENV} (e.g. stub)")
+    from crewai import LLM
+    return LLM(model=os.getenv(LLM_MODEL_ENV) or GEMINI_MODEL, api_key=api_key)
+
+
+_BACKENDS: Dict[str, Callable[[], Any]] = {
+    "gemini": _gemini_llm,
+    "crewai": lambda: None,
+    "stub": stub_llm
+}
+
+
+def register_backend(name: str, factory: Callable[[], Any]) -> None:
+    """Make ``factory`` (returning a CrewAI LLM) selectable as backend ``name``."""
+    _BACKENDS[name.lower()] = factory
+
+
+def backend_name(backend: Optional[str] = None, default: str = "gemini") -> str:
+    """
+    Resolve the backend for one pipeline run.
+
+    Raises:
+        ValueError: If the backend is not registered
+    """
+    name = (backend or os.getenv(LLM_BACKEND_ENV) or default).strip().lower()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'; choose from {', '.join(sorted(_BACKENDS))}")
+    return name
+
+
+def create_llm(backend: Optional[str] = None, default: str = "gemini"):
+    """
+    Create the LLM for one pipeline run.
+
+    Args:
+        backend: Backend name; None uses ``WILDLIFE_LLM_BACKEND``, then ``default``
+        default: Backend used when neither is set
+
+    Returns:
+        A CrewAI LLM, or None for the ``crewai`` backend (agents then pick CrewAI's default)
+    """
+    return _BACKENDS[backend_name(backend, default)]()
@@ -2,194 +2,111 @@
 Wildlife Insight Agent - Main application entry point.
 Uses CrewAI framework with MCP tools for wildlife research and reporting.
 """
+import argparse
 import sys
-import json
-from crewai import Agent, Task, Crew
-from crewai.tools import BaseTool
-from tools.species_tool import fetch_species
-from tools.climate_tool import fetch_climate_data
+import time
 
+from fused_pipeline import PIPELINE_MODES, pipeline_mode
+from llm_backend import backend_name, create_llm
+from pipeline_factory import CLI_PIPELINE
+from profiling import profiled
+from tools.metrics import instrument_pipeline, instrument_crewai
+from tools.report_export import analysis_id, export_analysis
 
-class SpeciesTool(BaseTool):
-    """CrewAI-compatible wrapper for the species MCP tool."""
-    name: str = "fetch_species"
-    description: str = "Fetch species data from GBIF API using MCP tool. Input should be a species name."
-    
-    def _run(self, species_name: str) -> str:
-        """Execute the species tool and return JSON string."""
-        result = fetch_species(species_name)
-        return json.dumps(result, indent=2)
+# CrewAI takes seconds to import, so it is loaded inside the functions that
+# build the pipeline; this keeps `python main.py --help` fast.
+_LAZY_TOOL_WRAPPERS = ("SpeciesTool", "ClimateTool", "OccurrenceTool", "ClimateHistoryTool")
 
 
-class ClimateTool(BaseTool):
-    """CrewAI-compatible wrapper for the climate MCP tool."""
-    name: str = "fetch_climate_data"
-    description: str = "Fetch climate data from Open Meteo API using MCP tool. Input should be a location name."
-    
-    def _run(self, location: str) -> str:
-        """Execute the climate tool and return JSON string."""
-        result = fetch_climate_data(location)
-        return json.dumps(result, indent=2)
-
-
-def create_research_agent():
-    """Create the Research Agent for data fetching."""
-    return Agent(
-        role="Wildlife Researcher",
-        goal="Fetch comprehensive species and climate data using MCP tools",
-        backstory=(
-            "You are an expert wildlife researcher with deep knowledge of "
-            "biodiversity databases and climate data sources. You specialize "
-            "in using standardized MCP tools to gather accurate scientific "
-            "information from the Global Biodiversity Information Facility "
-            "and climate APIs."
-        ),
-        verbose=True,
-        allow_delegation=False
-    )
+def __getattr__(name):
+    """Resolve the CrewAI tool wrappers lazily (PEP 562)."""
+    if name in _LAZY_TOOL_WRAPPERS:
+        from tools import crewai_wrappers
+        return getattr(crewai_wrappers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_research_agent(llm=None):
+    """Create the Research Agent for data fetching, with its own MCP tool instances."""
+    return CLI_PIPELINE.agents["research"].create(llm, CLI_PIPELINE.verbose)
 
 
-def create_analysis_agent():
+def create_analysis_agent(llm=None):
     """Create the Analysis Agent for data processing."""
-    return Agent(
-        role="Data Analyst",
-        goal="Analyze species and climate data to identify conservation insights",
-        backstory=(
-            "You are a skilled data analyst specializing in biodiversity and "
-            "environmental data. You excel at finding patterns in species "
-            "distribution, identifying endangered status indicators, and "
-            "correlating wildlife data with climate conditions to generate "
-            "meaningful conservation insights."
-        ),
-        verbose=True,
-        allow_delegation=False
-    )
+    return CLI_PIPELINE.agents["analysis"].create(llm, CLI_PIPELINE.verbose)
 
 
-def create_report_agent():
+def create_report_agent(llm=None):
     """Create the Report Agent for generating user-friendly reports."""
-    return Agent(
-        role="Report Writer",
-        goal="Create beginner-friendly reports about wildlife and climate findings",
-        backstory=(
-            "You are an experienced science communicator who specializes in "
-            "translating complex biodiversity and climate research into "
-            "accessible, engaging reports for students and conservationists. "
-            "You use simple language while maintaining scientific accuracy."
-        ),
-        verbose=True,
-        allow_delegation=False
-    )
+    return CLI_PIPELINE.agents["report"].create(llm, CLI_PIPELINE.verbose)
 
 
-def create_tasks(research_agent, analysis_agent, report_agent):
+def create_tasks(research_agent, analysis_agent, report_agent, species_query="tiger", distribution=None):
     """Create the four sequential tasks for the wildlife research pipeline."""
-    
-    # Task 1: Fetch species data using MCP tool
-    task1 = Task(
-        description=(
-            "Use the fetch_species MCP tool to gather comprehensive data about tigers. "
-            "Call the tool with 'tiger' as the species name parameter. "
-            "Return the complete JSON response including species information, "
-            "scientific classification, and any available occurrence data."
-        ),
-        agent=research_agent,
-        expected_output=(
-            "Complete species data from GBIF API including scientific name, "
-            "classification hierarchy, and occurrence information for tigers."
-        )
-    )
-    
-    # Task 2: Fetch climate data using MCP tool  
-    task2 = Task(
-        description=(
-            "Use the fetch_climate_data MCP tool to gather current weather and "
-            "climate information for New York. Call the tool with 'New York' "
-            "as the location parameter. Return the complete JSON response "
-            "including current weather conditions and forecast data."
-        ),
-        agent=research_agent,
-        expected_output=(
-            "Complete climate data including current weather conditions, "
-            "temperature forecasts, and precipitation data for New York."
-        )
-    )
-    
-    # Task 3: Analyze combined data
-    task3 = Task(
-        description=(
-            "Analyze the species and climate data from the previous tasks. "
-            "Extract key information including: species occurrence counts, "
-            "conservation status indicators, distribution patterns, "
-            "temperature trends, and potential correlations between "
-            "climate conditions and species habitat preferences. "
-            "Focus on conservation insights and environmental relationships."
-        ),
-        agent=analysis_agent,
-        expected_output=(
-            "Structured analysis including species occurrence statistics, "
-            "conservation status assessment, climate pattern summary, "
-            "and identified correlations between environmental conditions "
-            "and species distribution."
-        ),
-        context=[task1, task2]
-    )
-    
-    # Task 4: Generate final report
-    task4 = Task(
-        description=(
-            "Create a comprehensive, beginner-friendly report summarizing "
-            "the wildlife and climate findings. Use simple, non-technical "
-            "language suitable for students and conservation enthusiasts. "
-            "Include key conservation insights, climate context, and "
-            "explain the importance of the findings for wildlife protection."
-        ),
-        agent=report_agent,
-        expected_output=(
-            "A clear, accessible report in simple language that explains "
-            "the tiger species information, climate conditions, conservation "
-            "status, and the relationship between environmental factors "
-            "and wildlife conservation."
-        ),
-        context=[task3]
+    agents = {"research": research_agent, "analysis": analysis_agent, "report": report_agent}
+    return CLI_PIPELINE.create_tasks(agents, species_query, distribution)
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(
+        description="Research, analyze and report on a wildlife species with CrewAI agents."
     )
-    
-    return [task1, task2, task3, task4]
+    parser.add_argument("species", nargs="?", default="tiger",
+                        help="Species name to analyze (default: tiger)")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=None,
+                        help="crew: four CrewAI tasks; fused: direct tool calls and one LLM call "
+                             "(default: WILDLIFE_PIPELINE_MODE or crew)")
+    parser.add_argument("--backend", default=None,
+                        help="LLM backend: crewai, gemini or stub (default: WILDLIFE_LLM_BACKEND or crewai)")
+    args = parser.parse_args(argv)
+    try:
+        # Resolve WILDLIFE_PIPELINE_MODE here so a bad value is a usage error, not a traceback
+        args.mode = pipeline_mode(args.mode)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
 
 
-def main():
+@profiled("main")
+@instrument_pipeline("main")
+def main(argv=None):
     """Main function to execute the wildlife insight agent pipeline."""
+    args = parse_args(argv)
+    species_query = args.species.lower().strip()
+    
+    if args.mode == "fused":
+        return run_fused(species_query, args.backend)
+    
+    backend = args.backend
+    species_data = climate_data = distribution = pipeline = None
+    start_time = time.perf_counter()
     try:
         print("Initializing Wildlife Insight Agent...")
         print("Setting up MCP tools and CrewAI agents...")
         
-        # Create agents
-        research_agent = create_research_agent()
-        analysis_agent = create_analysis_agent()
-        report_agent = create_report_agent()
+        from tools.climate_tool import fetch_climate_data
+        from tools.occurrence_tool import fetch_occurrence_distribution
+        from tools.species_tool import fetch_species
         
-        # Create tasks
-        tasks = create_tasks(research_agent, analysis_agent, report_agent)
+        backend = backend_name(args.backend, default="crewai")
         
-        # Create CrewAI-compatible tool instances
-        species_tool = SpeciesTool()
-        climate_tool = ClimateTool()
+        # Fetch the inputs once, up front, so the archive row records the data of this run
+        species_data = fetch_species(species_query)
+        climate_data = fetch_climate_data("New York")
         
-        # Register MCP tools with agents
-        research_agent.tools = [species_tool, climate_tool]
+        # Summarize where the species occurs for the analysis task
+        distribution = fetch_occurrence_distribution(species_query)
         
-        # Create and configure the crew
-        crew = Crew(
-            agents=[research_agent, analysis_agent, report_agent],
-            tasks=tasks,
-            verbose=True
-        )
+        # Fresh agents, tools, tasks and crew for this run (CrewAI's default model
+        # unless WILDLIFE_LLM_BACKEND selects another)
+        pipeline = CLI_PIPELINE.build(species_query, create_llm(backend), distribution)
         
         print("\nStarting wildlife research pipeline...")
         print("=" * 50)
         
         # Execute the crew
-        result = crew.kickoff()
+        result = pipeline.kickoff()
         
         # Display final report
         print("\n" + "=" * 50)
@@ -197,10 +114,62 @@ def main():
         print("=" * 50)
         print(result)
         
+        print("\n=== Token Usage (estimated where the LLM reports none) ===")
+        for line in pipeline.budget.format_report():
+            print(line)
+        
+        export_analysis(species_query, result, species_data=species_data, climate_data=climate_data,
+                        distribution=distribution, tokens=pipeline.tokens, mode="crew",
+                        seconds=time.perf_counter() - start_time,
+                        row_id=analysis_id(species_query, "crew", backend))
         return result
         
     except Exception as e:
-        print(f"Error executing wildlife insight agent: {str(e)}")
+        error_msg = f"Error executing wildlife insight agent: {str(e)}"
+        print(error_msg)
+        export_analysis(species_query, None, species_data=species_data, climate_data=climate_data,
+                        distribution=distribution, tokens=pipeline.tokens if pipeline is not None else None,
+                        mode="crew", error=error_msg, seconds=time.perf_counter() - start_time,
+                        row_id=analysis_id(species_query, "crew", backend))
+        return None
+
+
+def run_fused(species_query, backend=None):
+    """Run the fused pipeline: tools called directly, analysis and report in one LLM call."""
+    inputs = {}
+    try:
+        print("Initializing Wildlife Insight Agent (fused mode)...")
+        from fused_pipeline import run_fused_analysis
+        from tools.prompt_budget import format_token_report
+        
+        # Same model the crew's agents would use
+        backend = backend_name(backend, default="crewai")
+        llm = create_report_agent(create_llm(backend)).llm
+        instrument_crewai()
+        fused = run_fused_analysis(species_query, llm, inputs=inputs)
+        
+        print("\n" + "=" * 50)
+        print("=== Final Report ===")
+        print("=" * 50)
+        print(fused["report"])
+        
+        print(f"\nTools: {fused['seconds']['tools']:.2f}s, LLM: {fused['seconds']['llm']:.2f}s")
+        print("\n=== Token Usage (estimated) ===")
+        for line in format_token_report(fused["tokens"]):
+            print(line)
+        
+        export_analysis(species_query, fused["report"], species_data=fused["inputs"]["species"],
+                        climate_data=fused["inputs"]["climate"], distribution=fused["inputs"].get("distribution"),
+                        tokens=fused["tokens"], mode="fused", seconds=sum(fused["seconds"].values()),
+                        row_id=analysis_id(species_query, "fused", backend))
+        return fused["report"] or None
+        
+    except Exception as e:
+        error_msg = f"Error executing wildlife insight agent: {str(e)}"
+        print(error_msg)
+        export_analysis(species_query, None, species_data=inputs.get("species"), climate_data=inputs.get("climate"),
+                        distribution=inputs.get("distribution"), mode="fused", error=error_msg,
+                        row_id=analysis_id(species_query, "fused", backend))
         return None
 
 
@@ -0,0 +1,396 @@
+"""
+Wildlife Insight Agent - Pipeline Factory
+
+CrewAI agents, tasks and tools are mutable: ``Agent.tools``, task callbacks,
+executors and usage counters all change while a crew runs. Sharing them
+between concurrent Streamlit sessions would let one request see another's
+tools, outputs or token counts. This module separates what can be shared
+from what cannot:
+
+- ``AgentTemplate``, ``TaskTemplate`` and ``PipelineTemplate`` are frozen
+  descriptions (role, prompts, tool names, task graph), built once at import
+  and safe to share between threads.
+- ``PipelineTemplate.build`` creates one request's ``Pipeline``: fresh
+  agents whose tools are given at construction, fresh tool and task objects,
+  a ``PromptBudget`` and the crew. Nothing is mutated after construction
+  and nothing in it is reachable from another request.
+
+``ANALYSIS_PIPELINE`` is used by the apps (``run_wildlife_analysis_streamlit``),
+``CLI_PIPELINE`` by ``main.py``. Building one costs a few pydantic object
+constructions; no imports or network calls beyond the habitat cache read.
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from tools.prompt_budget import PIPELINE_STAGES
+
+# CrewAI tool wrappers the research agent uses (names in tools/crewai_wrappers.py)
+RESEARCH_TOOLS = ("SpeciesTool", "ClimateTool", "OccurrenceTool", "ClimateHistoryTool")
+
+
+@dataclass(frozen=True)
+class AgentTemplate:
+    """Immutable description of one agent; ``create`` makes a per-request Agent."""
+
+    role: str
+    goal: str
+    backstory: str
+    tools: Tuple[str, ...] = ()
+
+    def create(self, llm: Any = None, verbose: bool = False):
+        """
+        Create a new Agent with its own tool instances.
+
+        Args:
+            llm: CrewAI LLM, or None for CrewAI's default model
+            verbose: Log agent steps
+        """
+        from crewai import Agent
+        from tools import crewai_wrappers
+
+        return Agent(
+            role=self.role,
+            goal=self.goal,
+            backstory=self.backstory,
+            tools=[getattr(crewai_wrappers, name)() for name in self.tools],
+            verbose=verbose,
+            allow_delegation=False,
+            llm=llm
+        )
+
+
+@dataclass(frozen=True)
+class TaskTemplate:
+    """
+    Immutable description of one task.
+
+    ``description`` and ``expected_output`` are ``str.format`` templates with
+    the fields ``species``, ``distribution_note`` and ``habitat_note``.
+    """
+
+    stage: str
+    agent: str
+    description: str
+    expected_output: str
+    context: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class PipelineTemplate:
+    """
+    Immutable agents and task graph of one crew pipeline.
+
+    ``distribution_note`` and ``habitat_note`` are ``str.format`` templates
+    with the field ``context``; they are left out when there is no data.
+    """
+
+    agents: Mapping[str, AgentTemplate]
+    tasks: Tuple[TaskTemplate, ...]
+    distribution_note: str = ""
+    habitat_note: str = ""
+    verbose: bool = False
+
+    def __post_init__(self):
+        object.__setattr__(self, "agents", MappingProxyType(dict(self.agents)))
+        object.__setattr__(self, "tasks", tuple(self.tasks))
+        for task in self.tasks:
+            if task.agent not in self.agents:
+                raise ValueError(f"Task '{task.stage}' uses unknown agent '{task.agent}'")
+
+    def create_agents(self, llm: Any = None) -> Dict[str, Any]:
+        """Create this request's agents, keyed like ``agents``."""
+        return {name: agent.create(llm, self.verbose) for name, agent in self.agents.items()}
+
+    def create_tasks(self, agents: Mapping[str, Any], species_query: str,
+                     distribution: Optional[dict] = None) -> List[Any]:
+        """
+        Create this request's tasks for ``agents``.
+
+        Args:
+            agents: Agents from ``create_agents`` (or compatible ones by key)
+            species_query: Species being analyzed
+            distribution: Binned occurrence distribution, if fetched
+        """
+        from crewai import Task
+        from tools.occurrence_tool import distribution_context
+        from tools.habitat_climate import get_habitat_summary, habitat_context
+
+        # Precomputed by the habitat scheduler; a cache read, never an API call
+        habitat = get_habitat_summary(species_query)
+        fields = {
+            "species": species_query,
+            "distribution_note": self.distribution_note.format(context=distribution_context(distribution))
+            if distribution is not None else "",
+            "habitat_note": self.habitat_note.format(context=habitat_context(habitat))
+            if habitat is not None else ""
+        }
+
+        created: Dict[str, Any] = {}
+        for template in self.tasks:
+            options = {"context": [created[stage] for stage in template.context]} if template.context else {}
+            created[template.stage] = Task(
+                description=template.description.format(**fields),
+                expected_output=template.expected_output.format(**fields),
+                agent=agents[template.agent],
+                **options
+            )
+        return list(created.values())
+
+    def build(self, species_query: str, llm: Any = None, distribution: Optional[dict] = None,
+              context_tokens: Optional[int] = None) -> "Pipeline":
+        """
+        Create everything one request runs: agents, tools, tasks, budget and crew.
+
+        Args:
+            species_query: Species being analyzed
+            llm: CrewAI LLM shared by the agents of this request
+            distribution: Binned occurrence distribution, if fetched
+            context_tokens: Prompt budget per task (default ``WILDLIFE_CONTEXT_TOKENS``)
+        """
+        from crewai import Crew
+        from tools.metrics import instrument_crewai
+        from tools.prompt_budget import PromptBudget
+
+        agents = self.create_agents(llm)
+        tasks = self.create_tasks(agents, species_query, distribution)
+        # Compact prompts, fit upstream outputs to the context budget and count tokens per stage
+        budget = PromptBudget(context_tokens).attach(tasks, [task.stage for task in self.tasks])
+        instrument_crewai()
+        crew = Crew(agents=list(agents.values()), tasks=tasks, verbose=self.verbose)
+        return Pipeline(agents, tasks, budget, crew)
+
+
+class Pipeline:
+    """One request's crew; build a new one per request and never share it."""
+
+    def __init__(self, agents: Dict[str, Any], tasks: List[Any], budget: Any, crew: Any):
+        self.agents = agents
+        self.tasks = tasks
+        self.budget = budget
+        self.crew = crew
+        self.tokens: Optional[dict] = None
+
+    def kickoff(self):
+        """Run the crew; per-stage token usage is in ``tokens`` afterwards, even on errors."""
+        try:
+            return self.crew.kickoff()
+        finally:
+            self.tokens = self.budget.finish()
+
+
+# Prompts of the web apps
+ANALYSIS_PIPELINE = PipelineTemplate(
+    agents={
+        "research": AgentTemplate(
+            role="Wildlife Researcher",
+            goal="Fetch species data from the GBIF API",
+            backstory="""You are an expert wildlife researcher with deep knowledge of
+            biodiversity databases and scientific data sources. You specialize in retrieving
+            accurate species information from the Global Biodiversity Information Facility (GBIF)
+            and ensuring data quality for conservation research.""",
+            tools=RESEARCH_TOOLS
+        ),
+        "analysis": AgentTemplate(
+            role="Data Analyst",
+            goal="Analyze species occurrence data and extract key insights",
+            backstory="""You are a skilled data analyst specializing in biodiversity and
+            conservation science. You excel at finding patterns in species occurrence data,
+            identifying endangered species, and extracting meaningful trends from complex
+            biological datasets for conservation purposes."""
+        ),
+        "report": AgentTemplate(
+            role="Report Writer",
+            goal="Summarize the analysis in simple, beginner-friendly language",
+            backstory="""You are an experienced science communicator who specializes in
+            making complex wildlife and conservation data accessible to students and the
+            general public. You excel at writing clear, engaging reports that help people
+            understand important conservation issues."""
+        )
+    },
+    tasks=(
+        TaskTemplate(
+            stage=PIPELINE_STAGES[0],
+            agent="research",
+            description="""Use the fetch_species MCP tool to gather comprehensive data about '{species}'.
+            Call the tool with '{species}' as the species name parameter.
+            Return the complete JSON response including species information, scientific classification,
+            and any available occurrence data.""",
+            expected_output="Complete species data from GBIF API via MCP tool including scientific names, "
+                            "classification, and occurrence information for {species}"
+        ),
+        TaskTemplate(
+            stage=PIPELINE_STAGES[1],
+            agent="research",
+            description="""Use the fetch_climate_data MCP tool to gather current weather and
+            climate information for New York. Call the tool with 'New York' as the location parameter.
+            Then call fetch_climate_history with 'New York' for the ten-year trend.
+            Return the complete JSON responses including current weather conditions, forecast data and the climate history summary.""",
+            expected_output="Complete climate data including current weather conditions, temperature forecasts, "
+                            "precipitation data and the multi-year climate trend for New York"
+        ),
+        TaskTemplate(
+            stage=PIPELINE_STAGES[2],
+            agent="analysis",
+            description="""Analyze the species and climate data from the previous tasks. Extract
+            key information including:
+            - Total number of {species} species found
+            - Scientific names and conservation status
+            - Distribution patterns and occurrence counts
+            - Climate context from New York weather data
+            - Potential correlations between environmental conditions and species habitat
+            {distribution_note}
+            {habitat_note}
+
+            Provide structured insights combining both datasets for conservation reporting.""",
+            expected_output="""Structured analysis including {species} species counts, conservation status,
+            climate context, and key findings about species distribution with environmental correlations""",
+            context=(PIPELINE_STAGES[0], PIPELINE_STAGES[1])
+        ),
+        TaskTemplate(
+            stage=PIPELINE_STAGES[3],
+            agent="report",
+            description="""Create a comprehensive, beginner-friendly report based on the analysis insights.
+            The report should:
+            - Use simple, non-technical language suitable for students and conservation enthusiasts
+            - Explain key findings about {species} species with climate context
+            - Highlight conservation concerns and environmental relationships
+            - Include interesting facts about distribution and habitat preferences
+            - Connect species data with climate information from New York
+
+            Focus on educational value and conservation awareness with environmental context.""",
+            expected_output="""A clear, beginner-friendly report about {species} species that
+            includes conservation status, climate context, distribution insights, and environmental
+            correlations in simple language""",
+            context=(PIPELINE_STAGES[2],)
+        )
+    ),
+    distribution_note="""
+            Base distribution patterns on these GBIF occurrence records binned on a
+            latitude/longitude grid (densest cells first):
+            {context}
+            """,
+    habitat_note="""
+            Relate the species to the climate where it actually lives, using this
+            occurrence-weighted multi-year summary of its habitat regions:
+            {context}
+            """
+)
+
+# Prompts of the command line pipeline (main.py)
+CLI_PIPELINE = PipelineTemplate(
+    agents={
+        "research": AgentTemplate(
+            role="Wildlife Researcher",
+            goal="Fetch comprehensive species and climate data using MCP tools",
+            backstory=(
+                "You are an expert wildlife researcher with deep knowledge of "
+                "biodiversity databases and climate data sources. You specialize "
+                "in using standardized MCP tools to gather accurate scientific "
+                "information from the Global Biodiversity Information Facility "
+                "and climate APIs."
+            ),
+            tools=RESEARCH_TOOLS
+        ),
+        "analysis": AgentTemplate(
+            role="Data Analyst",
+            goal="Analyze species and climate data to identify conservation insights",
+            backstory=(
+                "You are a skilled data analyst specializing in biodiversity and "
+                "environmental data. You excel at finding patterns in species "
+                "distribution, identifying endangered status indicators, and "
+                "correlating wildlife data with climate conditions to generate "
+                "meaningful conservation insights."
+            )
+        ),
+        "report": AgentTemplate(
+            role="Report Writer",
+            goal="Create beginner-friendly reports about wildlife and climate findings",
+            backstory=(
+                "You are an experienced science communicator who specializes in "
+                "translating complex biodiversity and climate research into "
+                "accessible, engaging reports for students and conservationists. "
+                "You use simple language while maintaining scientific accuracy."
+            )
+        )
+    },
+    tasks=(
+        TaskTemplate(
+            stage=PIPELINE_STAGES[0],
+            agent="research",
+            description=(
+                "Use the fetch_species MCP tool to gather comprehensive data about {species}. "
+                "Call the tool with '{species}' as the species name parameter. "
+                "Return the complete JSON response including species information, "
+                "scientific classification, and any available occurrence data."
+            ),
+            expected_output=(
+                "Complete species data from GBIF API including scientific name, "
+                "classification hierarchy, and occurrence information for {species}."
+            )
+        ),
+        TaskTemplate(
+            stage=PIPELINE_STAGES[1],
+            agent="research",
+            description=(
+                "Use the fetch_climate_data MCP tool to gather current weather and "
+                "climate information for New York. Call the tool with 'New York' "
+                "as the location parameter. Then call fetch_climate_history with "
+                "'New York' for the ten-year trend. Return the complete JSON responses "
+                "including current weather conditions, forecast data and the climate history summary."
+            ),
+            expected_output=(
+                "Complete climate data including current weather conditions, "
+                "temperature forecasts, precipitation data and the multi-year climate trend for New York."
+            )
+        ),
+        TaskTemplate(
+            stage=PIPELINE_STAGES[2],
+            agent="analysis",
+            description=(
+                "Analyze the species and climate data from the previous tasks. "
+                "Extract key information including: species occurrence counts, "
+                "conservation status indicators, distribution patterns, "
+                "temperature trends, and potential correlations between "
+                "climate conditions and species habitat preferences. "
+                "Focus on conservation insights and environmental relationships."
+                "{distribution_note}{habitat_note}"
+            ),
+            expected_output=(
+                "Structured analysis including species occurrence statistics, "
+                "conservation status assessment, climate pattern summary, "
+                "and identified correlations between environmental conditions "
+                "and species distribution."
+            ),
+            context=(PIPELINE_STAGES[0], PIPELINE_STAGES[1])
+        ),
+        TaskTemplate(
+            stage=PIPELINE_STAGES[3],
+            agent="report",
+            description=(
+                "Create a comprehensive, beginner-friendly report summarizing "
+                "the wildlife and climate findings. Use simple, non-technical "
+                "language suitable for students and conservation enthusiasts. "
+                "Include key conservation insights, climate context, and "
+                "explain the importance of the findings for wildlife protection."
+            ),
+            expected_output=(
+                "A clear, accessible report in simple language that explains "
+                "the {species} species information, climate conditions, conservation "
+                "status, and the relationship between environmental factors "
+                "and wildlife conservation."
+            ),
+            context=(PIPELINE_STAGES[2],)
+        )
+    ),
+    distribution_note=(
+        " Base distribution patterns on these GBIF occurrence records "
+        "binned on a latitude/longitude grid (densest cells first): {context}"
+    ),
+    habitat_note=(
+        " Relate the species to the climate where it actually lives, using "
+        "this occurrence-weighted multi-year summary of its habitat regions: {context}"
+    ),
+    verbose=True
+)
@@ -0,0 +1,210 @@
+"""
+Opt-in sampling profiler for the analysis entry points.
+
+Set ``WILDLIFE_PROFILE=1`` (or call ``set_profiling(True)``) and every call
+to a function decorated with ``@profiled`` is sampled: a background thread
+records, every few milliseconds, the stacks of the calling thread and of the
+threads it starts (directly or through threads they start), so time spent in
+``crew.kickoff()``, tool HTTP calls made from worker threads, JSON handling
+and rendering all show up, while concurrent requests in other sessions and
+their profilers stay out of the profile. Threads are attributed by who
+started them, so a long-lived pool thread that an earlier request started is
+not followed. Each run writes two files to
+``WILDLIFE_PROFILE_DIR`` (default ``.cache/profiles``):
+
+- ``<time>-<label>-<pid>.collapsed``: collapsed stacks, one ``frame;frame;... count``
+  line per distinct stack, ready for ``flamegraph.pl`` or speedscope
+- ``<time>-<label>-<pid>.json``: duration, sample count and the hottest
+  functions by self and total samples
+
+When profiling is off, the decorator costs one environment lookup per call.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.json_backend import dumps
+
+PROFILE_ENV = "WILDLIFE_PROFILE"
+PROFILE_DIR_ENV = "WILDLIFE_PROFILE_DIR"
+PROFILE_INTERVAL_ENV = "WILDLIFE_PROFILE_INTERVAL_MS"
+DEFAULT_PROFILE_DIR = os.path.join(".cache", "profiles")
+DEFAULT_INTERVAL_MS = 5.0
+
+_enabled: Optional[bool] = None
+
+
+def set_profiling(enabled: Optional[bool]) -> None:
+    """Turn profiling on or off for this process (None defers to ``WILDLIFE_PROFILE``)."""
+    global _enabled
+    _enabled = enabled
+
+
+def profiling_enabled() -> bool:
+    """Whether ``@profiled`` functions are currently sampled."""
+    if _enabled is not None:
+        return _enabled
+    return os.getenv(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+_start_lock = threading.Lock()
+_original_thread_start: Optional[Callable] = None
+
+
+def _track_thread_origins() -> None:
+    """Make every thread started from now on remember the chain of threads that started it."""
+    global _original_thread_start
+    with _start_lock:
+        if _original_thread_start is not None:
+            return
+        _original_thread_start = original = threading.Thread.start
+
+        @functools.wraps(original)
+        def start(thread):
+            parent = threading.current_thread()
+            thread._profiling_origins = (threading.get_ident(),) + getattr(parent, "_profiling_origins", ())
+            return original(thread)
+
+        threading.Thread.start = start
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of other threads at a fixed interval."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL_MS / 1000, root: Optional[int] = None):
+        """
+        Args:
+            interval: Seconds between samples
+            root: Ident of the thread to follow, with every thread it starts
+                (None samples all threads)
+        """
+        if root is not None:
+            _track_thread_origins()
+        self.root = root
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def _frame_label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        names = {ident: thread.name for ident, thread in threads.items()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or names.get(ident) == "sampling-profiler":
+                continue
+            if self.root is not None and ident != self.root \
+                    and self.root not in getattr(threads.get(ident), "_profiling_origins", ()):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text (Brendan Gregg's format), heaviest stacks first."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 25) -> Dict[str, List[Tuple[str, int]]]:
+        """The frames with the most samples on top of the stack (self) and anywhere in it (total)."""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return {"self": own.most_common(limit), "total": total.most_common(limit)}
+
+    def save(self, directory: str, label: str) -> Tuple[str, str]:
+        """
+        Write the collapsed stacks and a JSON summary.
+
+        Returns:
+            (collapsed_path, summary_path)
+        """
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}")
+        with open(stem + ".collapsed", "w", encoding="utf-8") as handle:
+            handle.write(self.collapsed())
+        summary = {
+            "label": label,
+            "duration_seconds": round(self.duration, 4),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "top": self.top_functions()
+        }
+        with open(stem + ".json", "w", encoding="utf-8") as handle:
+            handle.write(dumps(summary, indent=True))
+        return stem + ".collapsed", stem + ".json"
+
+
+def profiled(label: str) -> Callable[[Callable], Callable]:
+    """
+    Decorate an entry point so each call is sampled while profiling is enabled.
+
+    Args:
+        label: Name used in the profile file names
+    """
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiling_enabled():
+                return function(*args, **kwargs)
+            interval = float(os.getenv(PROFILE_INTERVAL_ENV, DEFAULT_INTERVAL_MS)) / 1000
+            profiler = SamplingProfiler(interval, root=threading.get_ident()).start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.stop()
+                try:
+                    paths = profiler.save(os.getenv(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR), label)
+                    print(f"🔬 Profile for {label}: {paths[0]} ({profiler.samples} samples)", file=sys.stderr)
+                except OSError as e:
+                    print(f"🔬 Could not save profile for {label}: {e}", file=sys.stderr)
+        return wrapper
+    return decorate
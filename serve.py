@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Wildlife Insight Agent - Multi-worker Server
+
+Runs several Streamlit worker processes behind a small local TCP balancer so
+the deployment can use more than one CPU core. All workers share tool
+responses and generated reports through the SQLite cache in ``tools/cache.py``,
+which is warmed with the featured species in the background. The public port
+is bound first; connections are routed by client address to workers that
+pass their health check, and workers that exit are restarted. A
+background scheduler keeps habitat climate summaries of popular species
+precomputed in the same cache (see ``tools/habitat_climate.py``).
+With ``--metrics-port`` the server process (warm-up, scheduler and cache
+revalidation) exposes Prometheus metrics on that port and worker N on the
+port N above it (see ``tools/metrics.py``).
+
+Usage:
+    python serve.py --workers 4 --port 8501
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+from tools.cache import CACHE_DB_ENV, SharedCache
+from tools.metrics import METRICS_PORT_ENV, ensure_metrics_server
+from warmup import (
+    DEFAULT_CACHE_DB, FEATURED_SPECIES, FEATURED_LOCATIONS, DEFAULT_STEPS, DEFAULT_BUDGET_SECONDS,
+    DEFAULT_CONCURRENCY, run_warmup, print_report
+)
+
+
+def warm_cache(steps=DEFAULT_STEPS, budget=DEFAULT_BUDGET_SECONDS, concurrency=DEFAULT_CONCURRENCY):
+    """Prefetch featured species and climate data (and optionally reports) into the shared cache."""
+    report = run_warmup(FEATURED_SPECIES, FEATURED_LOCATIONS, steps, budget, concurrency)
+    print_report(report)
+    return report
+
+
+HEALTH_PATH = "/_stcore/health"
+HEALTH_INTERVAL = 2.0
+HEALTH_TIMEOUT = 2.0
+RESTART_BACKOFF_MAX = 30.0
+
+# Largest request head read to find the client address before a worker is chosen
+MAX_HEAD_BYTES = 64 * 1024
+HEAD_TIMEOUT = 10.0
+
+UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 5\r\nContent-Type: text/plain\r\n"
+    b"Content-Length: 23\r\nConnection: close\r\n\r\nWorkers are starting.\r\n"
+)
+
+
+def spawn_worker(app, port, metrics_port=None):
+    """Start one Streamlit worker process on ``port``."""
+    env = dict(os.environ)
+    if metrics_port:
+        env[METRICS_PORT_ENV] = str(metrics_port)
+    return subprocess.Popen([
+        sys.executable, "-m", "streamlit", "run", app,
+        "--server.port", str(port),
+        "--server.address", "127.0.0.1",
+        "--server.headless", "true",
+        "--server.enableCORS", "false",
+        "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false"
+    ], env=env)
+
+
+class Worker:
+    """
+    One worker process and its routing state.
+
+    ``ready`` is set by the supervisor once the worker answers its health
+    check; the balancer only routes to ready workers. A worker that exits is
+    started again, immediately the first time and then with an exponential
+    backoff until it becomes healthy.
+    """
+
+    def __init__(self, index, port, spawn):
+        self.index = index
+        self.port = port
+        self.spawn = spawn
+        self.process = None
+        self.ready = False
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    def start(self):
+        self.process = self.spawn()
+        self.ready = False
+        print(f"🚀 Worker {self.index + 1} started on port {self.port} (pid {self.process.pid})")
+
+    def stop(self):
+        self.ready = False
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+
+def start_workers(app, workers, base_port, metrics_port=None):
+    """
+    Launch the Streamlit worker processes.
+
+    Args:
+        app: Streamlit script to run in each worker
+        workers: Number of worker processes
+        base_port: Port of the first worker; the rest use consecutive ports
+        metrics_port: Metrics port of the server process; worker N scrapes on metrics_port + N
+
+    Returns:
+        list: The started ``Worker`` objects (not yet ready)
+    """
+    started = []
+    for index in range(workers):
+        port = base_port + index
+        worker_metrics_port = metrics_port + index + 1 if metrics_port else None
+        worker = Worker(index, port, functools.partial(spawn_worker, app, port, worker_metrics_port))
+        worker.start()
+        started.append(worker)
+    return started
+
+
+async def check_health(port, timeout=HEALTH_TIMEOUT):
+    """Whether the worker on ``port`` answers its health endpoint with 200."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(f"GET {HEALTH_PATH} HTTP/1.0\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
+    return status.split(b" ")[1:2] == [b"200"]
+
+
+async def supervise_once(workers):
+    """Restart workers that exited and refresh the readiness of the others."""
+    now = time.monotonic()
+    checks = []
+    for worker in workers:
+        if worker.process is not None and worker.process.poll() is not None:
+            delay = min(RESTART_BACKOFF_MAX, 2.0 ** worker.restarts) if worker.restarts else 0.0
+            print(f"💥 Worker {worker.index + 1} exited with code {worker.process.returncode}; "
+                  f"restarting in {delay:.0f}s")
+            worker.process = None
+            worker.ready = False
+            worker.restarts += 1
+            worker.restart_at = now + delay
+        if worker.process is None:
+            if now >= worker.restart_at:
+                worker.start()
+            continue
+        checks.append(worker)
+    healthy = await asyncio.gather(*(check_health(worker.port) for worker in checks))
+    for worker, ready in zip(checks, healthy):
+        if ready and not worker.ready:
+            print(f"✅ Worker {worker.index + 1} on port {worker.port} is ready")
+            worker.restarts = 0
+        worker.ready = ready
+
+
+async def supervise(workers, interval=HEALTH_INTERVAL):
+    """Run ``supervise_once`` every ``interval`` seconds until cancelled."""
+    while True:
+        await supervise_once(workers)
+        await asyncio.sleep(interval)
+
+
+async def _pipe(reader, writer):
+    """Copy bytes from reader to writer until EOF."""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+def client_address(head, peer):
+    """
+    The address a connection is pinned by: the first ``X-Forwarded-For`` entry
+    of its request head (set by Render's proxy), else the connecting peer.
+    """
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"x-forwarded-for" and value.strip():
+            return value.split(b",")[0].strip().decode("latin-1")
+    return str(peer[0]) if peer else ""
+
+
+def pick_worker(workers, address):
+    """
+    The worker for a client address: a stable hash of the address over all
+    workers, moving on to the next ready worker while that one is not ready.
+    """
+    if not workers:
+        return None
+    start = zlib.crc32(address.encode("utf-8")) % len(workers)
+    for offset in range(len(workers)):
+        worker = workers[(start + offset) % len(workers)]
+        if worker.ready:
+            return worker
+    return None
+
+
+async def _read_head(reader):
+    """Read the request head (up to the blank line) without consuming anything after it."""
+    try:
+        return await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEAD_TIMEOUT)
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError:
+        return await reader.read(MAX_HEAD_BYTES)
+    except asyncio.TimeoutError:
+        return b""
+
+
+async def start_balancer(host, port, workers):
+    """
+    Listen on ``host:port`` and forward each connection to a ready worker.
+
+    Connections are pinned to a worker by client address (``pick_worker``),
+    so a browser's page loads and websocket reconnects reach the worker that
+    holds its ``st.session_state`` for as long as that worker stays up.
+    While no worker is ready, clients get a 503 with ``Retry-After``.
+
+    Returns:
+        asyncio.Server: The listening server
+    """
+    async def handle(client_reader, client_writer):
+        head = await _read_head(client_reader)
+        address = client_address(head, client_writer.get_extra_info("peername"))
+        for _ in range(len(workers)):
+            worker = pick_worker(workers, address)
+            if worker is None:
+                break
+            try:
+                backend_reader, backend_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+            except OSError:
+                worker.ready = False
+                continue
+            backend_writer.write(head)
+            await asyncio.gather(
+                _pipe(client_reader, backend_writer),
+                _pipe(backend_reader, client_writer)
+            )
+            return
+        try:
+            client_writer.write(UNAVAILABLE)
+            await client_writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            client_writer.close()
+
+    server = await asyncio.start_server(handle, host, port, limit=MAX_HEAD_BYTES)
+    print(f"⚖️  Balancer listening on {host}:{port} -> workers {[worker.port for worker in workers]}")
+    return server
+
+
+def parse_args(argv=None):
+    """Parse command line options, falling back to deployment env vars."""
+    parser = argparse.ArgumentParser(description="Run Wildlife Insight Agent with multiple workers.")
+    parser.add_argument("--app", default="app_production.py",
+                        help="Streamlit script to serve (default: app_production.py)")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="Number of Streamlit worker processes (default: $WEB_CONCURRENCY or CPU count)")
+    parser.add_argument("--host", default="0.0.0.0", help="Public address for the balancer")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8501)),
+                        help="Public port for the balancer (default: $PORT or 8501)")
+    parser.add_argument("--worker-base-port", type=int, default=9100,
+                        help="First local port used by workers (default: 9100)")
+    parser.add_argument("--cache-db", default=os.getenv(CACHE_DB_ENV, DEFAULT_CACHE_DB),
+                        help="Shared cache database path")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip cache warm-up on boot")
+    parser.add_argument("--warmup-budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Seconds the background boot warm-up may take (default: %(default)s)")
+    parser.add_argument("--warmup-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Concurrent warm-up jobs (default: %(default)s)")
+    parser.add_argument("--warmup-reports", action="store_true",
+                        help="Also pre-generate full reports for the featured species (uses the LLM)")
+    parser.add_argument("--habitat-refresh", type=float, default=24,
+                        help="Hours between habitat climate precomputations for popular species (0 disables)")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv(METRICS_PORT_ENV, 0)),
+                        help="Expose Prometheus metrics on this local port and the next one per worker (0 disables)")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    """
+    Bind the public port, then start the warm-up, scheduler and workers behind
+    it, and run until SIGTERM or SIGINT.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Not on the main thread or not supported (Windows); Ctrl+C still raises KeyboardInterrupt
+
+    workers = []
+    # Listen before anything slow so the platform's port check passes during boot
+    server = await start_balancer(args.host, args.port, workers)
+
+    if not args.no_warmup:
+        # Workers read whatever the warm-up has cached so far; nothing waits for it
+        print("🔥 Warming cache for featured species in the background...")
+        steps = DEFAULT_STEPS + (("report",) if args.warmup_reports else ())
+        threading.Thread(target=warm_cache, args=(steps, args.warmup_budget, args.warmup_concurrency),
+                         name="warmup", daemon=True).start()
+
+    if args.habitat_refresh > 0:
+        from tools.habitat_climate import HabitatClimateScheduler, popular_species
+        HabitatClimateScheduler(popular_species(FEATURED_SPECIES), args.habitat_refresh * 3600).start()
+
+    workers.extend(start_workers(args.app, max(1, args.workers), args.worker_base_port, args.metrics_port))
+    supervisor = asyncio.create_task(supervise(workers))
+    try:
+        await stop.wait()
+        print("\n👋 Shutting down Wildlife Insight Agent...")
+    finally:
+        supervisor.cancel()
+        server.close()
+        for worker in workers:
+            worker.stop()
+
+
+def main(argv=None):
+    """Prepare the shared cache and metrics, then serve until stopped."""
+    args = parse_args(argv)
+
+    # Workers inherit the environment, so they all open the same cache file
+    os.environ[CACHE_DB_ENV] = args.cache_db
+    SharedCache(args.cache_db).purge_expired()
+    print(f"🗄️  Shared cache: {args.cache_db}")
+
+    if args.metrics_port:
+        # Workers get their own ports from start_workers instead of inheriting this one
+        os.environ[METRICS_PORT_ENV] = str(args.metrics_port)
+        ensure_metrics_server()
+        print(f"📈 Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down Wildlife Insight Agent...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Unit tests for resumable batch runs.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from batch import BatchItem, BatchJournal, read_manifest, run_batch, main
+
+
+def _item(species, mode="fused", backend="stub", item_id=None):
+    return BatchItem(item_id or species, species, mode, backend)
+
+
+def _report(item):
+    return {"report": f"Report on {item.species}", "error": None, "tokens": {"total": {"llm_calls": 1}}}
+
+
+class TestBatch(unittest.TestCase):
+    """Test cases for the manifest, journal and run loop."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, "out", "results.jsonl")
+        self.journal = BatchJournal(os.path.join(self.directory, "journal.sqlite3"))
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _lines(self):
+        with open(self.output, encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle]
+
+    def test_reads_names_and_json_items(self):
+        """Test plain names, JSON objects, comments and resolved defaults."""
+        path = os.path.join(self.directory, "species.txt")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write("# nightly\nTiger\n\n{\"species\": \"Snow Leopard\", \"id\": \"sl-1\", \"mode\": \"crew\"}\n")
+        items = list(read_manifest(path, mode="fused", backend="stub"))
+        self.assertEqual(items, [BatchItem("tiger", "tiger", "fused", "stub"),
+                                 BatchItem("sl-1", "snow leopard", "crew", "stub")])
+
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write("{\"id\": 3}\n")
+        with self.assertRaisesRegex(ValueError, "species.txt:5"):
+            list(read_manifest(path, backend="stub"))
+
+    def test_runs_concurrently_and_streams_jsonl(self):
+        """Test that items overlap on the workers and each gets one output line."""
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def analyze(item):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return _report(item)
+
+        items = [_item(f"species {index}") for index in range(12)] + [_item("species 0")]
+        summary = run_batch(items, self.output, self.journal, workers=4, analyze=analyze)
+        self.assertEqual((summary["done"], summary["duplicate"]), (12, 1))
+        self.assertEqual(peak[0], 4)
+        lines = self._lines()
+        self.assertEqual(sorted(line["id"] for line in lines), sorted(f"species {index}" for index in range(12)))
+        self.assertEqual(lines[0]["status"], "ok")
+        self.assertIn("Report on", lines[0]["report"])
+        self.assertEqual(self.journal.counts()["done"], 12)
+
+    def test_resume_skips_unchanged_and_reruns_changed(self):
+        """Test that a second run only redoes items whose inputs changed."""
+        run_batch([_item("tiger"), _item("whale")], self.output, self.journal, analyze=_report)
+        calls = []
+        summary = run_batch([_item("tiger"), _item("whale", mode="crew")], self.output, self.journal,
+                            analyze=lambda item: calls.append(item.species) or _report(item))
+        self.assertEqual(calls, ["whale"])
+        self.assertEqual((summary["unchanged"], summary["done"]), (1, 1))
+        summary = run_batch([_item("tiger")], self.output, self.journal, force=True, analyze=_report)
+        self.assertEqual(summary["done"], 1)
+        self.assertEqual(len(self._lines()), 4)
+
+    def test_interrupted_items_are_resumed(self):
+        """Test that items left running by a crash are run again and the rest skipped."""
+        items = [_item("tiger"), _item("whale"), _item("elephant")]
+        run_batch(items[:1], self.output, self.journal, analyze=_report)
+        # Simulate a crash while "whale" was running
+        self.journal.start(items[1])
+
+        calls = []
+        summary = run_batch(items, self.output, self.journal,
+                            analyze=lambda item: calls.append(item.species) or _report(item))
+        self.assertEqual(summary["recovered"], 1)
+        self.assertEqual(sorted(calls), ["elephant", "whale"])
+        self.assertEqual(self.journal.entry("whale")["attempts"], 2)
+        self.assertEqual(self.journal.counts(), {"pending": 0, "running": 0, "done": 3, "failed": 0})
+
+    def test_failures_retried_until_max_attempts(self):
+        """Test that errors and exceptions are journaled, retried and finally given up."""
+        def fail(item):
+            raise RuntimeError("LLM unavailable")
+
+        for _ in range(2):
+            summary = run_batch([_item("tiger")], self.output, self.journal, max_attempts=2, analyze=fail)
+            self.assertEqual(summary["failed"], 1)
+        summary = run_batch([_item("tiger")], self.output, self.journal, max_attempts=2, analyze=fail)
+        self.assertEqual(summary["gave_up"], 1)
+        self.assertEqual(self.journal.entry("tiger")["error"], "LLM unavailable")
+        self.assertEqual([line["status"] for line in self._lines()], ["error", "error"])
+
+    def test_malformed_manifest_keeps_finished_items(self):
+        """Test that items submitted before a bad manifest line are still written and journaled."""
+        def items():
+            yield _item("tiger")
+            yield _item("whale")
+            raise ValueError("species.txt:3: invalid JSON")
+
+        with self.assertRaisesRegex(ValueError, "species.txt:3"):
+            run_batch(items(), self.output, self.journal, analyze=_report)
+        self.assertEqual(sorted(line["id"] for line in self._lines()), ["tiger", "whale"])
+        self.assertEqual(self.journal.counts()["done"], 2)
+
+    @patch('streamlit_utils.run_wildlife_analysis_streamlit')
+    def test_journal_follows_output(self, mock_analysis):
+        """Test that the default journal belongs to the output, so a new output reruns everything."""
+        mock_analysis.return_value = ("Report", {}, {}, {})
+        manifest = os.path.join(self.directory, "species.txt")
+        with open(manifest, "w", encoding="utf-8") as handle:
+            handle.write("tiger\nwhale\n")
+        argv = [manifest, "--mode", "fused", "--backend", "stub", "--output"]
+        self.assertEqual(main(argv + [self.output])["done"], 2)
+        self.assertEqual(main(argv + [self.output])["unchanged"], 2)
+        other = os.path.join(self.directory, "other.jsonl")
+        self.assertEqual(main(argv + [other])["done"], 2)
+        self.assertTrue(os.path.exists(other + ".journal.sqlite3"))
+
+    @patch('streamlit_utils.run_wildlife_analysis_streamlit')
+    def test_command_line(self, mock_analysis):
+        """Test the CLI end to end through the pipeline entry point."""
+        mock_analysis.side_effect = lambda species, mode=None, backend=None, row_id=None: (
+            f"Report on {species}" if species != "pug" else None,
+            {"tokens": {"total": {"llm_calls": 1}}} if species != "pug" else {"error": "Error executing crew"},
+            {}, {})
+        manifest = os.path.join(self.directory, "species.txt")
+        with open(manifest, "w", encoding="utf-8") as handle:
+            handle.write("tiger\nwhale\npug\n")
+        journal_path = os.path.join(self.directory, "cli.sqlite3")
+        argv = [manifest, "--output", self.output, "--journal", journal_path, "--workers", "2",
+                "--mode", "fused", "--backend", "stub"]
+        summary = main(argv)
+        self.assertEqual((summary["done"], summary["failed"]), (2, 1))
+        mock_analysis.assert_any_call("tiger", mode="fused", backend="stub",
+                                      row_id="tiger:" + _item("tiger").input_hash)
+        self.assertEqual(main(argv)["unchanged"], 2)
+        self.assertEqual(main([manifest, "--journal", journal_path, "--status"])["failed"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,364 @@
+"""
+Unit tests for the shared SQLite cache and its use by the MCP tools.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, Mock
+
+from tools import cache as cache_module
+from tools.cache import (
+    SharedCache, get_cache, cache_key, cached_call, freshness, cache_metrics, reset_cache_metrics,
+    wait_for_revalidations, Validated, NOT_MODIFIED
+)
+from tools.species_tool import fetch_species
+from tools.climate_tool import fetch_climate_data, fetch_climate_batch
+
+
+def _write_entry(path):
+    """Store an entry from a separate process."""
+    SharedCache(path).set("species", "tiger", {"count": 7})
+
+
+class TestSharedCache(unittest.TestCase):
+    """Test cases for the SharedCache store."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.sqlite3")
+        self.cache = SharedCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_and_get(self):
+        """Test that stored values round-trip."""
+        self.cache.set("species", "tiger", {"count": 3, "results": []})
+        self.assertEqual(self.cache.get("species", "tiger"), {"count": 3, "results": []})
+        self.assertIsNone(self.cache.get("climate", "tiger"))
+
+    def test_expired_entries_are_ignored(self):
+        """Test that entries past their TTL are treated as missing."""
+        self.cache.set("species", "tiger", {"count": 3}, ttl=-1)
+        self.assertIsNone(self.cache.get("species", "tiger"))
+        self.assertEqual(self.cache.purge_expired(), 1)
+
+    def test_clear_namespace(self):
+        """Test clearing a single namespace."""
+        self.cache.set("species", "tiger", 1)
+        self.cache.set("report", "tiger", "text")
+        self.cache.clear("species")
+        self.assertEqual(self.cache.stats(), {"report": 1})
+
+    def test_uses_wal_journal(self):
+        """Test that the database is opened in WAL mode for multi-process access."""
+        mode = self.cache._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_shared_between_processes(self):
+        """Test that an entry written by another process is visible."""
+        process = multiprocessing.Process(target=_write_entry, args=(self.path,))
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get("species", "tiger"), {"count": 7})
+
+    def test_validators_survive_expiry_and_touch_extends(self):
+        """Test that validators are kept with expired entries and a touch makes them live again."""
+        self.cache.set("species", "tiger", {"count": 3}, ttl=-1, validators={"etag": '"v1"', "size": 10})
+        self.assertIsNone(self.cache.get("species", "tiger"))
+        self.assertEqual(self.cache.get_stored("species", "tiger"), ('{"count":3}', {"etag": '"v1"', "size": 10}))
+        self.assertTrue(self.cache.touch("species", "tiger", ttl=60))
+        self.assertEqual(self.cache.get("species", "tiger"), {"count": 3})
+        self.assertFalse(self.cache.touch("species", "lion", ttl=60))
+
+    def test_adds_validators_column_to_old_databases(self):
+        """Test that caches created before validators were stored keep working."""
+        import sqlite3
+        path = os.path.join(self.directory, "old.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE cache_entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                     "stored_at REAL NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))")
+        conn.close()
+        old = SharedCache(path)
+        old.set("species", "tiger", {"count": 1}, validators={"etag": '"v1"'})
+        self.assertEqual(old.get_stored("species", "tiger")[1], {"etag": '"v1"'})
+
+    def test_cache_key_normalizes_queries(self):
+        """Test that case and whitespace differences share a key."""
+        self.assertEqual(cache_key("  Polar   Bear "), "polar bear")
+
+
+class TestToolCaching(unittest.TestCase):
+    """Test cases for cached MCP tool responses."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "cache.sqlite3")
+        self.env = patch.dict(os.environ, {cache_module.CACHE_DB_ENV: path})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        cache_module._cache_instance = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_cache_disabled_without_env(self):
+        """Test that caching is off when no database is configured."""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(get_cache())
+
+    @patch('tools.species_tool.requests.get')
+    def test_species_served_from_cache(self, mock_get):
+        """Test that a second species lookup does not call the API."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"results": [], "count": 5}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+
+        first = fetch_species("Tiger")
+        second = fetch_species("tiger")
+
+        self.assertEqual(first, second)
+        mock_get.assert_called_once()
+
+    @patch('tools.climate_tool.requests.get')
+    def test_errors_are_not_cached(self, mock_get):
+        """Test that failed climate lookups are retried on the next call."""
+        import requests
+        mock_get.side_effect = requests.exceptions.Timeout("Request timed out")
+
+        fetch_climate_data("New York")
+        fetch_climate_data("New York")
+
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    """Test cases for serving stale entries while refreshing them in the background."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "cache.sqlite3")
+        self.env = patch.dict(os.environ, {cache_module.CACHE_DB_ENV: path})
+        self.env.start()
+        reset_cache_metrics()
+
+    def tearDown(self):
+        wait_for_revalidations(timeout=5)
+        self.env.stop()
+        cache_module._cache_instance = None
+        reset_cache_metrics()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_freshness_override(self):
+        """Test per-namespace windows from the environment."""
+        self.assertEqual(freshness("species", 10, 20), (10, 20))
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_SPECIES": "5:50"}):
+            self.assertEqual(freshness("species", 10, 20), (5.0, 50.0))
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_SPECIES": "5"}):
+            self.assertEqual(freshness("species", 10, 20), (5.0, 20))
+
+    def test_refresh_lease_is_exclusive(self):
+        """Test that only one caller at a time may refresh an entry."""
+        cache = get_cache()
+        self.assertTrue(cache.claim_refresh("species", "tiger"))
+        self.assertFalse(SharedCache(cache.path).claim_refresh("species", "tiger"))
+        cache.release_refresh("species", "tiger")
+        self.assertTrue(cache.claim_refresh("species", "tiger"))
+        self.assertTrue(cache.claim_refresh("species", "lion"))
+
+    @patch('tools.species_tool.requests.get')
+    def test_stale_species_served_then_refreshed(self, mock_get):
+        """Test that a stale entry is returned at once and replaced in the background."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"results": [], "count": 5}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_SPECIES": "0:3600"}):
+            fetch_species("tiger")
+            mock_response.json.return_value = {"results": [], "count": 6}
+            self.assertEqual(fetch_species("tiger")["count"], 5)
+            wait_for_revalidations(timeout=5)
+            self.assertEqual(fetch_species("tiger")["count"], 6)
+            wait_for_revalidations(timeout=5)
+
+        self.assertEqual(mock_get.call_count, 3)
+        metrics = cache_metrics()["species"]
+        self.assertEqual((metrics["misses"], metrics["stale_served"]), (1, 2))
+        self.assertGreaterEqual(metrics["revalidations"], 1)
+        self.assertGreater(metrics["revalidation_seconds"], 0)
+
+    def test_one_refresh_per_key(self):
+        """Test that concurrent stale reads schedule a single background refresh."""
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"count": len(calls)}
+
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_TEST": "0:3600"}):
+            cached_call("test", "tiger", lambda: {"count": 0}, 60)
+            readers = [threading.Thread(target=cached_call, args=("test", "tiger", slow_fetch, 60))
+                       for _ in range(8)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(5)
+            release.set()
+            wait_for_revalidations(timeout=5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache_metrics()["test"]["stale_served"], 8)
+
+    def test_failed_refresh_keeps_stale_entry(self):
+        """Test that an error result does not replace the stale value."""
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_TEST": "0:3600"}):
+            cached_call("test", "tiger", lambda: {"count": 1}, 60)
+            cached_call("test", "tiger", lambda: {"error": "timeout"}, 60)
+            wait_for_revalidations(timeout=5)
+            self.assertEqual(cached_call("test", "tiger", lambda: {"count": 2}, 60), {"count": 1})
+        self.assertEqual(cache_metrics()["test"]["revalidation_failures"], 1)
+
+    @patch('tools.climate_tool.requests.get')
+    def test_stale_climate_refreshed_in_background(self, mock_get):
+        """Test stale-while-revalidate for the batched climate lookups."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"current_weather": {"temperature": 15.0}, "daily": {}}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_CLIMATE": "0:60"}):
+            fetch_climate_data("New York")
+            mock_response.json.return_value = {"current_weather": {"temperature": 20.0}, "daily": {}}
+            self.assertEqual(fetch_climate_data("New York")["current_weather"]["temperature"], 15.0)
+            wait_for_revalidations(timeout=5)
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_CLIMATE": "3600:60"}):
+            self.assertEqual(fetch_climate_data("New York")["current_weather"]["temperature"], 20.0)
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(cache_metrics()["climate"]["fresh_hits"], 1)
+
+
+def _response(status_code=200, body=None, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    # Real JSON padded to 1500 bytes, the size a 304 saves downloading again
+    response.content = json.dumps(body).encode().ljust(1500) if body is not None else b""
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestConditionalRevalidation(unittest.TestCase):
+    """Test cases for ETag / Last-Modified revalidation of cached responses."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "cache.sqlite3")
+        self.env = patch.dict(os.environ, {cache_module.CACHE_DB_ENV: path})
+        self.env.start()
+        reset_cache_metrics()
+
+    def tearDown(self):
+        wait_for_revalidations(timeout=5)
+        self.env.stop()
+        cache_module._cache_instance = None
+        reset_cache_metrics()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @patch('tools.species_tool.requests.get')
+    def test_species_not_modified_extends_entry(self, mock_get):
+        """Test that a stale species entry is revalidated with If-None-Match and kept on 304."""
+        mock_get.return_value = _response(body={"results": [], "count": 5}, headers={"ETag": '"gbif-1"'})
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_SPECIES": "0:3600"}):
+            fetch_species("tiger")
+            self.assertNotIn("headers", mock_get.call_args[1])
+            first_stored_at = get_cache().get_entry("species", "tiger")[1]
+            mock_get.return_value = _response(status_code=304)
+            self.assertEqual(fetch_species("tiger")["count"], 5)
+            wait_for_revalidations(timeout=5)
+
+        self.assertEqual(mock_get.call_args[1]["headers"], {"If-None-Match": '"gbif-1"'})
+        self.assertGreater(get_cache().get_entry("species", "tiger")[1], first_stored_at)
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_SPECIES": "3600:3600"}):
+            self.assertEqual(fetch_species("tiger")["count"], 5)
+        self.assertEqual(mock_get.call_count, 2)
+        metrics = cache_metrics()["species"]
+        self.assertEqual((metrics["not_modified"], metrics["bytes_saved"], metrics["bytes_fetched"]), (1, 1500, 1500))
+        self.assertEqual(metrics["fresh_hits"], 1)
+
+    @patch('tools.climate_tool.requests.get')
+    def test_climate_revalidated_with_last_modified(self, mock_get):
+        """Test that stale climate entries send If-Modified-Since and keep the stored body on 304."""
+        mock_get.return_value = _response(body={"current_weather": {"temperature": 15.0}, "daily": {}},
+                                          headers={"Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT"})
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_CLIMATE": "0:60"}):
+            fetch_climate_data("New York")
+            mock_get.return_value = _response(status_code=304)
+            fetch_climate_data("New York")
+            wait_for_revalidations(timeout=5)
+        self.assertEqual(mock_get.call_args[1]["headers"], {"If-Modified-Since": "Mon, 19 Oct 2026 10:00:00 GMT"})
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_CLIMATE": "3600:60"}):
+            self.assertEqual(fetch_climate_data("New York")["current_weather"]["temperature"], 15.0)
+        self.assertEqual(cache_metrics()["climate"]["not_modified"], 1)
+
+    def test_expired_entry_revalidated_inline(self):
+        """Test that a miss on an expired entry is answered from it after a 304."""
+        seen = []
+
+        def fetch(validators):
+            seen.append(validators)
+            return Validated({"count": 1}, {"etag": '"a"', "size": 200}) if validators is None else NOT_MODIFIED
+
+        self.assertEqual(cached_call("test", "tiger", fetch, -1, conditional=True), {"count": 1})
+        self.assertEqual(cached_call("test", "tiger", fetch, 60, conditional=True), {"count": 1})
+        self.assertEqual(seen, [None, {"etag": '"a"', "size": 200}])
+        self.assertEqual(get_cache().get("test", "tiger"), {"count": 1})
+        self.assertEqual(cache_metrics()["test"]["bytes_saved"], 200)
+
+    def test_entry_deleted_before_not_modified(self):
+        """Test that a 304 for an entry deleted meanwhile is followed by one unconditional fetch."""
+        seen = []
+
+        def fetch(validators):
+            seen.append(validators)
+            if validators is None:
+                return Validated({"count": len(seen)}, {"etag": '"a"', "size": 200})
+            # Another process purges the entry while the conditional request is in flight
+            get_cache().delete("test", "tiger")
+            return NOT_MODIFIED
+
+        cached_call("test", "tiger", fetch, -1, conditional=True)
+        self.assertEqual(cached_call("test", "tiger", fetch, 60, conditional=True), {"count": 3})
+        self.assertEqual(seen, [None, {"etag": '"a"', "size": 200}, None])
+        self.assertEqual(get_cache().get("test", "tiger"), {"count": 3})
+
+    @patch('tools.climate_tool.requests.get')
+    def test_expired_climate_batch_entries_revalidated(self, mock_get):
+        """Test that expired coordinates with validators are revalidated alone and the rest batched."""
+        mock_get.return_value = _response(body={"current_weather": {"temperature": 15.0}, "daily": {}},
+                                          headers={"ETag": '"om-1"'})
+        with patch.dict(os.environ, {"WILDLIFE_FRESHNESS_CLIMATE": "0:0"}):
+            fetch_climate_batch([(40.71, -74.01)])
+            mock_get.reset_mock()
+            mock_get.side_effect = lambda url, **kwargs: _response(status_code=304) if kwargs.get("headers") \
+                else _response(body=[{"current_weather": {"temperature": 1.0}, "daily": {}}] * 2)
+            results = fetch_climate_batch([(40.71, -74.01), (51.5, -0.13), (48.86, 2.35)])
+
+        self.assertEqual([result["current_weather"]["temperature"] for result in results], [15.0, 1.0, 1.0])
+        conditional = [call for call in mock_get.call_args_list if call[1].get("headers")]
+        self.assertEqual(len(conditional), 1)
+        self.assertEqual(conditional[0][1]["headers"], {"If-None-Match": '"om-1"'})
+        self.assertIn("latitude=51.5,48.86", mock_get.call_args_list[-1][0][0])
+        self.assertEqual(cache_metrics()["climate"]["not_modified"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Unit tests for cached Plotly figure construction.
+"""
+import unittest
+from unittest.mock import patch
+
+import charts
+from charts import dataset_hash, kingdom_counts, species_count_figure, kingdom_pie_figure, temperature_figure
+
+
+class TestFigureCache(unittest.TestCase):
+    """Test cases for the dataset-keyed figure cache."""
+
+    def setUp(self):
+        charts.clear_figure_cache()
+
+    def test_dataset_hash_is_stable(self):
+        """Test that equal datasets hash equally regardless of key order."""
+        self.assertEqual(dataset_hash({"a": 1, "b": 2}), dataset_hash({"b": 2, "a": 1}))
+        self.assertNotEqual(dataset_hash({"a": 1}), dataset_hash({"a": 2}))
+
+    def test_kingdom_counts(self):
+        """Test the kingdom breakdown over the first results."""
+        results = [{"kingdom": "Animalia"}, {"kingdom": "Animalia"}, {}]
+        self.assertEqual(kingdom_counts(results), {"Animalia": 2, "Unknown": 1})
+
+    def test_pie_is_built_once_per_dataset(self):
+        """Test that reruns reuse the serialized figure instead of calling plotly.express."""
+        with patch('charts.px.pie', wraps=charts.px.pie) as mock_pie:
+            first = kingdom_pie_figure("hash-1", {"Animalia": 3, "Plantae": 1})
+            second = kingdom_pie_figure("hash-1", {"Animalia": 3, "Plantae": 1})
+            kingdom_pie_figure("hash-2", {"Animalia": 1})
+
+        self.assertEqual(mock_pie.call_count, 2)
+        self.assertEqual(first.to_plotly_json(), second.to_plotly_json())
+        self.assertEqual(first.data[0].type, "pie")
+
+    def test_cached_figures_keep_layout(self):
+        """Test that titles and heights survive the JSON round trip."""
+        fig = species_count_figure("hash-1", "tiger", 42)
+        self.assertEqual(fig.layout.title.text, "Species Records Found")
+        self.assertEqual(fig.layout.height, 400)
+        self.assertEqual(list(fig.data[0].y), [42])
+
+        fig_temp = temperature_figure("hash-1", [20.5, 21.0])
+        self.assertEqual(list(fig_temp.data[0].x), ["Day 1", "Day 2"])
+
+    def test_cache_is_bounded(self):
+        """Test that the least recently used figures are evicted."""
+        with patch('charts.FIGURE_CACHE_SIZE', 2):
+            for index in range(4):
+                species_count_figure(f"hash-{index}", "tiger", index)
+        self.assertEqual(len(charts._figure_cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
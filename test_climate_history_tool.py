@@ -0,0 +1,159 @@
+"""
+Unit tests for the historical climate MCP tool with a mocked archive API.
+"""
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch, Mock
+
+import numpy as np
+import requests
+
+from tools import cache as cache_module
+from tools import climate_history_tool
+from tools.climate_history_tool import (
+    ClimateHistory, load_climate_history, fetch_climate_history, DAILY_VARIABLES
+)
+
+
+def _archive_response(url, params=None, timeout=None, missing_after=None):
+    """Fake archive API: a seasonal cycle plus 0.1 °C warming per year."""
+    start = date.fromisoformat(params["start_date"])
+    end = date.fromisoformat(params["end_date"])
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    mean = [None if missing_after and day > missing_after else
+            round(10 + 10 * math.sin(2 * math.pi * day.timetuple().tm_yday / 365) + 0.1 * (day.year - 2000), 2)
+            for day in days]
+    daily = {"time": [day.isoformat() for day in days], "temperature_2m_mean": mean,
+             "temperature_2m_max": [None if value is None else value + 5 for value in mean],
+             "temperature_2m_min": [None if value is None else value - 5 for value in mean],
+             "precipitation_sum": [None if value is None else 1.0 for value in mean]}
+    response = Mock()
+    response.json.return_value = {"latitude": params["latitude"], "longitude": params["longitude"], "daily": daily}
+    response.raise_for_status.return_value = None
+    return response
+
+
+def _history(values, start="2020-01-01"):
+    dates = np.arange(np.datetime64(start), np.datetime64(start) + len(values))
+    return ClimateHistory(40.71, -74.01, dates, {"temperature_2m_mean": np.array(values, dtype=np.float64)})
+
+
+class TestClimateHistoryComputations(unittest.TestCase):
+    """Test cases for the vectorized series computations."""
+
+    def test_rolling_mean_skips_missing_values(self):
+        """Test the trailing mean against a plain Python computation."""
+        values = [1.0, 2.0, float("nan"), 4.0, 5.0, 6.0]
+        result = _history(values).rolling_mean("temperature_2m_mean", window=3, min_periods=2)
+        expected = [float("nan"), 1.5, 1.5, 3.0, 4.5, 5.0]
+        np.testing.assert_allclose(result, expected)
+
+    def test_anomalies_against_day_of_year_climatology(self):
+        """Test that each day is compared with the same calendar day in other years."""
+        # 2020 is a leap year; 2021 has the same values shifted up by 2
+        first = [float(i % 365) for i in range(366)]
+        second = [value + 2 for value in first[:365]]
+        history = _history(first + second)
+        anomalies = history.anomalies("temperature_2m_mean")
+        self.assertEqual(len(history.climatology("temperature_2m_mean")), 365)
+        self.assertAlmostEqual(float(anomalies[0]), -1.0)
+        self.assertAlmostEqual(float(anomalies[366]), 1.0)
+        baseline = history.anomalies("temperature_2m_mean", baseline=(2020, 2020))
+        self.assertAlmostEqual(float(baseline[366]), 2.0)
+
+    def test_annual_means_and_trend(self):
+        """Test per-year means and the decadal trend in the summary."""
+        dates = np.arange(np.datetime64("2010-01-01"), np.datetime64("2020-01-01"))
+        years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        history = ClimateHistory(0.0, 0.0, dates, {"temperature_2m_mean": (years - 2010) * 0.2})
+        years_out, means = history.annual_means("temperature_2m_mean")
+        self.assertEqual(list(years_out), list(range(2010, 2020)))
+        np.testing.assert_allclose(means, np.arange(10) * 0.2, atol=1e-9)
+        summary = history.summary()
+        self.assertAlmostEqual(summary["variables"]["temperature_2m_mean"]["trend_per_decade"], 2.0, places=1)
+        self.assertEqual(summary["days"], len(dates))
+
+
+class TestClimateHistoryCaching(unittest.TestCase):
+    """Test cases for chunked, incremental archive fetching."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "cache.sqlite3")
+        self.env = patch.dict(os.environ, {cache_module.CACHE_DB_ENV: path})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        cache_module._cache_instance = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @patch('tools.climate_history_tool.requests.get', side_effect=_archive_response)
+    def test_consecutive_years_share_requests(self, mock_get):
+        """Test that missing years are grouped and the series is contiguous."""
+        history = load_climate_history("New York", date(2010, 1, 1), today=date(2024, 6, 15))
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(str(history.dates[0]), "2010-01-01")
+        self.assertEqual(str(history.dates[-1]), "2024-06-10")
+        self.assertTrue(np.all(np.diff(history.dates).astype(int) == 1))
+        self.assertEqual(set(history.variables), set(DAILY_VARIABLES))
+
+    @patch('tools.climate_history_tool.requests.get', side_effect=_archive_response)
+    def test_past_years_cached_and_recent_days_fetched_incrementally(self, mock_get):
+        """Test that a later refresh only requests the newly published days."""
+        load_climate_history("New York", date(2020, 1, 1), today=date(2024, 6, 15))
+        mock_get.reset_mock()
+
+        load_climate_history("New York", date(2020, 1, 1), today=date(2024, 6, 15))
+        mock_get.assert_not_called()
+
+        with patch.object(climate_history_tool, "RECENT_REFRESH_SECONDS", 0):
+            history = load_climate_history("New York", date(2020, 1, 1), today=date(2024, 6, 25))
+        mock_get.assert_called_once()
+        params = mock_get.call_args.kwargs["params"]
+        self.assertEqual((params["start_date"], params["end_date"]), ("2024-06-11", "2024-06-20"))
+        self.assertEqual(str(history.dates[-1]), "2024-06-20")
+        self.assertTrue(np.all(np.diff(history.dates).astype(int) == 1))
+
+    def test_unfilled_days_are_requested_again(self):
+        """Test that trailing days the archive has not filled yet are not cached."""
+        lagging = lambda url, params=None, timeout=None: _archive_response(
+            url, params, timeout, missing_after=date(2024, 6, 5))
+        with patch('tools.climate_history_tool.requests.get', side_effect=lagging):
+            load_climate_history("New York", date(2024, 1, 1), today=date(2024, 6, 15))
+        with patch.object(climate_history_tool, "RECENT_REFRESH_SECONDS", 0), \
+                patch('tools.climate_history_tool.requests.get', side_effect=_archive_response) as mock_get:
+            history = load_climate_history("New York", date(2024, 1, 1), today=date(2024, 6, 15))
+        self.assertEqual(mock_get.call_args.kwargs["params"]["start_date"], "2024-06-06")
+        self.assertTrue(np.isfinite(history.variables["temperature_2m_mean"]).all())
+
+    @patch('tools.climate_history_tool.requests.get')
+    def test_fetch_climate_history_timeout(self, mock_get):
+        """Test that request failures become error results."""
+        mock_get.side_effect = requests.exceptions.Timeout("Request timed out")
+        result = fetch_climate_history("New York", today=date(2024, 6, 15))
+        self.assertIn("timeout", result["error"].lower())
+        self.assertEqual(result["days"], 0)
+
+
+class TestClimateHistoryTool(unittest.TestCase):
+    """Test cases for the MCP tool without a cache."""
+
+    @patch('tools.climate_history_tool.requests.get', side_effect=_archive_response)
+    def test_summary_without_cache(self, mock_get):
+        """Test the summary returned to the agents."""
+        with patch.dict(os.environ, {}, clear=True):
+            result = fetch_climate_history("New York", years=5, today=date(2024, 6, 15))
+        mean = result["variables"]["temperature_2m_mean"]
+        self.assertEqual(result["start"], "2019-01-01")
+        self.assertAlmostEqual(mean["trend_per_decade"], 1.0, places=1)
+        self.assertEqual(sorted(mean["annual_means"]), list(range(2019, 2025)))
+        self.assertNotIn("error", result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+Unit tests for the fused (single LLM call) pipeline mode.
+"""
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+from fused_pipeline import pipeline_mode, parse_response, run_fused_analysis, PIPELINE_MODE_ENV, FUSED_STAGE
+
+SPECIES = {"count": 2, "results": [{"scientificName": "Panthera tigris", "kingdom": "Animalia"}]}
+CLIMATE = {"current_weather": {"temperature": 18.5}}
+HISTORY = {"years": 10, "annual_mean_temperature": 12.9}
+DISTRIBUTION = {"records_binned": 40, "top_cells": [{"lat": 22.5, "lon": 79.5, "count": 30}]}
+ANSWER = '```json\n{"analysis": {"conservation_status": "Endangered"}, "report": "# Tigers\\nBig cats."}\n```'
+
+
+class FakeLLM:
+    """Records the messages of each call and returns a fixed answer."""
+
+    def __init__(self, answer=ANSWER):
+        self.answer = answer
+        self.calls = []
+
+    def call(self, messages):
+        self.calls.append(messages)
+        return self.answer
+
+
+def _patch_tools(test):
+    for target, value in (('tools.species_tool.fetch_species', SPECIES),
+                          ('tools.climate_tool.fetch_climate_data', CLIMATE),
+                          ('tools.climate_history_tool.fetch_climate_history', HISTORY),
+                          ('tools.occurrence_tool.fetch_occurrence_distribution', DISTRIBUTION),
+                          ('tools.habitat_climate.get_habitat_summary', None)):
+        patcher = patch(target, return_value=value)
+        test.addCleanup(patcher.stop)
+        setattr(test, "mock_" + target.rsplit(".", 1)[1], patcher.start())
+
+
+class TestPipelineMode(unittest.TestCase):
+    """Test cases for mode selection and response parsing."""
+
+    def test_mode_resolution(self):
+        """Test the per-request argument, the env default and validation."""
+        with patch.dict(os.environ, {PIPELINE_MODE_ENV: ""}):
+            self.assertEqual(pipeline_mode(), "crew")
+            self.assertEqual(pipeline_mode("Fused"), "fused")
+        with patch.dict(os.environ, {PIPELINE_MODE_ENV: "fused"}):
+            self.assertEqual(pipeline_mode(), "fused")
+            self.assertEqual(pipeline_mode("crew"), "crew")
+        with self.assertRaises(ValueError):
+            pipeline_mode("swarm")
+
+    def test_parse_response(self):
+        """Test structured answers, fenced JSON and plain-text fallbacks."""
+        analysis, report = parse_response(ANSWER)
+        self.assertEqual(analysis, {"conservation_status": "Endangered"})
+        self.assertEqual(report, "# Tigers\nBig cats.")
+        self.assertEqual(parse_response("Tigers are big cats. {not json}"), (None, "Tigers are big cats. {not json}"))
+        self.assertEqual(parse_response('{"report": "Only a report", "analysis": "text"}'), (None, "Only a report"))
+
+
+class TestFusedAnalysis(unittest.TestCase):
+    """Test cases for run_fused_analysis."""
+
+    def setUp(self):
+        _patch_tools(self)
+
+    def test_one_llm_call_over_prefetched_data(self):
+        """Test that the tools run directly and the model is called once with their data."""
+        llm = FakeLLM()
+        progress = []
+        fused = run_fused_analysis("tiger", llm, progress_callback=lambda *update: progress.append(update))
+
+        self.assertEqual(len(llm.calls), 1)
+        prompt = llm.calls[0][1]["content"]
+        self.assertIn("Panthera tigris", prompt)
+        self.assertIn("18.5", prompt)
+        self.assertIn("'tiger'", prompt)
+        self.mock_fetch_species.assert_called_once_with("tiger")
+        self.mock_fetch_climate_data.assert_called_once_with("New York")
+
+        self.assertEqual(fused["report"], "# Tigers\nBig cats.")
+        self.assertEqual(fused["analysis"]["conservation_status"], "Endangered")
+        self.assertIs(fused["inputs"]["species"], SPECIES)
+        self.assertEqual(fused["tokens"][FUSED_STAGE]["llm_calls"], 1)
+        self.assertGreater(fused["tokens"][FUSED_STAGE]["prompt_tokens"], 0)
+        self.assertEqual([update[0] for update in progress], [20, 60, 100])
+
+    def test_prefetched_distribution_reused(self):
+        """Test that a distribution passed in is not fetched again."""
+        run_fused_analysis("tiger", FakeLLM(), distribution=DISTRIBUTION)
+        self.mock_fetch_occurrence_distribution.assert_not_called()
+
+    def test_tool_data_fits_context_budget(self):
+        """Test that large tool responses are shrunk to the budget."""
+        self.mock_fetch_species.return_value = {"count": 500, "results": [
+            {"scientificName": f"Panthera tigris {index}", "remarks": "x" * 100} for index in range(500)]}
+        llm = FakeLLM()
+        fused = run_fused_analysis("tiger", llm, context_tokens=800)
+        stage = fused["tokens"][FUSED_STAGE]
+        self.assertLess(stage["context_tokens_out"], stage["context_tokens_in"])
+        self.assertLessEqual(stage["context_tokens_out"], 800)
+
+
+class TestStreamlitFusedMode(unittest.TestCase):
+    """Test cases for the fused branch of run_wildlife_analysis_streamlit."""
+
+    def setUp(self):
+        _patch_tools(self)
+
+    @patch('streamlit_utils.create_llm')
+    @patch('streamlit_utils.get_cache')
+    def test_fused_mode_selected_per_request(self, mock_get_cache, mock_create_llm):
+        """Test that mode="fused" skips the crew and caches under its own key."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        cache = MagicMock()
+        cache.get.return_value = None
+        mock_get_cache.return_value = cache
+        mock_create_llm.return_value = FakeLLM()
+
+        with patch('crewai.Crew') as mock_crew:
+            result, logs, species_data, climate_data = run_wildlife_analysis_streamlit("tiger", mode="fused",
+                                                                                       backend="gemini")
+        mock_crew.assert_not_called()
+        self.assertEqual(result, "# Tigers\nBig cats.")
+        self.assertEqual(logs["mode"], "fused")
+        self.assertEqual(logs["tokens"][FUSED_STAGE]["llm_calls"], 1)
+        self.assertIs(species_data, SPECIES)
+        self.assertIs(climate_data, CLIMATE)
+        cache.get.assert_called_once_with("report", "tiger|fused|gemini")
+        self.assertEqual(cache.set.call_args[0][:3], ("report", "tiger|fused|gemini", "# Tigers\nBig cats."))
+
+    @patch('streamlit_utils.get_cache')
+    def test_cached_report_logs_its_backend(self, mock_get_cache):
+        """Test that a report served from the cache still records the mode and backend it was made with."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        mock_get_cache.return_value.get.return_value = "# Cached"
+        result, logs, _species, _climate = run_wildlife_analysis_streamlit("tiger", mode="fused", backend="crewai")
+        self.assertEqual(result, "# Cached")
+        self.assertEqual((logs["cached"], logs["mode"], logs["backend"]), (True, "fused", "crewai"))
+
+    @patch('streamlit_utils.create_llm')
+    @patch('streamlit_utils.get_cache')
+    def test_reports_cached_per_backend_except_stub(self, mock_get_cache, mock_create_llm):
+        """Test that backends never share reports and stub reports never reach the cache."""
+        from streamlit_utils import report_cache_key, run_wildlife_analysis_streamlit
+        self.assertEqual(report_cache_key("Tiger ", "crew", "crewai"), "tiger|crew|crewai")
+        self.assertNotEqual(report_cache_key("tiger", "crew", "gemini"), report_cache_key("tiger", "crew", "crewai"))
+        self.assertIsNone(report_cache_key("tiger", "crew", "stub"))
+        self.assertIsNone(report_cache_key("tiger", "crew", "gemeni"))
+
+        mock_create_llm.return_value = FakeLLM()
+        result, logs, _species, _climate = run_wildlife_analysis_streamlit("tiger", mode="fused", backend="stub")
+        self.assertEqual((result, logs["backend"]), ("# Tigers\nBig cats.", "stub"))
+        mock_get_cache.assert_not_called()
+
+    @patch('streamlit_utils.export_analysis')
+    @patch('streamlit_utils.create_llm')
+    @patch('streamlit_utils.get_cache', return_value=None)
+    def test_fused_failure_exported_with_gathered_inputs(self, mock_get_cache, mock_create_llm, mock_export):
+        """Test that a failed LLM call is archived and returns the inputs without fetching them again."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        llm = MagicMock()
+        llm.call.side_effect = RuntimeError("quota exceeded")
+        mock_create_llm.return_value = llm
+
+        result, logs, species_data, climate_data = run_wildlife_analysis_streamlit("tiger", mode="fused",
+                                                                                   backend="stub")
+        self.assertIsNone(result)
+        self.assertEqual((logs["mode"], logs["backend"]), ("fused", "stub"))
+        self.assertIn("quota exceeded", logs["error"])
+        self.assertIs(species_data, SPECIES)
+        self.assertIs(climate_data, CLIMATE)
+        self.mock_fetch_species.assert_called_once_with("tiger")
+        kwargs = mock_export.call_args[1]
+        self.assertEqual((kwargs["error"], kwargs["species_data"], kwargs["mode"]), (logs["error"], SPECIES, "fused"))
+        self.assertEqual(kwargs["row_id"], "tiger|fused|stub")
+
+    @patch('streamlit_utils.get_cache', return_value=None)
+    def test_unknown_backend_is_an_error_result(self, mock_get_cache):
+        """Test that a misspelled backend comes back as an error instead of raising."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        result, logs, species_data, _climate = run_wildlife_analysis_streamlit("tiger", mode="fused",
+                                                                               backend="gemeni")
+        self.assertIsNone(result)
+        self.assertIn("Unknown LLM backend", logs["error"])
+        self.assertIsNone(species_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
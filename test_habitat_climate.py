@@ -0,0 +1,102 @@
+"""
+Unit tests for precomputed habitat climate summaries and their scheduler.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from tools import cache as cache_module
+from tools.habitat_climate import (
+    HabitatClimateScheduler, compute_habitat_summary, get_habitat_summary, habitat_context,
+    habitat_regions, popular_species, POPULAR_SPECIES_ENV
+)
+from test_climate_history_tool import _archive_response
+
+DISTRIBUTION = {
+    "records_binned": 400,
+    "taxonKey": 5219416,
+    "top_cells": [
+        {"lat": 26.5, "lon": 80.5, "count": 300},
+        {"lat": 22.5, "lon": 88.5, "count": 100},
+        {"lat": 50.5, "lon": 135.5, "count": 5},
+    ]
+}
+
+
+class TestHabitatSummary(unittest.TestCase):
+    """Test cases for computing and reading habitat summaries."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "cache.sqlite3")
+        self.env = patch.dict(os.environ, {cache_module.CACHE_DB_ENV: path})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        cache_module._cache_instance = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_regions_are_densest_cells(self):
+        """Test that regions carry their share of the selected occurrences."""
+        regions = habitat_regions(DISTRIBUTION, regions=2)
+        self.assertEqual([(region["lat"], region["share"]) for region in regions], [(26.5, 0.75), (22.5, 0.25)])
+
+    @patch('tools.climate_history_tool.requests.get', side_effect=_archive_response)
+    @patch('tools.habitat_climate.fetch_occurrence_distribution', return_value=DISTRIBUTION)
+    def test_summary_weights_regions(self, mock_distribution, mock_get):
+        """Test that the habitat statistics are occurrence-weighted regional values."""
+        summary = compute_habitat_summary("tiger", regions=2, years=3, today=date(2024, 6, 15))
+        self.assertEqual(len(summary["regions"]), 2)
+        first, second = (region["climate"]["temperature_2m_mean"]["mean"] for region in summary["regions"])
+        self.assertAlmostEqual(summary["habitat"]["temperature_2m_mean"]["mean"],
+                               0.75 * first + 0.25 * second, places=3)
+        self.assertIsNotNone(summary["habitat"]["temperature_2m_mean"]["trend_per_decade"])
+        # One archive request per region covers all four years
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('tools.habitat_climate.fetch_occurrence_distribution', return_value={"error": "No GBIF taxon", "top_cells": []})
+    def test_errors_are_reported_and_not_stored(self, mock_distribution):
+        """Test that a failed precomputation leaves no summary behind."""
+        scheduler = HabitatClimateScheduler(["unicorn"])
+        self.assertEqual(scheduler.run_once(), {"unicorn": "No GBIF taxon"})
+        self.assertIsNone(get_habitat_summary("unicorn"))
+
+    @patch('tools.climate_history_tool.requests.get', side_effect=_archive_response)
+    @patch('tools.habitat_climate.fetch_occurrence_distribution', return_value=DISTRIBUTION)
+    def test_scheduler_precomputes_and_skips_fresh(self, mock_distribution, mock_get):
+        """Test that analyses read stored summaries and fresh ones are not recomputed."""
+        scheduler = HabitatClimateScheduler(["Tiger"], regions=1, years=2)
+        self.assertEqual(scheduler.run_once(), {"Tiger": "refreshed"})
+        self.assertEqual(scheduler.run_once(), {"Tiger": "fresh"})
+        self.assertEqual(mock_distribution.call_count, 1)
+
+        summary = get_habitat_summary("tiger")
+        self.assertEqual(summary["taxonKey"], 5219416)
+        brief = json.loads(habitat_context(summary))
+        self.assertEqual(brief["regions"], [{"lat": 26.5, "lon": 80.5, "share": 1.0}])
+
+        self.assertEqual(scheduler.run_once(force=True), {"Tiger": "refreshed"})
+        self.assertEqual(mock_distribution.call_count, 2)
+
+    @patch('tools.habitat_climate.fetch_occurrence_distribution', return_value={"error": "offline", "top_cells": []})
+    def test_background_thread_stops(self, mock_distribution):
+        """Test that the scheduler thread runs a pass and exits on stop."""
+        scheduler = HabitatClimateScheduler(["tiger"], interval=3600).start()
+        scheduler.stop(timeout=5)
+        self.assertFalse(scheduler._thread.is_alive())
+
+    def test_popular_species_from_env(self):
+        """Test the configured species list and its fallback."""
+        with patch.dict(os.environ, {POPULAR_SPECIES_ENV: "tiger, snow leopard,"}):
+            self.assertEqual(popular_species(["whale"]), ["tiger", "snow leopard"])
+        with patch.dict(os.environ, {POPULAR_SPECIES_ENV: ""}):
+            self.assertEqual(popular_species(["whale"]), ["whale"])
+
+
+if __name__ == '__main__':
+    unittest.main()
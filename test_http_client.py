@@ -0,0 +1,148 @@
+"""
+Unit tests for adaptive timeouts and hedged GETs.
+"""
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from tools import http_client
+from tools.http_client import (
+    get, host_latency, reset_latency, HTTP_HEDGES, HTTP_RESPONSES, ACCEPT_ENCODING, DEFAULT_TIMEOUT, MIN_SAMPLES,
+    TIMEOUT_ENV, MIN_TIMEOUT_ENV, HEDGE_ENV, HEDGE_BUDGET_ENV
+)
+from tools.metrics import registry
+
+URL = "https://api.example.org/v1/search"
+HOST = "api.example.org"
+
+
+def _seed(seconds, count=50):
+    tracker = host_latency(HOST)
+    for _ in range(count):
+        tracker.record(seconds)
+    return tracker
+
+
+@patch.dict(os.environ, {TIMEOUT_ENV: "", MIN_TIMEOUT_ENV: "", HEDGE_ENV: "", HEDGE_BUDGET_ENV: ""})
+class TestAdaptiveTimeout(unittest.TestCase):
+    """Test cases for per-host latency tracking and timeouts."""
+
+    def setUp(self):
+        reset_latency()
+
+    def test_timeout_follows_recent_latency(self):
+        """Test the ceiling without history, then p99 times the multiplier within bounds."""
+        tracker = _seed(0.1, MIN_SAMPLES - 1)
+        self.assertEqual(tracker.timeout(), DEFAULT_TIMEOUT)
+        tracker.record(0.1)
+        self.assertEqual(tracker.timeout(), 5.0)
+        _seed(4.0, 200)
+        self.assertEqual(tracker.timeout(), 12.0)
+        _seed(20.0, 200)
+        self.assertEqual(tracker.timeout(), DEFAULT_TIMEOUT)
+        with patch.dict(os.environ, {TIMEOUT_ENV: "20", MIN_TIMEOUT_ENV: "1"}):
+            self.assertEqual(_seed(0.2, 200).timeout(), 1.0)
+
+    @patch('tools.http_client.requests.get')
+    def test_get_uses_and_records_latency(self, mock_get):
+        """Test that the adaptive timeout is passed through and every attempt is counted."""
+        _seed(1.0)
+        response = get(URL, params={"q": "tiger"})
+        self.assertIs(response, mock_get.return_value)
+        mock_get.assert_called_once_with(URL, timeout=5.0, params={"q": "tiger"})
+        self.assertEqual(len(host_latency(HOST)._samples), 51)
+        get(URL, timeout=2)
+        self.assertEqual(mock_get.call_args[1]["timeout"], 2)
+
+    @patch('tools.http_client.requests.get')
+    def test_compression_negotiated(self, mock_get):
+        """Test that streamed GETs offer gzip, callers can override it, and encodings are counted."""
+        mock_get.return_value.headers = {"Content-Encoding": "gzip"}
+        gzipped = HTTP_RESPONSES.value(host=HOST, encoding="gzip")
+        get(URL, validators={"etag": '"v1"'}, stream=True)
+        headers = mock_get.call_args[1]["headers"]
+        self.assertTrue(ACCEPT_ENCODING.endswith("gzip, deflate"))
+        self.assertEqual(headers, {"Accept-Encoding": ACCEPT_ENCODING, "If-None-Match": '"v1"'})
+        self.assertEqual(HTTP_RESPONSES.value(host=HOST, encoding="gzip"), gzipped + 1)
+
+        mock_get.return_value.headers = {}
+        identity = HTTP_RESPONSES.value(host=HOST, encoding="identity")
+        get(URL, headers={"Accept-Encoding": "identity"}, stream=True)
+        self.assertEqual(mock_get.call_args[1]["headers"], {"Accept-Encoding": "identity"})
+        self.assertEqual(HTTP_RESPONSES.value(host=HOST, encoding="identity"), identity + 1)
+
+    @patch('tools.http_client.requests.get', side_effect=requests.exceptions.Timeout("slow"))
+    def test_timeouts_widen_the_window(self, mock_get):
+        """Test that timed-out requests still add a sample and raise as before."""
+        with self.assertRaises(requests.exceptions.Timeout):
+            get(URL)
+        self.assertEqual(len(host_latency(HOST)._samples), 1)
+
+    def test_metrics_exported(self):
+        """Test that per-host timeouts and percentiles are scraped."""
+        _seed(0.5)
+        text = registry.render()
+        self.assertIn(f'wildlife_http_timeout_seconds{{host="{HOST}"}} 5', text)
+        self.assertIn(f'wildlife_http_latency_seconds{{host="{HOST}",quantile="0.95"}} 0.5', text)
+
+
+@patch.dict(os.environ, {TIMEOUT_ENV: "", MIN_TIMEOUT_ENV: "", HEDGE_ENV: "", HEDGE_BUDGET_ENV: ""})
+class TestHedging(unittest.TestCase):
+    """Test cases for hedged duplicate requests."""
+
+    def setUp(self):
+        reset_latency()
+        _seed(0.01)
+
+    def test_hedge_wins_over_slow_primary(self):
+        """Test that a duplicate sent after the p95 answers first."""
+        calls = []
+        lock = threading.Lock()
+
+        def respond(url, timeout=None, **kwargs):
+            with lock:
+                calls.append(time.perf_counter())
+                first = len(calls) == 1
+            if first:
+                time.sleep(0.5)
+                return "slow"
+            return "fast"
+
+        won = HTTP_HEDGES.value(host=HOST, outcome="won")
+        with patch('tools.http_client.requests.get', side_effect=respond):
+            start_time = time.perf_counter()
+            self.assertEqual(get(URL, hedge=True), "fast")
+            self.assertLess(time.perf_counter() - start_time, 0.4)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(HTTP_HEDGES.value(host=HOST, outcome="won"), won + 1)
+
+    @patch('tools.http_client.requests.get', side_effect=lambda url, **kwargs: time.sleep(0.05) or "ok")
+    def test_hedges_are_capped(self, mock_get):
+        """Test that without budget refill only the burst allowance is hedged."""
+        _seed(0.01, 200)
+        skipped = HTTP_HEDGES.value(host=HOST, outcome="skipped")
+        with patch.dict(os.environ, {HEDGE_ENV: "1", HEDGE_BUDGET_ENV: "0"}):
+            for _ in range(5):
+                self.assertEqual(get(URL), "ok")
+        self.assertEqual(mock_get.call_count, 5 + int(http_client.HEDGE_BURST))
+        self.assertEqual(HTTP_HEDGES.value(host=HOST, outcome="skipped"), skipped + 2)
+
+    @patch('tools.http_client.requests.get', side_effect=lambda url, **kwargs: time.sleep(0.05) or "ok")
+    def test_off_by_default(self, mock_get):
+        """Test that slow requests are not duplicated unless hedging is enabled."""
+        self.assertEqual(get(URL), "ok")
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('tools.http_client.requests.get', side_effect=requests.exceptions.ConnectionError("down"))
+    def test_errors_propagate(self, mock_get):
+        """Test that a failing primary raises as an unhedged request would."""
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            get(URL, hedge=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Unit tests for the pluggable JSON backend and the typed cache-hit path.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+
+from tools import json_backend
+from tools import cache as cache_module
+from tools.cache import SharedCache
+from tools.records import SpeciesSearch
+from tools.species_tool import fetch_species_records
+from test_records import SPECIES_RESPONSE
+
+
+def _available_backends():
+    """The backends that can be loaded in this environment."""
+    available = []
+    for name in json_backend.BACKENDS:
+        try:
+            json_backend._load_backend(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+class TestJsonBackends(unittest.TestCase):
+    """Test cases for each installed JSON backend."""
+
+    def setUp(self):
+        self.previous = json_backend.backend_name()
+
+    def tearDown(self):
+        json_backend.set_backend(self.previous)
+
+    def test_round_trip(self):
+        """Test that every backend decodes what every backend encodes."""
+        value = {"name": "Lynx lynx", "counts": [1, 2.5, None], "nested": {"ok": True}, "é": "ü"}
+        for writer in _available_backends():
+            json_backend.set_backend(writer)
+            encoded = json_backend.dumps(value)
+            self.assertNotIn(": ", encoded)
+            for reader in _available_backends():
+                json_backend.set_backend(reader)
+                self.assertEqual(json_backend.loads(encoded), value)
+                self.assertEqual(json_backend.loads(encoded.encode("utf-8")), value)
+
+    def test_indent_and_sort_keys(self):
+        """Test that formatting options match the standard library's output."""
+        value = {"b": 1, "a": [1, 2]}
+        for name in _available_backends():
+            json_backend.set_backend(name)
+            self.assertEqual(json_backend.dumpb(value, sort_keys=True), b'{"a":[1,2],"b":1}')
+            self.assertEqual(json.loads(json_backend.dumps(value, indent=True)), value)
+            self.assertIn("\n  ", json_backend.dumps(value, indent=True))
+
+    def test_default_hook(self):
+        """Test that unknown objects go through the ``default`` callback."""
+        search = SpeciesSearch.from_response(SPECIES_RESPONSE)
+        for name in _available_backends():
+            json_backend.set_backend(name)
+            encoded = json_backend.dumps({"species": search}, default=lambda value: value.to_dict())
+            self.assertEqual(json.loads(encoded)["species"]["count"], 42)
+
+    def test_unknown_backend_rejected(self):
+        """Test that a misspelled backend name raises instead of silently falling back."""
+        with self.assertRaises(ValueError):
+            json_backend.set_backend("ujson")
+
+    def test_response_json_decodes_bytes(self):
+        """Test that byte bodies are decoded directly and test doubles still work."""
+        response = Mock()
+        response.content = b'{"count": 3}'
+        self.assertEqual(json_backend.response_json(response), {"count": 3})
+        response.json.assert_not_called()
+
+        double = Mock()
+        double.json.return_value = {"count": 4}
+        self.assertEqual(json_backend.response_json(double), {"count": 4})
+
+
+
+def _split(content, size):
+    return (content[i:i + size] for i in range(0, len(content), size))
+
+
+class TestObjectStream(unittest.TestCase):
+    """Test cases for incrementally decoding one array member of a large object."""
+
+    PAGE = {"offset": 0, "limit": 3, "endOfRecords": False, "count": 1234567,
+            "results": [{"key": 1, "decimalLatitude": -12.5e-1, "locality": "Sundarbans \u2013 Khulna \U0001F405"},
+                        {"key": 2, "issues": ["A", {"nested": [1, 2]}], "x": None}, 7, "text"],
+            "facets": [], "note": True}
+
+    def test_any_chunk_split(self):
+        """Test that elements and fields decode the same however the bytes are split."""
+        content = json.dumps(self.PAGE, ensure_ascii=False, indent=1).encode("utf-8")
+        fields = {key: value for key, value in self.PAGE.items() if key != "results"}
+        for size in (1, 2, 3, 5, 64, len(content)):
+            stream = json_backend.ObjectStream(_split(content, size), "results")
+            self.assertEqual(list(stream), self.PAGE["results"])
+            self.assertEqual(stream.fields, fields)
+
+    def test_elements_arrive_before_the_body_ends(self):
+        """Test that the first element is yielded after only its own bytes were read."""
+        content = json_backend.dumpb({"results": [{"key": index} for index in range(1000)]})
+        chunks = _split(content, 16)
+        first = next(iter(json_backend.ObjectStream(chunks, "results")))
+        self.assertEqual(first, {"key": 0})
+        self.assertGreater(len(list(chunks)), len(content) // 16 - 2)
+
+    def test_empty_and_missing_array(self):
+        """Test empty objects, empty arrays and bodies without the streamed member."""
+        for body, fields in ((b"{}", {}), (b' { "results" : [ ] , "count" : 0 } ', {"count": 0}),
+                             (b'{"count": 10}', {"count": 10})):
+            stream = json_backend.ObjectStream([body], "results")
+            self.assertEqual(list(stream), [])
+            self.assertEqual(stream.fields, fields)
+
+    def test_malformed_bodies_raise(self):
+        """Test that truncated or invalid bodies raise ValueError."""
+        for body in (b'{"results": [{"key": 1}', b'{"results": [1 2]}', b'[1, 2]', b'{"count": 1', b''):
+            with self.assertRaises(ValueError):
+                list(json_backend.ObjectStream(_split(body, 3), "results"))
+
+
+class TestTypedDecoding(unittest.TestCase):
+    """Test cases for decoding cached JSON straight into records."""
+
+    def setUp(self):
+        self.previous = json_backend.backend_name()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.sqlite3")
+
+    def tearDown(self):
+        json_backend.set_backend(self.previous)
+        cache_module._cache_instance = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_from_json_matches_dict_path(self):
+        """Test that every backend builds the same records as ``from_response``."""
+        expected = SpeciesSearch.from_response(SPECIES_RESPONSE).to_dict(raw=True)
+        body = json.dumps(SPECIES_RESPONSE)
+        for name in _available_backends():
+            json_backend.set_backend(name)
+            self.assertEqual(SpeciesSearch.from_json(body).to_dict(raw=True), expected)
+            self.assertEqual(SpeciesSearch.from_json(body.encode("utf-8")).to_dict(raw=True), expected)
+
+    def test_from_json_tolerates_unexpected_types(self):
+        """Test that schema mismatches fall back to the dict path."""
+        body = json.dumps({"count": 1, "results": [{"key": "not-a-number", "kingdom": "Fungi"}]})
+        for name in _available_backends():
+            json_backend.set_backend(name)
+            search = SpeciesSearch.from_json(body)
+            self.assertEqual((search.records[0].key, search.records[0].kingdom), ("not-a-number", "Fungi"))
+
+    def test_cache_written_by_one_backend_read_by_another(self):
+        """Test that cache entries are portable between backends."""
+        backends = _available_backends()
+        json_backend.set_backend(backends[0])
+        SharedCache(self.path).set("species", "tiger", SPECIES_RESPONSE)
+        json_backend.set_backend(backends[-1])
+        self.assertEqual(SharedCache(self.path).get("species", "tiger"), SPECIES_RESPONSE)
+
+    @patch('tools.species_tool.requests.get')
+    def test_fetch_species_records_uses_cache(self, mock_get):
+        """Test that a cached lookup is decoded into records without calling the API."""
+        mock_response = Mock()
+        mock_response.json.return_value = SPECIES_RESPONSE
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+
+        with patch.dict(os.environ, {cache_module.CACHE_DB_ENV: self.path}):
+            first = fetch_species_records("Tiger")
+            second = fetch_species_records("tiger")
+
+        mock_get.assert_called_once()
+        self.assertIsInstance(second, SpeciesSearch)
+        self.assertEqual(second.to_dict(raw=True), first.to_dict(raw=True))
+        self.assertEqual(second.records[0].vernacular_name, "Tiger")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Tests that entry points stay fast to import by deferring heavy dependencies.
+"""
+import subprocess
+import sys
+import unittest
+
+
+def _loaded_after_import(module, heavy):
+    """Import ``module`` in a fresh interpreter and report whether ``heavy`` was loaded."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print({heavy!r} in sys.modules)"],
+        capture_output=True, text=True
+    )
+    return result.stdout.strip().splitlines()[-1] == "True"
+
+
+class TestLazyImports(unittest.TestCase):
+    """Test cases for deferred CrewAI and charting imports."""
+
+    def test_main_does_not_import_crewai(self):
+        """Test that `python main.py --help` does not pay for CrewAI."""
+        self.assertFalse(_loaded_after_import("main", "crewai"))
+
+    def test_streamlit_utils_does_not_import_crewai(self):
+        """Test that the welcome page does not load CrewAI through streamlit_utils."""
+        self.assertFalse(_loaded_after_import("streamlit_utils", "crewai"))
+
+    def test_tool_wrappers_resolve_lazily(self):
+        """Test that the CrewAI tool wrappers are still importable from streamlit_utils."""
+        from streamlit_utils import SpeciesTool, ClimateTool
+        self.assertEqual(SpeciesTool().name, "fetch_species")
+        self.assertEqual(ClimateTool().name, "fetch_climate_data")
+
+    def test_help_exits_cleanly(self):
+        """Test that the CLI prints usage without running the pipeline."""
+        result = subprocess.run([sys.executable, "main.py", "--help"], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("species", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
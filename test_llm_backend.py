@@ -0,0 +1,199 @@
+"""
+Unit tests for LLM backend selection and the deterministic stub LLM.
+"""
+import json
+import os
+import random
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from tools.prompt_budget import estimate_tokens
+from llm_backend import (
+    create_llm, backend_name, register_backend, parse_latency, sample_latency, stub_llm,
+    GEMINI_API_KEY_ENV, LLM_BACKEND_ENV, STUB_RESPONSES_ENV, STUB_LATENCY_ENV
+)
+
+FUSED_PROMPT = [{"role": "user", "content": "Analyze the data above about 'snow leopard': ... "
+                                            '{"analysis": {}, "report": "..."}'}]
+
+
+class TestLatency(unittest.TestCase):
+    """Test cases for latency distributions."""
+
+    def test_parse_latency(self):
+        """Test the accepted specs and that bad ones raise."""
+        self.assertEqual(parse_latency("fixed:0.5"), ("fixed", (0.5,)))
+        self.assertEqual(parse_latency("Uniform:0.1, 0.3"), ("uniform", (0.1, 0.3)))
+        for spec in ("gamma:1,2", "normal:0.5", "fixed:"):
+            with self.assertRaises(ValueError):
+                parse_latency(spec)
+
+    def test_samples_stay_in_range(self):
+        """Test draws per distribution, never negative."""
+        rng = random.Random(1)
+        uniform = [sample_latency(("uniform", (0.2, 0.4)), rng) for _ in range(200)]
+        self.assertTrue(all(0.2 <= value <= 0.4 for value in uniform))
+        self.assertTrue(all(sample_latency(("normal", (0.0, 1.0)), rng) >= 0 for _ in range(200)))
+        lognormal = sorted(sample_latency(("lognormal", (0.8, 0.3)), rng) for _ in range(401))
+        self.assertAlmostEqual(lognormal[200], 0.8, delta=0.1)
+
+
+class TestStubLLM(unittest.TestCase):
+    """Test cases for StubLLM answers, timing and events."""
+
+    def test_templated_answers(self):
+        """Test the fused JSON answer and crew Final Answers per agent role."""
+        from crewai import Agent, Task
+        llm = stub_llm(templates={"Report Writer": "Final Answer: Report on $species"})
+        fused = json.loads(llm.call(FUSED_PROMPT))
+        self.assertIn("snow leopard", fused["report"])
+
+        agent = Agent(role="Data Analyst", goal="Analyze", backstory="Analyst.", llm=llm)
+        task = Task(description="Gather comprehensive data about tiger. Call the tool.",
+                    expected_output="Data.", agent=agent)
+        answer = llm.call("Begin!", from_task=task, from_agent=agent)
+        self.assertTrue(answer.startswith("Thought: I now know the final answer\nFinal Answer: Data Analyst"))
+        self.assertIn("for tiger", answer)
+        writer = Agent(role="Report Writer", goal="Write", backstory="Writer.", llm=llm)
+        self.assertEqual(llm.call("Begin!", from_task=task, from_agent=writer), "Final Answer: Report on tiger")
+
+    def test_latency_deterministic_per_prompt(self):
+        """Test that the same prompt always waits as long, and token rate adds generation time."""
+        llm = stub_llm(latency="uniform:0.0,1.0")
+        self.assertEqual(llm.delay("prompt a", "answer"), llm.delay("prompt a", "answer"))
+        self.assertNotEqual(llm.delay("prompt a", "answer"), llm.delay("prompt b", "answer"))
+        self.assertNotEqual(llm.delay("prompt a", "answer"), stub_llm(latency="uniform:0.0,1.0", seed=7)
+                            .delay("prompt a", "answer"))
+
+        slow = stub_llm(latency="fixed:0.05", tokens_per_second=100)
+        answer = slow.answer(FUSED_PROMPT)
+        start_time = time.perf_counter()
+        slow.call(FUSED_PROMPT)
+        elapsed = time.perf_counter() - start_time
+        self.assertAlmostEqual(slow.delay(FUSED_PROMPT, answer), 0.05 + estimate_tokens(answer) / 100)
+        self.assertGreaterEqual(elapsed, slow.delay(FUSED_PROMPT, answer) - 0.01)
+
+    def test_env_settings_and_template_file(self):
+        """Test that WILDLIFE_STUB_* configure stubs created by create_llm."""
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as handle:
+            json.dump({"fused": '{"report": "Canned $species"}'}, handle)
+        self.addCleanup(os.remove, handle.name)
+        with patch.dict(os.environ, {LLM_BACKEND_ENV: "stub", STUB_RESPONSES_ENV: handle.name,
+                                     STUB_LATENCY_ENV: "normal:0.2,0.05"}):
+            llm = create_llm()
+        self.assertEqual(llm.latency, "normal:0.2,0.05")
+        with patch.object(time, "sleep"):
+            self.assertEqual(llm.call(FUSED_PROMPT), '{"report": "Canned snow leopard"}')
+
+    def test_usage_reported_to_metrics(self):
+        """Test that stub calls emit LLM events with token usage."""
+        from crewai.events import crewai_event_bus
+        from tools import metrics
+        metrics.instrument_crewai()
+        before = metrics.LLM_TOKENS.value(model="stub", kind="completion")
+        calls = metrics.LLM_DURATION.count(model="stub")
+        stub_llm().call(FUSED_PROMPT)
+        crewai_event_bus.flush()
+        self.assertGreater(metrics.LLM_TOKENS.value(model="stub", kind="completion"), before)
+        self.assertEqual(metrics.LLM_DURATION.count(model="stub"), calls + 1)
+
+
+class TestBackendSelection(unittest.TestCase):
+    """Test cases for create_llm and the backend registry."""
+
+    def test_resolution_order(self):
+        """Test argument, then environment, then the caller's default."""
+        with patch.dict(os.environ, {LLM_BACKEND_ENV: ""}):
+            self.assertEqual(backend_name(), "gemini")
+            self.assertEqual(backend_name(default="crewai"), "crewai")
+            self.assertIsNone(create_llm(default="crewai"))
+        with patch.dict(os.environ, {LLM_BACKEND_ENV: "stub"}):
+            self.assertEqual(backend_name(default="crewai"), "stub")
+            self.assertEqual(backend_name("gemini"), "gemini")
+        with self.assertRaises(ValueError):
+            backend_name("gpt-9")
+
+    def test_gemini_requires_api_key(self):
+        """Test that the gemini backend refuses to start without GEMINI_API_KEY."""
+        with patch.dict(os.environ, {GEMINI_API_KEY_ENV: ""}):
+            with self.assertRaisesRegex(RuntimeError, GEMINI_API_KEY_ENV):
+                create_llm("gemini")
+
+    def test_register_backend(self):
+        """Test that custom backends become selectable."""
+        sentinel = object()
+        register_backend("Custom", lambda: sentinel)
+        self.assertIs(create_llm("custom"), sentinel)
+
+
+@patch.dict(os.environ, {"CREWAI_DISABLE_TELEMETRY": "true", "OTEL_SDK_DISABLED": "true"})
+class TestOfflinePipeline(unittest.TestCase):
+    """Test the full crew pipeline offline with the stub backend."""
+
+    @patch('tools.occurrence_tool.fetch_occurrence_distribution', return_value={"records_binned": 0, "top_cells": []})
+    @patch('streamlit_utils.fetch_climate_data', return_value={"current_weather": {"temperature": 18.5}})
+    @patch('streamlit_utils.fetch_species', return_value={"count": 1, "results": []})
+    @patch('streamlit_utils.get_cache', return_value=None)
+    def test_crew_runs_on_stub(self, mock_cache, mock_species, mock_climate, mock_distribution):
+        """Test that all four tasks complete and report per-stage usage."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        result, logs, _species, _climate = run_wildlife_analysis_streamlit("tiger", mode="crew", backend="stub")
+        self.assertIsNone(logs.get("error"))
+        self.assertIn("Report Writer summary for tiger", str(result))
+        self.assertEqual(logs["tokens"]["total"]["llm_calls"], 4)
+        self.assertGreater(logs["tokens"]["report"]["completion_tokens"], 0)
+
+    @patch('streamlit_utils.export_analysis')
+    @patch('tools.occurrence_tool.fetch_occurrence_distribution', return_value={"records_binned": 0, "top_cells": []})
+    @patch('streamlit_utils.fetch_climate_data', return_value={"current_weather": {"temperature": 18.5}})
+    @patch('streamlit_utils.fetch_species', return_value={"count": 1, "results": []})
+    @patch('streamlit_utils.get_cache', return_value=None)
+    def test_crew_export_row(self, mock_cache, mock_species, mock_climate, mock_distribution, mock_export):
+        """Test that the crew run is archived with its duration under a stable id."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        run_wildlife_analysis_streamlit("Tiger", mode="crew", backend="stub")
+        kwargs = mock_export.call_args[1]
+        self.assertEqual(kwargs["row_id"], "tiger|crew|stub")
+        self.assertGreater(kwargs["seconds"], 0)
+        self.assertEqual(kwargs["species_data"], {"count": 1, "results": []})
+        run_wildlife_analysis_streamlit("tiger", mode="crew", backend="stub", row_id="batch-1")
+        self.assertEqual(mock_export.call_args[1]["row_id"], "batch-1")
+
+    @patch('main.export_analysis')
+    @patch('tools.occurrence_tool.fetch_occurrence_distribution', return_value={"records_binned": 0, "top_cells": []})
+    @patch('tools.climate_tool.fetch_climate_data', return_value={"current_weather": {"temperature": 18.5}})
+    @patch('tools.species_tool.fetch_species', return_value={"count": 1, "results": []})
+    def test_cli_crew_export_row(self, mock_species, mock_climate, mock_distribution, mock_export):
+        """Test that CLI crew runs archive the inputs fetched before kickoff, failed runs included."""
+        import main
+        self.assertIsNotNone(main.main(["tiger", "--mode", "crew", "--backend", "stub"]))
+        kwargs = mock_export.call_args[1]
+        self.assertEqual(kwargs["row_id"], "tiger|crew|stub")
+        self.assertEqual(kwargs["climate_data"], {"current_weather": {"temperature": 18.5}})
+        self.assertEqual(kwargs["species_data"], {"count": 1, "results": []})
+        self.assertGreater(kwargs["seconds"], 0)
+
+        with patch('main.create_llm', side_effect=RuntimeError("crew failed")):
+            self.assertIsNone(main.main(["tiger", "--mode", "crew", "--backend", "stub"]))
+        kwargs = mock_export.call_args[1]
+        self.assertEqual((kwargs["row_id"], kwargs["mode"]), ("tiger|crew|stub", "crew"))
+        self.assertIn("crew failed", kwargs["error"])
+        self.assertEqual(kwargs["species_data"], {"count": 1, "results": []})
+
+    @patch('tools.occurrence_tool.fetch_occurrence_distribution', return_value={"records_binned": 0, "top_cells": []})
+    @patch('streamlit_utils.fetch_climate_data', return_value={"current_weather": {"temperature": 18.5}})
+    @patch('streamlit_utils.fetch_species', return_value={"count": 1, "results": []})
+    @patch('streamlit_utils.get_cache', return_value=None)
+    def test_unknown_backend_returns_error(self, mock_cache, mock_species, mock_climate, mock_distribution):
+        """Test that a misspelled backend gives the error result instead of raising."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        result, logs, species, _climate = run_wildlife_analysis_streamlit("tiger", mode="crew", backend="gemeni")
+        self.assertIsNone(result)
+        self.assertIn("Unknown LLM backend 'gemeni'", logs["error"])
+        self.assertEqual(species, {"count": 1, "results": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
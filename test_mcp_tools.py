@@ -6,12 +6,16 @@ from unittest.mock import patch, Mock
 import json
 import requests
 from tools.species_tool import fetch_species
-from tools.climate_tool import fetch_climate_data
+from tools.climate_tool import fetch_climate_data, fetch_climate_batch, resolve_location
+from tools.http_client import reset_latency, DEFAULT_TIMEOUT
 
 
 class TestSpeciesTool(unittest.TestCase):
     """Test cases for the species MCP tool."""
     
+    def setUp(self):
+        reset_latency()
+    
     @patch('tools.species_tool.requests.get')
     def test_fetch_species_success(self, mock_get):
         """Test successful species data fetch."""
@@ -45,7 +49,8 @@ class TestSpeciesTool(unittest.TestCase):
         self.assertIn("results", result)
         self.assertEqual(len(result["results"]), 1)
         self.assertEqual(result["results"][0]["scientificName"], "Panthera tigris")
-        mock_get.assert_called_once_with("https://api.gbif.org/v1/species/search?q=tiger", timeout=30)
+        # No latency history yet, so the adaptive timeout starts at its ceiling
+        mock_get.assert_called_once_with("https://api.gbif.org/v1/species/search?q=tiger", timeout=DEFAULT_TIMEOUT)
     
     @patch('tools.species_tool.requests.get')
     def test_fetch_species_connection_error(self, mock_get):
@@ -157,6 +162,63 @@ class TestClimateTool(unittest.TestCase):
             call_args = mock_get.call_args[0][0]
             self.assertIn("latitude=40.71", call_args)
             self.assertIn("longitude=-74.01", call_args)
+    
+    @patch('tools.climate_tool.requests.get')
+    def test_fetch_climate_batch_single_request(self, mock_get):
+        """Test that several locations are fetched in one comma-separated request."""
+        mock_response = Mock()
+        mock_response.json.return_value = [
+            {"latitude": 27.5, "longitude": 85.3, "current_weather": {"temperature": 20.0}},
+            {"latitude": -1.29, "longitude": 36.82, "current_weather": {"temperature": 25.0}}
+        ]
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        results = fetch_climate_batch([(27.5012, 85.3001), (-1.2864, 36.8172), (27.4999, 85.2998)])
+        
+        mock_get.assert_called_once()
+        call_args = mock_get.call_args[0][0]
+        self.assertIn("latitude=27.5,-1.29", call_args)
+        self.assertIn("longitude=85.3,36.82", call_args)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["current_weather"]["temperature"], 20.0)
+        self.assertEqual(results[1]["current_weather"]["temperature"], 25.0)
+        # Nearby coordinates round to the same point and share its response
+        self.assertIs(results[2], results[0])
+    
+    @patch('tools.climate_tool.MAX_LOCATIONS_PER_REQUEST', 2)
+    @patch('tools.climate_tool.requests.get')
+    def test_fetch_climate_batch_chunks_requests(self, mock_get):
+        """Test that large batches are split into several upstream requests."""
+        mock_response = Mock()
+        mock_response.json.side_effect = [
+            [{"latitude": 1.0}, {"latitude": 2.0}],
+            {"latitude": 3.0}
+        ]
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        results = fetch_climate_batch([(1, 0), (2, 0), (3, 0)])
+        
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual([r["latitude"] for r in results], [1.0, 2.0, 3.0])
+    
+    @patch('tools.climate_tool.requests.get')
+    def test_fetch_climate_batch_error_per_location(self, mock_get):
+        """Test that a failed batch request yields an error for every location."""
+        mock_get.side_effect = requests.exceptions.Timeout("Request timed out")
+        
+        results = fetch_climate_batch(["New York", (10.0, 10.0)])
+        
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertIn("Request timeout", result["error"])
+            self.assertEqual(result["daily"], {})
+    
+    def test_resolve_location(self):
+        """Test that names and coordinate pairs resolve to rounded coordinates."""
+        self.assertEqual(resolve_location("New York"), (40.71, -74.01))
+        self.assertEqual(resolve_location((51.50735, -0.12776)), (51.51, -0.13))
 
 
 if __name__ == '__main__':
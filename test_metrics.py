@@ -0,0 +1,161 @@
+"""
+Unit tests for the Prometheus-style metrics registry.
+"""
+import os
+import unittest
+import urllib.request
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import requests
+
+from tools import metrics
+from tools.cache import count_cache_event, reset_cache_metrics
+from tools.metrics import Registry, instrument_tool, instrument_pipeline, ensure_metrics_server, METRICS_PORT_ENV
+
+
+class TestRegistry(unittest.TestCase):
+    """Test cases for counters, gauges, histograms and the text exposition."""
+
+    def test_render_exposition_format(self):
+        """Test counter, gauge and cumulative histogram lines."""
+        registry = Registry()
+        calls = registry.counter("calls_total", "Calls.", ("tool", "outcome"))
+        depth = registry.gauge("depth", "Depth.")
+        latency = registry.histogram("latency_seconds", "Latency.", ("tool",), buckets=(0.1, 1.0))
+        calls.inc(tool="species", outcome="ok")
+        calls.inc(2, tool="species", outcome="ok")
+        depth.set(3)
+        depth.dec()
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value, tool="species")
+
+        text = registry.render()
+        self.assertIn("# TYPE calls_total counter", text)
+        self.assertIn('calls_total{tool="species",outcome="ok"} 3', text)
+        self.assertIn("depth 2", text)
+        self.assertIn('latency_seconds_bucket{tool="species",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{tool="species",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{tool="species",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_sum{tool="species"} 5.55', text)
+        self.assertIn('latency_seconds_count{tool="species"} 3', text)
+
+    def test_labels_checked_and_reregistration(self):
+        """Test that wrong labels raise and the same metric can be fetched twice."""
+        registry = Registry()
+        calls = registry.counter("calls_total", "Calls.", ("tool",))
+        with self.assertRaises(ValueError):
+            calls.inc(outcome="ok")
+        self.assertIs(registry.counter("calls_total", "Calls.", ("tool",)), calls)
+        with self.assertRaises(ValueError):
+            registry.gauge("calls_total", "Calls.", ("tool",))
+
+    def test_counters_only_increase(self):
+        """Test that a negative increment raises for counters but not for gauges."""
+        registry = Registry()
+        with self.assertRaises(ValueError):
+            registry.counter("calls_total", "Calls.").inc(-1)
+        depth = registry.gauge("depth", "Depth.")
+        depth.inc(-2)
+        self.assertEqual(depth.value(), -2)
+
+    def test_label_values_escaped(self):
+        """Test that quotes in label values do not break the exposition."""
+        registry = Registry()
+        registry.counter("calls_total", "Calls.", ("query",)).inc(query='say "hi"')
+        self.assertIn('calls_total{query="say \\"hi\\""} 1', registry.render())
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases for tool, pipeline, cache and LLM instrumentation."""
+
+    def test_tool_outcomes(self):
+        """Test that ok, error dicts and exceptions are counted separately."""
+        @instrument_tool("test_tool")
+        def tool(value):
+            if value == "raise":
+                raise RuntimeError("boom")
+            return {"error": "bad"} if value == "error" else {"count": 1}
+
+        before = {outcome: metrics.TOOL_CALLS.value(tool="test_tool", outcome=outcome)
+                  for outcome in ("ok", "error", "exception")}
+        tool("ok")
+        tool("error")
+        with self.assertRaises(RuntimeError):
+            tool("raise")
+        for outcome in ("ok", "error", "exception"):
+            self.assertEqual(metrics.TOOL_CALLS.value(tool="test_tool", outcome=outcome), before[outcome] + 1)
+        self.assertGreaterEqual(metrics.TOOL_DURATION.count(tool="test_tool"), 3)
+
+    @patch('tools.species_tool.requests.get', side_effect=requests.exceptions.Timeout())
+    def test_fetch_species_instrumented(self, mock_get):
+        """Test that the real species tool reports its failures."""
+        from tools.species_tool import fetch_species
+        before = metrics.TOOL_CALLS.value(tool="fetch_species", outcome="error")
+        with patch.dict(os.environ, {"WILDLIFE_CACHE_DB": ""}):
+            fetch_species("metrics-test-species")
+        self.assertEqual(metrics.TOOL_CALLS.value(tool="fetch_species", outcome="error"), before + 1)
+
+    def test_pipeline_tracks_in_progress(self):
+        """Test the in-progress gauge during a run and the outcome afterwards."""
+        seen = []
+
+        @instrument_pipeline("test_entry")
+        def run():
+            seen.append(metrics.PIPELINES_IN_PROGRESS.value(entry="test_entry"))
+            return None, {"error": "failed"}
+
+        run()
+        self.assertEqual(seen, [1])
+        self.assertEqual(metrics.PIPELINES_IN_PROGRESS.value(entry="test_entry"), 0)
+        self.assertIn('wildlife_pipeline_duration_seconds_count{entry="test_entry",outcome="error"} 1',
+                      metrics.registry.render())
+
+    def test_cache_events_collected_at_scrape(self):
+        """Test that shared cache counters appear without double bookkeeping."""
+        reset_cache_metrics()
+        count_cache_event("species", "fresh_hits", 3)
+        count_cache_event("species", "misses")
+        text = metrics.registry.render()
+        self.assertIn('wildlife_cache_events_total{namespace="species",event="fresh_hits"} 3', text)
+        self.assertIn('wildlife_cache_events_total{namespace="species",event="misses"} 1', text)
+        self.assertIn('wildlife_queue_depth{queue="cache_revalidation"}', text)
+        reset_cache_metrics()
+
+    def test_llm_usage_tokens(self):
+        """Test token extraction from dict and object usage payloads."""
+        self.assertEqual(metrics._usage_tokens({"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14}),
+                         {"prompt": 10, "completion": 4})
+        self.assertEqual(metrics._usage_tokens(SimpleNamespace(prompt_tokens=7)), {"prompt": 7})
+        self.assertEqual(metrics._usage_tokens(None), {})
+
+
+class TestMetricsServer(unittest.TestCase):
+    """Test cases for the scrape endpoint."""
+
+    def tearDown(self):
+        if metrics._server is not None:
+            metrics._server.shutdown()
+            metrics._server.server_close()
+            metrics._server = None
+
+    def test_disabled_without_port(self):
+        """Test that nothing listens unless a port is configured."""
+        with patch.dict(os.environ, {METRICS_PORT_ENV: ""}):
+            self.assertIsNone(ensure_metrics_server())
+
+    def test_scrape_endpoint(self):
+        """Test that /metrics serves the registry once per process."""
+        with patch.dict(os.environ, {METRICS_PORT_ENV: "0"}):
+            self.assertIsNone(ensure_metrics_server())
+        metrics._server = metrics.start_metrics_server(0)
+        with patch.dict(os.environ, {METRICS_PORT_ENV: "1"}):
+            self.assertIs(ensure_metrics_server(), metrics._server)
+        port = metrics._server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+            self.assertIn("# TYPE wildlife_tool_calls_total counter", response.read().decode("utf-8"))
+
+
+if __name__ == '__main__':
+    unittest.main()
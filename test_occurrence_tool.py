@@ -0,0 +1,257 @@
+"""
+Unit tests for the occurrence distribution MCP tool with mocked API responses.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch, Mock
+
+import numpy as np
+import requests
+
+from tools.occurrence_tool import (
+    OccurrenceGrid, iter_archive_coordinates, iter_occurrence_pages,
+    fetch_occurrence_distribution, distribution_context, resolve_taxon_key
+)
+from tools.occurrence_store import OccurrenceStore, ingest_archive, OCCURRENCE_STORE_ENV
+from tools.species_tool import fetch_species
+from tools.json_backend import dumpb
+
+
+def _json_response(payload):
+    content = dumpb(payload)
+    response = Mock()
+    response.json.return_value = payload
+    # Streamed pages arrive in small pieces that split records and numbers
+    response.iter_content.side_effect = lambda chunk_size=1: (content[i:i + 7] for i in range(0, len(content), 7))
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestOccurrenceGrid(unittest.TestCase):
+    """Test cases for NumPy spatial binning."""
+
+    def test_bins_and_ignores_invalid_coordinates(self):
+        """Test that valid points are counted and bad ones skipped."""
+        grid = OccurrenceGrid(cell_size=10.0)
+        grid.add(np.array([21.0, 22.0, np.nan, 95.0]), np.array([79.0, 78.0, 10.0, 10.0]))
+        self.assertEqual(grid.total, 2)
+        self.assertEqual(grid.top_cells(), [{"lat": 25.0, "lon": 75.0, "count": 2}])
+
+    def test_summary_aggregates(self):
+        """Test bounding box and latitude bands in the summary."""
+        grid = OccurrenceGrid(cell_size=1.0)
+        grid.add([10.2, 10.7, 45.5], [100.1, 100.9, 5.5])
+        summary = grid.summary()
+        self.assertEqual(summary["records_binned"], 3)
+        self.assertEqual(summary["occupied_cells"], 2)
+        self.assertEqual(summary["latitude_bands"], {"tropical": 2, "temperate": 1, "polar": 0})
+        self.assertEqual(summary["bounding_box"]["min_lat"], 10.0)
+        self.assertEqual(summary["bounding_box"]["max_lon"], 101.0)
+        self.assertEqual(summary["top_cells"][0]["count"], 2)
+
+    def test_memory_is_independent_of_record_count(self):
+        """Test that the grid size is fixed however many chunks are added."""
+        grid = OccurrenceGrid(cell_size=1.0)
+        shape = grid.counts.shape
+        rng = np.random.default_rng(0)
+        for _ in range(5):
+            grid.add(rng.uniform(-90, 90, 100000), rng.uniform(-180, 180, 100000))
+        self.assertEqual(grid.counts.shape, shape)
+        self.assertEqual(int(grid.counts.sum()), 500000)
+
+
+class TestOccurrenceSources(unittest.TestCase):
+    """Test cases for streaming occurrence coordinates."""
+
+    @patch('tools.occurrence_tool.requests.get')
+    def test_pages_until_end_of_records(self, mock_get):
+        """Test that occurrence/search is paged with increasing offsets."""
+        mock_get.side_effect = [
+            _json_response({"results": [{"decimalLatitude": 1.0, "decimalLongitude": 2.0}] * 300,
+                            "endOfRecords": False}),
+            _json_response({"results": [{"decimalLatitude": 3.0, "decimalLongitude": 4.0}],
+                            "endOfRecords": True})
+        ]
+        pages = list(iter_occurrence_pages(5219416, max_records=1000))
+        self.assertEqual([len(lat) for lat, _ in pages], [300, 1])
+        self.assertEqual(mock_get.call_args_list[1][1]["params"]["offset"], 300)
+        self.assertEqual(pages[1][0].tolist(), [3.0])
+        self.assertEqual(pages[1][1].tolist(), [4.0])
+
+    @patch('tools.occurrence_tool.requests.get')
+    def test_pages_are_streamed_compressed(self, mock_get):
+        """Test that pages are requested compressed, decoded incrementally and closed."""
+        response = _json_response({"offset": 0, "endOfRecords": True, "results": [
+            {"key": 1, "decimalLatitude": -12.25, "decimalLongitude": 130.5, "issues": ["A", "B"]},
+            {"key": 2, "scientificName": "Panthera tigris"}
+        ], "facets": []})
+        mock_get.return_value = response
+        latitudes, longitudes = next(iter_occurrence_pages(5219416))
+        self.assertEqual(latitudes[0], -12.25)
+        self.assertEqual(longitudes[0], 130.5)
+        self.assertTrue(np.isnan(latitudes[1]))
+        kwargs = mock_get.call_args[1]
+        self.assertTrue(kwargs["stream"])
+        self.assertIn("gzip", kwargs["headers"]["Accept-Encoding"])
+        response.json.assert_not_called()
+        response.close.assert_called_once()
+
+    def test_reads_dwca_archive_in_chunks(self):
+        """Test streaming coordinates from a Darwin Core Archive zip."""
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "download.zip")
+            rows = ["gbifID\ttaxonKey\tspeciesKey\tdecimalLatitude\tdecimalLongitude"]
+            rows += [f"{i}\t111\t5219416\t{i % 50}.5\t{i % 100}.5" for i in range(5)]
+            rows += ["99\t222\t999\t1.0\t1.0", "100\t111\t5219416\t\t"]
+            with zipfile.ZipFile(path, "w") as archive:
+                archive.writestr("occurrence.txt", "\n".join(rows) + "\n")
+                archive.writestr("meta.xml", "<archive/>")
+
+            chunks = list(iter_archive_coordinates(path, taxon_key=5219416, chunk_size=2))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.assertEqual([len(lat) for lat, _ in chunks], [2, 2, 2])
+        grid = OccurrenceGrid()
+        for latitudes, longitudes in chunks:
+            grid.add(latitudes, longitudes)
+        self.assertEqual(grid.total, 5)
+
+
+class TestOccurrenceStore(unittest.TestCase):
+    """Test cases for the local columnar occurrence store."""
+
+    HEADER = ["gbifID", "taxonKey", "speciesKey", "genusKey", "kingdom", "genus", "species",
+              "scientificName", "vernacularName", "decimalLatitude", "decimalLongitude"]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        rows = [self.HEADER]
+        for i in range(7):
+            rows.append([str(i), "5219416", "5219416", "2435194", "Animalia", "Panthera", "Panthera tigris",
+                         "Panthera tigris (Linnaeus, 1758)", "Tiger", f"{20 + i}.5", "79.5"])
+            rows.append([str(100 + i), "5219404", "5219404", "2435194", "Animalia", "Panthera", "Panthera leo",
+                         "Panthera leo (Linnaeus, 1758)", "Lion", "-1.5", f"{30 + i}.5"])
+        rows.append(["200", "5219416", "5219416", "2435194", "Animalia", "Panthera", "Panthera tigris",
+                     "Panthera tigris (Linnaeus, 1758)", "", "", ""])
+        self.archive = os.path.join(self.directory, "download.zip")
+        with zipfile.ZipFile(self.archive, "w") as archive:
+            archive.writestr("occurrence.txt", "\n".join("\t".join(row) for row in rows) + "\n")
+        self.store_dir = os.path.join(self.directory, "store")
+        self.meta = ingest_archive(self.archive, self.store_dir, chunk_size=3)
+
+    def test_ingest_sorts_and_indexes_by_taxon(self):
+        """Test that each taxon is one contiguous, indexed row range."""
+        self.assertEqual((self.meta["rows_stored"], self.meta["rows_skipped"], self.meta["taxa"]), (14, 1, 2))
+        store = OccurrenceStore(self.store_dir)
+        keys = np.asarray(store.columns["taxon_key"])
+        self.assertTrue(np.all(np.diff(keys) >= 0))
+        self.assertEqual(list(store.index_keys), [5219404, 5219416])
+        self.assertEqual(store.count(5219416), 7)
+        self.assertEqual(store.count(2435194), 14)
+        self.assertFalse(os.path.exists(self.store_dir + ".building"))
+
+    def test_rows_placed_in_archive_order_per_taxon(self):
+        """Test that rows interleaved across chunks keep their archive order within a taxon."""
+        store = OccurrenceStore(self.store_dir)
+        tiger = np.concatenate([lat for lat, _ in store.iter_coordinates(5219416)])
+        lion = np.concatenate([lon for _, lon in store.iter_coordinates(5219404)])
+        self.assertEqual(tiger.tolist(), [20.5 + i for i in range(7)])
+        self.assertEqual(lion.tolist(), [30.5 + i for i in range(7)])
+
+    def test_malformed_taxon_keys_are_skipped(self):
+        """Test that a row with an unparseable key is skipped instead of aborting the ingest."""
+        archive = os.path.join(self.directory, "malformed.zip")
+        rows = [self.HEADER, ["1", "5219416", "5219416", "", "", "", "", "", "", "20.5", "79.5"],
+                ["2", "x", "5219416.0", "", "", "", "", "", "", "21.5", "79.5"]]
+        with zipfile.ZipFile(archive, "w") as handle:
+            handle.writestr("occurrence.txt", "\n".join("\t".join(row) for row in rows) + "\n")
+        meta = ingest_archive(archive, os.path.join(self.directory, "malformed"))
+        self.assertEqual((meta["rows_stored"], meta["rows_skipped"]), (1, 1))
+
+    def test_malformed_keys_fall_back_or_are_left_out(self):
+        """Test that a bad species key falls back to the taxon key and a bad rank key is dropped."""
+        archive = os.path.join(self.directory, "rank.zip")
+        rows = [self.HEADER, ["1", "5219416", "abc", "2435194", "", "", "", "", "", "20.5", "79.5"],
+                ["2", "5219404", "5219404", "abc", "", "", "", "", "", "21.5", "79.5"]]
+        with zipfile.ZipFile(archive, "w") as handle:
+            handle.writestr("occurrence.txt", "\n".join("\t".join(row) for row in rows) + "\n")
+        store_dir = os.path.join(self.directory, "rank")
+        meta = ingest_archive(archive, store_dir)
+        self.assertEqual((meta["rows_stored"], meta["rows_skipped"], meta["taxa"]), (2, 0, 2))
+        store = OccurrenceStore(store_dir)
+        self.assertEqual((store.count(5219416), store.count(5219404)), (1, 1))
+        self.assertEqual(store.count(2435194), 1)
+
+    def test_coordinates_are_streamed_per_taxon(self):
+        """Test that a taxon's coordinates come back in bounded chunks."""
+        store = OccurrenceStore(self.store_dir)
+        chunks = list(store.iter_coordinates(5219416, chunk_size=4))
+        self.assertEqual([len(lat) for lat, _ in chunks], [4, 3])
+        self.assertTrue(all(np.all(lon == 79.5) for _, lon in chunks))
+
+    def test_species_search_matches_names(self):
+        """Test exact vernacular matches and partial scientific matches."""
+        store = OccurrenceStore(self.store_dir)
+        tiger = store.species_search("tiger")
+        self.assertEqual(tiger["source"], "local")
+        self.assertEqual(tiger["results"][0]["canonicalName"], "Panthera tigris")
+        self.assertEqual(tiger["results"][0]["occurrenceCount"], 7)
+        self.assertEqual(store.species_search("panthera")["count"], 2)
+        self.assertEqual(store.species_search("zebra")["count"], 0)
+
+    @patch('tools.occurrence_tool.requests.get')
+    @patch('tools.species_tool.requests.get')
+    def test_tools_answer_from_configured_store(self, mock_species_get, mock_occurrence_get):
+        """Test that the tools skip the network for taxa held locally."""
+        with patch.dict(os.environ, {OCCURRENCE_STORE_ENV: self.store_dir}):
+            species = fetch_species("Panthera leo")
+            distribution = fetch_occurrence_distribution("Tiger")
+        mock_species_get.assert_not_called()
+        mock_occurrence_get.assert_not_called()
+        self.assertEqual(species["results"][0]["key"], 5219404)
+        self.assertEqual(distribution["source"], "local store")
+        self.assertEqual(distribution["records_binned"], 7)
+
+
+class TestOccurrenceTool(unittest.TestCase):
+    """Test cases for fetch_occurrence_distribution."""
+
+    @patch('tools.occurrence_tool.requests.get')
+    def test_fetch_distribution_success(self, mock_get):
+        """Test the end-to-end summary for a matched species."""
+        mock_get.side_effect = [
+            _json_response({"usageKey": 5219416}),
+            _json_response({"results": [{"decimalLatitude": 21.5, "decimalLongitude": 79.5}],
+                            "endOfRecords": True})
+        ]
+        result = fetch_occurrence_distribution("Panthera tigris")
+        self.assertEqual(result["taxonKey"], 5219416)
+        self.assertEqual(result["records_binned"], 1)
+        self.assertEqual(result["top_cells"][0]["lat"], 21.5)
+        self.assertIn('"records_binned":1', distribution_context(result))
+
+    @patch('tools.occurrence_tool.fetch_species')
+    @patch('tools.occurrence_tool.requests.get')
+    def test_common_name_falls_back_to_search(self, mock_get, mock_fetch_species):
+        """Test that unmatched common names use the backbone key of a search hit."""
+        mock_get.return_value = _json_response({"matchType": "NONE"})
+        mock_fetch_species.return_value = {"results": [{"key": 1}, {"key": 2, "nubKey": 5219416}]}
+        self.assertEqual(resolve_taxon_key("tiger"), 5219416)
+
+    @patch('tools.occurrence_tool.requests.get')
+    def test_fetch_distribution_connection_error(self, mock_get):
+        """Test handling of connection errors."""
+        mock_get.side_effect = requests.exceptions.ConnectionError("Connection failed")
+        result = fetch_occurrence_distribution("tiger")
+        self.assertIn("Connection error", result["error"])
+        self.assertEqual(result["top_cells"], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
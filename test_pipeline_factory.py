@@ -0,0 +1,129 @@
+"""
+Unit tests for the pipeline factory and concurrent analyses without cross-talk.
+"""
+import dataclasses
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from pipeline_factory import ANALYSIS_PIPELINE, CLI_PIPELINE, RESEARCH_TOOLS
+from llm_backend import LLM_BACKEND_ENV, STUB_LATENCY_ENV
+
+SPECIES = ("tiger", "whale", "elephant", "snow leopard")
+OFFLINE_ENV = {"CREWAI_DISABLE_TELEMETRY": "true", "OTEL_SDK_DISABLED": "true",
+               LLM_BACKEND_ENV: "stub", STUB_LATENCY_ENV: "uniform:0.01,0.05"}
+
+
+def _distribution(species_name):
+    return {"records_binned": len(species_name), "top_cells": [{"lat": 1.5, "lon": 2.5, "count": len(species_name)}]}
+
+
+@patch.dict(os.environ, OFFLINE_ENV)
+@patch('tools.habitat_climate.get_habitat_summary', return_value=None)
+class TestPipelineFactory(unittest.TestCase):
+    """Test cases for shared templates and per-request pipelines."""
+
+    def test_templates_are_immutable(self, mock_habitat):
+        """Test that shared templates cannot be changed by a request."""
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            ANALYSIS_PIPELINE.agents["research"].tools = ()
+        with self.assertRaises(TypeError):
+            ANALYSIS_PIPELINE.agents["research"] = CLI_PIPELINE.agents["research"]
+        self.assertIsInstance(ANALYSIS_PIPELINE.tasks, tuple)
+
+    def test_builds_share_nothing(self, mock_habitat):
+        """Test that every build gets its own agents, tools and tasks, tools set at construction."""
+        first = ANALYSIS_PIPELINE.build("tiger", distribution=_distribution("tiger"))
+        second = ANALYSIS_PIPELINE.build("whale")
+
+        research = first.agents["research"]
+        self.assertEqual([type(tool).__name__ for tool in research.tools], list(RESEARCH_TOOLS))
+        self.assertEqual(first.agents["report"].tools, [])
+        for name in first.agents:
+            self.assertIsNot(first.agents[name], second.agents[name])
+        self.assertTrue(set(map(id, research.tools)).isdisjoint(map(id, second.agents["research"].tools)))
+        self.assertTrue(set(map(id, first.tasks)).isdisjoint(map(id, second.tasks)))
+
+        species_task, climate_task, analysis_task, report_task = first.tasks
+        self.assertIs(species_task.agent, research)
+        self.assertEqual(analysis_task.context, [species_task, climate_task])
+        self.assertEqual(report_task.context, [analysis_task])
+        self.assertIn("'tiger'", species_task.description)
+        self.assertIn("latitude/longitude grid", analysis_task.description)
+        self.assertNotIn("latitude/longitude grid", second.tasks[2].description)
+        self.assertEqual(ANALYSIS_PIPELINE.agents["research"].tools, RESEARCH_TOOLS)
+
+    def test_cli_helpers_use_template(self, mock_habitat):
+        """Test that main.py's agent and task helpers build from CLI_PIPELINE."""
+        from main import create_research_agent, create_analysis_agent, create_report_agent, create_tasks
+        research = create_research_agent()
+        self.assertEqual(len(research.tools), len(RESEARCH_TOOLS))
+        tasks = create_tasks(research, create_analysis_agent(), create_report_agent(), "tiger")
+        self.assertEqual(len(tasks), 4)
+        self.assertIn("about tiger.", tasks[0].description)
+        self.assertNotIn("latitude/longitude", tasks[2].description)
+
+
+class TestCaptureOutput(unittest.TestCase):
+    """Test cases for per-thread output capture."""
+
+    def test_threads_capture_only_their_output(self):
+        """Test that overlapping captures never see each other's writes."""
+        from streamlit_utils import capture_output
+        original = sys.stdout, sys.stderr
+        barrier = threading.Barrier(6)
+
+        def capture(index):
+            with capture_output() as (stdout_capture, stderr_capture):
+                barrier.wait()
+                for _ in range(20):
+                    print(f"thread-{index}")
+                    print(f"error-{index}", file=sys.stderr)
+                    time.sleep(0.001)
+            return stdout_capture.getvalue(), stderr_capture.getvalue()
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            outputs = list(executor.map(capture, range(6)))
+        for index, (stdout_text, stderr_text) in enumerate(outputs):
+            self.assertEqual(stdout_text, f"thread-{index}\n" * 20)
+            self.assertEqual(stderr_text, f"error-{index}\n" * 20)
+        self.assertEqual((sys.stdout, sys.stderr), original)
+
+
+@patch.dict(os.environ, OFFLINE_ENV)
+class TestConcurrentAnalyses(unittest.TestCase):
+    """Stress test: many concurrent crew analyses against the stub backend."""
+
+    @patch('tools.habitat_climate.get_habitat_summary', return_value=None)
+    @patch('tools.occurrence_tool.fetch_occurrence_distribution', side_effect=_distribution)
+    @patch('streamlit_utils.fetch_climate_data', return_value={"current_weather": {"temperature": 18.5}})
+    @patch('streamlit_utils.fetch_species', side_effect=lambda name: {"count": len(name), "results": []})
+    @patch('streamlit_utils.get_cache', return_value=None)
+    def test_no_cross_talk(self, mock_cache, mock_species, mock_climate, mock_distribution, mock_habitat):
+        """Test that each request gets its own report, data and token accounting."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        requests = [SPECIES[index % len(SPECIES)] for index in range(16)]
+        original = sys.stdout, sys.stderr
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            outcomes = list(executor.map(lambda name: run_wildlife_analysis_streamlit(name, mode="crew"), requests))
+
+        for species_name, (result, logs, species_data, _climate) in zip(requests, outcomes):
+            self.assertIsNone(logs.get("error"))
+            self.assertIn(f"Report Writer summary for {species_name}", str(result))
+            for other in SPECIES:
+                if other != species_name:
+                    self.assertNotIn(f"for {other}", str(result))
+            self.assertEqual(species_data["count"], len(species_name))
+            self.assertEqual(logs["tokens"]["total"]["llm_calls"], 4)
+            for stage in ("species", "climate", "analysis", "report"):
+                self.assertEqual(logs["tokens"][stage]["llm_calls"], 1)
+        self.assertEqual((sys.stdout, sys.stderr), original)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Unit tests for the opt-in sampling profiler.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from profiling import SamplingProfiler, profiled, set_profiling, PROFILE_ENV, PROFILE_DIR_ENV
+
+
+def _spin_in_tool_thread(seconds):
+    """Burn CPU in a helper thread, as tool calls made by the crew do."""
+    def spin():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+    worker = threading.Thread(target=spin, name="tool-worker")
+    worker.start()
+    worker.join()
+    return "done"
+
+
+class TestProfiling(unittest.TestCase):
+    """Test cases for @profiled and SamplingProfiler."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {PROFILE_DIR_ENV: self.directory})
+        self.env.start()
+
+    def tearDown(self):
+        set_profiling(None)
+        self.env.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_disabled_by_default(self):
+        """Test that nothing is sampled or written unless profiling is on."""
+        with patch.dict(os.environ, {PROFILE_ENV: ""}):
+            self.assertEqual(profiled("run")(_spin_in_tool_thread)(0.01), "done")
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_profile_files_written_per_run(self):
+        """Test that each run saves collapsed stacks and a summary covering worker threads."""
+        with patch.dict(os.environ, {PROFILE_ENV: "1"}):
+            self.assertEqual(profiled("run")(_spin_in_tool_thread)(0.2), "done")
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual([os.path.splitext(name)[1] for name in files], [".collapsed", ".json"])
+
+        with open(os.path.join(self.directory, files[0])) as handle:
+            lines = handle.read().splitlines()
+        spinning = [line for line in lines if line.startswith("tool-worker;") and "spin (" in line]
+        self.assertTrue(spinning)
+        stack, count = spinning[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+
+        with open(os.path.join(self.directory, files[1])) as handle:
+            summary = json.load(handle)
+        self.assertEqual(summary["label"], "run")
+        self.assertGreater(summary["samples"], 10)
+        self.assertTrue(any("spin (" in frame for frame, _ in summary["top"]["self"]))
+
+    def test_concurrent_requests_profiled_separately(self):
+        """Test that a run samples only its own thread and the threads it starts."""
+        stop = threading.Event()
+
+        def other_session():
+            while not stop.is_set():
+                sum(range(1000))
+
+        bystander = threading.Thread(target=other_session, name="other-session")
+        bystander.start()
+        concurrent = threading.Thread(target=profiled("concurrent")(_spin_in_tool_thread), args=(0.2,),
+                                      name="concurrent-request")
+        try:
+            with patch.dict(os.environ, {PROFILE_ENV: "1"}):
+                concurrent.start()
+                profiled("run")(_spin_in_tool_thread)(0.2)
+                concurrent.join()
+        finally:
+            stop.set()
+            bystander.join()
+
+        collapsed = [name for name in os.listdir(self.directory) if name.endswith(".collapsed")]
+        self.assertEqual(len(collapsed), 2)
+        for name in collapsed:
+            with open(os.path.join(self.directory, name)) as handle:
+                threads = {line.split(";", 1)[0] for line in handle.read().splitlines()}
+            self.assertIn("tool-worker", threads)
+            self.assertFalse(threads & {"other-session", "sampling-profiler"})
+            self.assertEqual(len(threads - {"tool-worker"}), 1)
+
+    def test_toggle_overrides_env_and_errors_propagate(self):
+        """Test the programmatic toggle and that failing runs are still saved."""
+        @profiled("failing")
+        def fail():
+            raise RuntimeError("boom")
+
+        set_profiling(True)
+        with patch.dict(os.environ, {PROFILE_ENV: "0"}), self.assertRaises(RuntimeError):
+            fail()
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_top_functions_counts_self_and_total(self):
+        """Test the self/total aggregation over collapsed stacks."""
+        profiler = SamplingProfiler()
+        profiler.stacks.update({("main", "a", "b"): 3, ("main", "a"): 2})
+        top = profiler.top_functions()
+        self.assertEqual(dict(top["self"]), {"b": 3, "a": 2})
+        self.assertEqual(dict(top["total"]), {"a": 5, "b": 3})
+        self.assertEqual(profiler.collapsed(), "main;a;b 3\nmain;a 2\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Unit tests for prompt compaction, context budgeting and per-stage token accounting.
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from tools import metrics
+from tools.json_backend import dumps, loads
+from tools.prompt_budget import (
+    PromptBudget, estimate_tokens, compact_prompt, dedupe_lines, shrink_output, PIPELINE_STAGES
+)
+
+
+def _species_response(results):
+    return dumps({
+        "count": results, "offset": 0, "endOfRecords": False, "facets": [],
+        "results": [{"key": index, "scientificName": f"Panthera tigris {index}", "kingdom": "Animalia",
+                     "vernacularNames": [], "remarks": None, "descriptions": [{"description": "x" * 200}]}
+                    for index in range(results)]
+    }, indent=True)
+
+
+def _task(task_id, description, agent, context=None):
+    return SimpleNamespace(id=task_id, name=None, description=description, expected_output="A summary.",
+                           agent=agent, context=context, callback=None)
+
+
+class TestShrinking(unittest.TestCase):
+    """Test cases for the text helpers."""
+
+    def test_compaction_keeps_wording(self):
+        """Test that indentation of triple-quoted prompts is removed and counted."""
+        prompt = """Analyze the data. Extract
+        key information including:
+        - Total number of species found
+
+
+        Provide structured insights."""
+        compacted = compact_prompt(prompt)
+        self.assertEqual(compacted, "Analyze the data. Extract\nkey information including:\n"
+                                    "- Total number of species found\n\nProvide structured insights.")
+        self.assertLess(estimate_tokens(compacted), estimate_tokens(prompt))
+
+    def test_repeated_lines_dropped(self):
+        """Test that long lines already sent are dropped and short ones kept."""
+        seen = set()
+        first = "The tiger is listed as endangered by the IUCN Red List.\n}"
+        self.assertEqual(dedupe_lines(first, seen), first)
+        self.assertEqual(dedupe_lines("the tiger is listed as  endangered by the IUCN Red List.\n}\nNew", seen),
+                         "}\nNew")
+
+    def test_json_pruned_before_truncating(self):
+        """Test that big JSON outputs lose empty fields and list tails but stay valid JSON."""
+        raw = _species_response(40)
+        self.assertGreater(estimate_tokens(raw), 1000)
+        shrunk = shrink_output(raw, 600)
+        self.assertLessEqual(estimate_tokens(shrunk), 600)
+        document = loads(shrunk)
+        self.assertNotIn("facets", document)
+        self.assertNotIn("remarks", document["results"][0])
+        self.assertTrue(document["results"][-1].endswith("more"))
+
+    def test_prose_truncated_with_marker(self):
+        """Test the last-resort truncation of text that is not JSON."""
+        raw = "\n".join(f"Finding {index}: tigers were observed in region {index} of the reserve."
+                        for index in range(200))
+        shrunk = shrink_output(raw, 100)
+        self.assertLessEqual(estimate_tokens(shrunk), 130)
+        self.assertTrue(shrunk.startswith("Finding 0:"))
+        self.assertIn("tokens omitted to fit the context budget", shrunk)
+
+
+class TestPromptBudget(unittest.TestCase):
+    """Test cases for PromptBudget on a four-stage pipeline."""
+
+    def setUp(self):
+        self.researcher = SimpleNamespace(role="Wildlife Researcher", goal="Fetch data",
+                                          backstory="""You are an expert wildlife researcher
+            with deep knowledge of biodiversity databases.""")
+        self.writer = SimpleNamespace(role="Report Writer", goal="Write", backstory="You write reports.")
+        self.species = _task("t1", "Fetch the species.", self.researcher)
+        self.climate = _task("t2", "Fetch the climate.", self.researcher)
+        self.analysis = _task("t3", "Analyze it.", self.writer, [self.species, self.climate])
+        self.report = _task("t4", "Report it.", self.writer, [self.analysis])
+        self.tasks = [self.species, self.climate, self.analysis, self.report]
+
+    def test_attach_compacts_and_splits_budget(self):
+        """Test that prompts are compacted and a task's inputs share its context budget."""
+        budget = PromptBudget(context_tokens=800).attach(self.tasks, PIPELINE_STAGES)
+        self.addCleanup(budget.finish, 0)
+        self.assertEqual(self.researcher.backstory,
+                         "You are an expert wildlife researcher\nwith deep knowledge of biodiversity databases.")
+        stages = budget.report()
+        self.assertGreater(stages["species"]["instruction_tokens_saved"], 0)
+        # The shared agent's backstory is sent, and saved, once per task
+        self.assertEqual(stages["species"]["instruction_tokens_saved"],
+                         stages["climate"]["instruction_tokens_saved"])
+        self.assertIsNone(self.report.callback)
+
+        output = SimpleNamespace(raw=_species_response(40))
+        self.species.callback(output)
+        self.assertLessEqual(estimate_tokens(output.raw), 400)
+        output = SimpleNamespace(raw="Analysis: " + "tigers " * 100)
+        self.analysis.callback(output)
+        self.assertEqual(budget.report()["analysis"]["context_tokens_in"],
+                         budget.report()["analysis"]["context_tokens_out"])
+
+    def test_env_sets_default_budget(self):
+        """Test the WILDLIFE_CONTEXT_TOKENS override."""
+        with patch.dict('os.environ', {"WILDLIFE_CONTEXT_TOKENS": "321"}):
+            self.assertEqual(PromptBudget().context_tokens, 321)
+
+    def test_llm_calls_accounted_per_stage(self):
+        """Test that estimates are replaced by provider counts and totals are exported."""
+        budget = PromptBudget().attach(self.tasks, PIPELINE_STAGES)
+        messages = [{"role": "system", "content": "You write reports."}, {"role": "user", "content": "Analyze it."}]
+        budget.record_llm_call(SimpleNamespace(task_id="t3", messages=messages), False)
+        self.assertEqual(budget.report()["analysis"]["prompt_tokens"], estimate_tokens("You write reports.\nAnalyze it."))
+        budget.record_llm_call(SimpleNamespace(task_id="t3", messages=messages, response="Done.",
+                                               usage={"prompt_tokens": 120, "completion_tokens": 30}), True)
+        budget.record_llm_call(SimpleNamespace(task_id="t4", messages="Report it.", response="A short report.",
+                                               usage=None), False)
+        budget.record_llm_call(SimpleNamespace(task_id="t4", messages="Report it.", response="A short report.",
+                                               usage=None), True)
+        budget.record_llm_call(SimpleNamespace(task_id="other", messages="x"), False)
+
+        before = metrics.STAGE_TOKENS.value(stage="analysis", kind="prompt")
+        report = budget.finish(0)
+        self.assertEqual(report["analysis"]["llm_calls"], 1)
+        self.assertEqual(report["analysis"]["prompt_tokens"], 120)
+        self.assertEqual(report["analysis"]["completion_tokens"], 30)
+        self.assertEqual(report["report"]["completion_tokens"], estimate_tokens("A short report."))
+        self.assertEqual(report["total"]["llm_calls"], 2)
+        self.assertEqual(metrics.STAGE_TOKENS.value(stage="analysis", kind="prompt"), before + 120)
+        self.assertEqual(len(budget.format_report()), len(PIPELINE_STAGES) + 2)
+
+    def test_grown_context_saves_nothing(self):
+        """Test that context re-serialized longer than its input never decrements the saved counter."""
+        budget = PromptBudget()
+        budget.stages["analysis"] = dict(budget._stage("analysis"), context_tokens_in=10, context_tokens_out=14)
+        before = metrics.STAGE_TOKENS.value(stage="analysis", kind="context_saved")
+        budget.finish(0)
+        self.assertEqual(metrics.STAGE_TOKENS.value(stage="analysis", kind="context_saved"), before)
+
+    def test_crewai_tasks(self):
+        """Test that real CrewAI tasks accept the compacted prompts and callbacks."""
+        from crewai import Agent, Task
+        agent = Agent(role="Data Analyst", goal="Analyze", backstory="""Skilled analyst
+            of biodiversity data.""", llm="gpt-4o-mini")
+        first = Task(description="Fetch   data.", expected_output="Data.", agent=agent)
+        second = Task(description="Analyze data.", expected_output="Analysis.", agent=agent, context=[first])
+        budget = PromptBudget(context_tokens=50).attach([first, second])
+        self.addCleanup(budget.finish, 0)
+        self.assertEqual(first.description, "Fetch data.")
+        self.assertEqual(agent.backstory, "Skilled analyst\nof biodiversity data.")
+        self.assertIsNotNone(first.callback)
+        self.assertEqual(set(budget.report()), {"task1", "task2", "total"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Unit tests for the typed species and climate records.
+"""
+import json
+import math
+import unittest
+
+from tools.records import SpeciesRecord, SpeciesSearch, ClimateSeries, json_default
+from charts import kingdom_counts, dataset_hash
+from streamlit_utils import estimate_size
+
+
+SPECIES_RESPONSE = {
+    "offset": 0,
+    "limit": 20,
+    "endOfRecords": False,
+    "count": 42,
+    "results": [
+        {
+            "key": 5219416,
+            "scientificName": "Panthera tigris (Linnaeus, 1758)",
+            "canonicalName": "Panthera tigris",
+            "kingdom": "Animalia",
+            "phylum": "Chordata",
+            "class": "Mammalia",
+            "rank": "SPECIES",
+            "taxonomicStatus": "ACCEPTED",
+            "descriptions": [{"description": "Large striped cat."}],
+            "vernacularNames": [
+                {"vernacularName": "Tigre", "language": "fra"},
+                {"vernacularName": "Tiger", "language": "eng"}
+            ]
+        },
+        {"key": 1, "scientificName": "Unplaced"}
+    ]
+}
+
+CLIMATE_RESPONSE = {
+    "latitude": 40.71,
+    "longitude": -74.01,
+    "timezone": "America/New_York",
+    "current_weather": {"temperature": 15.2, "windspeed": 10.5, "time": "2024-01-01T12:00"},
+    "daily": {
+        "time": ["2024-01-01", "2024-01-02"],
+        "temperature_2m_max": [18.5, None],
+        "temperature_2m_min": [10.2, 9.0],
+        "precipitation_sum": [0.0, 2.5]
+    }
+}
+
+
+class TestSpeciesRecords(unittest.TestCase):
+    """Test cases for SpeciesSearch and SpeciesRecord."""
+
+    def test_parses_kept_fields(self):
+        """Test that the used fields become attributes."""
+        search = SpeciesSearch.from_response(SPECIES_RESPONSE)
+        self.assertEqual((search.count, search.end_of_records, len(search)), (42, False, 2))
+        tiger = search.records[0]
+        self.assertEqual(tiger.scientific_name, "Panthera tigris (Linnaeus, 1758)")
+        self.assertEqual(tiger.class_name, "Mammalia")
+        self.assertEqual(tiger.vernacular_name, "Tiger")
+        self.assertIsNone(search.records[1].kingdom)
+        self.assertFalse(hasattr(tiger, "__dict__"))
+
+    def test_get_uses_gbif_field_names_and_raw_fallback(self):
+        """Test dict-style access, including fields only kept in the raw payload."""
+        tiger = SpeciesSearch.from_response(SPECIES_RESPONSE).records[0]
+        self.assertEqual(tiger.get("class"), "Mammalia")
+        self.assertEqual(tiger.get("descriptions"), [{"description": "Large striped cat."}])
+        self.assertEqual(SpeciesRecord.from_result({}).get("kingdom", "Unknown"), "Unknown")
+        self.assertEqual(tiger.raw, SPECIES_RESPONSE["results"][0])
+
+    def test_to_dict_is_compact(self):
+        """Test conversion back to the species/search shape."""
+        search = SpeciesSearch.from_response(SPECIES_RESPONSE)
+        compact = search.to_dict()
+        self.assertEqual(compact["count"], 42)
+        self.assertNotIn("descriptions", compact["results"][0])
+        self.assertEqual(compact["results"][1], {"key": 1, "scientificName": "Unplaced"})
+        self.assertEqual(search.to_dict(raw=True)["results"], SPECIES_RESPONSE["results"])
+
+    def test_error_response(self):
+        """Test that tool error results keep their message."""
+        search = SpeciesSearch.from_response({"error": "Connection error", "results": [], "count": 0})
+        self.assertEqual((search.error, search.count, search.records), ("Connection error", 0, ()))
+        self.assertEqual(search.to_dict()["error"], "Connection error")
+
+    def test_existing_helpers_accept_records(self):
+        """Test chart, hashing and history-size helpers on records."""
+        search = SpeciesSearch.from_response(SPECIES_RESPONSE)
+        self.assertEqual(kingdom_counts(search.records), {"Animalia": 1, "Unknown": 1})
+        self.assertEqual(dataset_hash(search), dataset_hash(SpeciesSearch.from_response(SPECIES_RESPONSE)))
+        self.assertNotEqual(dataset_hash(search), dataset_hash(SpeciesSearch.from_response({"count": 1})))
+        self.assertGreater(estimate_size({"species_data": search}), 200)
+
+
+class TestClimateSeries(unittest.TestCase):
+    """Test cases for ClimateSeries."""
+
+    def test_parses_series_into_arrays(self):
+        """Test current conditions and daily arrays, with NaN for gaps."""
+        series = ClimateSeries.from_response(CLIMATE_RESPONSE)
+        self.assertTrue(series.has_current)
+        self.assertEqual(series.current_temperature, 15.2)
+        self.assertEqual(series.days, ("2024-01-01", "2024-01-02"))
+        self.assertEqual(series.temperature_max.typecode, "d")
+        self.assertTrue(math.isnan(series.temperature_max[1]))
+
+    def test_round_trip(self):
+        """Test conversion back to the Open Meteo shape and lazy raw access."""
+        series = ClimateSeries.from_response(CLIMATE_RESPONSE)
+        self.assertEqual(series.to_dict()["daily"], CLIMATE_RESPONSE["daily"])
+        self.assertEqual(series.raw, CLIMATE_RESPONSE)
+        self.assertEqual(json.loads(json.dumps(series, default=json_default))["latitude"], 40.71)
+
+    def test_error_and_empty_responses(self):
+        """Test that errors and missing data have no current conditions."""
+        error = ClimateSeries.from_response({"error": "Request timeout", "current_weather": {}, "daily": {}})
+        self.assertFalse(error.has_current)
+        self.assertEqual(error.to_dict()["error"], "Request timeout")
+        self.assertFalse(ClimateSeries.from_response({}).has_current)
+        self.assertEqual(len(ClimateSeries().temperature_max), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
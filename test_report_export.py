@@ -0,0 +1,216 @@
+"""
+Unit tests for the report export archive.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from tools import report_export
+from tools.records import ClimateSeries
+from tools.report_export import (
+    COLUMNS, EXPORT_ERRORS, REPORT_EXPORT_ENV, compact, export_analysis, get_report_exporter, open_writer,
+    page_reports, report_row
+)
+
+SPECIES_DATA = {"count": 3, "results": [{"key": 5219416, "scientificName": "Panthera tigris (Linnaeus, 1758)",
+                                         "family": "Felidae", "taxonomicStatus": "ACCEPTED"}]}
+CLIMATE_DATA = {"latitude": 40.7, "longitude": -74.0, "current_weather": {"temperature": 18.5},
+                "daily": {"time": ["2026-10-18", "2026-10-19"], "temperature_2m_max": [20.0, 22.0],
+                          "temperature_2m_min": [10.0, None], "precipitation_sum": [1.5, 0.25]}}
+TOKENS = {"total": {"prompt_tokens": 500, "completion_tokens": 120, "llm_calls": 4}}
+
+
+def _rows(count, species="tiger", start=0):
+    return [report_row(species, f"Report {index}", row_id=f"{species}-{index}") for index in range(start, count)]
+
+
+class TestReportRows(unittest.TestCase):
+    """Test cases for building archive rows."""
+
+    def test_row_has_report_tokens_and_aggregates(self):
+        """Test that every column is filled from the analysis and its data."""
+        row = report_row("tiger", "# Tiger", species_data=SPECIES_DATA,
+                         climate_data=ClimateSeries.from_response(CLIMATE_DATA),
+                         distribution={"records_binned": 300, "occupied_cells": 12}, tokens=TOKENS, mode="fused",
+                         seconds=2.34567)
+        self.assertEqual(set(row), set(COLUMNS))
+        self.assertEqual((row["status"], row["report"], row["mode"], row["seconds"]), ("ok", "# Tiger", "fused", 2.346))
+        self.assertEqual((row["prompt_tokens"], row["llm_calls"]), (500, 4))
+        self.assertEqual((row["taxon_key"], row["family"], row["species_count"]), (5219416, "Felidae", 3))
+        self.assertEqual((row["temperature_max_mean"], row["temperature_min_mean"]), (21.0, 10.0))
+        self.assertEqual((row["precipitation_total"], row["climate_days"]), (1.75, 2))
+        self.assertEqual(row["records_binned"], 300)
+        self.assertEqual(report_row("tiger", "# Tiger", climate_data=CLIMATE_DATA)["current_temperature"], 18.5)
+
+    def test_failed_analysis_row(self):
+        """Test that missing data and reports give an error row of None aggregates."""
+        row = report_row("pug", None, error="Error executing crew")
+        self.assertEqual((row["status"], row["error"], row["report"]), ("error", "Error executing crew", None))
+        self.assertIsNone(row["taxon_key"])
+        self.assertIsNone(row["precipitation_total"])
+
+
+class TestArchives(unittest.TestCase):
+    """Test cases shared by the JSONL, SQLite and Parquet archives."""
+
+    PATHS = ("reports.jsonl", "reports.sqlite3", "reports.parquet")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, "archive", name)
+
+    def _all(self, path, page_size=4, **filters):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page = page_reports(path, page_size, cursor, **filters)
+            rows.extend(page["rows"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return rows, pages
+
+    def test_buffered_appends_and_paged_reads(self):
+        """Test that rows reach disk only in bounded batches and page back in order."""
+        for name in self.PATHS:
+            with self.subTest(format=name):
+                path = self._path(name)
+                writer = open_writer(path, buffer_rows=3, flush_interval=60)
+                rows = _rows(7) + _rows(2, species="whale")
+                for row in rows[:2]:
+                    writer.write(row)
+                self.assertEqual(page_reports(path)["rows"], [])
+                for row in rows[2:]:
+                    writer.write(row)
+                self.assertEqual(len(page_reports(path)["rows"]), 9 - 9 % 3)
+                writer.close()
+
+                read, pages = self._all(path)
+                self.assertEqual([row["id"] for row in read], [row["id"] for row in rows])
+                self.assertEqual(read[0], rows[0])
+                self.assertEqual(pages, 3)
+                whales, _ = self._all(path, page_size=1, species="whale")
+                self.assertEqual([row["id"] for row in whales], ["whale-0", "whale-1"])
+                self.assertEqual(self._all(path, since=rows[0]["exported_at"] + 3600)[0], [])
+
+                # Appending later continues the same archive
+                with open_writer(path) as writer:
+                    writer.write(_rows(1, species="elephant")[0])
+                self.assertEqual(len(self._all(path)[0]), 10)
+
+    def test_buffer_bytes_and_interval(self):
+        """Test that large reports and old buffered rows are written out early."""
+        path = self._path("reports.jsonl")
+        writer = open_writer(path, buffer_rows=100, buffer_bytes=10000, flush_interval=60)
+        writer.write(report_row("tiger", "x" * 20000))
+        self.assertEqual(len(page_reports(path)["rows"]), 1)
+        writer.flush_interval = 0
+        writer.write(report_row("whale", "short"))
+        self.assertEqual(len(page_reports(path)["rows"]), 2)
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.write(report_row("whale", "late"))
+
+    def test_parquet_parts_per_flush(self):
+        """Test that each flush adds one complete part file."""
+        path = self._path("reports.parquet")
+        with open_writer(path, buffer_rows=2) as writer:
+            for row in _rows(5):
+                writer.write(row)
+        self.assertEqual(len(report_export._parquet_parts(path)), 3)
+        self.assertFalse([name for name in os.listdir(path) if name.endswith(".tmp")])
+
+    def test_compaction(self):
+        """Test that compaction keeps the last row per id, drops old rows and merges parts."""
+        for name in self.PATHS:
+            with self.subTest(format=name):
+                path = self._path(name)
+                rows = _rows(6)
+                rows[0]["exported_at"] -= 10 * 24 * 60 * 60
+                rerun = dict(rows[3], report="Report 3, rerun")
+                with open_writer(path, buffer_rows=2) as writer:
+                    for row in rows + [rerun]:
+                        writer.write(row)
+                result = compact(path, keep_since=rows[1]["exported_at"] - 60)
+                self.assertEqual(result, {"rows_before": 7, "rows_after": 5})
+                read, _ = self._all(path, page_size=100)
+                self.assertEqual([row["id"] for row in read], ["tiger-1", "tiger-2", "tiger-4", "tiger-5", "tiger-3"])
+                self.assertEqual(read[-1]["report"], "Report 3, rerun")
+                if name.endswith(".parquet"):
+                    self.assertEqual(len(report_export._parquet_parts(path)), 1)
+                self.assertEqual(compact(path), {"rows_before": 5, "rows_after": 5})
+
+    def test_unknown_format_rejected(self):
+        """Test that paths without a known extension raise instead of guessing."""
+        with self.assertRaises(ValueError):
+            open_writer(self._path("reports.csv"))
+        with self.assertRaises(ValueError):
+            open_writer(self._path("reports.out"), format="csv")
+
+
+class TestExportAnalysis(unittest.TestCase):
+    """Test cases for archiving analyses through WILDLIFE_REPORT_EXPORT."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "reports.jsonl")
+
+    def tearDown(self):
+        if report_export._exporter is not None:
+            report_export._exporter.close()
+            report_export._exporter = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_disabled_without_path(self):
+        """Test that nothing is exported unless the variable is set."""
+        with patch.dict(os.environ, {REPORT_EXPORT_ENV: ""}):
+            self.assertIsNone(get_report_exporter())
+            self.assertFalse(export_analysis("tiger", "# Tiger"))
+
+    def test_errors_never_fail_the_analysis(self):
+        """Test that an unusable archive path is counted instead of raised."""
+        errors = EXPORT_ERRORS.value()
+        with patch.dict(os.environ, {REPORT_EXPORT_ENV: os.path.join(self.directory, "reports.csv")}):
+            self.assertFalse(export_analysis("tiger", "# Tiger"))
+        self.assertEqual(EXPORT_ERRORS.value(), errors + 1)
+
+    @patch('streamlit_utils.get_cache', return_value=None)
+    @patch('fused_pipeline.run_fused_analysis')
+    def test_analyses_are_archived(self, mock_fused, mock_cache):
+        """Test that a Streamlit analysis is archived with its data aggregates."""
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        mock_fused.return_value = {
+            "report": "# Tiger report", "tokens": TOKENS, "analysis": {}, "seconds": {"tools": 0.5, "llm": 1.25},
+            "inputs": {"species": SPECIES_DATA, "climate": CLIMATE_DATA, "distribution": {"records_binned": 9}}
+        }
+        with patch.dict(os.environ, {REPORT_EXPORT_ENV: self.path, "WILDLIFE_LLM_BACKEND": "stub"}):
+            run_wildlife_analysis_streamlit("tiger", mode="fused")
+            get_report_exporter().flush()
+        with open(self.path, encoding="utf-8") as handle:
+            row = json.loads(handle.readline())
+        self.assertEqual((row["species"], row["mode"], row["report"]), ("tiger", "fused", "# Tiger report"))
+        self.assertEqual((row["scientific_name"], row["records_binned"], row["seconds"]),
+                         ("Panthera tigris (Linnaeus, 1758)", 9, 1.75))
+
+    def test_command_line(self):
+        """Test reading pages and compacting from the command line."""
+        path = os.path.join(self.directory, "reports.sqlite3")
+        with open_writer(path) as writer:
+            for row in _rows(3) + _rows(3, start=2):
+                writer.write(row)
+        page = report_export.main(["read", path, "--page-size", "2"])
+        self.assertEqual(len(page["rows"]), 2)
+        self.assertEqual(report_export.main(["read", path, "--cursor", page["next_cursor"]])["next_cursor"], None)
+        self.assertEqual(report_export.main(["compact", path, "--keep-days", "1"]),
+                         {"rows_before": 4, "rows_after": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Unit tests for the multi-worker balancer and worker supervision.
+"""
+import asyncio
+import subprocess
+import sys
+import unittest
+
+from serve import Worker, check_health, client_address, pick_worker, start_balancer, supervise_once
+
+
+async def _fake_worker(name):
+    """An HTTP server that answers every request, including the health check, with its name."""
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        body = name.encode("ascii")
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _get(port, forwarded_for=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = f"X-Forwarded-For: {forwarded_for}, 10.0.0.1\r\n" if forwarded_for else ""
+    writer.write(f"GET / HTTP/1.0\r\nHost: example\r\n{headers}\r\n".encode("ascii"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b" ")[1].decode(), response.split(b"\r\n\r\n", 1)[1].decode()
+
+
+class TestBalancer(unittest.TestCase):
+    """Test cases for routing connections to ready workers."""
+
+    def test_client_address(self):
+        """Test that the proxy's forwarded address wins over the peer."""
+        head = b"GET / HTTP/1.1\r\nHost: x\r\nX-Forwarded-For: 203.0.113.7, 10.0.0.2\r\n\r\n"
+        self.assertEqual(client_address(head, ("10.0.0.2", 5000)), "203.0.113.7")
+        self.assertEqual(client_address(b"GET / HTTP/1.1\r\n\r\n", ("10.0.0.2", 5000)), "10.0.0.2")
+
+    def test_pick_worker_is_sticky_and_skips_unready(self):
+        """Test that an address keeps its worker and moves on only while it is not ready."""
+        workers = [Worker(index, 9100 + index, None) for index in range(3)]
+        self.assertIsNone(pick_worker(workers, "203.0.113.7"))
+        for worker in workers:
+            worker.ready = True
+        chosen = pick_worker(workers, "203.0.113.7")
+        self.assertIs(pick_worker(workers, "203.0.113.7"), chosen)
+        chosen.ready = False
+        self.assertIsNot(pick_worker(workers, "203.0.113.7"), chosen)
+        chosen.ready = True
+        self.assertIs(pick_worker(workers, "203.0.113.7"), chosen)
+
+    def test_routes_by_address_and_rejects_until_ready(self):
+        """Test end to end that requests get 503 until a worker is ready, then stick to one worker."""
+        async def scenario():
+            backends = [await _fake_worker(f"worker{index}") for index in range(3)]
+            workers = [Worker(index, port, None) for index, (_server, port) in enumerate(backends)]
+            balancer = await start_balancer("127.0.0.1", 0, workers)
+            port = balancer.sockets[0].getsockname()[1]
+            results = [await _get(port, "203.0.113.7")]
+            for worker in workers:
+                worker.ready = await check_health(worker.port)
+            results += [await _get(port, "203.0.113.7") for _ in range(3)]
+            results += [await _get(port, f"198.51.100.{index}") for index in range(12)]
+            balancer.close()
+            for server, _port in backends:
+                server.close()
+            return results
+
+        results = asyncio.run(scenario())
+        self.assertEqual(results[0][0], "503")
+        self.assertEqual(len({body for _status, body in results[1:4]}), 1)
+        self.assertEqual({status for status, _body in results[1:]}, {"200"})
+        self.assertGreater(len({body for _status, body in results[4:]}), 1)
+
+
+class TestSupervision(unittest.TestCase):
+    """Test cases for health checks and restarts."""
+
+    def test_exited_worker_is_restarted(self):
+        """Test that a worker that exits is started again and is not routed to meanwhile."""
+        spawned = []
+
+        def spawn():
+            spawned.append(subprocess.Popen([sys.executable, "-c", "pass"]))
+            return spawned[-1]
+
+        worker = Worker(0, 1, spawn)
+        worker.start()
+        worker.ready = True
+        spawned[0].wait()
+        asyncio.run(supervise_once([worker]))
+        self.assertEqual(len(spawned), 2)
+        self.assertFalse(worker.ready)
+        self.assertEqual(worker.restarts, 1)
+
+        # A second exit before it became ready backs off instead of restarting at once
+        spawned[1].wait()
+        asyncio.run(supervise_once([worker]))
+        self.assertEqual(len(spawned), 2)
+        self.assertIsNone(worker.process)
+        self.assertGreater(worker.restart_at, 0)
+
+    def test_health_check_fails_without_worker(self):
+        """Test that a closed port is reported as not ready."""
+        self.assertFalse(asyncio.run(check_health(1, timeout=0.5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
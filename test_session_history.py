@@ -0,0 +1,75 @@
+"""
+Unit tests for the per-session analysis history kept across Streamlit reruns.
+"""
+import unittest
+from unittest.mock import patch
+
+from streamlit_utils import (
+    remember_analysis, analysis_history, current_analysis, select_analysis, estimate_size
+)
+
+
+def _analysis(species_query, report="Report"):
+    return {
+        'species_query': species_query,
+        'result': report,
+        'species_data': {'count': 1, 'results': []},
+        'climate_data': {},
+        'timings': {'Total': 1.0}
+    }
+
+
+class TestSessionHistory(unittest.TestCase):
+    """Test cases for remember_analysis and friends."""
+
+    def setUp(self):
+        self.state = {}
+
+    def test_empty_session(self):
+        """Test that a fresh session has nothing to re-render."""
+        self.assertIsNone(current_analysis(self.state))
+        self.assertEqual(analysis_history(self.state), [])
+
+    def test_newest_analysis_is_active(self):
+        """Test that reruns render the most recent analysis by default."""
+        remember_analysis(self.state, _analysis("tiger"))
+        remember_analysis(self.state, _analysis("whale"))
+        self.assertEqual(current_analysis(self.state)['species_query'], "whale")
+        self.assertEqual(current_analysis(self.state)['timings'], {'Total': 1.0})
+
+    def test_select_previous_analysis(self):
+        """Test switching back to an earlier analysis without recomputing."""
+        tiger = remember_analysis(self.state, _analysis("tiger"))
+        remember_analysis(self.state, _analysis("whale"))
+        select_analysis(self.state, tiger['id'])
+        self.assertEqual(current_analysis(self.state)['species_query'], "tiger")
+
+    @patch('streamlit_utils.MAX_HISTORY_ENTRIES', 2)
+    def test_history_is_bounded_by_count(self):
+        """Test that the oldest entries are dropped beyond the entry cap."""
+        for species in ["tiger", "whale", "elephant"]:
+            remember_analysis(self.state, _analysis(species))
+        queries = [entry['species_query'] for entry in analysis_history(self.state)]
+        self.assertEqual(queries, ["whale", "elephant"])
+
+    def test_history_is_bounded_by_memory(self):
+        """Test that the memory cap evicts old entries but keeps the newest."""
+        big_report = "x" * 1000
+        cap = estimate_size(_analysis("tiger", big_report)) + 100
+        with patch('streamlit_utils.MAX_HISTORY_BYTES', cap):
+            remember_analysis(self.state, _analysis("tiger", big_report))
+            remember_analysis(self.state, _analysis("whale", big_report * 5))
+        queries = [entry['species_query'] for entry in analysis_history(self.state)]
+        self.assertEqual(queries, ["whale"])
+
+    @patch('streamlit_utils.MAX_HISTORY_ENTRIES', 1)
+    def test_evicted_active_entry_falls_back_to_newest(self):
+        """Test that a selection pointing at an evicted entry renders the newest."""
+        tiger = remember_analysis(self.state, _analysis("tiger"))
+        remember_analysis(self.state, _analysis("whale"))
+        select_analysis(self.state, tiger['id'])
+        self.assertEqual(current_analysis(self.state)['species_query'], "whale")
+
+
+if __name__ == '__main__':
+    unittest.main()
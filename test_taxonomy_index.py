@@ -0,0 +1,110 @@
+"""
+Unit tests for the local taxonomy index built from a GBIF backbone snapshot.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from tools.taxonomy_index import TaxonomyIndex, build_index, normalize_name, TAXONOMY_INDEX_ENV
+from tools.occurrence_tool import resolve_taxon_key
+from streamlit_utils import normalize_species_query, species_suggestions
+
+
+TAXON_HEADER = ["taxonID", "acceptedNameUsageID", "scientificName", "canonicalName",
+                "taxonRank", "taxonomicStatus", "kingdom", "genus"]
+TAXA = [
+    ["1", "", "Animalia", "Animalia", "kingdom", "accepted", "Animalia", ""],
+    ["2435194", "", "Panthera Oken, 1816", "Panthera", "genus", "accepted", "Animalia", "Panthera"],
+    ["5219416", "", "Panthera tigris (Linnaeus, 1758)", "Panthera tigris", "species", "accepted",
+     "Animalia", "Panthera"],
+    ["5219404", "", "Panthera leo (Linnaeus, 1758)", "Panthera leo", "species", "accepted",
+     "Animalia", "Panthera"],
+    ["7193910", "5219416", "Felis tigris Linnaeus, 1758", "Felis tigris", "species", "synonym",
+     "Animalia", "Felis"],
+    ["5219426", "", "Panthera pardus (Linnaeus, 1758)", "Panthera pardus", "species", "accepted",
+     "Animalia", "Panthera"],
+    ["6100001", "", "Panthera tigris altaica", "Panthera tigris altaica", "subspecies", "accepted",
+     "Animalia", "Panthera"],
+]
+VERNACULAR_HEADER = ["taxonID", "vernacularName", "language"]
+VERNACULAR = [
+    ["5219416", "Tiger", "en"],
+    ["5219416", "tiger", "en"],
+    ["5219416", "Tigre", "fr"],
+    ["5219404", "Lion", "en"],
+    ["5219426", "Léopard", "en"],
+]
+
+
+class TestTaxonomyIndex(unittest.TestCase):
+    """Test cases for building and querying the taxonomy index."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.snapshot = os.path.join(self.directory, "backbone.zip")
+        with zipfile.ZipFile(self.snapshot, "w") as archive:
+            archive.writestr("Taxon.tsv", "\n".join("\t".join(row) for row in [TAXON_HEADER] + TAXA) + "\n")
+            archive.writestr("VernacularName.tsv",
+                             "\n".join("\t".join(row) for row in [VERNACULAR_HEADER] + VERNACULAR) + "\n")
+        self.index_dir = os.path.join(self.directory, "taxonomy")
+        self.meta = build_index(self.snapshot, self.index_dir)
+        self.index = TaxonomyIndex(self.index_dir)
+
+    def test_build_skips_unindexed_ranks_and_languages(self):
+        """Test that subspecies and non-English names are left out."""
+        self.assertEqual(self.meta["entries"], 9)
+        self.assertIsNone(self.index.normalize("tigre", cutoff=0.95))
+        self.assertFalse(os.path.exists(self.index_dir + ".building"))
+
+    def test_normalize_name(self):
+        """Test case, accent and punctuation folding."""
+        self.assertEqual(normalize_name("  Léopard,  SNOW-leopard "), "leopard snow leopard")
+
+    def test_exact_matches_resolve_to_accepted_taxon(self):
+        """Test vernacular, synonym and accent-insensitive exact matches."""
+        tiger = self.index.normalize("TIGER")
+        self.assertEqual((tiger["matchType"], tiger["acceptedUsageKey"]), ("EXACT", 5219416))
+        self.assertEqual(tiger["canonicalName"], "Panthera tigris")
+        self.assertEqual(tiger["status"], "VERNACULAR")
+
+        synonym = self.index.normalize("Felis tigris")
+        self.assertEqual((synonym["usageKey"], synonym["acceptedUsageKey"]), (7193910, 5219416))
+        self.assertEqual(synonym["status"], "SYNONYM")
+
+        self.assertEqual(self.index.normalize("leopard")["acceptedUsageKey"], 5219426)
+
+    def test_fuzzy_matches_misspellings(self):
+        """Test that misspelled names find the closest taxon."""
+        match = self.index.normalize("Panthera tigirs")
+        self.assertEqual((match["matchType"], match["acceptedUsageKey"]), ("FUZZY", 5219416))
+        self.assertLess(match["confidence"], 100)
+        self.assertEqual(self.index.fuzzy("lino")[0]["matchedName"], "Lion")
+        self.assertIsNone(self.index.normalize("pug"))
+
+    def test_autocomplete_prefix(self):
+        """Test prefix suggestions, shortest first and one per accepted taxon."""
+        names = [match["matchedName"] for match in self.index.autocomplete("panth")]
+        self.assertEqual(names[0], "Panthera")
+        self.assertEqual(sorted(names[1:]), ["Panthera leo", "Panthera pardus", "Panthera tigris"])
+        self.assertEqual([m["acceptedUsageKey"] for m in self.index.autocomplete("ti")], [5219416])
+        self.assertEqual(self.index.autocomplete("zz"), [])
+        self.assertEqual(self.index.autocomplete(""), [])
+
+    @patch('tools.occurrence_tool.requests.get')
+    def test_configured_index_avoids_network(self, mock_get):
+        """Test that the occurrence tool and app helpers resolve names locally."""
+        with patch.dict(os.environ, {TAXONOMY_INDEX_ENV: self.index_dir}):
+            self.assertEqual(resolve_taxon_key("Lion"), 5219404)
+            self.assertEqual(normalize_species_query("Panthera tigirs")[0], "panthera tigris")
+            self.assertEqual(normalize_species_query("pug"), (None, None))
+            self.assertIn("Lion", species_suggestions("li"))
+        mock_get.assert_not_called()
+        self.assertEqual(normalize_species_query("Pug"), ("pug", None))
+
+
+if __name__ == '__main__':
+    unittest.main()
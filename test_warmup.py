@@ -0,0 +1,76 @@
+"""
+Unit tests for the concurrent cache warm-up.
+"""
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from warmup import run_warmup, warmup_jobs, print_report
+
+
+def _slow_species(seconds):
+    def fetch(species_name):
+        time.sleep(seconds)
+        return {"count": 1, "results": []}
+    return fetch
+
+
+class TestWarmup(unittest.TestCase):
+    """Test cases for run_warmup."""
+
+    @patch('tools.climate_tool.fetch_climate_data', return_value={"current_weather": {}})
+    @patch('tools.species_tool.fetch_species', side_effect=_slow_species(0.2))
+    def test_jobs_run_concurrently(self, mock_species, mock_climate):
+        """Test that jobs overlap instead of running one after another."""
+        report = run_warmup(["tiger", "whale", "elephant", "pug"], ["New York"],
+                            steps=["species", "climate"], budget=5, concurrency=5)
+        self.assertEqual(report["counts"], {"ok": 5, "error": 0, "timeout": 0, "cancelled": 0})
+        self.assertLess(report["seconds"], 0.6)
+        self.assertEqual(mock_species.call_count, 4)
+        mock_climate.assert_called_once_with("New York")
+
+    @patch('tools.species_tool.fetch_species', side_effect=_slow_species(0.5))
+    def test_budget_limits_waiting(self, mock_species):
+        """Test that running jobs time out and queued ones are cancelled at the budget."""
+        report = run_warmup(["tiger", "whale", "elephant"], [], steps=["species"], budget=0.1, concurrency=1)
+        self.assertLess(report["seconds"], 0.4)
+        self.assertEqual(report["counts"]["timeout"], 1)
+        self.assertEqual(report["counts"]["cancelled"], 2)
+
+    @patch('tools.species_tool.fetch_species', return_value={"error": "Connection error", "results": [], "count": 0})
+    def test_tool_errors_are_reported(self, mock_species):
+        """Test that error results are counted as failures with their message."""
+        report = run_warmup(["tiger"], [], steps=["species"], budget=5)
+        self.assertEqual(report["results"][0]["status"], "error")
+        self.assertEqual(report["results"][0]["error"], "Connection error")
+        print_report(report)
+
+    @patch('streamlit_utils.run_wildlife_analysis_streamlit')
+    @patch('tools.species_tool.fetch_species', return_value={"count": 1, "results": []})
+    def test_reports_start_after_tool_responses(self, mock_species, mock_report):
+        """Test that report jobs are queued last and their output checked."""
+        order = []
+        lock = threading.Lock()
+
+        def report(species):
+            with lock:
+                order.append(("report", species))
+            return "Report text", {}, {}, {}
+
+        mock_report.side_effect = report
+        jobs = warmup_jobs(["tiger"], [], ["report", "species"])
+        self.assertEqual([job[0] for job in jobs], ["species", "report"])
+
+        result = run_warmup(["tiger"], [], steps=["report", "species"], budget=5, concurrency=1)
+        self.assertEqual(result["counts"]["ok"], 2)
+        self.assertEqual(order, [("report", "tiger")])
+
+    def test_unknown_step_rejected(self):
+        """Test that a misspelled step raises instead of warming nothing."""
+        with self.assertRaises(ValueError):
+            warmup_jobs(["tiger"], [], ["reports"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,502 @@
+"""
+Shared response cache for MCP tools and generated reports.
+
+Entries live in a single SQLite database opened in WAL mode, so several app
+processes on the same host (see ``serve.py``) can read and write the cache
+concurrently. Caching is enabled by pointing ``WILDLIFE_CACHE_DB`` at a file
+path; when the variable is unset, ``get_cache()`` returns ``None`` and the
+tools fall back to uncached requests.
+
+Tools read through ``cached_call``, which serves stale-while-revalidate: an
+entry is fresh for a per-namespace window, after which it is still returned
+immediately while a single background refresh per key (across all
+processes) replaces it. ``WILDLIFE_FRESHNESS_<NAMESPACE>=fresh[:stale]``
+overrides a tool's windows in seconds, e.g. ``WILDLIFE_FRESHNESS_CLIMATE=300:3600``.
+
+Entries can carry the HTTP validators (ETag, Last-Modified) of the response
+they came from. ``cached_call(..., conditional=True)`` hands them to the
+fetch, which sends a conditional GET and returns ``NOT_MODIFIED`` on a 304;
+the stored body is then kept and its TTL extended, and the bytes that were
+not downloaded are counted.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from tools.json_backend import dumps, loads
+
+
+CACHE_DB_ENV = "WILDLIFE_CACHE_DB"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    validators TEXT,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS cache_refresh (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    lease_until REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+FRESHNESS_ENV_PREFIX = "WILDLIFE_FRESHNESS_"
+
+# A background refresh holding its lease longer than this is presumed dead
+REFRESH_LEASE_SECONDS = 120.0
+REFRESH_WORKERS = 4
+
+
+class SharedCache:
+    """SQLite-backed key/value cache shared between processes."""
+
+    def __init__(self, path: str, default_ttl: float = 3600.0):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: File path of the SQLite database
+            default_ttl: Lifetime in seconds for entries stored without a TTL
+        """
+        self.path = path
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+        if "validators" not in columns:
+            try:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN validators TEXT")
+            except sqlite3.OperationalError:
+                pass  # Another process added it first
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Look up a live entry.
+
+        Args:
+            namespace: Logical cache area, e.g. "species" or "report"
+            key: Entry key within the namespace
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        raw = self.get_raw(namespace, key)
+        return None if raw is None else loads(raw)
+
+    def get_raw(self, namespace: str, key: str) -> Optional[str]:
+        """
+        Look up a live entry without decoding it.
+
+        Lets callers decode the stored JSON straight into their own types.
+
+        Returns:
+            The cached JSON text, or None if missing or expired
+        """
+        entry = self.get_entry(namespace, key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, namespace: str, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Look up a live entry with the time it was stored.
+
+        Returns:
+            (JSON text, stored_at timestamp), or None if missing or expired
+        """
+        row = self._connection().execute(
+            "SELECT value, stored_at, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return row[0], row[1]
+
+    def get_stored(self, namespace: str, key: str) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Look up an entry and its HTTP validators, even if it has expired.
+
+        Returns:
+            (JSON text, validators or None), or None if there is no entry
+        """
+        row = self._connection().execute(
+            "SELECT value, validators FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], loads(row[1]) if row[1] else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None,
+            validators: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Store a JSON-serializable value.
+
+        Args:
+            namespace: Logical cache area
+            key: Entry key within the namespace
+            value: Value to store
+            ttl: Lifetime in seconds (defaults to ``default_ttl``)
+            validators: HTTP validators of the response the value came from
+        """
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at, expires_at, validators) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, dumps(value), now, expires_at, dumps(validators) if validators else None),
+        )
+        conn.commit()
+
+    def touch(self, namespace: str, key: str, ttl: Optional[float] = None) -> bool:
+        """
+        Mark an entry as just stored without rewriting its value (after a 304).
+
+        Returns:
+            True if the entry exists
+        """
+        now = time.time()
+        conn = self._connection()
+        cursor = conn.execute(
+            "UPDATE cache_entries SET stored_at = ?, expires_at = ? WHERE namespace = ? AND key = ?",
+            (now, now + (self.default_ttl if ttl is None else ttl), namespace, key),
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def claim_refresh(self, namespace: str, key: str, lease: float = REFRESH_LEASE_SECONDS) -> bool:
+        """
+        Take the refresh lease for an entry, so only one process revalidates it.
+
+        Returns:
+            True if this caller now holds the lease; False if another live lease exists
+        """
+        now = time.time()
+        conn = self._connection()
+        cursor = conn.execute(
+            "INSERT INTO cache_refresh (namespace, key, lease_until) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET lease_until = excluded.lease_until "
+            "WHERE cache_refresh.lease_until < ?",
+            (namespace, key, now + lease, now),
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def release_refresh(self, namespace: str, key: str) -> None:
+        """Give up a refresh lease taken with ``claim_refresh``."""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_refresh WHERE namespace = ? AND key = ?", (namespace, key))
+        conn.commit()
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove a single entry if present."""
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        )
+        conn.commit()
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove all entries, or only those in ``namespace``."""
+        conn = self._connection()
+        if namespace is None:
+            conn.execute("DELETE FROM cache_entries")
+        else:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        conn = self._connection()
+        cursor = conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of live entries per namespace."""
+        rows = self._connection().execute(
+            "SELECT namespace, COUNT(*) FROM cache_entries WHERE expires_at >= ? GROUP BY namespace",
+            (time.time(),),
+        ).fetchall()
+        return {namespace: count for namespace, count in rows}
+
+
+_cache_lock = threading.Lock()
+_cache_instance: Optional[SharedCache] = None
+
+
+def get_cache() -> Optional[SharedCache]:
+    """
+    Return the process-wide shared cache.
+
+    Returns:
+        A SharedCache for the path in ``WILDLIFE_CACHE_DB``, or None when
+        caching is not configured
+    """
+    global _cache_instance
+    path = os.getenv(CACHE_DB_ENV)
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache_instance is None or _cache_instance.path != path:
+            _cache_instance = SharedCache(path)
+        return _cache_instance
+
+
+def cache_key(text: str) -> str:
+    """Normalize a free-text query into a cache key."""
+    return " ".join(text.lower().split())
+
+
+def freshness(namespace: str, fresh_for: float, stale_for: float) -> Tuple[float, float]:
+    """
+    Resolve a namespace's freshness windows, applying any environment override.
+
+    Args:
+        namespace: Cache namespace, e.g. "climate"
+        fresh_for: Default seconds an entry is served without revalidation
+        stale_for: Default seconds after that it may still be served while refreshing
+
+    Returns:
+        (fresh_for, stale_for) in seconds
+    """
+    override = os.getenv(FRESHNESS_ENV_PREFIX + namespace.upper(), "").strip()
+    if override:
+        fresh, _, stale = override.partition(":")
+        fresh_for = float(fresh)
+        stale_for = float(stale) if stale else stale_for
+    return fresh_for, stale_for
+
+
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Dict[str, float]] = {}
+_refreshing: Set[Tuple[str, str]] = set()
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_futures: Set[Future] = set()
+
+
+def count_cache_event(namespace: str, name: str, amount: float = 1) -> None:
+    """Add to one of a namespace's counters (see ``cache_metrics``)."""
+    with _metrics_lock:
+        counters = _metrics.setdefault(namespace, {})
+        counters[name] = counters.get(name, 0) + amount
+
+
+def cache_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    Per-namespace counters for this process.
+
+    Returns:
+        ``fresh_hits``, ``stale_served``, ``misses``, ``revalidations``,
+        ``revalidation_failures``, ``revalidation_seconds`` (total),
+        ``revalidation_max_seconds``, ``not_modified`` (304 responses),
+        ``bytes_fetched`` and ``bytes_saved`` (bodies not downloaded thanks
+        to a 304) per namespace
+    """
+    with _metrics_lock:
+        return {namespace: dict(counters) for namespace, counters in _metrics.items()}
+
+
+def reset_cache_metrics() -> None:
+    """Clear the counters (mainly for tests and benchmarks)."""
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def revalidate(namespace: str, key: str, refresh: Callable[[], bool]) -> bool:
+    """
+    Run ``refresh`` in the background unless a refresh of this entry is already running.
+
+    Refreshes are de-duplicated within the process and, through the cache's
+    lease table, across processes sharing the cache.
+
+    Args:
+        namespace: Cache namespace
+        key: Entry key
+        refresh: Fetches and stores a new value; returns False if the fetch failed
+
+    Returns:
+        True if a refresh was scheduled
+    """
+    global _refresh_executor
+    cache = get_cache()
+    with _metrics_lock:
+        if (namespace, key) in _refreshing:
+            return False
+        _refreshing.add((namespace, key))
+    if cache is None or not cache.claim_refresh(namespace, key):
+        with _metrics_lock:
+            _refreshing.discard((namespace, key))
+        return False
+
+    def run():
+        start_time = time.perf_counter()
+        try:
+            succeeded = refresh()
+        except Exception:
+            succeeded = False
+        finally:
+            cache.release_refresh(namespace, key)
+            with _metrics_lock:
+                _refreshing.discard((namespace, key))
+        seconds = time.perf_counter() - start_time
+        count_cache_event(namespace, "revalidations")
+        count_cache_event(namespace, "revalidation_seconds", seconds)
+        if not succeeded:
+            count_cache_event(namespace, "revalidation_failures")
+        with _metrics_lock:
+            counters = _metrics[namespace]
+            counters["revalidation_max_seconds"] = max(counters.get("revalidation_max_seconds", 0), seconds)
+
+    with _cache_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="revalidate")
+        future = _refresh_executor.submit(run)
+    with _metrics_lock:
+        _refresh_futures.add(future)
+    future.add_done_callback(lambda done: _refresh_futures.discard(done))
+    return True
+
+
+def wait_for_revalidations(timeout: Optional[float] = None) -> None:
+    """Block until the background refreshes scheduled so far have finished."""
+    with _metrics_lock:
+        pending = list(_refresh_futures)
+    for future in pending:
+        future.result(timeout)
+
+
+def pending_revalidations() -> int:
+    """Background refreshes queued or running in this process."""
+    with _metrics_lock:
+        return len(_refresh_futures)
+
+
+class Validated:
+    """A fetched value together with the HTTP validators to store next to it."""
+
+    __slots__ = ("value", "validators")
+
+    def __init__(self, value: Any, validators: Optional[Dict[str, Any]]):
+        self.value = value
+        self.validators = validators
+
+
+# Returned by a conditional fetch when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+
+
+def refresh_conditionally(namespace: str, key: str, fetch: Callable[[Optional[Dict[str, Any]]], Any],
+                          ttl: float, decode: Callable[[str], Any] = loads) -> Tuple[Any, bool]:
+    """
+    Fetch an entry again, conditionally when validators are stored, and update the cache.
+
+    Args:
+        namespace: Cache namespace
+        key: Entry key
+        fetch: Called with the stored validators (or None); returns a value,
+            a ``Validated`` value or ``NOT_MODIFIED``
+        ttl: Lifetime of the stored or extended entry
+        decode: Turns the stored JSON text into the returned value on a 304
+
+    A 304 for an entry that was purged or deleted after it was read is
+    followed by one unconditional fetch, so callers never see it.
+
+    Returns:
+        (value, stored): the fetched or kept value, and whether the cache
+        now holds it (False for error results)
+    """
+    cache = get_cache()
+    stored = cache.get_stored(namespace, key) if cache is not None else None
+    validators = stored[1] if stored is not None else None
+    result = fetch(validators)
+    if result is NOT_MODIFIED:
+        if stored is not None and cache.touch(namespace, key, ttl):
+            count_cache_event(namespace, "not_modified")
+            count_cache_event(namespace, "bytes_saved", (validators or {}).get("size", 0))
+            return decode(stored[0]), True
+        # The entry was purged or deleted after it was read; fetch the body once more
+        result = fetch(None)
+        if result is NOT_MODIFIED:
+            return {"error": f"Not Modified for {namespace}/{key} without validators"}, False
+
+    if isinstance(result, Validated):
+        result, validators = result.value, result.validators
+        count_cache_event(namespace, "bytes_fetched", (validators or {}).get("size", 0))
+    else:
+        validators = None
+    if cache is None or (isinstance(result, dict) and "error" in result):
+        return result, False
+    cache.set(namespace, key, result, ttl=ttl, validators=validators)
+    return result, True
+
+
+def cached_call(namespace: str, key: str, fetch: Callable[..., Any], fresh_for: float,
+                stale_for: float = 0.0, decode: Callable[[str], Any] = loads, conditional: bool = False) -> Any:
+    """
+    Serve ``fetch()`` through the shared cache with stale-while-revalidate.
+
+    Fresh entries are returned directly. Stale ones (older than ``fresh_for``
+    but within ``stale_for`` after that) are returned immediately while one
+    background ``fetch`` replaces them. Misses call ``fetch`` inline. Results
+    containing an ``"error"`` key are never stored.
+
+    Args:
+        namespace: Cache namespace (also selects the freshness override)
+        key: Entry key
+        fetch: Produces a JSON-serializable result
+        fresh_for: Seconds an entry is served without revalidation
+        stale_for: Further seconds a stale entry may be served
+        decode: Turns the stored JSON text into the returned value
+        conditional: ``fetch`` takes the stored HTTP validators (or None) and
+            may return ``Validated`` or ``NOT_MODIFIED`` (see ``refresh_conditionally``)
+
+    Returns:
+        The decoded cached value, or the result of ``fetch()`` on a miss
+    """
+    cache = get_cache()
+    if not conditional:
+        plain_fetch = fetch
+        fetch = lambda validators: plain_fetch()
+    if cache is None:
+        result = fetch(None)
+        return result.value if isinstance(result, Validated) else result
+    fresh_for, stale_for = freshness(namespace, fresh_for, stale_for)
+    ttl = fresh_for + stale_for
+
+    entry = cache.get_entry(namespace, key)
+    if entry is not None:
+        raw, stored_at = entry
+        if time.time() - stored_at < fresh_for:
+            count_cache_event(namespace, "fresh_hits")
+        else:
+            count_cache_event(namespace, "stale_served")
+            revalidate(namespace, key, lambda: refresh_conditionally(namespace, key, fetch, ttl, decode)[1])
+        return decode(raw)
+
+    count_cache_event(namespace, "misses")
+    return refresh_conditionally(namespace, key, fetch, ttl, decode)[0]
@@ -0,0 +1,376 @@
+"""
+MCP tool for multi-year daily climate series from the Open Meteo archive API.
+
+Series are fetched and cached in calendar-year chunks per location. Years
+that lie fully in the past never change, so their chunks are cached
+permanently; the current year's chunk is extended incrementally, requesting
+only the days after the last one already stored. Consecutive missing years
+are fetched with one request each (up to ``MAX_YEARS_PER_REQUEST``).
+
+Assembled series are held as NumPy arrays, and anomalies, rolling means and
+annual trends are computed on them vectorized.
+"""
+import time
+import requests
+import numpy as np
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from tools.cache import get_cache
+from tools.climate_tool import Location, resolve_location, COORDINATE_PRECISION
+from tools.json_backend import response_json
+from tools import http_client
+
+
+CACHE_NAMESPACE = "climate_history"
+
+# Completed years are immutable upstream; keep their chunks for a century
+PERMANENT_TTL = 100 * 365 * 24 * 60 * 60
+
+# Re-check the current year's chunk for newly published days at most this often
+RECENT_REFRESH_SECONDS = 6 * 60 * 60
+
+ARCHIVE_API = "https://archive-api.open-meteo.com/v1/archive"
+
+# The reanalysis behind the archive is published with a few days' delay
+ARCHIVE_DELAY_DAYS = 5
+
+# The archive starts in 1940
+FIRST_ARCHIVE_YEAR = 1940
+
+DEFAULT_YEARS = 10
+MAX_YEARS_PER_REQUEST = 10
+
+DAILY_VARIABLES = (
+    "temperature_2m_max", "temperature_2m_min", "temperature_2m_mean", "precipitation_sum"
+)
+
+
+class ClimateHistory:
+    """Daily climate series for one location, as NumPy arrays."""
+
+    def __init__(self, latitude: float, longitude: float, dates: np.ndarray,
+                 variables: Dict[str, np.ndarray]):
+        """
+        Args:
+            latitude: Rounded latitude of the series
+            longitude: Rounded longitude of the series
+            dates: ``datetime64[D]`` array, ascending and without gaps
+            variables: Open Meteo daily variable name -> float64 array (NaN for missing)
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.dates = dates
+        self.variables = variables
+
+    @classmethod
+    def from_chunks(cls, coords: Tuple[float, float], chunks: List[Dict[str, Any]],
+                    start: date, end: date) -> "ClimateHistory":
+        """Concatenate cached year chunks and clip them to ``start``..``end``."""
+        times = [day for chunk in chunks for day in chunk["time"]]
+        dates = np.array(times, dtype="datetime64[D]")
+        keep = (dates >= np.datetime64(start)) & (dates <= np.datetime64(end))
+        variables = {}
+        for variable in DAILY_VARIABLES:
+            values = [value for chunk in chunks for value in chunk.get(variable) or [None] * len(chunk["time"])]
+            variables[variable] = np.array(values, dtype=np.float64)[keep]
+        return cls(coords[0], coords[1], dates[keep], variables)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def _day_of_year(self) -> np.ndarray:
+        """Zero-based day of year, with 29 February folded onto 28 February."""
+        year_starts = self.dates.astype("datetime64[Y]")
+        day = (self.dates - year_starts).astype(np.int64)
+        years = year_starts.astype(np.int64) + 1970
+        leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+        return np.where(leap & (day >= 59), day - 1, day)
+
+    def climatology(self, variable: str, baseline: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Mean value per day of year (365 entries) over a baseline period.
+
+        Args:
+            variable: Daily variable name
+            baseline: Inclusive (first_year, last_year); defaults to the whole series
+
+        Returns:
+            float64 array indexed by zero-based day of year (NaN where no data)
+        """
+        values = self.variables[variable]
+        mask = np.isfinite(values)
+        if baseline is not None:
+            years = self.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+            mask &= (years >= baseline[0]) & (years <= baseline[1])
+        day = self._day_of_year()
+        sums = np.bincount(day[mask], weights=values[mask], minlength=365)
+        counts = np.bincount(day[mask], minlength=365)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    def anomalies(self, variable: str, baseline: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Daily departures from the day-of-year climatology (NaN where unknown)."""
+        return self.variables[variable] - self.climatology(variable, baseline)[self._day_of_year()]
+
+    def rolling_mean(self, variable: str, window: int = 30, min_periods: Optional[int] = None) -> np.ndarray:
+        """
+        Trailing mean over ``window`` days, skipping missing values.
+
+        Args:
+            variable: Daily variable name
+            window: Window length in days
+            min_periods: Minimum valid days for a value (default: half the window)
+
+        Returns:
+            float64 array aligned with ``dates`` (NaN before enough data is seen)
+        """
+        values = self.variables[variable]
+        min_periods = window // 2 + 1 if min_periods is None else min_periods
+        valid = np.isfinite(values)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(valid)))
+        upper = np.arange(1, len(values) + 1)
+        lower = np.maximum(upper - window, 0)
+        window_counts = counts[upper] - counts[lower]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (sums[upper] - sums[lower]) / window_counts
+        return np.where(window_counts >= min_periods, means, np.nan)
+
+    def annual_means(self, variable: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (years, mean value per year), ignoring missing days."""
+        values = self.variables[variable]
+        years = self.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        if len(years) == 0:
+            return years, values
+        index = years - years[0]
+        valid = np.isfinite(values)
+        sums = np.bincount(index[valid], weights=values[valid], minlength=index[-1] + 1)
+        counts = np.bincount(index[valid], minlength=index[-1] + 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.arange(years[0], years[-1] + 1), sums / counts
+
+    def trend_per_decade(self, anomalies: np.ndarray, min_years: int = 3) -> Optional[float]:
+        """
+        Linear trend of daily anomalies, per ten years.
+
+        Fitting deseasonalized anomalies rather than annual means keeps a
+        partial current year from skewing the slope.
+
+        Returns:
+            The slope, or None for series shorter than ``min_years``
+        """
+        valid = np.isfinite(anomalies)
+        if len(self) < min_years * 365 or valid.sum() < 2:
+            return None
+        elapsed_years = (self.dates - self.dates[0]).astype(np.float64) / 365.25
+        return round(float(np.polyfit(elapsed_years[valid], anomalies[valid], 1)[0]) * 10, 3)
+
+    def summary(self, recent_days: int = 365) -> Dict[str, Any]:
+        """Aggregate statistics suitable for the analysis agent and charts."""
+        if len(self) == 0:
+            return {"latitude": self.latitude, "longitude": self.longitude, "days": 0, "variables": {}}
+        recent = slice(max(len(self) - recent_days, 0), None)
+        variables = {}
+        for variable, values in self.variables.items():
+            if not np.isfinite(values).any():
+                continue
+            years, means = self.annual_means(variable)
+            anomalies = self.anomalies(variable)
+            variables[variable] = {
+                "mean": round(float(np.nanmean(values)), 2),
+                "min": round(float(np.nanmin(values)), 2),
+                "max": round(float(np.nanmax(values)), 2),
+                "trend_per_decade": self.trend_per_decade(anomalies),
+                "recent_anomaly": _rounded(np.nanmean(anomalies[recent])),
+                "annual_means": {int(year): _rounded(mean) for year, mean in zip(years, means)}
+            }
+        return {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "start": str(self.dates[0]),
+            "end": str(self.dates[-1]),
+            "days": len(self),
+            "variables": variables
+        }
+
+
+def _rounded(value: float, digits: int = 2) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def _chunk_key(coords: Tuple[float, float], year: int) -> str:
+    return f"{coords[0]:.{COORDINATE_PRECISION}f},{coords[1]:.{COORDINATE_PRECISION}f}|{year}"
+
+
+def available_end(today: Optional[date] = None) -> date:
+    """Last day the archive is expected to hold."""
+    return (today or date.today()) - timedelta(days=ARCHIVE_DELAY_DAYS)
+
+
+def load_climate_history(location: Location, start: date, end: Optional[date] = None,
+                         today: Optional[date] = None) -> ClimateHistory:
+    """
+    Assemble a daily series for ``start``..``end`` from cached and fetched chunks.
+
+    Args:
+        location: Location name or (latitude, longitude) tuple
+        start: First day of the series
+        end: Last day (default and maximum: the last day the archive holds)
+        today: Reference date for what counts as past (default: today)
+
+    Returns:
+        ClimateHistory for the rounded coordinates
+
+    Raises:
+        requests.exceptions.RequestException: If an upstream request fails
+    """
+    coords = resolve_location(location)
+    last_day = available_end(today)
+    end = min(end or last_day, last_day)
+    start = max(start, date(FIRST_ARCHIVE_YEAR, 1, 1))
+    cache = get_cache()
+
+    chunks: Dict[int, Dict[str, Any]] = {}
+    missing: List[int] = []
+    for year in range(start.year, end.year + 1):
+        chunk_end = min(date(year, 12, 31), last_day)
+        cached = cache.get(CACHE_NAMESPACE, _chunk_key(coords, year)) if cache is not None else None
+        if cached is None:
+            missing.append(year)
+        elif cached["complete"] or cached["end"] >= chunk_end.isoformat() \
+                or time.time() - cached["fetched_at"] < RECENT_REFRESH_SECONDS:
+            chunks[year] = cached
+        else:
+            # Only the days published since the last fetch are requested
+            resume = date.fromisoformat(cached["end"]) + timedelta(days=1)
+            chunks[year] = _merge_chunk(cached, _request_archive(coords, resume, chunk_end))
+            _store_chunk(cache, coords, year, chunks[year], chunk_end)
+
+    for group in _consecutive_groups(missing, MAX_YEARS_PER_REQUEST):
+        group_end = min(date(group[-1], 12, 31), last_day)
+        daily = _request_archive(coords, date(group[0], 1, 1), group_end)
+        for year in group:
+            chunks[year] = _year_slice(daily, year)
+            if cache is not None:
+                _store_chunk(cache, coords, year, chunks[year], min(date(year, 12, 31), last_day))
+
+    ordered = [chunks[year] for year in sorted(chunks)]
+    return ClimateHistory.from_chunks(coords, ordered, start, end)
+
+
+def fetch_climate_history(location: str, years: int = DEFAULT_YEARS,
+                          today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    MCP tool to summarize multi-year daily climate for a location.
+
+    Args:
+        location: Location name (currently supports "New York") or a
+            (latitude, longitude) tuple
+        years: Number of whole past years to include, plus the current year to date
+        today: Reference date (default: today)
+
+    Returns:
+        Per-variable means, extremes, decadal trend, recent anomaly and annual
+        means, or error information
+    """
+    today = today or date.today()
+    try:
+        history = load_climate_history(location, date(today.year - years, 1, 1), today=today)
+        return history.summary()
+    except requests.exceptions.Timeout:
+        return _error_result("Request timeout while fetching climate history")
+    except requests.exceptions.ConnectionError:
+        return _error_result("Connection error while accessing Open Meteo archive API")
+    except requests.exceptions.HTTPError as e:
+        status_code = getattr(e.response, 'status_code', 'Unknown') if e.response else 'Unknown'
+        reason = getattr(e.response, 'reason', 'Unknown') if e.response else 'Unknown'
+        return _error_result(f"HTTP error {status_code}: {reason}")
+    except requests.exceptions.RequestException as e:
+        return _error_result(f"Request failed: {str(e)}")
+    except Exception as e:
+        return _error_result(f"Unexpected error: {str(e)}")
+
+
+def _request_archive(coords: Tuple[float, float], start: date, end: date) -> Dict[str, List[Any]]:
+    """Query the archive endpoint for one date range and return its ``daily`` block."""
+    if start > end:
+        return {"time": []}
+    response = http_client.get(
+        ARCHIVE_API,
+        params={
+            "latitude": coords[0],
+            "longitude": coords[1],
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "daily": ",".join(DAILY_VARIABLES),
+            "timezone": "auto"
+        }
+    )
+    response.raise_for_status()
+    data = response_json(response)
+    daily = data.get("daily") if isinstance(data, dict) else None
+    if not isinstance(daily, dict) or not isinstance(daily.get("time"), list):
+        raise ValueError("Invalid response format from Open Meteo archive API")
+    return daily
+
+
+def _year_slice(daily: Dict[str, List[Any]], year: int) -> Dict[str, List[Any]]:
+    """The days of ``year`` from a multi-year ``daily`` block (dates are ISO strings)."""
+    prefix = f"{year}-"
+    indices = [i for i, day in enumerate(daily["time"]) if day.startswith(prefix)]
+    lo, hi = (indices[0], indices[-1] + 1) if indices else (0, 0)
+    chunk = {"time": daily["time"][lo:hi]}
+    for variable in DAILY_VARIABLES:
+        values = daily.get(variable)
+        chunk[variable] = values[lo:hi] if values is not None else [None] * (hi - lo)
+    return chunk
+
+
+def _merge_chunk(cached: Dict[str, Any], daily: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Append newly fetched days to a cached chunk."""
+    merged = {"time": cached["time"] + daily["time"]}
+    for variable in DAILY_VARIABLES:
+        new_values = daily.get(variable) or [None] * len(daily["time"])
+        merged[variable] = (cached.get(variable) or [None] * len(cached["time"])) + new_values
+    return merged
+
+
+def _store_chunk(cache, coords: Tuple[float, float], year: int, chunk: Dict[str, Any], chunk_end: date) -> None:
+    """
+    Cache a year chunk, trimming trailing days the archive has not filled yet.
+
+    Trimmed days are requested again on the next refresh. A chunk reaching
+    31 December is complete and never refetched.
+    """
+    filled = len(chunk["time"])
+    while filled and all((chunk.get(variable) or [None] * filled)[filled - 1] is None
+                         for variable in DAILY_VARIABLES):
+        filled -= 1
+    stored = {key: values[:filled] for key, values in chunk.items() if isinstance(values, list)}
+    last = stored["time"][-1] if filled else date(year - 1, 12, 31).isoformat()
+    stored.update({
+        "end": last,
+        "complete": last == date(year, 12, 31).isoformat(),
+        "fetched_at": time.time()
+    })
+    cache.set(CACHE_NAMESPACE, _chunk_key(coords, year), stored, ttl=PERMANENT_TTL)
+
+
+def _consecutive_groups(years: List[int], size: int) -> List[List[int]]:
+    """Split sorted years into runs of consecutive years, each at most ``size`` long."""
+    groups: List[List[int]] = []
+    for year in years:
+        if groups and groups[-1][-1] == year - 1 and len(groups[-1]) < size:
+            groups[-1].append(year)
+        else:
+            groups.append([year])
+    return groups
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    """Build the error response returned in place of a climate history summary."""
+    return {
+        "error": message,
+        "days": 0,
+        "variables": {}
+    }
@@ -1,92 +1,213 @@
 """
 MCP tool for fetching climate data from Open Meteo API.
 """
+import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Union
+from tools.cache import get_cache, freshness, revalidate, count_cache_event, refresh_conditionally, Validated, NOT_MODIFIED
+from tools.json_backend import loads, response_json
+from tools.metrics import instrument_tool
+from tools import http_client
 
 
+CACHE_NAMESPACE = "climate"
+
+# Current weather moves quickly: forecasts are fresh for ten minutes, then
+# served for up to an hour while a background refresh replaces them
+CACHE_TTL = 10 * 60
+CACHE_STALE_TTL = 60 * 60
+
+# For this implementation, we'll use New York coordinates as specified
+# In a production system, you'd want to add geocoding for other locations
+LOCATION_COORDS = {
+    "new york": {"lat": 40.71, "lon": -74.01},
+    "newyork": {"lat": 40.71, "lon": -74.01},
+    "ny": {"lat": 40.71, "lon": -74.01}
+}
+DEFAULT_LOCATION = "newyork"
+
+# Coordinates are rounded to two decimals (~1 km), so nearby points share one
+# upstream lookup and one cache entry
+COORDINATE_PRECISION = 2
+
+# Open Meteo accepts comma-separated coordinate lists; keep URLs a sane length
+MAX_LOCATIONS_PER_REQUEST = 50
+
+Location = Union[str, Tuple[float, float]]
+
+
+def resolve_location(location: Location) -> Tuple[float, float]:
+    """
+    Turn a location name or (latitude, longitude) pair into rounded coordinates.
+
+    Args:
+        location: Location name (unknown names default to New York) or a
+            (latitude, longitude) tuple
+
+    Returns:
+        Tuple of rounded latitude and longitude
+    """
+    if isinstance(location, str):
+        location_key = location.lower().replace(" ", "")
+        coords = LOCATION_COORDS.get(location_key, LOCATION_COORDS[DEFAULT_LOCATION])
+        lat, lon = coords["lat"], coords["lon"]
+    else:
+        lat, lon = location
+    return round(float(lat), COORDINATE_PRECISION), round(float(lon), COORDINATE_PRECISION)
+
+
+def _coordinate_key(coords: Tuple[float, float]) -> str:
+    """Cache key for a rounded coordinate pair."""
+    return f"{coords[0]:.{COORDINATE_PRECISION}f},{coords[1]:.{COORDINATE_PRECISION}f}"
+
+
+@instrument_tool("fetch_climate_data")
 def fetch_climate_data(location: str) -> Dict[str, Any]:
     """
     MCP tool to fetch climate data from Open Meteo API.
-    
+
+    Successful responses are stored in the shared cache when one is
+    configured, so repeated lookups from any worker process skip the API.
+
     Args:
         location: Location name for climate data (currently supports "New York")
-        
+
     Returns:
         JSON response with temperature and weather data or error information
     """
-    try:
-        # For this implementation, we'll use New York coordinates as specified
-        # In a production system, you'd want to add geocoding for other locations
-        location_coords = {
-            "new york": {"lat": 40.71, "lon": -74.01},
-            "newyork": {"lat": 40.71, "lon": -74.01},
-            "ny": {"lat": 40.71, "lon": -74.01}
-        }
-        
-        location_key = location.lower().replace(" ", "")
-        
-        if location_key not in location_coords:
-            # Default to New York if location not found
-            coords = location_coords["newyork"]
+    return fetch_climate_batch([location])[0]
+
+
+def fetch_climate_batch(locations: List[Location]) -> List[Dict[str, Any]]:
+    """
+    Fetch climate data for many locations with as few API requests as possible.
+
+    Locations are rounded and de-duplicated, looked up in the shared cache
+    individually, and the remaining ones are requested from Open Meteo in
+    groups of up to ``MAX_LOCATIONS_PER_REQUEST`` coordinates per call.
+    Stale cache entries are returned as they are and refreshed in the background;
+    expired entries with stored validators are revalidated one by one, so a
+    304 keeps their body.
+
+    Args:
+        locations: Location names and/or (latitude, longitude) tuples
+
+    Returns:
+        One response (or error dict) per input location, in input order.
+        Locations that round to the same coordinates share one response.
+    """
+    cache = get_cache()
+    coordinates = [resolve_location(location) for location in locations]
+    fresh_for, stale_for = freshness(CACHE_NAMESPACE, CACHE_TTL, CACHE_STALE_TTL)
+
+    def store(coords: Tuple[float, float], result: Dict[str, Any], validators: Optional[Dict[str, Any]]) -> None:
+        if "error" not in result:
+            cache.set(CACHE_NAMESPACE, _coordinate_key(coords), result, ttl=fresh_for + stale_for,
+                      validators=validators)
+
+    results = {}
+    missing = []
+    for coords in dict.fromkeys(coordinates):
+        entry = cache.get_entry(CACHE_NAMESPACE, _coordinate_key(coords)) if cache is not None else None
+        if entry is None:
+            if cache is not None:
+                count_cache_event(CACHE_NAMESPACE, "misses")
+                stored = cache.get_stored(CACHE_NAMESPACE, _coordinate_key(coords))
+                if stored is not None and stored[1]:
+                    # Expired, but its validators can still save the body: ask for this coordinate alone
+                    results[coords] = refresh_conditionally(
+                        CACHE_NAMESPACE, _coordinate_key(coords), lambda validators, coords=coords:
+                        _refetch(coords, validators), fresh_for + stale_for)[0]
+                    continue
+            missing.append(coords)
+            continue
+        raw, stored_at = entry
+        results[coords] = loads(raw)
+        if time.time() - stored_at < fresh_for:
+            count_cache_event(CACHE_NAMESPACE, "fresh_hits")
         else:
-            coords = location_coords[location_key]
-        
-        lat, lon = coords["lat"], coords["lon"]
-        
+            count_cache_event(CACHE_NAMESPACE, "stale_served")
+            revalidate(CACHE_NAMESPACE, _coordinate_key(coords), lambda coords=coords: refresh_conditionally(
+                CACHE_NAMESPACE, _coordinate_key(coords), lambda validators: _refetch(coords, validators),
+                fresh_for + stale_for)[1])
+
+    for start in range(0, len(missing), MAX_LOCATIONS_PER_REQUEST):
+        chunk = missing[start:start + MAX_LOCATIONS_PER_REQUEST]
+        chunk_results, validators = _request_climate_data(chunk)
+        for coords, result in zip(chunk, chunk_results):
+            results[coords] = result
+            if cache is not None:
+                # Validators of a multi-location response do not belong to any single entry
+                store(coords, result, validators if len(chunk) == 1 else None)
+
+    return [results[coords] for coords in coordinates]
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    """Build the error response returned in place of climate data."""
+    return {
+        "error": message,
+        "current_weather": {},
+        "daily": {}
+    }
+
+
+def _refetch(coords: Tuple[float, float], validators: Optional[Dict[str, Any]]) -> Any:
+    """Conditionally re-request one coordinate for ``refresh_conditionally``."""
+    results, new_validators = _request_climate_data([coords], validators)
+    return NOT_MODIFIED if results is None else Validated(results[0], new_validators)
+
+
+def _request_climate_data(coordinates: List[Tuple[float, float]], validators: Optional[Dict[str, Any]] = None
+                          ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    """
+    Query the Open Meteo forecast endpoint for several coordinates without caching.
+
+    Returns:
+        (results, validators): one result per coordinate and the response's
+        HTTP validators; results is None when ``validators`` still matched (304)
+    """
+    try:
+        latitudes = ",".join(str(lat) for lat, _ in coordinates)
+        longitudes = ",".join(str(lon) for _, lon in coordinates)
+
         # Fetch current weather and 7-day forecast
         url = (
             f"https://api.open-meteo.com/v1/forecast?"
-            f"latitude={lat}&longitude={lon}&"
+            f"latitude={latitudes}&longitude={longitudes}&"
             f"current_weather=true&"
             f"daily=temperature_2m_max,temperature_2m_min,precipitation_sum&"
             f"timezone=auto"
         )
-        
-        response = requests.get(url, timeout=30)
+
+        response = http_client.get(url, validators=validators)
+        if validators and http_client.is_not_modified(response):
+            return None, validators
         response.raise_for_status()
-        
-        data = response.json()
-        
+
+        data = response_json(response)
+
+        # A single coordinate returns an object, several return a list in request order
+        if isinstance(data, dict) and len(coordinates) == 1:
+            data = [data]
+
         # Validate response structure
-        if not isinstance(data, dict):
-            return {
-                "error": "Invalid response format from Open Meteo API",
-                "current_weather": {},
-                "daily": {}
-            }
-            
-        return data
-        
+        if not isinstance(data, list) or len(data) != len(coordinates) \
+                or not all(isinstance(item, dict) for item in data):
+            return [_error_result("Invalid response format from Open Meteo API") for _ in coordinates], None
+
+        return data, http_client.response_validators(response)
+
     except requests.exceptions.Timeout:
-        return {
-            "error": "Request timeout while fetching climate data",
-            "current_weather": {},
-            "daily": {}
-        }
+        error = _error_result("Request timeout while fetching climate data")
     except requests.exceptions.ConnectionError:
-        return {
-            "error": "Connection error while accessing Open Meteo API",
-            "current_weather": {},
-            "daily": {}
-        }
+        error = _error_result("Connection error while accessing Open Meteo API")
     except requests.exceptions.HTTPError as e:
         status_code = getattr(e.response, 'status_code', 'Unknown') if e.response else 'Unknown'
         reason = getattr(e.response, 'reason', 'Unknown') if e.response else 'Unknown'
-        return {
-            "error": f"HTTP error {status_code}: {reason}",
-            "current_weather": {},
-            "daily": {}
-        }
+        error = _error_result(f"HTTP error {status_code}: {reason}")
     except requests.exceptions.RequestException as e:
-        return {
-            "error": f"Request failed: {str(e)}",
-            "current_weather": {},
-            "daily": {}
-        }
+        error = _error_result(f"Request failed: {str(e)}")
     except Exception as e:
-        return {
-            "error": f"Unexpected error: {str(e)}",
-            "current_weather": {},
-            "daily": {}
-        }
\ No newline at end of file
+        error = _error_result(f"Unexpected error: {str(e)}")
+    return [dict(error) for _ in coordinates], None
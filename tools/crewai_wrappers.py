@@ -0,0 +1,63 @@
+"""
+CrewAI-compatible wrappers around the MCP tools.
+
+Importing this module pulls in ``crewai``, which is slow to load, so callers
+import it only once an agent pipeline is actually being built.
+"""
+from crewai.tools import BaseTool
+from tools.json_backend import dumps
+from tools.species_tool import fetch_species
+from tools.climate_tool import fetch_climate_data
+from tools.occurrence_tool import fetch_occurrence_distribution
+from tools.climate_history_tool import fetch_climate_history
+from tools.records import SpeciesSearch, ClimateSeries
+
+
+class SpeciesTool(BaseTool):
+    """CrewAI-compatible wrapper for the species MCP tool."""
+    name: str = "fetch_species"
+    description: str = "Fetch species data from GBIF API using MCP tool. Input should be a species name."
+
+    def _run(self, species_name: str) -> str:
+        """Execute the species tool and return the fields the agents use as a JSON string."""
+        result = SpeciesSearch.from_response(fetch_species(species_name))
+        return dumps(result.to_dict(), indent=True)
+
+
+class ClimateTool(BaseTool):
+    """CrewAI-compatible wrapper for the climate MCP tool."""
+    name: str = "fetch_climate_data"
+    description: str = "Fetch climate data from Open Meteo API using MCP tool. Input should be a location name."
+
+    def _run(self, location: str) -> str:
+        """Execute the climate tool and return the fields the agents use as a JSON string."""
+        result = ClimateSeries.from_response(fetch_climate_data(location))
+        return dumps(result.to_dict(), indent=True)
+
+
+class OccurrenceTool(BaseTool):
+    """CrewAI-compatible wrapper for the occurrence distribution MCP tool."""
+    name: str = "fetch_occurrence_distribution"
+    description: str = (
+        "Summarize where a species has been observed using GBIF occurrence records "
+        "binned on a latitude/longitude grid. Input should be a species name."
+    )
+
+    def _run(self, species_name: str) -> str:
+        """Execute the occurrence tool and return JSON string."""
+        result = fetch_occurrence_distribution(species_name)
+        return dumps(result, indent=True)
+
+
+class ClimateHistoryTool(BaseTool):
+    """CrewAI-compatible wrapper for the historical climate MCP tool."""
+    name: str = "fetch_climate_history"
+    description: str = (
+        "Summarize ten years of daily climate for a location from the Open Meteo archive: "
+        "means, extremes, warming trend per decade and the recent anomaly. Input should be a location name."
+    )
+
+    def _run(self, location: str) -> str:
+        """Execute the climate history tool and return JSON string."""
+        result = fetch_climate_history(location)
+        return dumps(result, indent=True)
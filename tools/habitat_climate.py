@@ -0,0 +1,275 @@
+"""
+Precomputed climate summaries for the regions where a species lives.
+
+Joining a species' occurrence distribution with multi-year climate series
+takes several upstream calls, far too slow for an interactive analysis. A
+background scheduler therefore computes the summaries for popular species
+ahead of time and stores them in the shared cache; analyses then read them
+with ``get_habitat_summary`` in milliseconds and never call upstream APIs.
+
+A species' habitat regions are the densest cells of its occurrence grid
+(see ``tools.occurrence_tool``). Each region's climate history (see
+``tools.climate_history_tool``) is summarized and the regions are combined,
+weighted by their share of occurrences.
+
+Run the scheduler standalone with::
+
+    python -m tools.habitat_climate tiger "snow leopard" --loop --interval 24
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import date
+from typing import Dict, Any, Iterable, List, Optional
+from tools.cache import get_cache, cache_key
+from tools.climate_history_tool import DEFAULT_YEARS, load_climate_history
+from tools.json_backend import dumps
+from tools.occurrence_tool import fetch_occurrence_distribution
+
+
+CACHE_NAMESPACE = "habitat_climate"
+
+# Summaries stay readable for a week so a late scheduler run never leaves gaps
+SUMMARY_TTL = 7 * 24 * 60 * 60
+
+DEFAULT_REFRESH_SECONDS = 24 * 60 * 60
+DEFAULT_REGIONS = 3
+
+POPULAR_SPECIES_ENV = "WILDLIFE_POPULAR_SPECIES"
+
+# Variables combined across regions, and the statistics averaged for each
+SUMMARY_VARIABLES = ("temperature_2m_mean", "temperature_2m_max", "temperature_2m_min", "precipitation_sum")
+SUMMARY_STATISTICS = ("mean", "trend_per_decade", "recent_anomaly")
+
+
+def popular_species(default: Iterable[str] = ()) -> List[str]:
+    """Species named in ``WILDLIFE_POPULAR_SPECIES`` (comma separated), else ``default``."""
+    configured = os.getenv(POPULAR_SPECIES_ENV, "")
+    names = [name.strip() for name in configured.split(",") if name.strip()]
+    return names or list(default)
+
+
+def habitat_regions(distribution: Dict[str, Any], regions: int = DEFAULT_REGIONS) -> List[Dict[str, Any]]:
+    """
+    Pick the densest occurrence cells as the species' habitat regions.
+
+    Args:
+        distribution: Result of ``fetch_occurrence_distribution``
+        regions: Maximum number of regions
+
+    Returns:
+        Cell centers with their occurrence count and share of the selected total
+    """
+    cells = distribution.get("top_cells", [])[:regions]
+    total = sum(cell["count"] for cell in cells)
+    return [
+        {"lat": cell["lat"], "lon": cell["lon"], "occurrences": cell["count"],
+         "share": round(cell["count"] / total, 3)}
+        for cell in cells
+    ]
+
+
+def compute_habitat_summary(species_name: str, regions: int = DEFAULT_REGIONS, years: int = DEFAULT_YEARS,
+                            today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Summarize the multi-year climate of a species' habitat regions.
+
+    Args:
+        species_name: Name of species to summarize
+        regions: Number of densest occurrence cells to use
+        years: Whole past years of climate history per region
+        today: Reference date (default: today)
+
+    Returns:
+        Per-region summaries and occurrence-weighted habitat statistics, or
+        error information
+    """
+    today = today or date.today()
+    distribution = fetch_occurrence_distribution(species_name)
+    if "error" in distribution:
+        return _error_result(distribution["error"])
+    selected = habitat_regions(distribution, regions)
+    if not selected:
+        return _error_result(f"No georeferenced occurrences for '{species_name}'")
+
+    try:
+        for region in selected:
+            history = load_climate_history((region["lat"], region["lon"]), date(today.year - years, 1, 1),
+                                           today=today)
+            variables = history.summary()["variables"]
+            region["climate"] = {
+                variable: {statistic: variables[variable][statistic] for statistic in SUMMARY_STATISTICS}
+                for variable in SUMMARY_VARIABLES if variable in variables
+            }
+    except Exception as e:
+        return _error_result(f"Climate history unavailable: {str(e)}")
+
+    return {
+        "species": species_name,
+        "taxonKey": distribution.get("taxonKey"),
+        "years": years,
+        "regions": selected,
+        "habitat": _weighted_climate(selected),
+        "computed_at": time.time()
+    }
+
+
+def _weighted_climate(regions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Average each regional statistic, weighted by occurrence share (missing values skipped)."""
+    combined = {}
+    for variable in SUMMARY_VARIABLES:
+        statistics = {}
+        for statistic in SUMMARY_STATISTICS:
+            pairs = [(region["share"], region["climate"][variable][statistic]) for region in regions
+                     if variable in region["climate"] and region["climate"][variable][statistic] is not None]
+            weight = sum(share for share, _ in pairs)
+            statistics[statistic] = round(sum(share * value for share, value in pairs) / weight, 3) if weight else None
+        if any(value is not None for value in statistics.values()):
+            combined[variable] = statistics
+    return combined
+
+
+def precompute_habitat_summary(species_name: str, **options: Any) -> Dict[str, Any]:
+    """Compute a habitat summary and store it in the shared cache (errors are not stored)."""
+    summary = compute_habitat_summary(species_name, **options)
+    cache = get_cache()
+    if cache is not None and "error" not in summary:
+        cache.set(CACHE_NAMESPACE, cache_key(species_name), summary, ttl=SUMMARY_TTL)
+    return summary
+
+
+def get_habitat_summary(species_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Read a precomputed habitat summary without calling any upstream API.
+
+    Returns:
+        The stored summary, or None if none has been computed (or no cache is configured)
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    return cache.get(CACHE_NAMESPACE, cache_key(species_name))
+
+
+def habitat_context(summary: Dict[str, Any]) -> str:
+    """
+    Condense a habitat summary into compact JSON for an LLM prompt.
+
+    Args:
+        summary: Result of get_habitat_summary
+
+    Returns:
+        JSON string with the weighted habitat climate and the regions used
+    """
+    brief = {
+        "years": summary.get("years"),
+        "habitat": summary.get("habitat", {}),
+        "regions": [{key: region.get(key) for key in ("lat", "lon", "share")}
+                    for region in summary.get("regions", [])]
+    }
+    return dumps(brief)
+
+
+class HabitatClimateScheduler:
+    """Background thread that keeps habitat summaries of popular species fresh."""
+
+    def __init__(self, species: Iterable[str], interval: float = DEFAULT_REFRESH_SECONDS, **options: Any):
+        """
+        Args:
+            species: Species names to keep precomputed
+            interval: Seconds between refresh passes; summaries younger than
+                this are skipped
+            **options: Passed to ``compute_habitat_summary`` (``regions``, ``years``)
+        """
+        self.species = list(species)
+        self.interval = interval
+        self.options = options
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, force: bool = False) -> Dict[str, str]:
+        """
+        Refresh every species whose summary is missing or older than the interval.
+
+        Args:
+            force: Recompute even fresh summaries
+
+        Returns:
+            Outcome per species: "refreshed", "fresh" or the error message
+        """
+        outcomes = {}
+        for species in self.species:
+            if self._stop.is_set():
+                break
+            current = None if force else get_habitat_summary(species)
+            if current is not None and time.time() - current.get("computed_at", 0) < self.interval:
+                outcomes[species] = "fresh"
+                continue
+            summary = precompute_habitat_summary(species, **self.options)
+            outcomes[species] = summary.get("error", "refreshed")
+        return outcomes
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            started = time.time()
+            outcomes = self.run_once()
+            refreshed = sum(1 for outcome in outcomes.values() if outcome == "refreshed")
+            print(f"🌡️  Habitat climate: {refreshed} refreshed, {len(outcomes) - refreshed} fresh or failed "
+                  f"in {time.time() - started:.1f}s")
+            self._stop.wait(self.interval)
+
+    def start(self) -> "HabitatClimateScheduler":
+        """Run refresh passes in a daemon thread until ``stop`` is called."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="habitat-climate", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Ask the thread to finish after the species being computed, and wait for it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    """Build the error response returned in place of a habitat summary."""
+    return {
+        "error": message,
+        "regions": [],
+        "habitat": {}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute habitat climate summaries into the shared cache.")
+    parser.add_argument("species", nargs="*", help=f"Species names (default: ${POPULAR_SPECIES_ENV})")
+    parser.add_argument("--regions", type=int, default=DEFAULT_REGIONS, help="Habitat regions per species")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS, help="Years of climate history per region")
+    parser.add_argument("--interval", type=float, default=DEFAULT_REFRESH_SECONDS / 3600,
+                        help="Hours between refreshes (default: 24)")
+    parser.add_argument("--loop", action="store_true", help="Keep refreshing instead of running one pass")
+    parser.add_argument("--force", action="store_true", help="Recompute summaries that are still fresh")
+    args = parser.parse_args(argv)
+
+    species = args.species or popular_species()
+    if not species:
+        parser.error(f"name species or set {POPULAR_SPECIES_ENV}")
+    if get_cache() is None:
+        parser.error("set WILDLIFE_CACHE_DB so summaries can be stored")
+
+    scheduler = HabitatClimateScheduler(species, args.interval * 3600, regions=args.regions, years=args.years)
+    if args.loop:
+        try:
+            scheduler._loop()
+        except KeyboardInterrupt:
+            pass
+    else:
+        for name, outcome in scheduler.run_once(force=args.force).items():
+            print(f"{'✅' if outcome in ('refreshed', 'fresh') else '⚠️'} {name}: {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Latency-aware GETs for the upstream APIs (GBIF, Open Meteo).
+
+A fixed 30 second timeout lets one stuck response hold an analysis for half
+a minute, although these APIs normally answer in well under a second.
+``get`` keeps the latencies of the last ``LATENCY_WINDOW`` requests per host
+and, once it has ``MIN_SAMPLES`` of them, uses ``TIMEOUT_MULTIPLIER`` times
+the host's p99 as the timeout, kept between ``WILDLIFE_HTTP_MIN_TIMEOUT``
+(default 5) and ``WILDLIFE_HTTP_TIMEOUT`` (default 30) seconds. Timed-out
+requests count as samples, so a host that slows down widens its own timeout.
+
+With ``WILDLIFE_HEDGE_REQUESTS=1`` (or ``hedge=True``), a GET still running
+after the host's p95 gets a hedged duplicate, and whichever answers first
+wins. Hedges are capped at ``WILDLIFE_HEDGE_BUDGET`` (default 0.1) of the
+requests to a host, plus a small burst, so a slow host is not hit twice as
+hard. Only the idempotent GETs made here are ever hedged.
+
+Metrics: ``wildlife_http_attempt_duration_seconds`` (every request sent) and
+``wildlife_http_request_duration_seconds`` (what callers waited) show the
+tail latency saved by hedging; ``wildlife_http_hedges_total{host,outcome}``
+counts hedges that won, lost, failed or were skipped for lack of budget, and
+``wildlife_http_timeout_seconds`` / ``wildlife_http_latency_seconds`` export
+the current per-host timeout and percentiles.
+
+Streamed GETs (``stream=True``, for large pages) negotiate compression
+explicitly with ``ACCEPT_ENCODING``: br first when a brotli decoder is
+installed (``pip install brotli``), then gzip; other GETs get the same
+encodings from requests' defaults. ``wildlife_http_responses_total{host,
+encoding}`` counts what the hosts actually answered with. requests
+decompresses transparently, also while ``iter_content`` streams a body.
+
+``validators`` turns a GET into a conditional one (``If-None-Match`` /
+``If-Modified-Since``), and ``response_validators`` extracts what to store
+for the next revalidation; see ``tools.cache.refresh_conditionally``.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from tools.metrics import registry
+
+TIMEOUT_ENV = "WILDLIFE_HTTP_TIMEOUT"
+MIN_TIMEOUT_ENV = "WILDLIFE_HTTP_MIN_TIMEOUT"
+HEDGE_ENV = "WILDLIFE_HEDGE_REQUESTS"
+HEDGE_BUDGET_ENV = "WILDLIFE_HEDGE_BUDGET"
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MIN_TIMEOUT = 5.0
+DEFAULT_HEDGE_BUDGET = 0.1
+
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+TIMEOUT_MULTIPLIER = 3.0
+HEDGE_QUANTILE = 0.95
+# Hedges that may be sent back to back before the budget has to refill
+HEDGE_BURST = 3.0
+HEDGE_WORKERS = 16
+
+
+def _accept_encoding() -> str:
+    """Encodings urllib3 can decode here, best compression first."""
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "br, gzip, deflate"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+HTTP_ATTEMPT_DURATION = registry.histogram(
+    "wildlife_http_attempt_duration_seconds", "Latency of each upstream GET sent, hedges included.", ("host",))
+HTTP_REQUEST_DURATION = registry.histogram(
+    "wildlife_http_request_duration_seconds", "Upstream GET latency as seen by the caller.", ("host",))
+HTTP_HEDGES = registry.counter(
+    "wildlife_http_hedges_total", "Hedged GETs by outcome (won, lost, failed, skipped).", ("host", "outcome"))
+HTTP_RESPONSES = registry.counter(
+    "wildlife_http_responses_total", "Upstream responses by Content-Encoding (identity when uncompressed).",
+    ("host", "encoding"))
+
+
+class HostLatency:
+    """Recent request latencies of one host, and the timeout and hedge delay derived from them."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._hedge_tokens = HEDGE_BURST
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """The nearest-rank percentile, or None while fewer than ``MIN_SAMPLES`` are known."""
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def timeout(self) -> float:
+        """Seconds to wait for one request to this host."""
+        ceiling = float(os.getenv(TIMEOUT_ENV) or DEFAULT_TIMEOUT)
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return ceiling
+        floor = min(float(os.getenv(MIN_TIMEOUT_ENV) or DEFAULT_MIN_TIMEOUT), ceiling)
+        return min(ceiling, max(floor, p99 * TIMEOUT_MULTIPLIER))
+
+    def earn_hedge(self) -> None:
+        """Add the budget share one request earns."""
+        budget = float(os.getenv(HEDGE_BUDGET_ENV) or DEFAULT_HEDGE_BUDGET)
+        with self._lock:
+            self._hedge_tokens = min(HEDGE_BURST, self._hedge_tokens + budget)
+
+    def spend_hedge(self) -> bool:
+        """Take one hedge from the budget; False when it is exhausted."""
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            return True
+
+
+_hosts: Dict[str, HostLatency] = {}
+_hosts_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def host_latency(host: str) -> HostLatency:
+    """The latency tracker of ``host`` (created on first use)."""
+    with _hosts_lock:
+        tracker = _hosts.get(host)
+        if tracker is None:
+            tracker = _hosts[host] = HostLatency()
+        return tracker
+
+
+def reset_latency() -> None:
+    """Forget all latency samples and hedge budgets (for tests)."""
+    with _hosts_lock:
+        _hosts.clear()
+
+
+def _hedging(hedge: Optional[bool]) -> bool:
+    if hedge is not None:
+        return hedge
+    return os.getenv(HEDGE_ENV, "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _hosts_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="wildlife-http")
+        return _executor
+
+
+def _attempt(host: str, tracker: HostLatency, url: str, timeout: float, kwargs: Dict[str, Any]):
+    start_time = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=timeout, **kwargs)
+    except requests.exceptions.Timeout:
+        # A timeout is a lower bound on the latency; counting it widens later timeouts
+        elapsed = time.perf_counter() - start_time
+        tracker.record(elapsed)
+        HTTP_ATTEMPT_DURATION.observe(elapsed, host=host)
+        raise
+    elapsed = time.perf_counter() - start_time
+    tracker.record(elapsed)
+    HTTP_ATTEMPT_DURATION.observe(elapsed, host=host)
+    HTTP_RESPONSES.inc(host=host, encoding=response_encoding(response))
+    return response
+
+
+def response_encoding(response: Any) -> str:
+    """The Content-Encoding a response was sent with, ``identity`` if none."""
+    headers = getattr(response, "headers", None) or {}
+    encoding = headers.get("Content-Encoding")
+    return encoding.strip().lower() if isinstance(encoding, str) and encoding.strip() else "identity"
+
+
+def conditional_headers(validators: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Request headers that let the server answer 304 when ``validators`` still match."""
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def response_validators(response: Any) -> Optional[Dict[str, Any]]:
+    """
+    The ETag / Last-Modified of a response and its body size, or None if it has neither.
+
+    ``size`` is what a later 304 saves downloading.
+    """
+    headers = getattr(response, "headers", None) or {}
+    validators = {}
+    for name, field in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+        value = headers.get(name)
+        if isinstance(value, str) and value:
+            validators[field] = value
+    if not validators:
+        return None
+    content = getattr(response, "content", None)
+    validators["size"] = len(content) if isinstance(content, bytes) else 0
+    return validators
+
+
+def is_not_modified(response: Any) -> bool:
+    """Whether a conditional GET was answered 304 Not Modified."""
+    return getattr(response, "status_code", None) == 304
+
+
+def get(url: str, timeout: Optional[float] = None, hedge: Optional[bool] = None,
+        validators: Optional[Dict[str, Any]] = None, **kwargs: Any):
+    """
+    ``requests.get`` with an adaptive timeout and optional hedging.
+
+    Args:
+        url: URL to fetch
+        timeout: Fixed timeout in seconds; default adapts to the host's recent latency
+        hedge: Send a hedged duplicate after the host's p95; default ``WILDLIFE_HEDGE_REQUESTS``
+        validators: Stored ``response_validators``; makes the GET conditional
+            (check ``is_not_modified`` on the response)
+        **kwargs: Passed to ``requests.get`` (e.g. ``params``, or ``stream=True`` to
+            read the decompressed body incrementally with ``iter_content``)
+
+    Returns:
+        requests.Response: The first response received
+
+    Raises:
+        requests.exceptions.RequestException: As ``requests.get``, when no attempt succeeds
+    """
+    headers = conditional_headers(validators)
+    if kwargs.get("stream"):
+        headers = {"Accept-Encoding": ACCEPT_ENCODING, **(kwargs.get("headers") or {}), **headers}
+    if headers:
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), **headers}
+    host = urlsplit(url).netloc
+    tracker = host_latency(host)
+    if timeout is None:
+        timeout = tracker.timeout()
+    hedge_after = tracker.percentile(HEDGE_QUANTILE) if _hedging(hedge) else None
+    start_time = time.perf_counter()
+    try:
+        if hedge_after is None or hedge_after >= timeout:
+            return _attempt(host, tracker, url, timeout, kwargs)
+        return _hedged(host, tracker, url, timeout, hedge_after, kwargs)
+    finally:
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start_time, host=host)
+
+
+def _hedged(host: str, tracker: HostLatency, url: str, timeout: float, hedge_after: float,
+            kwargs: Dict[str, Any]):
+    tracker.earn_hedge()
+    executor = _get_executor()
+    primary = executor.submit(_attempt, host, tracker, url, timeout, kwargs)
+    try:
+        return primary.result(timeout=hedge_after)
+    except FutureTimeout:
+        pass
+    if not tracker.spend_hedge():
+        HTTP_HEDGES.inc(host=host, outcome="skipped")
+        return primary.result()
+
+    backup = executor.submit(_attempt, host, tracker, url, timeout, kwargs)
+    error = None
+    for future in as_completed((primary, backup)):
+        if future.exception() is None:
+            HTTP_HEDGES.inc(host=host, outcome="won" if future is backup else "lost")
+            if kwargs.get("stream"):
+                # A streamed loser holds its connection until its body is read or closed
+                (primary if future is backup else backup).add_done_callback(_close_response)
+            return future.result()
+        error = error or future.exception()
+    HTTP_HEDGES.inc(host=host, outcome="failed")
+    raise error
+
+
+def _close_response(future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+def _latency_samples() -> Iterable:
+    with _hosts_lock:
+        hosts = sorted(_hosts.items())
+    for host, tracker in hosts:
+        for quantile in (0.5, 0.95, 0.99):
+            value = tracker.percentile(quantile)
+            if value is not None:
+                yield "wildlife_http_latency_seconds", {"host": host, "quantile": str(quantile)}, value
+
+
+def _timeout_samples() -> Iterable:
+    with _hosts_lock:
+        hosts = sorted(_hosts.items())
+    for host, tracker in hosts:
+        yield "wildlife_http_timeout_seconds", {"host": host}, tracker.timeout()
+
+
+registry.collector("wildlife_http_latency_seconds", "Recent upstream GET latency percentiles per host.",
+                   "gauge", _latency_samples)
+registry.collector("wildlife_http_timeout_seconds", "Current adaptive timeout per upstream host.",
+                   "gauge", _timeout_samples)
@@ -0,0 +1,256 @@
+"""
+Pluggable JSON encoding and decoding for the tools, caches and wrappers.
+
+orjson or msgspec are used when installed (in that order of preference),
+with the standard library as the fallback; set ``WILDLIFE_JSON_BACKEND`` to
+``orjson``, ``msgspec`` or ``stdlib`` to pick one explicitly. All backends
+produce plain JSON, so cache entries written by one process can be read by
+workers using another. Encoded output is compact (no spaces) unless
+``indent`` is requested.
+
+``ObjectStream`` decodes one large JSON object incrementally from a byte
+stream, yielding the elements of one array member as they arrive (see the
+GBIF occurrence pages in ``tools.occurrence_tool``).
+"""
+import codecs
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Union
+
+
+JSON_BACKEND_ENV = "WILDLIFE_JSON_BACKEND"
+BACKENDS = ("orjson", "msgspec", "stdlib")
+
+Default = Optional[Callable[[Any], Any]]
+
+
+class _StdlibBackend:
+    name = "stdlib"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumpb(self, value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> bytes:
+        return self.dumps(value, indent, sort_keys, default).encode("utf-8")
+
+    def dumps(self, value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> str:
+        if indent:
+            return json.dumps(value, indent=2, sort_keys=sort_keys, default=default, ensure_ascii=False)
+        return json.dumps(value, separators=(",", ":"), sort_keys=sort_keys, default=default, ensure_ascii=False)
+
+
+class _OrjsonBackend:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+    def dumpb(self, value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> bytes:
+        option = self._orjson.OPT_NON_STR_KEYS | self._orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= self._orjson.OPT_SORT_KEYS
+        return self._orjson.dumps(value, default=default, option=option)
+
+    def dumps(self, value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> str:
+        return self.dumpb(value, indent, sort_keys, default).decode("utf-8")
+
+
+class _MsgspecBackend:
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+        self._msgspec = msgspec
+        self._decoder = msgspec.json.Decoder()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._decoder.decode(data)
+
+    def dumpb(self, value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> bytes:
+        encoded = self._msgspec.json.encode(value, enc_hook=default, order="sorted" if sort_keys else None)
+        return self._msgspec.json.format(encoded, indent=2) if indent else encoded
+
+    def dumps(self, value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> str:
+        return self.dumpb(value, indent, sort_keys, default).decode("utf-8")
+
+
+_BACKEND_CLASSES = {"orjson": _OrjsonBackend, "msgspec": _MsgspecBackend, "stdlib": _StdlibBackend}
+
+
+def _load_backend(preferred: Optional[str] = None):
+    """Instantiate the preferred backend, or the fastest one that is installed."""
+    if preferred and preferred != "auto":
+        if preferred not in _BACKEND_CLASSES:
+            raise ValueError(f"Unknown JSON backend '{preferred}'; choose from {', '.join(BACKENDS)}")
+        return _BACKEND_CLASSES[preferred]()
+    for name in BACKENDS:
+        try:
+            return _BACKEND_CLASSES[name]()
+        except ImportError:
+            continue
+
+
+backend = _load_backend(os.getenv(JSON_BACKEND_ENV))
+
+
+def set_backend(name: str) -> str:
+    """
+    Switch the process-wide backend (mainly for tests and benchmarks).
+
+    Args:
+        name: ``orjson``, ``msgspec``, ``stdlib`` or ``auto``
+
+    Returns:
+        str: Name of the backend that was active before
+    """
+    global backend
+    previous = backend.name
+    backend = _load_backend(name)
+    return previous
+
+
+def backend_name() -> str:
+    """Name of the active backend."""
+    return backend.name
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON from bytes or text."""
+    return backend.loads(data)
+
+
+def dumps(value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> str:
+    """Encode ``value`` as JSON text."""
+    return backend.dumps(value, indent, sort_keys, default)
+
+
+def dumpb(value: Any, indent: bool = False, sort_keys: bool = False, default: Default = None) -> bytes:
+    """Encode ``value`` as UTF-8 JSON bytes, skipping the str round trip where the backend allows."""
+    return backend.dumpb(value, indent, sort_keys, default)
+
+
+def response_json(response) -> Any:
+    """
+    Decode an HTTP response body with the active backend.
+
+    The raw bytes are decoded directly, skipping requests' own text decoding
+    and stdlib parse; responses without a byte body (such as test doubles)
+    fall back to ``response.json()``.
+    """
+    content = getattr(response, "content", None)
+    if isinstance(content, (bytes, bytearray)):
+        return backend.loads(content)
+    return response.json()
+
+
+_WHITESPACE = " \t\n\r"
+_element_decoder = json.JSONDecoder()
+
+
+class ObjectStream:
+    """
+    Incremental decoder for one JSON object read from byte chunks.
+
+    Iterating yields the elements of the array member ``key`` one at a time
+    as soon as their bytes have arrived; every other top-level member is
+    decoded into ``fields`` on the way. Only the pending chunk and the current
+    element are held, never the whole body or the whole array.
+
+    Elements are decoded with the standard library's ``raw_decode``: the
+    other backends can only decode a complete document.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], key: str):
+        """
+        Args:
+            chunks: Body bytes in any split (e.g. ``response.iter_content(...)``)
+            key: Name of the top-level array member to stream
+        """
+        self.key = key
+        self.fields: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> None:
+        """Append the next chunk, dropping what has been consumed."""
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._text.decode(b"", final=True)
+        else:
+            text = self._text.decode(chunk)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+
+    def _peek(self) -> str:
+        """The next non-whitespace character ('' at the end of the body)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._fill()
+
+    def _expect(self, character: str) -> None:
+        found = self._peek()
+        if found != character:
+            raise ValueError(f"Expected '{character}' but found '{found or 'end of body'}'")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """Decode the value at the current position, reading more chunks until it is complete."""
+        self._peek()
+        while True:
+            try:
+                value, end = _element_decoder.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Read until the pending text doubles, so retrying a long value stays linear
+            target = 2 * (len(self._buffer) - self._pos) + 1
+            while not self._eof and len(self._buffer) - self._pos < target:
+                self._fill()
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name = self._value()
+            if not isinstance(name, str):
+                raise ValueError(f"Expected an object key but found {name!r}")
+            self._expect(":")
+            if name == self.key:
+                yield from self._elements()
+            else:
+                self.fields[name] = self._value()
+            if self._peek() == "}":
+                self._pos += 1
+                return
+            self._expect(",")
+
+    def _elements(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == "]":
+                self._pos += 1
+                return
+            self._expect(",")
@@ -0,0 +1,383 @@
+"""
+Prometheus-style metrics for tool, cache and pipeline health.
+
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format (0.0.4), so the standard scraper can
+read it without adding ``prometheus_client`` as a dependency. Updates take
+one lock and a dict lookup. Values that already exist elsewhere, such as the
+cache counters in ``tools.cache``, are collected at scrape time instead of
+being duplicated on the hot path.
+
+Set ``WILDLIFE_METRICS_PORT`` and call ``ensure_metrics_server()`` (the
+Streamlit apps and ``serve.py`` do) to expose ``/metrics`` on localhost.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_PORT_ENV = "WILDLIFE_METRICS_PORT"
+METRICS_HOST_ENV = "WILDLIFE_METRICS_HOST"
+
+# Seconds; covers cache hits (sub-millisecond) up to full LLM pipelines
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._lines()
+
+    def _lines(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError(f"{self.name} is a counter and cannot decrease (got {amount})")
+        self._add(amount, labels)
+
+    def _add(self, amount: float, labels: Dict[str, Any]) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _lines(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down per label set."""
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations (e.g. latencies) per label set."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label set -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels: Any) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def _lines(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Named metrics plus callbacks that produce samples at scrape time."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name: str, documentation: str, kind: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Register a callback evaluated on every scrape.
+
+        Args:
+            name: Metric family name
+            documentation: HELP text
+            kind: "counter" or "gauge"
+            collect: Returns (sample_name, labels, value) triples
+        """
+        with self._lock:
+            self._collectors = [entry for entry in self._collectors if entry[0] != name]
+            self._collectors.append((name, documentation, kind, collect))
+
+    def render(self) -> str:
+        """The whole registry in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, documentation, kind, collect in collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"])
+            lines.extend(f"{sample}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}"
+                         for sample, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+TOOL_CALLS = registry.counter("wildlife_tool_calls_total", "MCP tool calls by outcome.", ("tool", "outcome"))
+TOOL_DURATION = registry.histogram("wildlife_tool_duration_seconds", "MCP tool call latency.", ("tool",))
+PIPELINE_DURATION = registry.histogram("wildlife_pipeline_duration_seconds",
+                                       "Analysis pipeline latency by entry point and outcome.", ("entry", "outcome"))
+PIPELINES_IN_PROGRESS = registry.gauge("wildlife_pipelines_in_progress", "Analyses currently running.", ("entry",))
+LLM_DURATION = registry.histogram("wildlife_llm_call_duration_seconds", "LLM call latency.", ("model",))
+LLM_TOKENS = registry.counter("wildlife_llm_tokens_total", "LLM tokens used.", ("model", "kind"))
+STAGE_TOKENS = registry.counter("wildlife_stage_tokens_total",
+                                "LLM tokens per pipeline stage (prompt, completion, context_saved).", ("stage", "kind"))
+
+
+def instrument_tool(tool: str) -> Callable[[Callable], Callable]:
+    """
+    Count calls and time latency of a tool function.
+
+    The outcome is "error" when the tool returns a dict with an ``error``
+    key, "exception" when it raises, and "ok" otherwise.
+    """
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            outcome = "exception"
+            try:
+                result = function(*args, **kwargs)
+                outcome = "error" if isinstance(result, dict) and "error" in result else "ok"
+                return result
+            finally:
+                TOOL_DURATION.observe(time.perf_counter() - start_time, tool=tool)
+                TOOL_CALLS.inc(tool=tool, outcome=outcome)
+        return wrapper
+    return decorate
+
+
+def instrument_pipeline(entry: str) -> Callable[[Callable], Callable]:
+    """Time an analysis entry point and track how many are running."""
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            PIPELINES_IN_PROGRESS.inc(entry=entry)
+            start_time = time.perf_counter()
+            outcome = "exception"
+            try:
+                result = function(*args, **kwargs)
+                report = result[0] if isinstance(result, tuple) else result
+                outcome = "ok" if report is not None else "error"
+                return result
+            finally:
+                PIPELINES_IN_PROGRESS.dec(entry=entry)
+                PIPELINE_DURATION.observe(time.perf_counter() - start_time, entry=entry, outcome=outcome)
+        return wrapper
+    return decorate
+
+
+def _usage_tokens(usage: Any) -> Dict[str, float]:
+    if usage is None:
+        return {}
+    if not isinstance(usage, dict):
+        usage = getattr(usage, "model_dump", lambda: vars(usage))()
+    return {kind: usage[field] for kind, field in (("prompt", "prompt_tokens"), ("completion", "completion_tokens"))
+            if isinstance(usage.get(field), (int, float))}
+
+
+_llm_hooks_installed = False
+_llm_started: Dict[str, float] = {}
+
+
+def instrument_crewai() -> None:
+    """Record LLM call latency and token usage from CrewAI's event bus (once per process)."""
+    global _llm_hooks_installed
+    if _llm_hooks_installed:
+        return
+    try:
+        from crewai.events import crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent
+    except ImportError:
+        return
+    _llm_hooks_installed = True
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def _started(source, event):
+        _llm_started[event.call_id] = time.perf_counter()
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def _completed(source, event):
+        model = event.model or "unknown"
+        started = _llm_started.pop(event.call_id, None)
+        if started is not None:
+            LLM_DURATION.observe(time.perf_counter() - started, model=model)
+        for kind, tokens in _usage_tokens(event.usage).items():
+            LLM_TOKENS.inc(tokens, model=model, kind=kind)
+
+
+def _cache_samples() -> Iterable[Sample]:
+    from tools.cache import cache_metrics
+    for namespace, counters in sorted(cache_metrics().items()):
+        for event in ("fresh_hits", "stale_served", "misses", "revalidations", "revalidation_failures",
+                      "not_modified"):
+            if event in counters:
+                yield "wildlife_cache_events_total", {"namespace": namespace, "event": event}, counters[event]
+
+
+def _cache_byte_samples() -> Iterable[Sample]:
+    from tools.cache import cache_metrics
+    for namespace, counters in sorted(cache_metrics().items()):
+        for kind in ("fetched", "saved"):
+            if f"bytes_{kind}" in counters:
+                yield "wildlife_cache_revalidation_bytes_total", {"namespace": namespace, "kind": kind}, \
+                    counters[f"bytes_{kind}"]
+
+
+def _queue_samples() -> Iterable[Sample]:
+    from tools.cache import pending_revalidations
+    yield "wildlife_queue_depth", {"queue": "cache_revalidation"}, pending_revalidations()
+
+
+registry.collector("wildlife_cache_events_total", "Shared cache lookups and background refreshes by outcome.",
+                   "counter", _cache_samples)
+registry.collector("wildlife_cache_revalidation_bytes_total",
+                   "Response bodies downloaded for validated entries, and saved by 304 Not Modified.",
+                   "counter", _cache_byte_samples)
+registry.collector("wildlife_queue_depth", "Jobs waiting or running in background queues.", "gauge", _queue_samples)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread and return the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def ensure_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """
+    Start the scrape endpoint once per process if ``WILDLIFE_METRICS_PORT`` is set.
+
+    Returns:
+        The running server, or None when disabled or the port is taken
+    """
+    global _server
+    port = int(os.getenv(METRICS_PORT_ENV) or 0)
+    if port <= 0:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = start_metrics_server(port, os.getenv(METRICS_HOST_ENV, "127.0.0.1"))
+            except OSError as e:
+                print(f"📈 Metrics endpoint not started on port {port}: {e}", file=sys.stderr)
+                return None
+        return _server
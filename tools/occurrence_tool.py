@@ -0,0 +1,339 @@
+"""
+MCP tool for summarizing where a species has been observed, using GBIF
+occurrence records.
+
+Occurrence coordinates are streamed page by page from the GBIF
+``occurrence/search`` API (or read in chunks from a downloaded occurrence
+archive) and binned into a fixed latitude/longitude grid with NumPy. Only the
+grid counts are kept, so memory stays bounded however many records are read.
+Search pages are requested compressed and decoded while they download: only
+the coordinates of each record are kept, never the whole page body.
+
+When a local occurrence store is configured (see ``tools.occurrence_store``),
+taxa it holds are binned straight from its memory-mapped columns instead.
+"""
+import requests
+import numpy as np
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from tools.cache import cache_key, cached_call
+from tools.json_backend import ObjectStream, dumps, response_json
+from tools.occurrence_store import get_occurrence_store, iter_archive_rows
+from tools.taxonomy_index import get_taxonomy_index
+from tools.species_tool import fetch_species
+from tools import http_client
+
+
+CACHE_NAMESPACE = "occurrence"
+
+# Distributions shift slowly; recompute at most once a day, serving the
+# previous summary for up to a week while the recomputation runs
+CACHE_TTL = 24 * 60 * 60
+CACHE_STALE_TTL = 7 * 24 * 60 * 60
+
+GBIF_API = "https://api.gbif.org/v1"
+
+# GBIF's maximum page size for occurrence/search
+PAGE_SIZE = 300
+
+# occurrence/search refuses offsets beyond 100,000; use an archive for more
+MAX_SEARCH_RECORDS = 100000
+
+DEFAULT_MAX_RECORDS = 3000
+
+# Decompressed bytes read per step while decoding a search page
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_CELL_SIZE = 1.0
+ARCHIVE_CHUNK_SIZE = 100000
+
+# Occurrence table columns holding the taxon keys of each classification rank
+TAXON_KEY_COLUMNS = (
+    "taxonKey", "acceptedTaxonKey", "speciesKey", "genusKey", "familyKey",
+    "orderKey", "classKey", "phylumKey", "kingdomKey"
+)
+
+Coordinates = Tuple[np.ndarray, np.ndarray]
+
+
+class OccurrenceGrid:
+    """Fixed-size latitude/longitude histogram of occurrence records."""
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        """
+        Create an empty grid.
+
+        Args:
+            cell_size: Cell edge length in degrees (1.0 gives a 180 x 360 grid)
+        """
+        self.cell_size = cell_size
+        self.lat_edges = np.arange(-90.0, 90.0 + cell_size / 2, cell_size)
+        self.lon_edges = np.arange(-180.0, 180.0 + cell_size / 2, cell_size)
+        self.counts = np.zeros((len(self.lat_edges) - 1, len(self.lon_edges) - 1), dtype=np.int64)
+        self.total = 0
+
+    def add(self, latitudes: np.ndarray, longitudes: np.ndarray) -> None:
+        """Bin a chunk of coordinates, ignoring missing or out-of-range values."""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = (
+            np.isfinite(latitudes) & np.isfinite(longitudes)
+            & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180)
+        )
+        if not valid.any():
+            return
+        chunk, _, _ = np.histogram2d(
+            latitudes[valid], longitudes[valid], bins=(self.lat_edges, self.lon_edges)
+        )
+        self.counts += chunk.astype(np.int64)
+        self.total += int(valid.sum())
+
+    def top_cells(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most populated cells with their center coordinates."""
+        flat = self.counts.ravel()
+        occupied = np.flatnonzero(flat)
+        if limit < len(occupied):
+            occupied = occupied[np.argpartition(flat[occupied], -limit)[-limit:]]
+        occupied = occupied[np.argsort(flat[occupied])[::-1]]
+        rows, cols = np.unravel_index(occupied, self.counts.shape)
+        return [
+            {
+                "lat": round(float(self.lat_edges[row]) + self.cell_size / 2, 4),
+                "lon": round(float(self.lon_edges[col]) + self.cell_size / 2, 4),
+                "count": int(self.counts[row, col])
+            }
+            for row, col in zip(rows, cols)
+        ]
+
+    def summary(self, top: int = 50) -> Dict[str, Any]:
+        """Aggregate statistics suitable for the analysis agent and charts."""
+        occupied_rows, occupied_cols = np.nonzero(self.counts)
+        if len(occupied_rows) == 0:
+            bounding_box = {}
+            latitude_bands = {}
+        else:
+            bounding_box = {
+                "min_lat": float(self.lat_edges[occupied_rows.min()]),
+                "max_lat": float(self.lat_edges[occupied_rows.max() + 1]),
+                "min_lon": float(self.lon_edges[occupied_cols.min()]),
+                "max_lon": float(self.lon_edges[occupied_cols.max() + 1])
+            }
+            per_row = self.counts.sum(axis=1)
+            centers = self.lat_edges[:-1] + self.cell_size / 2
+            latitude_bands = {
+                "tropical": int(per_row[np.abs(centers) < 23.5].sum()),
+                "temperate": int(per_row[(np.abs(centers) >= 23.5) & (np.abs(centers) < 66.5)].sum()),
+                "polar": int(per_row[np.abs(centers) >= 66.5].sum())
+            }
+        return {
+            "records_binned": self.total,
+            "cell_size_deg": self.cell_size,
+            "occupied_cells": int(len(occupied_rows)),
+            "bounding_box": bounding_box,
+            "latitude_bands": latitude_bands,
+            "top_cells": self.top_cells(top)
+        }
+
+
+def resolve_taxon_key(species_name: str) -> Optional[int]:
+    """
+    Resolve a species name to a GBIF backbone taxon key.
+
+    Names known to the local taxonomy index (when configured) resolve
+    without a network call. Otherwise scientific names are matched with
+    species/match; common names such as "tiger" fall back to the backbone
+    key of the first species search hit.
+
+    Args:
+        species_name: Common or scientific name
+
+    Returns:
+        The matched usage key, or None if GBIF found no match
+    """
+    index = get_taxonomy_index()
+    if index is not None:
+        match = index.normalize(species_name)
+        if match is not None:
+            return match["acceptedUsageKey"]
+
+    response = http_client.get(f"{GBIF_API}/species/match", params={"name": species_name})
+    response.raise_for_status()
+    usage_key = response_json(response).get("usageKey")
+    if usage_key is not None:
+        return usage_key
+
+    for result in fetch_species(species_name).get("results", []):
+        if result.get("nubKey") is not None:
+            return result["nubKey"]
+    return None
+
+
+def iter_occurrence_pages(taxon_key: int, max_records: int = DEFAULT_MAX_RECORDS) -> Iterator[Coordinates]:
+    """
+    Stream coordinates of georeferenced occurrences from occurrence/search.
+
+    Each page is downloaded with ``stream=True`` and decoded record by record
+    with ``ObjectStream``, keeping only the two coordinates of each record.
+
+    Args:
+        taxon_key: GBIF taxon key
+        max_records: Stop after this many records (capped at the API's limit)
+
+    Yields:
+        (latitudes, longitudes) arrays, one pair per page
+    """
+    max_records = min(max_records, MAX_SEARCH_RECORDS)
+    offset = 0
+    while offset < max_records:
+        response = http_client.get(
+            f"{GBIF_API}/occurrence/search",
+            params={
+                "taxonKey": taxon_key,
+                "hasCoordinate": "true",
+                "hasGeospatialIssue": "false",
+                "limit": min(PAGE_SIZE, max_records - offset),
+                "offset": offset
+            },
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            page = ObjectStream(response.iter_content(STREAM_CHUNK_SIZE), "results")
+            latitudes, longitudes = [], []
+            for record in page:
+                latitudes.append(record.get("decimalLatitude", np.nan))
+                longitudes.append(record.get("decimalLongitude", np.nan))
+        finally:
+            response.close()
+        yield np.array(latitudes, dtype=np.float64), np.array(longitudes, dtype=np.float64)
+        offset += len(latitudes)
+        if page.fields.get("endOfRecords", True) or not latitudes:
+            break
+
+
+def iter_archive_coordinates(path: str, taxon_key: Optional[int] = None,
+                             chunk_size: int = ARCHIVE_CHUNK_SIZE) -> Iterator[Coordinates]:
+    """
+    Stream coordinates from a downloaded GBIF occurrence archive.
+
+    Args:
+        path: Path of the downloaded zip file (see ``iter_archive_rows``)
+        taxon_key: Only keep rows classified under this taxon key
+        chunk_size: Number of rows per yielded chunk
+
+    Yields:
+        (latitudes, longitudes) arrays of at most ``chunk_size`` rows
+    """
+    wanted = str(taxon_key) if taxon_key is not None else None
+    latitudes, longitudes = [], []
+    for row in iter_archive_rows(path):
+        if wanted is not None and not any(row.get(column) == wanted for column in TAXON_KEY_COLUMNS):
+            continue
+        latitudes.append(row.get("decimalLatitude") or "nan")
+        longitudes.append(row.get("decimalLongitude") or "nan")
+        if len(latitudes) >= chunk_size:
+            yield np.array(latitudes, dtype=np.float64), np.array(longitudes, dtype=np.float64)
+            latitudes, longitudes = [], []
+    if latitudes:
+        yield np.array(latitudes, dtype=np.float64), np.array(longitudes, dtype=np.float64)
+
+
+def bin_occurrences(chunks: Iterator[Coordinates], cell_size: float = DEFAULT_CELL_SIZE) -> OccurrenceGrid:
+    """Accumulate coordinate chunks into an OccurrenceGrid."""
+    grid = OccurrenceGrid(cell_size)
+    for latitudes, longitudes in chunks:
+        grid.add(latitudes, longitudes)
+    return grid
+
+
+def fetch_occurrence_distribution(species_name: str, max_records: int = DEFAULT_MAX_RECORDS,
+                                  cell_size: float = DEFAULT_CELL_SIZE,
+                                  archive_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    MCP tool to summarize the geographic distribution of a species.
+
+    Args:
+        species_name: Name of species to look up
+        max_records: Maximum occurrence records to page through from the API
+        cell_size: Grid cell size in degrees
+        archive_path: Optional downloaded occurrence archive to read instead of the API
+
+    Returns:
+        Grid summary (bounding box, latitude bands, densest cells) or error information
+    """
+    store = get_occurrence_store()
+    if store is not None and archive_path is None:
+        taxon_key = store.match_name(species_name)
+        if taxon_key is not None and store.count(taxon_key):
+            result = bin_occurrences(store.iter_coordinates(taxon_key), cell_size).summary()
+            result["taxonKey"] = taxon_key
+            result["source"] = "local store"
+            return result
+
+    if archive_path is not None:
+        return _compute_distribution(species_name, max_records, cell_size, archive_path)
+    return cached_call(
+        CACHE_NAMESPACE, f"{cache_key(species_name)}|{max_records}|{cell_size}",
+        lambda: _compute_distribution(species_name, max_records, cell_size), CACHE_TTL, CACHE_STALE_TTL
+    )
+
+
+def _compute_distribution(species_name: str, max_records: int, cell_size: float,
+                          archive_path: Optional[str] = None) -> Dict[str, Any]:
+    """Bin a species' occurrences from the API or an archive without caching."""
+    try:
+        taxon_key = resolve_taxon_key(species_name)
+        if taxon_key is None:
+            return _error_result(f"No GBIF taxon matches '{species_name}'")
+
+        if archive_path is not None:
+            chunks = iter_archive_coordinates(archive_path, taxon_key)
+            source = "archive"
+        else:
+            chunks = iter_occurrence_pages(taxon_key, max_records)
+            source = "occurrence/search"
+
+        result = bin_occurrences(chunks, cell_size).summary()
+        result["taxonKey"] = taxon_key
+        result["source"] = source
+
+    except requests.exceptions.Timeout:
+        return _error_result("Request timeout while fetching occurrence data")
+    except requests.exceptions.ConnectionError:
+        return _error_result("Connection error while accessing GBIF API")
+    except requests.exceptions.HTTPError as e:
+        status_code = getattr(e.response, 'status_code', 'Unknown') if e.response else 'Unknown'
+        reason = getattr(e.response, 'reason', 'Unknown') if e.response else 'Unknown'
+        return _error_result(f"HTTP error {status_code}: {reason}")
+    except requests.exceptions.RequestException as e:
+        return _error_result(f"Request failed: {str(e)}")
+    except Exception as e:
+        return _error_result(f"Unexpected error: {str(e)}")
+
+    return result
+
+
+def distribution_context(distribution: Dict[str, Any], top: int = 10) -> str:
+    """
+    Condense a distribution summary into compact JSON for an LLM prompt.
+
+    Args:
+        distribution: Result of fetch_occurrence_distribution
+        top: Number of densest cells to include
+
+    Returns:
+        JSON string with the aggregates the analysis agent needs
+    """
+    if "error" in distribution:
+        return dumps({"error": distribution["error"]})
+    brief = {key: distribution.get(key) for key in
+             ("records_binned", "cell_size_deg", "occupied_cells", "bounding_box", "latitude_bands")}
+    brief["densest_cells"] = distribution.get("top_cells", [])[:top]
+    return dumps(brief)
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    """Build the error response returned in place of a distribution summary."""
+    return {
+        "error": message,
+        "records_binned": 0,
+        "top_cells": []
+    }
@@ -0,0 +1,335 @@
+"""
+Token budgeting for the agent pipeline prompts.
+
+Every LLM call of the crew carries the agent's role, goal and backstory, the
+task description and the raw output of its upstream tasks, which for the
+research tasks is whole GBIF and Open Meteo JSON responses. ``PromptBudget``
+attaches to the tasks of one analysis and:
+
+- compacts descriptions and backstories (the indentation of triple-quoted
+  prompts costs tokens on every call)
+- shrinks each upstream output before a downstream task sees it: repeated
+  paragraphs are dropped, JSON is pruned of empty fields and long lists,
+  and anything still over budget is truncated with a marker
+- reports token usage per stage, from the LLM usage CrewAI reports where
+  available and from an estimate otherwise
+
+Upstream outputs handed to one task share ``WILDLIFE_CONTEXT_TOKENS``
+(default 1500) estimated tokens. Token counts are estimates (about four
+characters per token); the provider's own counts are reported alongside.
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from tools.json_backend import dumps, loads
+from tools.metrics import STAGE_TOKENS
+
+CONTEXT_TOKENS_ENV = "WILDLIFE_CONTEXT_TOKENS"
+DEFAULT_CONTEXT_TOKENS = 1500
+
+# Stage names of the four-task analysis pipeline, in task order
+PIPELINE_STAGES = ("species", "climate", "analysis", "report")
+
+# Lines shorter than this (braces, bullets, headings) are never treated as duplicates
+MIN_DEDUPE_CHARS = 40
+
+# List lengths tried, longest first, when pruning JSON to fit
+LIST_LIMITS = (20, 10, 5, 3, 1)
+
+# Words, punctuation, and whitespace beyond a single space (indentation is not free)
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s{2,}|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of ``text`` (about one per four characters of each word, symbol or indent)."""
+    if not text:
+        return 0
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def compact_prompt(text: str) -> str:
+    """Collapse runs of whitespace and blank lines without changing the wording."""
+    lines = [" ".join(line.split()) for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def dedupe_lines(text: str, seen: Set[str]) -> str:
+    """
+    Drop lines already sent to the model in this run.
+
+    Args:
+        text: Text to filter
+        seen: Normalized lines seen so far; updated in place
+    """
+    kept = []
+    for line in text.splitlines():
+        key = " ".join(line.lower().split())
+        if len(key) >= MIN_DEDUPE_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _prune_json(value: Any, max_items: int) -> Any:
+    """Drop empty fields and cut lists to ``max_items`` entries."""
+    if isinstance(value, dict):
+        pruned = {key: _prune_json(item, max_items) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        items = [_prune_json(item, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more")
+        return items
+    return value
+
+
+def extract_json(text: str) -> Any:
+    """The JSON document in ``text`` (possibly wrapped in prose or a code fence), or None."""
+    start = min((index for index in (text.find("{"), text.find("[")) if index >= 0), default=-1)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if start < 0 or end <= start:
+        return None
+    try:
+        return loads(text[start:end + 1])
+    except ValueError:
+        return None
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Keep the start of ``text`` within ``max_tokens`` and say how much was cut."""
+    total = estimate_tokens(text)
+    cut = int(len(text) * max_tokens / max(total, 1))
+    while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    head = text[:cut].rsplit("\n", 1)[0] if "\n" in text[:cut] else text[:cut]
+    return f"{head}\n[... {total - estimate_tokens(head)} tokens omitted to fit the context budget]"
+
+
+def shrink_output(text: str, max_tokens: int, seen: Optional[Set[str]] = None) -> str:
+    """
+    Fit an upstream task output into ``max_tokens`` estimated tokens.
+
+    Args:
+        text: Raw task output
+        max_tokens: Budget for this output
+        seen: Lines already sent in this run, dropped from ``text`` when given
+
+    Returns:
+        The compacted, deduplicated, pruned or (as a last resort) truncated text
+    """
+    text = compact_prompt(text)
+    if seen is not None:
+        text = dedupe_lines(text, seen)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    document = extract_json(text)
+    if document is not None:
+        for limit in LIST_LIMITS:
+            pruned = dumps(_prune_json(document, limit))
+            if estimate_tokens(pruned) <= max_tokens:
+                return pruned
+        text = pruned
+    return _truncate(text, max_tokens)
+
+
+def message_text(messages: Any) -> str:
+    """Concatenated content of the messages of an LLM call."""
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content", "")) if isinstance(message, dict) else str(message)
+                     for message in messages or ())
+
+
+_budgets_lock = threading.Lock()
+_budgets_by_task: Dict[str, "PromptBudget"] = {}
+_hooks_installed = False
+
+
+def _install_hooks() -> None:
+    """Route CrewAI LLM events to the budget owning their task (once per process)."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    try:
+        from crewai.events import crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent
+    except ImportError:
+        return
+    _hooks_installed = True
+
+    def route(event, completed):
+        with _budgets_lock:
+            budget = _budgets_by_task.get(getattr(event, "task_id", None) or "")
+        if budget is not None:
+            budget.record_llm_call(event, completed)
+
+    crewai_event_bus.on(LLMCallStartedEvent)(lambda source, event: route(event, False))
+    crewai_event_bus.on(LLMCallCompletedEvent)(lambda source, event: route(event, True))
+
+
+class PromptBudget:
+    """Prompt compaction, upstream output budgeting and per-stage token accounting for one run."""
+
+    def __init__(self, context_tokens: Optional[int] = None):
+        """
+        Args:
+            context_tokens: Estimated tokens of upstream output one task may receive
+                (default: ``WILDLIFE_CONTEXT_TOKENS`` or 1500)
+        """
+        if context_tokens is None:
+            context_tokens = int(os.getenv(CONTEXT_TOKENS_ENV) or DEFAULT_CONTEXT_TOKENS)
+        self.context_tokens = context_tokens
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self._task_stages: Dict[str, str] = {}
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> Dict[str, int]:
+        return self.stages.setdefault(name, {
+            "instruction_tokens": 0, "instruction_tokens_saved": 0,
+            "context_tokens_in": 0, "context_tokens_out": 0,
+            "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0
+        })
+
+    def attach(self, tasks: Sequence[Any], names: Optional[Iterable[str]] = None) -> "PromptBudget":
+        """
+        Compact the prompts of ``tasks`` and budget the outputs they pass downstream.
+
+        Args:
+            tasks: CrewAI tasks of one pipeline, in execution order
+            names: Stage names for the report (default: task names or task1, task2, ...)
+        """
+        names = list(names or ())
+        shares: Dict[int, int] = {}
+        for task in tasks:
+            context = task.context if isinstance(task.context, list) else []
+            for upstream in context:
+                share = self.context_tokens // len(context)
+                shares[id(upstream)] = min(shares.get(id(upstream), share), share)
+
+        # Agents are shared between tasks; their text is sent (and saved) once per task
+        original_tokens: Dict[Any, int] = {}
+        for index, task in enumerate(tasks):
+            name = names[index] if index < len(names) else (task.name or f"task{index + 1}")
+            stage = self._stage(name)
+            texts = [("task", "description"), ("task", "expected_output")]
+            if task.agent is not None:
+                texts += [("agent", "role"), ("agent", "goal"), ("agent", "backstory")]
+            for owner, field in texts:
+                target = task if owner == "task" else task.agent
+                original = getattr(target, field) or ""
+                before = original_tokens.setdefault((id(target), field), estimate_tokens(original))
+                compacted = compact_prompt(original)
+                if compacted != original:
+                    setattr(target, field, compacted)
+                stage["instruction_tokens"] += estimate_tokens(compacted)
+                stage["instruction_tokens_saved"] += before - estimate_tokens(compacted)
+            if id(task) in shares:
+                task.callback = self._output_callback(name, shares[id(task)], task.callback)
+            self._task_stages[str(task.id)] = name
+
+        _install_hooks()
+        with _budgets_lock:
+            for task_id in self._task_stages:
+                _budgets_by_task[task_id] = self
+        return self
+
+    def shrink(self, stage: str, text: str, max_tokens: int) -> str:
+        """``shrink_output`` for this run, counted as context of ``stage``."""
+        shrunk = shrink_output(text, max_tokens, self._seen)
+        with self._lock:
+            counts = self._stage(stage)
+            counts["context_tokens_in"] += estimate_tokens(text)
+            counts["context_tokens_out"] += estimate_tokens(shrunk)
+        return shrunk
+
+    def _output_callback(self, name: str, max_tokens: int, previous: Any):
+        def fit(output):
+            output.raw = self.shrink(name, output.raw or "", max_tokens)
+            return previous(output) if previous else None
+        return fit
+
+    def count_call(self, stage: str, messages: Any, response: str) -> None:
+        """Account an LLM call made outside CrewAI tasks, from estimated tokens."""
+        with self._lock:
+            counts = self._stage(stage)
+            counts["llm_calls"] += 1
+            counts["prompt_tokens"] += estimate_tokens(message_text(messages))
+            counts["completion_tokens"] += estimate_tokens(response or "")
+
+    def record_llm_call(self, event: Any, completed: bool) -> None:
+        """Account one LLM call event of an attached task."""
+        name = self._task_stages.get(getattr(event, "task_id", None) or "")
+        if name is None:
+            return
+        with self._lock:
+            stage = self._stage(name)
+            if not completed:
+                stage["llm_calls"] += 1
+                stage["prompt_tokens"] += estimate_tokens(message_text(getattr(event, "messages", None)))
+                return
+            usage = getattr(event, "usage", None) or {}
+            if not isinstance(usage, dict):
+                usage = getattr(usage, "model_dump", lambda: vars(usage))()
+            if isinstance(usage.get("prompt_tokens"), int):
+                # Replace this call's estimate with the provider's count
+                stage["prompt_tokens"] += usage["prompt_tokens"] - estimate_tokens(
+                    message_text(getattr(event, "messages", None)))
+            completion = usage.get("completion_tokens")
+            stage["completion_tokens"] += (completion if isinstance(completion, int)
+                                           else estimate_tokens(str(getattr(event, "response", "") or "")))
+
+    def finish(self, timeout: float = 5.0) -> Dict[str, Dict[str, int]]:
+        """
+        Stop routing LLM events to this budget and return the report.
+
+        Args:
+            timeout: Seconds to wait for CrewAI to deliver pending events
+        """
+        try:
+            from crewai.events import crewai_event_bus
+            crewai_event_bus.flush(timeout)
+        except (ImportError, AttributeError):
+            pass
+        with _budgets_lock:
+            for task_id in self._task_stages:
+                if _budgets_by_task.get(task_id) is self:
+                    del _budgets_by_task[task_id]
+        report = self.report()
+        for name, stage in report.items():
+            if name != "total":
+                STAGE_TOKENS.inc(stage["prompt_tokens"], stage=name, kind="prompt")
+                STAGE_TOKENS.inc(stage["completion_tokens"], stage=name, kind="completion")
+                # Re-serialized context can come out longer than it went in; that saves nothing
+                STAGE_TOKENS.inc(max(0, stage["context_tokens_in"] - stage["context_tokens_out"]), stage=name,
+                                 kind="context_saved")
+        return report
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Per-stage token counts plus a ``total`` entry."""
+        with self._lock:
+            report = {name: dict(stage) for name, stage in self.stages.items()}
+        total: Dict[str, int] = {}
+        for stage in report.values():
+            for key, value in stage.items():
+                total[key] = total.get(key, 0) + value
+        report["total"] = total
+        return report
+
+    def format_report(self) -> List[str]:
+        """The report as aligned text lines, one per stage."""
+        return format_token_report(self.report())
+
+
+def format_token_report(report: Dict[str, Dict[str, int]]) -> List[str]:
+    """A ``PromptBudget.report()`` as aligned text lines, one per stage."""
+    lines = [f"{'stage':<10} {'calls':>5} {'prompt':>8} {'output':>7} {'context in->out':>16} {'saved':>6}"]
+    for name, stage in report.items():
+        context = f"{stage['context_tokens_in']}->{stage['context_tokens_out']}"
+        saved = (stage["context_tokens_in"] - stage["context_tokens_out"]) + stage["instruction_tokens_saved"]
+        lines.append(f"{name:<10} {stage['llm_calls']:>5} {stage['prompt_tokens']:>8} "
+                     f"{stage['completion_tokens']:>7} {context:>16} {saved:>6}")
+    return lines
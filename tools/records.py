@@ -0,0 +1,335 @@
+"""
+Compact typed records for the responses the tools return.
+
+GBIF species search results carry dozens of keys each (descriptions, name
+maps, nested classification), but the app only reads a handful of them. The
+records here parse a response once, keep the fields in use as slotted
+attributes (repeated strings such as kingdom names are interned, climate
+series live in ``array('d')`` buffers), and hold the rest of each payload as
+compressed JSON that is only decoded when ``raw`` is accessed.
+
+``get()`` accepts the original API field names, so helpers written against
+the raw dicts (e.g. ``charts.kingdom_counts``) work on records unchanged.
+
+``SpeciesSearch.from_json`` decodes response bytes straight into records:
+with the msgspec backend the kept fields are decoded into typed structs and
+each result's raw JSON is compressed as-is, without building the full dicts.
+"""
+import functools
+import math
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from tools import json_backend
+
+
+def _pack(payload: Any) -> bytes:
+    """Serialize a payload into the compact form kept for lazy ``raw`` access."""
+    return zlib.compress(json_backend.dumpb(payload), 1)
+
+
+def _unpack(blob: Optional[bytes]) -> Any:
+    return json_backend.loads(zlib.decompress(blob)) if blob else None
+
+
+def _intern(value: Any) -> Optional[str]:
+    """Share one copy of short, frequently repeated strings such as kingdom names."""
+    return sys.intern(value) if isinstance(value, str) else None
+
+
+def _float_array(values: Optional[List[Any]]) -> array:
+    """Pack a JSON number list into doubles, with NaN for missing values."""
+    return array("d", (math.nan if value is None else float(value) for value in values or ()))
+
+
+def _float_list(values: array) -> List[Optional[float]]:
+    return [None if math.isnan(value) else value for value in values]
+
+
+@functools.lru_cache(maxsize=None)
+def _msgspec_species_types():
+    """msgspec structs for the kept species/search fields (built on first use)."""
+    import msgspec
+
+    class Vernacular(msgspec.Struct):
+        vernacularName: Optional[str] = None
+        language: Optional[str] = None
+
+    class Result(msgspec.Struct):
+        key: Optional[int] = None
+        scientificName: Optional[str] = None
+        canonicalName: Optional[str] = None
+        kingdom: Optional[str] = None
+        phylum: Optional[str] = None
+        class_name: Optional[str] = msgspec.field(default=None, name="class")
+        order: Optional[str] = None
+        family: Optional[str] = None
+        genus: Optional[str] = None
+        rank: Optional[str] = None
+        taxonomicStatus: Optional[str] = None
+        vernacularNames: Optional[List[Vernacular]] = None
+
+    class Search(msgspec.Struct):
+        offset: int = 0
+        limit: int = 0
+        endOfRecords: bool = False
+        count: int = 0
+        results: List[msgspec.Raw] = []
+        error: Optional[str] = None
+        source: Optional[str] = None
+
+    return msgspec.json.Decoder(Search), msgspec.json.Decoder(Result), msgspec.ValidationError
+
+
+def json_default(value: Any) -> Any:
+    """``json.dumps`` fallback that serializes records through their ``to_dict``."""
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if callable(to_dict) else str(value)
+
+
+class SpeciesRecord:
+    """One GBIF species search result."""
+
+    __slots__ = (
+        "key", "scientific_name", "canonical_name", "vernacular_name", "kingdom", "phylum",
+        "class_name", "order", "family", "genus", "rank", "taxonomic_status", "_raw"
+    )
+
+    # GBIF field name -> attribute
+    FIELDS = {
+        "key": "key",
+        "scientificName": "scientific_name",
+        "canonicalName": "canonical_name",
+        "kingdom": "kingdom",
+        "phylum": "phylum",
+        "class": "class_name",
+        "order": "order",
+        "family": "family",
+        "genus": "genus",
+        "rank": "rank",
+        "taxonomicStatus": "taxonomic_status",
+    }
+    _INTERNED = ("kingdom", "phylum", "class_name", "order", "family", "genus", "rank", "taxonomic_status")
+
+    def __init__(self, **fields: Any):
+        for attribute in self.__slots__:
+            setattr(self, attribute, fields.get(attribute))
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "SpeciesRecord":
+        """Parse one element of a species/search ``results`` list."""
+        record = cls()
+        for field, attribute in cls.FIELDS.items():
+            value = result.get(field)
+            setattr(record, attribute, _intern(value) if attribute in cls._INTERNED else value)
+        vernacular_names = result.get("vernacularNames") or []
+        english = [name for name in vernacular_names if name.get("language") in ("eng", "en")]
+        if english or vernacular_names:
+            record.vernacular_name = (english or vernacular_names)[0].get("vernacularName")
+        record._raw = _pack(result)
+        return record
+
+    @classmethod
+    def _from_struct(cls, result: Any, raw_json: bytes) -> "SpeciesRecord":
+        """Build a record from a decoded msgspec ``Result`` and its raw JSON."""
+        record = cls()
+        for field, attribute in cls.FIELDS.items():
+            value = getattr(result, "class_name" if field == "class" else field)
+            setattr(record, attribute, _intern(value) if attribute in cls._INTERNED else value)
+        vernacular_names = result.vernacularNames or []
+        english = [name for name in vernacular_names if name.language in ("eng", "en")]
+        if english or vernacular_names:
+            record.vernacular_name = (english or vernacular_names)[0].vernacularName
+        record._raw = zlib.compress(raw_json, 1)
+        return record
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        """The full original result, decoded on every access (not cached)."""
+        return _unpack(self._raw) or self.to_dict()
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """Read a value by its GBIF field name, falling back to the raw payload."""
+        attribute = self.FIELDS.get(field)
+        value = getattr(self, attribute) if attribute else self.raw.get(field)
+        return default if value is None else value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The kept fields under their GBIF names (missing ones omitted)."""
+        result = {field: getattr(self, attribute) for field, attribute in self.FIELDS.items()
+                  if getattr(self, attribute) is not None}
+        if self.vernacular_name:
+            result["vernacularName"] = self.vernacular_name
+        return result
+
+    def __repr__(self) -> str:
+        return f"SpeciesRecord(key={self.key!r}, scientific_name={self.scientific_name!r})"
+
+
+class SpeciesSearch:
+    """A parsed GBIF species/search response (or the tool's error result)."""
+
+    __slots__ = ("count", "offset", "limit", "end_of_records", "records", "error", "source")
+
+    def __init__(self, records: Tuple[SpeciesRecord, ...] = (), count: int = 0, offset: int = 0,
+                 limit: int = 0, end_of_records: bool = True, error: Optional[str] = None,
+                 source: Optional[str] = None):
+        self.records = tuple(records)
+        self.count = count
+        self.offset = offset
+        self.limit = limit
+        self.end_of_records = end_of_records
+        self.error = error
+        self.source = source
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any]) -> "SpeciesSearch":
+        """Parse the dict returned by ``fetch_species``; passes records through unchanged."""
+        if isinstance(response, cls):
+            return response
+        return cls(
+            records=tuple(SpeciesRecord.from_result(result) for result in response.get("results") or []),
+            count=response.get("count", 0),
+            offset=response.get("offset", 0),
+            limit=response.get("limit", 0),
+            end_of_records=response.get("endOfRecords", False),
+            error=response.get("error"),
+            source=response.get("source")
+        )
+
+    @classmethod
+    def from_json(cls, body: Union[bytes, str]) -> "SpeciesSearch":
+        """
+        Decode a species/search JSON body (an API response or cache entry).
+
+        Args:
+            body: JSON bytes or text
+
+        Returns:
+            SpeciesSearch: Parsed records
+        """
+        if json_backend.backend_name() == "msgspec":
+            search_decoder, result_decoder, validation_error = _msgspec_species_types()
+            try:
+                search = search_decoder.decode(body)
+                records = tuple(
+                    SpeciesRecord._from_struct(result_decoder.decode(raw), bytes(raw)) for raw in search.results
+                )
+            except validation_error:
+                # Unexpected field types: take the tolerant dict path instead
+                return cls.from_response(json_backend.loads(body))
+            return cls(records=records, count=search.count, offset=search.offset, limit=search.limit,
+                       end_of_records=search.endOfRecords, error=search.error, source=search.source)
+        return cls.from_response(json_backend.loads(body))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[SpeciesRecord]:
+        return iter(self.records)
+
+    def to_dict(self, raw: bool = False) -> Dict[str, Any]:
+        """
+        Convert back to the species/search shape.
+
+        Args:
+            raw: Include each result's full original payload instead of the
+                compact kept fields
+
+        Returns:
+            dict: ``count``, ``endOfRecords``, ``results`` (and ``error``/``source`` if set)
+        """
+        result = {
+            "offset": self.offset,
+            "limit": self.limit,
+            "endOfRecords": self.end_of_records,
+            "count": self.count,
+            "results": [record.raw if raw else record.to_dict() for record in self.records]
+        }
+        if self.error is not None:
+            result["error"] = self.error
+        if self.source is not None:
+            result["source"] = self.source
+        return result
+
+    def __repr__(self) -> str:
+        return f"SpeciesSearch(count={self.count!r}, records={len(self.records)})"
+
+
+class ClimateSeries:
+    """A parsed Open Meteo forecast: current conditions plus daily series."""
+
+    __slots__ = (
+        "latitude", "longitude", "timezone", "current_temperature", "current_windspeed",
+        "current_time", "days", "temperature_max", "temperature_min", "precipitation", "error", "_raw"
+    )
+
+    # Open Meteo daily variable -> attribute
+    DAILY_FIELDS = {
+        "temperature_2m_max": "temperature_max",
+        "temperature_2m_min": "temperature_min",
+        "precipitation_sum": "precipitation",
+    }
+
+    def __init__(self, **fields: Any):
+        for attribute in self.__slots__:
+            setattr(self, attribute, fields.get(attribute))
+        for attribute in self.DAILY_FIELDS.values():
+            if getattr(self, attribute) is None:
+                setattr(self, attribute, array("d"))
+        if self.days is None:
+            self.days = ()
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any]) -> "ClimateSeries":
+        """Parse the dict returned by ``fetch_climate_data``; passes series through unchanged."""
+        if isinstance(response, cls):
+            return response
+        current = response.get("current_weather") or {}
+        daily = response.get("daily") or {}
+        series = cls(
+            latitude=response.get("latitude"),
+            longitude=response.get("longitude"),
+            timezone=_intern(response.get("timezone")),
+            current_temperature=current.get("temperature"),
+            current_windspeed=current.get("windspeed"),
+            current_time=current.get("time"),
+            days=tuple(daily.get("time") or ()),
+            error=response.get("error")
+        )
+        for field, attribute in cls.DAILY_FIELDS.items():
+            setattr(series, attribute, _float_array(daily.get(field)))
+        series._raw = _pack(response)
+        return series
+
+    @property
+    def has_current(self) -> bool:
+        return self.error is None and self.current_temperature is not None
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        """The full original response, decoded on every access (not cached)."""
+        return _unpack(self._raw) or self.to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to the Open Meteo response shape (kept fields only)."""
+        if self.error is not None:
+            return {"error": self.error, "current_weather": {}, "daily": {}}
+        daily = {"time": list(self.days)}
+        daily.update({field: _float_list(getattr(self, attribute))
+                      for field, attribute in self.DAILY_FIELDS.items()})
+        return {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "timezone": self.timezone,
+            "current_weather": {
+                "temperature": self.current_temperature,
+                "windspeed": self.current_windspeed,
+                "time": self.current_time
+            },
+            "daily": daily
+        }
+
+    def __repr__(self) -> str:
+        return f"ClimateSeries(latitude={self.latitude!r}, longitude={self.longitude!r}, days={len(self.days)})"
@@ -0,0 +1,655 @@
+"""
+Archive of generated reports and the data behind them.
+
+Each analysis becomes one flat row (``COLUMNS``): the report text, token
+usage and a few aggregates of the species, climate and occurrence data it
+was written from. Rows are appended to one of three formats, chosen by the
+path's extension:
+
+* ``.jsonl``: one JSON object per line
+* ``.sqlite3`` / ``.sqlite`` / ``.db``: a ``reports`` table
+* ``.parquet`` (a directory): one part file per flush (needs ``pyarrow``)
+
+Writers buffer at most ``buffer_rows`` rows or ``buffer_bytes`` bytes, and
+no row waits longer than ``flush_interval`` seconds once another is written;
+``close`` (also run at exit) writes the rest. Nothing else is held in memory,
+however many analyses a batch run exports.
+
+``compact`` merges the Parquet parts into one file, keeps only the last row
+per ``id`` and can drop rows older than a cutoff; ``page_reports`` pages
+through the history in export order with an opaque cursor (cursors do not
+survive a compaction). The apps and ``main.py`` export under ``analysis_id``
+(species, mode and backend) and ``batch.py`` under the manifest item and its
+inputs, so until a compaction every run is in the archive, and afterwards only
+the latest analysis per key is: do not compact an archive whose full run
+history you need. Setting ``WILDLIFE_REPORT_EXPORT`` to a path archives
+every analysis the apps, ``main.py`` and ``batch.py`` generate.
+
+Usage::
+
+    python -m tools.report_export read reports.parquet --species tiger --page-size 20
+    python -m tools.report_export compact reports.parquet --keep-days 90
+"""
+import argparse
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tools.json_backend import dumps, loads
+from tools.metrics import registry
+from tools.records import ClimateSeries
+
+REPORT_EXPORT_ENV = "WILDLIFE_REPORT_EXPORT"
+
+FORMATS = ("jsonl", "sqlite", "parquet")
+
+DEFAULT_BUFFER_ROWS = 500
+DEFAULT_BUFFER_BYTES = 4 * 1024 * 1024
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_PAGE_SIZE = 100
+
+# Column name -> type ("str", "int" or "float"); every row has all of them
+COLUMNS = {
+    "id": "str",
+    "exported_at": "float",
+    "species": "str",
+    "mode": "str",
+    "status": "str",
+    "error": "str",
+    "report": "str",
+    "seconds": "float",
+    "prompt_tokens": "int",
+    "completion_tokens": "int",
+    "llm_calls": "int",
+    "species_count": "int",
+    "taxon_key": "int",
+    "scientific_name": "str",
+    "family": "str",
+    "taxonomic_status": "str",
+    "latitude": "float",
+    "longitude": "float",
+    "current_temperature": "float",
+    "temperature_max_mean": "float",
+    "temperature_min_mean": "float",
+    "precipitation_total": "float",
+    "climate_days": "int",
+    "records_binned": "int",
+    "occupied_cells": "int",
+}
+
+EXPORT_ROWS = registry.counter(
+    "wildlife_report_export_rows_total", "Report rows written to the export archive.", ("format",))
+EXPORT_FLUSH_DURATION = registry.histogram(
+    "wildlife_report_export_flush_duration_seconds", "Time to write one buffered batch of report rows.",
+    ("format",))
+EXPORT_ERRORS = registry.counter(
+    "wildlife_report_export_errors_total", "Analyses that could not be archived.")
+
+
+def export_format(path: str, format: Optional[str] = None) -> str:
+    """The format of ``path``, from ``format`` or its extension."""
+    if format is None:
+        extension = os.path.splitext(path.rstrip(os.sep))[1].lower()
+        format = {".jsonl": "jsonl", ".sqlite3": "sqlite", ".sqlite": "sqlite", ".db": "sqlite",
+                  ".parquet": "parquet"}.get(extension)
+        if format is None:
+            raise ValueError(f"Cannot tell the export format of '{path}'; use .jsonl, .sqlite3 or .parquet")
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format '{format}'; choose from {', '.join(FORMATS)}")
+    return format
+
+
+def _mean(values) -> Optional[float]:
+    values = [value for value in values if value == value]
+    return round(sum(values) / len(values), 3) if values else None
+
+
+def aggregates(species_data: Any = None, climate_data: Any = None,
+               distribution: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Summarize the data an analysis was written from into row columns.
+
+    Args:
+        species_data: ``fetch_species`` result or a ``SpeciesSearch``
+        climate_data: ``fetch_climate_data`` result or a ``ClimateSeries``
+        distribution: ``fetch_occurrence_distribution`` result
+
+    Returns:
+        dict: The species, climate and occurrence columns (None where unknown)
+    """
+    if species_data is not None and hasattr(species_data, "to_dict"):
+        species_data = species_data.to_dict()
+    species_data = species_data or {}
+    top = (species_data.get("results") or [{}])[0]
+    climate = ClimateSeries.from_response(climate_data or {})
+    distribution = distribution or {}
+    return {
+        "species_count": species_data.get("count"),
+        "taxon_key": top.get("nubKey") or top.get("key"),
+        "scientific_name": top.get("scientificName"),
+        "family": top.get("family"),
+        "taxonomic_status": top.get("taxonomicStatus"),
+        "latitude": climate.latitude,
+        "longitude": climate.longitude,
+        "current_temperature": climate.current_temperature,
+        "temperature_max_mean": _mean(climate.temperature_max),
+        "temperature_min_mean": _mean(climate.temperature_min),
+        "precipitation_total": round(sum(v for v in climate.precipitation if v == v), 3) if climate.days else None,
+        "climate_days": len(climate.days),
+        "records_binned": distribution.get("records_binned"),
+        "occupied_cells": distribution.get("occupied_cells"),
+    }
+
+
+def analysis_id(species: str, mode: Optional[str], backend: Optional[str]) -> str:
+    """
+    Stable row id of an analysis of ``species`` in ``mode`` on ``backend``.
+
+    Every run is archived, but ``compact`` keeps only the latest run per id.
+    """
+    return f"{species.lower().strip()}|{mode}|{backend}"
+
+
+def report_row(species: str, report: Optional[str], species_data: Any = None, climate_data: Any = None,
+               distribution: Optional[Dict[str, Any]] = None, tokens: Optional[Dict[str, Any]] = None,
+               mode: Optional[str] = None, error: Optional[str] = None, seconds: Optional[float] = None,
+               row_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the archive row of one analysis.
+
+    Args:
+        species: Species query
+        report: Generated report (None if the analysis failed)
+        species_data / climate_data / distribution: Data the report was written from
+        tokens: Per-stage token usage (``logs['tokens']``)
+        mode: Pipeline mode
+        error: Error message of a failed analysis
+        seconds: Analysis duration
+        row_id: Stable id, so re-exports of the same analysis compact to one row
+            (see ``analysis_id``; default: random)
+
+    Returns:
+        dict: A value for every column in ``COLUMNS``
+    """
+    total = (tokens or {}).get("total") or {}
+    row = {
+        "id": row_id or uuid.uuid4().hex,
+        "exported_at": round(time.time(), 3),
+        "species": species,
+        "mode": mode,
+        "status": "error" if error or not report else "ok",
+        "error": error,
+        "report": str(report) if report else None,
+        "seconds": round(seconds, 3) if seconds is not None else None,
+        "prompt_tokens": total.get("prompt_tokens"),
+        "completion_tokens": total.get("completion_tokens"),
+        "llm_calls": total.get("llm_calls"),
+    }
+    row.update(aggregates(species_data, climate_data, distribution))
+    return row
+
+
+def _row_size(row: Dict[str, Any]) -> int:
+    """Rough in-memory size of a row; the report text dominates."""
+    return 256 + sum(len(value) for value in row.values() if isinstance(value, str))
+
+
+class ReportWriter:
+    """Appends rows to an archive through a bounded buffer (thread-safe)."""
+
+    format = ""
+
+    def __init__(self, path: str, buffer_rows: int = DEFAULT_BUFFER_ROWS,
+                 buffer_bytes: int = DEFAULT_BUFFER_BYTES, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.buffer_rows = max(1, buffer_rows)
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffered_bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """Buffer one row, writing the buffer out when it is full or old."""
+        row = {column: row.get(column) for column in COLUMNS}
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Report writer for '{self.path}' is closed")
+            self._buffer.append(row)
+            self._buffered_bytes += _row_size(row)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if (len(self._buffer) >= self.buffer_rows or self._buffered_bytes >= self.buffer_bytes
+                    or time.monotonic() - self._oldest >= self.flush_interval):
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Write out all buffered rows."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._close()
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        rows, self._buffer, self._buffered_bytes, self._oldest = self._buffer, [], 0, None
+        start_time = time.perf_counter()
+        self._write_rows(rows)
+        EXPORT_FLUSH_DURATION.observe(time.perf_counter() - start_time, format=self.format)
+        EXPORT_ROWS.inc(len(rows), format=self.format)
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class JsonlWriter(ReportWriter):
+    format = "jsonl"
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write("".join(dumps(row) + "\n" for row in rows))
+
+
+_SQLITE_TYPES = {"str": "TEXT", "int": "INTEGER", "float": "REAL"}
+
+
+def _connect_sqlite(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    columns = ", ".join(f"{name} {_SQLITE_TYPES[kind]}" for name, kind in COLUMNS.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS reports (seq INTEGER PRIMARY KEY, {columns})")
+    conn.execute("CREATE INDEX IF NOT EXISTS reports_species ON reports (species, seq)")
+    conn.commit()
+    return conn
+
+
+class SqliteWriter(ReportWriter):
+    format = "sqlite"
+
+    def __init__(self, path: str, **kwargs: Any):
+        super().__init__(path, **kwargs)
+        self._conn = _connect_sqlite(path)
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO reports ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                                   [tuple(row[column] for column in COLUMNS) for row in rows])
+
+    def _close(self) -> None:
+        self._conn.close()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+def _arrow_schema():
+    pa, _ = _pyarrow()
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64()}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS.items()])
+
+
+def _parquet_parts(path: str) -> List[str]:
+    """Part files of a Parquet archive in export order (names sort chronologically)."""
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".parquet"))
+
+
+class ParquetWriter(ReportWriter):
+    format = "parquet"
+
+    def __init__(self, path: str, **kwargs: Any):
+        super().__init__(path, **kwargs)
+        self._schema = _arrow_schema()
+        self._sequence = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        pa, pq = _pyarrow()
+        self._sequence += 1
+        name = f"part-{time.time_ns():020d}-{os.getpid()}-{self._sequence:06d}.parquet"
+        temporary = os.path.join(self.path, f".{name}.tmp")
+        pq.write_table(pa.Table.from_pylist(rows, schema=self._schema), temporary, compression="zstd")
+        # Readers only see complete parts
+        os.replace(temporary, os.path.join(self.path, name))
+
+
+_WRITERS = {"jsonl": JsonlWriter, "sqlite": SqliteWriter, "parquet": ParquetWriter}
+
+
+def open_writer(path: str, format: Optional[str] = None, **kwargs: Any) -> ReportWriter:
+    """
+    Open an append-mode writer for an archive.
+
+    Args:
+        path: Archive path (format from its extension unless ``format`` is given)
+        format: ``jsonl``, ``sqlite`` or ``parquet``
+        **kwargs: ``buffer_rows``, ``buffer_bytes``, ``flush_interval``
+    """
+    format = export_format(path, format)
+    directory = os.path.dirname(path.rstrip(os.sep))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return _WRITERS[format](path, **kwargs)
+
+
+_exporter: Optional[ReportWriter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_report_exporter() -> Optional[ReportWriter]:
+    """
+    Return the process-wide writer for ``WILDLIFE_REPORT_EXPORT``.
+
+    Returns:
+        A writer flushed and closed at exit, or None when exporting is not configured
+    """
+    global _exporter
+    path = os.getenv(REPORT_EXPORT_ENV)
+    if not path:
+        return None
+    with _exporter_lock:
+        if _exporter is None or _exporter.path != path:
+            if _exporter is not None:
+                _exporter.close()
+            _exporter = open_writer(path)
+            atexit.register(_exporter.close)
+        return _exporter
+
+
+def export_analysis(species: str, report: Optional[str], **fields: Any) -> bool:
+    """
+    Archive one analysis if ``WILDLIFE_REPORT_EXPORT`` is set.
+
+    Exporting never fails the analysis: errors are counted in
+    ``wildlife_report_export_errors_total`` and False is returned.
+
+    Args:
+        species: Species query
+        report: Generated report
+        **fields: Passed to ``report_row``
+
+    Returns:
+        True if the row was written (or buffered)
+    """
+    try:
+        exporter = get_report_exporter()
+        if exporter is None:
+            return False
+        exporter.write(report_row(species, report, **fields))
+        return True
+    except Exception:
+        EXPORT_ERRORS.inc()
+        return False
+
+
+def _matches(row: Dict[str, Any], species: Optional[str], since: Optional[float]) -> bool:
+    return ((species is None or row.get("species") == species)
+            and (since is None or (row.get("exported_at") or 0) >= since))
+
+
+def _scan_jsonl(path: str, cursor: Optional[str]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as handle:
+        handle.seek(int(cursor or 0))
+        while True:
+            line = handle.readline()
+            if not line:
+                return
+            if line.strip():
+                yield loads(line), str(handle.tell())
+
+
+def _scan_sqlite(path: str, cursor: Optional[str], species: Optional[str]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    if not os.path.exists(path):
+        return
+    conn = _connect_sqlite(path)
+    try:
+        last = int(cursor or 0)
+        query = f"SELECT seq, {', '.join(COLUMNS)} FROM reports WHERE seq > ?"
+        if species is not None:
+            query += " AND species = ?"
+        query += " ORDER BY seq LIMIT 500"
+        while True:
+            rows = conn.execute(query, (last, species) if species is not None else (last,)).fetchall()
+            if not rows:
+                return
+            for values in rows:
+                last = values[0]
+                yield dict(zip(COLUMNS, values[1:])), str(last)
+    finally:
+        conn.close()
+
+
+def _scan_parquet(path: str, cursor: Optional[str]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    _, pq = _pyarrow()
+    part, group, index = "", 0, 0
+    if cursor:
+        part, group, index = cursor.rsplit(":", 2)
+        group, index = int(group), int(index)
+    for name in _parquet_parts(path):
+        if name < part:
+            continue
+        parquet = pq.ParquetFile(os.path.join(path, name))
+        for number in range(group if name == part else 0, parquet.num_row_groups):
+            rows = parquet.read_row_group(number).to_pylist()
+            start = index if name == part and number == group else 0
+            for offset in range(start, len(rows)):
+                yield rows[offset], f"{name}:{number}:{offset + 1}"
+
+
+def iter_reports(path: str, format: Optional[str] = None, species: Optional[str] = None,
+                 since: Optional[float] = None, cursor: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    Stream archived rows in export order, each with the cursor that resumes after it.
+
+    Args:
+        path: Archive path
+        format: Archive format (default: from the extension)
+        species: Only rows for this species query
+        since: Only rows exported at or after this Unix time
+        cursor: Resume after the row this cursor was returned with
+    """
+    format = export_format(path, format)
+    if format == "jsonl":
+        scan = _scan_jsonl(path, cursor)
+    elif format == "sqlite":
+        scan = _scan_sqlite(path, cursor, species)
+    else:
+        scan = _scan_parquet(path, cursor)
+    for row, position in scan:
+        if _matches(row, species, since):
+            yield row, position
+
+
+def page_reports(path: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                 format: Optional[str] = None, species: Optional[str] = None,
+                 since: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Read one page of archived rows.
+
+    Args:
+        path: Archive path
+        page_size: Rows per page
+        cursor: ``next_cursor`` of the previous page; None for the first page
+        format / species / since: As ``iter_reports``
+
+    Returns:
+        dict: ``rows`` and ``next_cursor`` (None after the last page)
+    """
+    rows, position = [], cursor
+    scan = iter_reports(path, format, species, since, cursor)
+    for row, position in scan:
+        rows.append(row)
+        if len(rows) >= page_size:
+            break
+    else:
+        return {"rows": rows, "next_cursor": None}
+    scan.close()
+    return {"rows": rows, "next_cursor": position}
+
+
+def compact(path: str, format: Optional[str] = None, keep_since: Optional[float] = None) -> Dict[str, int]:
+    """
+    Rewrite an archive compactly: last row per ``id``, optionally only rows exported since ``keep_since``.
+
+    Parquet parts are merged into one file (parts written meanwhile are kept
+    as they are); JSONL files are rewritten and SQLite databases vacuumed.
+    Run it while no other process writes JSONL or SQLite archives.
+
+    Returns:
+        dict: ``rows_before`` and ``rows_after``
+    """
+    format = export_format(path, format)
+    if format == "sqlite":
+        return _compact_sqlite(path, keep_since)
+    if format == "jsonl":
+        return _compact_jsonl(path, keep_since)
+    return _compact_parquet(path, keep_since)
+
+
+def _compact_sqlite(path: str, keep_since: Optional[float]) -> Dict[str, int]:
+    if not os.path.exists(path):
+        return {"rows_before": 0, "rows_after": 0}
+    conn = _connect_sqlite(path)
+    try:
+        before = conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+        with conn:
+            conn.execute("DELETE FROM reports WHERE seq NOT IN (SELECT MAX(seq) FROM reports GROUP BY id)")
+            if keep_since is not None:
+                conn.execute("DELETE FROM reports WHERE exported_at < ?", (keep_since,))
+        conn.execute("VACUUM")
+        after = conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+    finally:
+        conn.close()
+    return {"rows_before": before, "rows_after": after}
+
+
+def _last_positions(rows: Iterator[Dict[str, Any]]) -> Tuple[Dict[str, int], int]:
+    """Position of the last row per id, and the number of rows."""
+    last, count = {}, 0
+    for count, row in enumerate(rows, 1):
+        last[row["id"]] = count
+    return last, count
+
+
+def _kept(row: Dict[str, Any], position: int, last: Dict[str, int], keep_since: Optional[float]) -> bool:
+    return last[row["id"]] == position and (keep_since is None or (row.get("exported_at") or 0) >= keep_since)
+
+
+def _compact_jsonl(path: str, keep_since: Optional[float]) -> Dict[str, int]:
+    if not os.path.exists(path):
+        return {"rows_before": 0, "rows_after": 0}
+    last, before = _last_positions(row for row, _ in _scan_jsonl(path, None))
+    temporary = f"{path}.compacting"
+    after = 0
+    with open(path, "rb") as source, open(temporary, "wb") as target:
+        position = 0
+        for line in source:
+            if not line.strip():
+                continue
+            position += 1
+            if _kept(loads(line), position, last, keep_since):
+                target.write(line)
+                after += 1
+    os.replace(temporary, path)
+    return {"rows_before": before, "rows_after": after}
+
+
+def _compact_parquet(path: str, keep_since: Optional[float]) -> Dict[str, int]:
+    pa, pq = _pyarrow()
+    parts = _parquet_parts(path)
+    if not parts:
+        return {"rows_before": 0, "rows_after": 0}
+
+    def rows():
+        for name in parts:
+            parquet = pq.ParquetFile(os.path.join(path, name))
+            for number in range(parquet.num_row_groups):
+                yield from parquet.read_row_group(number).to_pylist()
+
+    last, before = _last_positions(rows())
+    # Sorts right after the newest merged part, before any part written meanwhile
+    name = f"{parts[-1][:-len('.parquet')]}-compacted.parquet"
+    temporary = os.path.join(path, f".{name}.tmp")
+    schema = _arrow_schema()
+    after, batch = 0, []
+    with pq.ParquetWriter(temporary, schema, compression="zstd") as writer:
+        for position, row in enumerate(rows(), 1):
+            if _kept(row, position, last, keep_since):
+                batch.append(row)
+            if len(batch) >= DEFAULT_BUFFER_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                after, batch = after + len(batch), []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            after += len(batch)
+    os.replace(temporary, os.path.join(path, name))
+    # A crash before this point leaves duplicates, which the next compaction removes
+    for part in parts:
+        if part != name:
+            os.remove(os.path.join(path, part))
+    return {"rows_before": before, "rows_after": after}
+
+
+def main(argv=None):
+    """Command line entry point: page through or compact an archive."""
+    parser = argparse.ArgumentParser(description="Read or compact the report export archive.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    read = commands.add_parser("read", help="Print one page of archived reports as JSON lines")
+    read.add_argument("path")
+    read.add_argument("--species", default=None)
+    read.add_argument("--page-size", type=int, default=20)
+    read.add_argument("--cursor", default=None, help="next_cursor printed by the previous page")
+    read.add_argument("--full", action="store_true", help="Include the report text")
+    compaction = commands.add_parser("compact", help="Keep the latest analysis per id, drop old rows and merge parts")
+    compaction.add_argument("path")
+    compaction.add_argument("--keep-days", type=float, default=None, help="Drop rows older than this")
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        keep_since = time.time() - args.keep_days * 24 * 60 * 60 if args.keep_days is not None else None
+        result = compact(args.path, keep_since=keep_since)
+        print(f"Compacted {args.path}: {result['rows_before']} rows -> {result['rows_after']}")
+        return result
+    page = page_reports(args.path, args.page_size, args.cursor, species=args.species)
+    for row in page["rows"]:
+        if not args.full:
+            row = {key: value for key, value in row.items() if key != "report"}
+        print(dumps(row))
+    print(f"next_cursor: {page['next_cursor']}" if page["next_cursor"] else "(end of archive)")
+    return page
+
+
+if __name__ == "__main__":
+    main()
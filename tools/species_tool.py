@@ -2,25 +2,92 @@
 MCP tool for fetching species data from GBIF API.
 """
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from tools.cache import cache_key, cached_call, Validated, NOT_MODIFIED
+from tools.json_backend import response_json
+from tools.metrics import instrument_tool
+from tools.occurrence_store import get_occurrence_store
+from tools.records import SpeciesSearch
+from tools import http_client
 
 
+CACHE_NAMESPACE = "species"
+
+# GBIF taxonomy changes slowly: results are fresh for a day, then served
+# for up to a week while a background refresh replaces them
+CACHE_TTL = 24 * 60 * 60
+CACHE_STALE_TTL = 7 * 24 * 60 * 60
+
+
+@instrument_tool("fetch_species")
 def fetch_species(species_name: str) -> Dict[str, Any]:
     """
     MCP tool to fetch species data from GBIF API.
     
+    Names held by a configured local occurrence store are answered from it.
+    Successful API responses are stored in the shared cache when one is
+    configured, so repeated queries from any worker process skip the API;
+    stale entries are returned at once and refreshed in the background.
+    
     Args:
         species_name: Name of species to search for
         
     Returns:
         JSON response from GBIF API or error information
     """
+    store = get_occurrence_store()
+    if store is not None:
+        local = store.species_search(species_name)
+        if local["count"]:
+            return local
+
+    return cached_call(CACHE_NAMESPACE, cache_key(species_name),
+                       lambda validators: _request_species(species_name, validators),
+                       CACHE_TTL, CACHE_STALE_TTL, conditional=True)
+
+
+def fetch_species_records(species_name: str) -> SpeciesSearch:
+    """
+    Fetch species data as parsed records.
+    
+    Same lookup order as ``fetch_species``, but cache hits are decoded from
+    the stored JSON straight into records (typed decoding with the msgspec
+    backend) instead of going through an intermediate dict.
+    
+    Args:
+        species_name: Name of species to search for
+        
+    Returns:
+        SpeciesSearch: Parsed results or error information
+    """
+    store = get_occurrence_store()
+    if store is not None:
+        local = store.species_search(species_name)
+        if local["count"]:
+            return SpeciesSearch.from_response(local)
+
+    return SpeciesSearch.from_response(cached_call(
+        CACHE_NAMESPACE, cache_key(species_name), lambda validators: _request_species(species_name, validators),
+        CACHE_TTL, CACHE_STALE_TTL, decode=SpeciesSearch.from_json, conditional=True
+    ))
+
+
+def _request_species(species_name: str, validators: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Query the GBIF species search endpoint without caching.
+    
+    With the validators of a cached response the request is conditional:
+    ``NOT_MODIFIED`` is returned on a 304, and successful responses come
+    back as ``Validated`` so their validators can be stored.
+    """
     try:
         url = f"https://api.gbif.org/v1/species/search?q={species_name}"
-        response = requests.get(url, timeout=30)
+        response = http_client.get(url, validators=validators)
+        if validators and http_client.is_not_modified(response):
+            return NOT_MODIFIED
         response.raise_for_status()
         
-        data = response.json()
+        data = response_json(response)
         
         # Validate response structure
         if not isinstance(data, dict):
@@ -29,8 +96,9 @@ def fetch_species(species_name: str) -> Dict[str, Any]:
                 "results": [],
                 "count": 0
             }
-            
-        return data
+        
+        new_validators = http_client.response_validators(response)
+        return Validated(data, new_validators) if new_validators else data
         
     except requests.exceptions.Timeout:
         return {
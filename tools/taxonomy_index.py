@@ -0,0 +1,492 @@
+"""
+Local taxonomy index for species name autocomplete and normalization.
+
+The index is built once from a GBIF backbone snapshot (``backbone.zip`` from
+https://hosted-datasets.gbif.org/datasets/backbone/, containing ``Taxon.tsv``
+and ``VernacularName.tsv``) and answers, without any network call:
+
+- prefix autocomplete over scientific and vernacular names,
+- exact name normalization (synonyms and vernacular names resolve to the
+  accepted taxon), and
+- fuzzy matching of misspelled names through a character-trigram index.
+
+Names are stored as a byte-sorted UTF-8 blob with an offsets array, so a
+prefix lookup is a binary search (the flattened equivalent of walking a
+trie) and every column is a memory-mapped ``.npy`` file; opening the index
+costs almost no resident memory however large the snapshot is. Building
+sorts the names through a temporary SQLite table, so the snapshot is never
+held in memory either.
+
+Point ``WILDLIFE_TAXONOMY_INDEX`` at an index directory to let the app and
+the occurrence tool resolve names locally.
+
+Usage:
+    python -m tools.taxonomy_index backbone.zip --index .cache/taxonomy
+"""
+import argparse
+import array
+import difflib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import unicodedata
+import zipfile
+import zlib
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from tools.occurrence_store import iter_archive_rows
+
+
+TAXONOMY_INDEX_ENV = "WILDLIFE_TAXONOMY_INDEX"
+DEFAULT_INDEX_DIR = ".cache/taxonomy"
+
+INDEX_FORMAT_VERSION = 1
+
+RANK_CODES = {
+    "kingdom": 0, "phylum": 1, "class": 2, "order": 3, "family": 4,
+    "genus": 5, "species": 6, "subspecies": 7
+}
+RANK_NAMES = {code: rank.upper() for rank, code in RANK_CODES.items()}
+DEFAULT_RANKS = ("kingdom", "phylum", "class", "order", "family", "genus", "species")
+DEFAULT_LANGUAGES = ("en", "eng")
+
+# Kinds of indexed name, in order of preference when several match
+KIND_ACCEPTED = 0
+KIND_VERNACULAR = 1
+KIND_SYNONYM = 2
+KIND_LABELS = {KIND_ACCEPTED: "ACCEPTED", KIND_VERNACULAR: "VERNACULAR", KIND_SYNONYM: "SYNONYM"}
+
+# Prefix matches scanned (in byte order) before ranking the suggestions
+PREFIX_SCAN_FACTOR = 20
+
+# Trigrams shared by more names than this carry little signal and are skipped
+MAX_POSTINGS = 20000
+FUZZY_CANDIDATES = 50
+DEFAULT_FUZZY_CUTOFF = 0.75
+
+_BUILD_BATCH = 50000
+
+_index_lock = threading.Lock()
+_index_instance = None
+
+
+def normalize_name(text: str) -> str:
+    """Fold case, strip accents and punctuation, and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w]+", " ", stripped.casefold()).split())
+
+
+def _trigrams(name: str) -> Iterable[int]:
+    """Distinct hashed character trigrams of a normalized name, padded at both ends."""
+    padded = f" {name} "
+    return {zlib.crc32(padded[i:i + 3].encode("utf-8")) for i in range(len(padded) - 2)}
+
+
+class _BlobWriter:
+    """Append strings to a UTF-8 blob file while recording their offsets."""
+
+    def __init__(self, path: str):
+        self.handle = open(path, "wb")
+        self.offsets = array.array("q", [0])
+
+    def append(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.handle.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self, offsets_path: str) -> None:
+        self.handle.close()
+        np.save(offsets_path, np.frombuffer(self.offsets, dtype=np.int64))
+
+
+def build_index(snapshot_path: str, index_dir: str = DEFAULT_INDEX_DIR,
+                ranks: Iterable[str] = DEFAULT_RANKS, languages: Iterable[str] = DEFAULT_LANGUAGES,
+                include_synonyms: bool = True) -> Dict[str, Any]:
+    """
+    Build a taxonomy index from a GBIF backbone snapshot.
+
+    Args:
+        snapshot_path: Path of the backbone zip (``Taxon.tsv`` plus an optional
+            ``VernacularName.tsv``)
+        index_dir: Directory to write the index to (replaced if it exists)
+        ranks: Taxon ranks to index
+        languages: Vernacular name languages to index
+        include_synonyms: Also index synonyms, resolving them to the accepted taxon
+
+    Returns:
+        The index metadata (name counts, timings)
+    """
+    start_time = time.perf_counter()
+    rank_codes = {rank: RANK_CODES[rank] for rank in ranks}
+    languages = {language.lower() for language in languages}
+
+    build_dir = f"{index_dir.rstrip(os.sep)}.building"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    # Sort names on disk so large snapshots never have to fit in memory
+    db = sqlite3.connect(os.path.join(build_dir, "build.sqlite3"))
+    db.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE taxa (key INTEGER PRIMARY KEY, accepted INTEGER, rank INTEGER, name TEXT);
+        CREATE TABLE names (norm BLOB, display TEXT, key INTEGER, kind INTEGER);
+    """)
+
+    taxa_batch: List[Tuple] = []
+    names_batch: List[Tuple] = []
+
+    def flush():
+        db.executemany("INSERT OR REPLACE INTO taxa VALUES (?, ?, ?, ?)", taxa_batch)
+        db.executemany("INSERT INTO names VALUES (?, ?, ?, ?)", names_batch)
+        taxa_batch.clear()
+        names_batch.clear()
+
+    def add_name(display: str, key: int, kind: int):
+        norm = normalize_name(display)
+        if norm:
+            names_batch.append((norm.encode("utf-8"), display, key, kind))
+        if len(names_batch) >= _BUILD_BATCH:
+            flush()
+
+    for row in iter_archive_rows(snapshot_path, "Taxon.tsv"):
+        rank = rank_codes.get((row.get("taxonRank") or "").lower())
+        if rank is None or not row.get("taxonID"):
+            continue
+        key = int(row["taxonID"])
+        status = (row.get("taxonomicStatus") or "").lower()
+        is_synonym = bool(row.get("acceptedNameUsageID")) and status not in ("accepted", "doubtful")
+        if is_synonym and not include_synonyms:
+            continue
+        accepted = int(row["acceptedNameUsageID"]) if is_synonym else key
+        name = row.get("canonicalName") or row.get("scientificName") or ""
+        taxa_batch.append((key, accepted, rank, name))
+        add_name(name, key, KIND_SYNONYM if is_synonym else KIND_ACCEPTED)
+
+    with zipfile.ZipFile(snapshot_path) as archive:
+        has_vernacular = "VernacularName.tsv" in archive.namelist()
+    if has_vernacular:
+        for row in iter_archive_rows(snapshot_path, "VernacularName.tsv"):
+            if (row.get("language") or "").lower() in languages and row.get("taxonID") and row.get("vernacularName"):
+                add_name(row["vernacularName"], int(row["taxonID"]), KIND_VERNACULAR)
+    flush()
+    db.commit()
+
+    # One entry per distinct (name, taxon, kind), sorted byte-wise by name and
+    # then by preference, so the best match for a name comes first
+    entry_count = db.execute("SELECT COUNT(*) FROM (SELECT 1 FROM names n JOIN taxa t ON t.key = n.key "
+                             "GROUP BY n.norm, n.key, n.kind)").fetchone()[0]
+    rows = db.execute("""
+        SELECT n.norm, MIN(n.display), n.key, t.accepted, t.rank, n.kind, COALESCE(a.name, t.name)
+        FROM names n
+        JOIN taxa t ON t.key = n.key
+        LEFT JOIN taxa a ON a.key = t.accepted
+        GROUP BY n.norm, n.key, n.kind
+        ORDER BY n.norm, n.kind, ABS(t.rank - 6), n.key
+    """)
+
+    columns = {
+        "key": np.lib.format.open_memmap(os.path.join(build_dir, "key.npy"), "w+", np.int32, (entry_count,)),
+        "accepted_key": np.lib.format.open_memmap(
+            os.path.join(build_dir, "accepted_key.npy"), "w+", np.int32, (entry_count,)),
+        "rank": np.lib.format.open_memmap(os.path.join(build_dir, "rank.npy"), "w+", np.int8, (entry_count,)),
+        "kind": np.lib.format.open_memmap(os.path.join(build_dir, "kind.npy"), "w+", np.int8, (entry_count,)),
+    }
+    blobs = {blob: _BlobWriter(os.path.join(build_dir, f"{blob}.bin")) for blob in ("norm", "display", "accepted")}
+    trigram_codes = array.array("I")
+    trigram_entries = array.array("i")
+    name_lengths = array.array("h")
+    distinct_names = 0
+    previous_norm = None
+    for position, (norm, display, key, accepted, rank, kind, accepted_name) in enumerate(rows):
+        columns["key"][position] = key
+        columns["accepted_key"][position] = accepted
+        columns["rank"][position] = rank
+        columns["kind"][position] = kind
+        text = norm.decode("utf-8")
+        blobs["norm"].append(text)
+        blobs["display"].append(display)
+        blobs["accepted"].append(accepted_name or display)
+        name_lengths.append(min(len(text), 32767))
+        # Trigrams point at the first (preferred) entry of each distinct name
+        if norm != previous_norm:
+            previous_norm = norm
+            distinct_names += 1
+            for code in _trigrams(text):
+                trigram_codes.append(code)
+                trigram_entries.append(position)
+    db.close()
+
+    for column in columns.values():
+        column.flush()
+    del columns
+    for name, blob in blobs.items():
+        blob.close(os.path.join(build_dir, f"{name}_offsets.npy"))
+    np.save(os.path.join(build_dir, "name_length.npy"), np.frombuffer(name_lengths, dtype=np.int16))
+
+    codes = np.frombuffer(trigram_codes, dtype=np.uint32)
+    order = np.argsort(codes, kind="stable")
+    gram_keys, gram_starts, gram_counts = np.unique(codes[order], return_index=True, return_counts=True)
+    np.save(os.path.join(build_dir, "gram_keys.npy"), gram_keys)
+    np.save(os.path.join(build_dir, "gram_starts.npy"), gram_starts.astype(np.int64))
+    np.save(os.path.join(build_dir, "gram_counts.npy"), gram_counts.astype(np.int64))
+    np.save(os.path.join(build_dir, "postings.npy"), np.frombuffer(trigram_entries, dtype=np.int32)[order])
+    del codes, order
+    os.remove(os.path.join(build_dir, "build.sqlite3"))
+
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "source": os.path.basename(snapshot_path),
+        "built_at": time.time(),
+        "entries": entry_count,
+        "distinct_names": distinct_names,
+        "ranks": list(rank_codes),
+        "languages": sorted(languages),
+        "include_synonyms": include_synonyms,
+        "build_seconds": round(time.perf_counter() - start_time, 3)
+    }
+    with open(os.path.join(build_dir, "meta.json"), "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, indent=2)
+
+    previous_dir = f"{index_dir.rstrip(os.sep)}.previous"
+    shutil.rmtree(previous_dir, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.replace(index_dir, previous_dir)
+    os.replace(build_dir, index_dir)
+    shutil.rmtree(previous_dir, ignore_errors=True)
+    return meta
+
+
+class TaxonomyIndex:
+    """Read-only view of an index written by ``build_index``."""
+
+    def __init__(self, path: str):
+        """
+        Open an index directory; all columns are memory-mapped, not read.
+
+        Args:
+            path: Directory written by ``build_index``
+        """
+        self.path = path
+        self.meta_mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as handle:
+            self.meta = json.load(handle)
+        if self.meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported taxonomy index version in {path}; rebuild the index")
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        def load_blob(name):
+            blob_path = os.path.join(path, f"{name}.bin")
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) \
+                else np.zeros(0, dtype=np.uint8)
+            return blob, load(f"{name}_offsets")
+
+        self._keys = load("key")
+        self._accepted_keys = load("accepted_key")
+        self._ranks = load("rank")
+        self._kinds = load("kind")
+        self._name_lengths = load("name_length")
+        self._norm, self._norm_offsets = load_blob("norm")
+        self._display, self._display_offsets = load_blob("display")
+        self._accepted, self._accepted_offsets = load_blob("accepted")
+        self._gram_keys = load("gram_keys")
+        self._gram_starts = load("gram_starts")
+        self._gram_counts = load("gram_counts")
+        self._postings = load("postings")
+
+    def __len__(self) -> int:
+        return int(self.meta["entries"])
+
+    def _text(self, blob: np.ndarray, offsets: np.ndarray, position: int) -> str:
+        return blob[offsets[position]:offsets[position + 1]].tobytes().decode("utf-8")
+
+    def _bisect(self, target: bytes) -> int:
+        """First entry whose normalized name is not less than ``target`` (byte order)."""
+        low, high = 0, len(self)
+        norm, offsets = self._norm, self._norm_offsets
+        while low < high:
+            middle = (low + high) // 2
+            if norm[offsets[middle]:offsets[middle + 1]].tobytes() < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _entry(self, position: int, match_type: str, confidence: int = 100) -> Dict[str, Any]:
+        """Describe an entry in the shape of a GBIF species/match response."""
+        return {
+            "usageKey": int(self._keys[position]),
+            "acceptedUsageKey": int(self._accepted_keys[position]),
+            "canonicalName": self._text(self._accepted, self._accepted_offsets, position),
+            "matchedName": self._text(self._display, self._display_offsets, position),
+            "rank": RANK_NAMES.get(int(self._ranks[position]), "UNRANKED"),
+            "status": KIND_LABELS[int(self._kinds[position])],
+            "matchType": match_type,
+            "confidence": confidence
+        }
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Suggest names starting with ``prefix``, one per accepted taxon.
+
+        Args:
+            prefix: Partially typed scientific or vernacular name
+            limit: Maximum number of suggestions
+
+        Returns:
+            Matches ordered by shortest completion, then name kind
+        """
+        target = normalize_name(prefix).encode("utf-8")
+        if not target:
+            return []
+        low = self._bisect(target)
+        high = min(self._bisect(target + b"\xff"), low + limit * PREFIX_SCAN_FACTOR)
+        order = np.lexsort((self._kinds[low:high], self._name_lengths[low:high]))
+        suggestions, seen = [], set()
+        for position in (low + order).tolist():
+            accepted_key = int(self._accepted_keys[position])
+            if accepted_key in seen:
+                continue
+            seen.add(accepted_key)
+            suggestions.append(self._entry(position, "PREFIX"))
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def fuzzy(self, name: str, limit: int = 5, cutoff: float = DEFAULT_FUZZY_CUTOFF) -> List[Dict[str, Any]]:
+        """
+        Find names similar to a possibly misspelled ``name``.
+
+        Candidates sharing the most character trigrams with the query are
+        taken from the trigram index and re-ranked by edit similarity.
+
+        Args:
+            name: Free-text species name
+            limit: Maximum number of matches
+            cutoff: Minimum similarity (0-1) of a match
+
+        Returns:
+            Matches ordered by decreasing similarity, one per accepted taxon
+        """
+        query = normalize_name(name)
+        if not query or not len(self._gram_keys):
+            return []
+        grams = np.fromiter(_trigrams(query), dtype=np.uint32)
+        positions = np.searchsorted(self._gram_keys, grams)
+        positions = positions[positions < len(self._gram_keys)]
+        positions = positions[np.isin(self._gram_keys[positions], grams)]
+        if not len(positions):
+            return []
+        counts = self._gram_counts[positions]
+        selective = positions[counts <= MAX_POSTINGS]
+        if not len(selective):
+            selective = positions[np.argsort(counts)[:3]]
+        candidates = np.concatenate([
+            self._postings[self._gram_starts[position]:self._gram_starts[position] + self._gram_counts[position]]
+            for position in selective
+        ])
+        entries, shared = np.unique(candidates, return_counts=True)
+
+        # Dice coefficient over trigram sets, then edit similarity on the best few
+        dice = 2 * shared / (len(grams) + self._name_lengths[entries].astype(np.float64))
+        best = entries[np.argsort(-dice, kind="stable")[:FUZZY_CANDIDATES]]
+        scored = []
+        for position in best:
+            candidate = self._text(self._norm, self._norm_offsets, int(position))
+            similarity = difflib.SequenceMatcher(None, query, candidate).ratio()
+            if similarity >= cutoff:
+                scored.append((similarity, int(position)))
+        scored.sort(key=lambda item: (-item[0], int(self._kinds[item[1]])))
+
+        matches, seen = [], set()
+        for similarity, position in scored:
+            accepted_key = int(self._accepted_keys[position])
+            if accepted_key in seen:
+                continue
+            seen.add(accepted_key)
+            matches.append(self._entry(position, "FUZZY", round(similarity * 100)))
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def normalize(self, name: str, cutoff: float = DEFAULT_FUZZY_CUTOFF) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a free-text name to its accepted taxon.
+
+        Exact matches of a scientific, vernacular or synonym name win;
+        otherwise the closest fuzzy match above ``cutoff`` is returned.
+
+        Args:
+            name: Free-text species name
+            cutoff: Minimum similarity (0-1) of a fuzzy match
+
+        Returns:
+            The match, or None when nothing in the index is close enough
+        """
+        target = normalize_name(name).encode("utf-8")
+        if not target:
+            return None
+        position = self._bisect(target)
+        if position < len(self) and \
+                self._norm[self._norm_offsets[position]:self._norm_offsets[position + 1]].tobytes() == target:
+            return self._entry(position, "EXACT")
+        matches = self.fuzzy(name, limit=1, cutoff=cutoff)
+        return matches[0] if matches else None
+
+
+def get_taxonomy_index() -> Optional[TaxonomyIndex]:
+    """
+    Return the process-wide taxonomy index.
+
+    Returns:
+        The TaxonomyIndex in ``WILDLIFE_TAXONOMY_INDEX``, or None when no
+        index is configured or it has not been built yet
+    """
+    global _index_instance
+    path = os.getenv(TAXONOMY_INDEX_ENV)
+    if not path or not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    with _index_lock:
+        meta_mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+        if _index_instance is None or _index_instance.path != path \
+                or _index_instance.meta_mtime != meta_mtime:
+            _index_instance = TaxonomyIndex(path)
+        return _index_instance
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the local taxonomy index from a GBIF backbone snapshot."
+    )
+    parser.add_argument("snapshot", help="GBIF backbone zip (Taxon.tsv, VernacularName.tsv)")
+    parser.add_argument(
+        "--index",
+        default=os.getenv(TAXONOMY_INDEX_ENV, DEFAULT_INDEX_DIR),
+        help=f"Index directory (default: ${TAXONOMY_INDEX_ENV} or {DEFAULT_INDEX_DIR})"
+    )
+    parser.add_argument("--ranks", nargs="+", default=list(DEFAULT_RANKS), choices=list(RANK_CODES),
+                        help="Taxon ranks to index")
+    parser.add_argument("--languages", nargs="+", default=list(DEFAULT_LANGUAGES),
+                        help="Vernacular name languages to index")
+    parser.add_argument("--no-synonyms", action="store_true", help="Index accepted names only")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"🌳 Building taxonomy index from {args.snapshot} into {args.index} ...")
+    meta = build_index(args.snapshot, args.index, args.ranks, args.languages, not args.no_synonyms)
+    print(f"✅ Indexed {meta['entries']:,} names ({meta['distinct_names']:,} distinct) "
+          f"in {meta['build_seconds']:.1f}s")
+    print(f"   Set {TAXONOMY_INDEX_ENV}={args.index} to resolve names from this index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Wildlife Insight Agent - Cache Warm-up
+
+Prefetches tool responses (and optionally generates full reports) for the
+featured queries into the shared cache, so the first visitor after a deploy
+does not pay cold GBIF, Open Meteo and LLM latency. Jobs run concurrently on
+a thread pool within a time budget; jobs still running when the budget is
+spent are reported as timed out and finish in the background, jobs not yet
+started are cancelled.
+
+``serve.py`` runs the warm-up at boot; it can also be run on its own:
+
+Usage:
+    python warmup.py
+    python warmup.py --species tiger "snow leopard" --steps species occurrence report --budget 300
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tools.cache import CACHE_DB_ENV
+
+DEFAULT_CACHE_DB = os.path.join(".cache", "wildlife_cache.sqlite3")
+
+# Queries shown on the welcome screen and sidebar
+FEATURED_SPECIES = ["tiger", "whale", "elephant", "pug"]
+FEATURED_LOCATIONS = ["New York"]
+
+# Steps per species ("species", "occurrence", "report") or per location ("climate", "climate_history")
+SPECIES_STEPS = ("species", "occurrence", "report")
+LOCATION_STEPS = ("climate", "climate_history")
+DEFAULT_STEPS = ("species", "occurrence", "climate")
+
+DEFAULT_BUDGET_SECONDS = 60.0
+DEFAULT_CONCURRENCY = 4
+
+Job = Tuple[str, str, Callable[[], Any]]
+
+
+def _step_function(step: str) -> Callable[[str], Any]:
+    """Resolve a step to the tool that warms it (imported on demand)."""
+    if step == "species":
+        from tools.species_tool import fetch_species
+        return fetch_species
+    if step == "occurrence":
+        from tools.occurrence_tool import fetch_occurrence_distribution
+        return fetch_occurrence_distribution
+    if step == "climate":
+        from tools.climate_tool import fetch_climate_data
+        return fetch_climate_data
+    if step == "climate_history":
+        from tools.climate_history_tool import fetch_climate_history
+        return fetch_climate_history
+    if step == "report":
+        from streamlit_utils import run_wildlife_analysis_streamlit
+        return lambda species: run_wildlife_analysis_streamlit(species)[0]
+    raise ValueError(f"Unknown warm-up step '{step}'; choose from {', '.join(SPECIES_STEPS + LOCATION_STEPS)}")
+
+
+def warmup_jobs(species: Iterable[str], locations: Iterable[str], steps: Iterable[str]) -> List[Job]:
+    """
+    Build the (step, target, callable) jobs for a warm-up run.
+
+    Reports come last so that, with enough workers, the tool responses they
+    read are already cached when they start.
+    """
+    steps = list(steps)
+    jobs = []
+    for step in sorted(steps, key=lambda step: step == "report"):
+        function = _step_function(step)
+        targets = species if step in SPECIES_STEPS else locations
+        jobs.extend((step, target, lambda function=function, target=target: function(target)) for target in targets)
+    return jobs
+
+
+def _run_job(step: str, target: str, function: Callable[[], Any]) -> Dict[str, Any]:
+    """Run one job and describe its outcome."""
+    start_time = time.perf_counter()
+    try:
+        result = function()
+        error = result.get("error") if isinstance(result, dict) else None
+        if error is None and isinstance(result, str) and result.startswith("Error"):
+            error = result
+    except Exception as e:
+        error = str(e)
+    return {
+        "step": step,
+        "target": target,
+        "status": "ok" if error is None else "error",
+        "error": error,
+        "seconds": round(time.perf_counter() - start_time, 3)
+    }
+
+
+def run_warmup(species: Optional[Iterable[str]] = None, locations: Optional[Iterable[str]] = None,
+               steps: Iterable[str] = DEFAULT_STEPS, budget: float = DEFAULT_BUDGET_SECONDS,
+               concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """
+    Warm the shared cache for the featured queries.
+
+    Args:
+        species: Species queries (default: featured species)
+        locations: Climate locations (default: featured locations)
+        steps: Which tools to warm; add "report" to pre-generate reports
+        budget: Seconds to wait before reporting; unfinished jobs time out
+        concurrency: Worker threads
+
+    Returns:
+        dict: Per-job results plus ok/error/timeout/cancelled counts and elapsed seconds
+    """
+    jobs = warmup_jobs(FEATURED_SPECIES if species is None else species,
+                       FEATURED_LOCATIONS if locations is None else locations, steps)
+    start_time = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="warmup")
+    futures = {executor.submit(_run_job, *job): job for job in jobs}
+    done, _ = wait(futures, timeout=budget)
+    results = []
+    for future, (step, target, _function) in futures.items():
+        if future in done:
+            results.append(future.result())
+        else:
+            status = "cancelled" if future.cancel() else "timeout"
+            results.append({"step": step, "target": target, "status": status, "error": None,
+                            "seconds": None})
+    # Running jobs keep filling the cache in the background; queued ones are dropped
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    counts = {status: sum(1 for result in results if result["status"] == status)
+              for status in ("ok", "error", "timeout", "cancelled")}
+    return {
+        "results": results,
+        "counts": counts,
+        "seconds": round(time.perf_counter() - start_time, 3),
+        "budget": budget,
+        "concurrency": concurrency
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a warm-up report, one line per job."""
+    icons = {"ok": "✅", "error": "⚠️", "timeout": "⏱️", "cancelled": "⏭️"}
+    for result in report["results"]:
+        detail = f"{result['seconds']:.1f}s" if result["seconds"] is not None else result["status"]
+        if result["error"]:
+            detail += f" ({result['error']})"
+        print(f"   {icons[result['status']]} {result['step']} '{result['target']}' {detail}")
+    counts = report["counts"]
+    print(f"🔥 Cache warm-up finished in {report['seconds']:.1f}s "
+          f"(budget {report['budget']:.0f}s): {counts['ok']} ok, {counts['error']} failed, "
+          f"{counts['timeout']} timed out, {counts['cancelled']} skipped")
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Prefetch featured queries into the shared cache.")
+    parser.add_argument("--species", nargs="+", default=None,
+                        help=f"Species queries (default: {', '.join(FEATURED_SPECIES)})")
+    parser.add_argument("--locations", nargs="+", default=None,
+                        help=f"Climate locations (default: {', '.join(FEATURED_LOCATIONS)})")
+    parser.add_argument("--steps", nargs="+", default=list(DEFAULT_STEPS),
+                        choices=SPECIES_STEPS + LOCATION_STEPS,
+                        help="Tools to warm; add 'report' to pre-generate reports (default: %(default)s)")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Seconds to spend before reporting (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Concurrent jobs (default: %(default)s)")
+    parser.add_argument("--cache-db", default=os.getenv(CACHE_DB_ENV, DEFAULT_CACHE_DB),
+                        help="Shared cache database path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run a warm-up pass from the command line and print its report."""
+    args = parse_args(argv)
+    os.environ[CACHE_DB_ENV] = args.cache_db
+    print(f"🔥 Warming {args.cache_db} ({', '.join(args.steps)})...")
+    report = run_warmup(args.species, args.locations, args.steps, args.budget, args.concurrency)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()